@@ -75,10 +75,26 @@ async def lifespan(app: FastAPI):
         template_api.initialize(db)
         composio_api.initialize(db)
         
+        # Warm the Composio toolkit catalog and keep it refreshed in the background
+        from core.composio_integration.toolkit_catalog import get_toolkit_catalog
+        if config.COMPOSIO_API_KEY:
+            get_toolkit_catalog().start()
+        
+        # Apply marketplace template downloads to the database in batches
+        from core.templates.services.marketplace_index import get_marketplace_index
+        get_marketplace_index(db).start()
+        
+        # Re-enqueue Stripe webhook events whose queue message or consumer was lost
+        from core.billing.webhook_queue import webhook_queue
+        webhook_queue.start()
+        
         yield
         
         logger.debug("Cleaning up agent resources")
         await core_api.cleanup()
+        await get_toolkit_catalog().stop()
+        await get_marketplace_index().stop()
+        await webhook_queue.stop()
         
         try:
             logger.debug("Closing Redis connection")
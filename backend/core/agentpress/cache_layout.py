@@ -0,0 +1,451 @@
+"""
+Stable prompt-cache layout for Anthropic models.
+
+Anthropic caches prompt prefixes up to each cache_control breakpoint, so a
+breakpoint only produces a cache read if every byte before it is identical to
+the previous request. Re-chunking the conversation from scratch on each turn
+moves those boundaries whenever messages are appended or compressed, and the
+cache hit rate collapses.
+
+The layout engine keeps chunk boundaries append-only:
+
+- Boundaries are stored per thread in Redis (via Cache) as the last message_id
+  of each chunk plus a hash of the chunk text.
+- On each turn the stored boundaries are re-validated in order. The first one
+  whose messages are gone or whose text changed (e.g. after compression) is
+  dropped together with everything after it; earlier chunks are reused as-is.
+- New chunks are only cut from messages after the last valid boundary. When
+  all breakpoints are in use the last chunk absorbs the tail, so only the final
+  block is rewritten.
+
+Each turn also records the number of cache-read tokens the layout predicts.
+record_usage() compares it with the provider's cache_read_input_tokens so the
+hit ratio per thread can be tracked and the thresholds tuned.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional
+
+from core.agentpress.prompt_caching import (
+    add_system_cache_control,
+    calculate_optimal_cache_threshold,
+    format_conversation_for_cache,
+    get_message_token_count,
+    system_cache_breakpoints,
+)
+from core.utils.cache import Cache
+from core.utils.logger import logger
+
+CACHE_LAYOUT_TTL = 24 * 3600
+
+# Anthropic ephemeral cache entries expire after 5 minutes without a hit
+PROVIDER_CACHE_TTL_SECONDS = 300
+
+# Anthropic allows at most 4 cache breakpoints per request
+MAX_CACHE_BLOCKS = 4
+
+MIN_CACHEABLE_TOKENS = 1024
+
+# Per-turn prediction records kept in the layout
+MAX_HISTORY_ENTRIES = 20
+
+# Layouts kept in process memory (avoids a Redis read when recording usage)
+LOCAL_LAYOUT_CACHE_SIZE = 512
+
+
+@dataclass
+class CacheBoundary:
+    """End of one cached conversation chunk."""
+    last_message_id: str
+    message_count: int
+    content_hash: str
+    tokens: int
+
+
+@dataclass
+class CacheLayout:
+    """Persisted cache layout for one thread."""
+    model: str
+    threshold: int
+    system_hash: Optional[str] = None
+    boundaries: List[CacheBoundary] = field(default_factory=list)
+    updated_at: float = 0.0
+    # Prediction for the request built from this layout, cleared once usage is recorded
+    prediction: Optional[Dict[str, Any]] = None
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        'turns': 0,
+        'prompt_tokens': 0,
+        'predicted_read_tokens': 0,
+        'actual_read_tokens': 0,
+        'actual_write_tokens': 0,
+    })
+    history: List[Dict[str, Any]] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CacheLayout":
+        layout = cls(
+            model=data.get('model', ''),
+            threshold=int(data.get('threshold', MIN_CACHEABLE_TOKENS)),
+            system_hash=data.get('system_hash'),
+            boundaries=[CacheBoundary(**b) for b in data.get('boundaries', [])],
+            updated_at=float(data.get('updated_at', 0.0)),
+            prediction=data.get('prediction'),
+            history=data.get('history', []),
+        )
+        layout.stats.update(data.get('stats', {}))
+        return layout
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of prompt tokens served from cache across recorded turns."""
+        prompt_tokens = self.stats.get('prompt_tokens', 0)
+        return self.stats.get('actual_read_tokens', 0) / prompt_tokens if prompt_tokens else 0.0
+
+
+@dataclass
+class _Block:
+    start: int
+    end: int
+    tokens: int
+    content_hash: str
+    text: str
+    reused: bool
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def _system_hash(system_prompt: Dict[str, Any]) -> str:
+    content = system_prompt.get('content', '')
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, default=str)
+    return _hash_text(content)
+
+
+def _cache_block(text: str) -> Dict[str, Any]:
+    return {
+        "role": "user",
+        "content": [
+            {
+                "type": "text",
+                "text": text,
+                "cache_control": {"type": "ephemeral"}
+            }
+        ]
+    }
+
+
+class CacheLayoutEngine:
+    """Builds cache breakpoints from a stable, append-only per-thread layout."""
+
+    def __init__(self, persist_layout: bool = True):
+        """Initialize the engine.
+
+        Args:
+            persist_layout: Store layouts in Redis between turns. Disable for offline use.
+        """
+        self.persist_layout = persist_layout
+        self._local_layouts: "OrderedDict[str, CacheLayout]" = OrderedDict()
+
+    @staticmethod
+    def _layout_key(thread_id: str) -> str:
+        return f"cache_layout:{thread_id}"
+
+    def _remember(self, thread_id: str, layout: CacheLayout):
+        self._local_layouts[thread_id] = layout
+        self._local_layouts.move_to_end(thread_id)
+        while len(self._local_layouts) > LOCAL_LAYOUT_CACHE_SIZE:
+            self._local_layouts.popitem(last=False)
+
+    async def load_layout(self, thread_id: str, prefer_local: bool = False) -> Optional[CacheLayout]:
+        """Load the layout for a thread, from Redis unless prefer_local and a local copy exists."""
+        layout = self._local_layouts.get(thread_id) if prefer_local or not self.persist_layout else None
+        if layout is None and self.persist_layout:
+            try:
+                data = await Cache.get(self._layout_key(thread_id))
+                if data:
+                    layout = CacheLayout.from_dict(data)
+            except Exception as e:
+                logger.debug(f"Failed to load cache layout for {thread_id}: {e}")
+                layout = self._local_layouts.get(thread_id)
+        return layout
+
+    async def save_layout(self, thread_id: str, layout: CacheLayout):
+        self._remember(thread_id, layout)
+        if not self.persist_layout:
+            return
+        try:
+            await Cache.set(self._layout_key(thread_id), asdict(layout), ttl=CACHE_LAYOUT_TTL)
+        except Exception as e:
+            logger.debug(f"Failed to save cache layout for {thread_id}: {e}")
+
+    async def reset(self, thread_id: str):
+        self._local_layouts.pop(thread_id, None)
+        if self.persist_layout:
+            try:
+                await Cache.invalidate(self._layout_key(thread_id))
+            except Exception as e:
+                logger.debug(f"Failed to reset cache layout for {thread_id}: {e}")
+
+    def _new_layout(
+        self,
+        system_prompt: Dict[str, Any],
+        conversation: List[Dict[str, Any]],
+        message_tokens: List[int],
+        model_name: str,
+        max_blocks: int,
+        context_window_tokens: Optional[int]
+    ) -> CacheLayout:
+        """Pick a chunk threshold for a new layout. It stays fixed until the layout is rebuilt."""
+        if context_window_tokens is None:
+            try:
+                from core.ai_models.registry import registry
+                context_window_tokens = registry.get_context_window(model_name, default=200_000)
+            except Exception as e:
+                logger.warning(f"Failed to get context window from registry: {e}")
+                context_window_tokens = 200_000
+
+        conversation_tokens = sum(message_tokens)
+        total_tokens = conversation_tokens + get_message_token_count(system_prompt, model_name)
+        threshold = calculate_optimal_cache_threshold(context_window_tokens, len(conversation), total_tokens)
+
+        # Rebuilding on a long conversation: size chunks so the available blocks cover it
+        if max_blocks > 0:
+            optimal_chunk_size = conversation_tokens // max_blocks
+            if optimal_chunk_size > threshold * 1.5:
+                threshold = min(optimal_chunk_size, 30000)
+
+        logger.info(f"🆕 New cache layout: chunk threshold {threshold} tokens for {len(conversation)} messages")
+        return CacheLayout(model=model_name, threshold=threshold)
+
+    def _reuse_boundaries(
+        self,
+        layout: CacheLayout,
+        conversation: List[Dict[str, Any]]
+    ) -> List[_Block]:
+        """Return the stored chunks that still match the conversation, in order."""
+        positions = {msg['message_id']: i for i, msg in enumerate(conversation) if msg.get('message_id')}
+        blocks: List[_Block] = []
+        start = 0
+        for boundary in layout.boundaries:
+            end = positions.get(boundary.last_message_id)
+            if end is None or end < start or end + 1 - start != boundary.message_count:
+                break
+            text = format_conversation_for_cache(conversation[start:end + 1])
+            content_hash = _hash_text(text)
+            if content_hash != boundary.content_hash:
+                break
+            blocks.append(_Block(start, end + 1, boundary.tokens, content_hash, text, reused=True))
+            start = end + 1
+
+        dropped = len(layout.boundaries) - len(blocks)
+        if dropped:
+            logger.info(f"✂️ Cache layout: dropped {dropped} stale chunk boundaries, kept {len(blocks)}")
+        return blocks
+
+    def _cap_blocks(
+        self,
+        blocks: List[_Block],
+        conversation: List[Dict[str, Any]],
+        max_blocks: int
+    ) -> List[_Block]:
+        """Merge the tail of the reused chunks so they fit in max_blocks breakpoints.
+
+        The layout may have been stored while the system prompt was too short to
+        cache; once it is cached it takes one breakpoint from the conversation.
+        """
+        if len(blocks) <= max_blocks:
+            return blocks
+        if max_blocks <= 0:
+            return []
+        head, tail = blocks[:max_blocks - 1], blocks[max_blocks - 1:]
+        start, end = tail[0].start, tail[-1].end
+        text = format_conversation_for_cache(conversation[start:end])
+        merged = _Block(start, end, sum(block.tokens for block in tail), _hash_text(text), text, reused=False)
+        logger.info(f"✂️ Cache layout: merged {len(tail)} chunks to fit {max_blocks} cache breakpoints")
+        return head + [merged]
+
+    def _extend_layout(
+        self,
+        blocks: List[_Block],
+        conversation: List[Dict[str, Any]],
+        message_tokens: List[int],
+        threshold: int,
+        max_blocks: int
+    ) -> List[_Block]:
+        """Cut new chunks from messages after the last boundary. The final chunk is never cached."""
+        start = blocks[-1].end if blocks else 0
+        chunk_start = start
+        chunk_tokens = 0
+
+        for i in range(start, len(conversation)):
+            tokens = message_tokens[i]
+            closes_chunk = (
+                i > chunk_start
+                and chunk_tokens + tokens > threshold
+                and conversation[i - 1].get('message_id')
+            )
+            if closes_chunk:
+                if len(blocks) < max_blocks:
+                    text = format_conversation_for_cache(conversation[chunk_start:i])
+                    blocks.append(_Block(chunk_start, i, chunk_tokens, _hash_text(text), text, reused=False))
+                elif blocks:
+                    # Out of breakpoints: grow the last chunk so only the final block changes
+                    last = blocks[-1]
+                    text = format_conversation_for_cache(conversation[last.start:i])
+                    blocks[-1] = _Block(last.start, i, last.tokens + chunk_tokens, _hash_text(text), text, reused=False)
+                chunk_start = i
+                chunk_tokens = 0
+            chunk_tokens += tokens
+
+        return blocks
+
+    async def apply(
+        self,
+        system_prompt: Dict[str, Any],
+        conversation_messages: List[Dict[str, Any]],
+        model_name: str,
+        thread_id: str,
+        force_recalc: bool = False,
+        context_window_tokens: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Build the prepared message list for an Anthropic request from the thread's layout.
+
+        Args:
+            system_prompt: System prompt message
+            conversation_messages: Conversation messages (oldest first)
+            model_name: Model used for the request
+            thread_id: Thread the layout belongs to
+            force_recalc: Discard the stored layout and pick a new threshold
+            context_window_tokens: Override the context window from the model registry
+
+        Returns:
+            System prompt, cached chunk blocks and the uncached tail, in order
+        """
+        conversation = [msg for msg in conversation_messages if msg.get('role') != 'system']
+        if len(conversation) < len(conversation_messages):
+            logger.debug(f"🔧 Filtered out {len(conversation_messages) - len(conversation)} system messages")
+
+        layout = None if force_recalc else await self.load_layout(thread_id)
+        if layout is not None and layout.model != model_name:
+            logger.info(f"🔄 Cache layout was built for {layout.model}, rebuilding for {model_name}")
+            layout = None
+
+        system_tokens = get_message_token_count(system_prompt, model_name)
+        system_cached = system_tokens >= MIN_CACHEABLE_TOKENS
+        system_blocks = system_cache_breakpoints(system_prompt) if system_cached else 0
+        max_blocks = MAX_CACHE_BLOCKS - system_blocks
+        message_tokens = [get_message_token_count(msg, model_name) for msg in conversation]
+
+        previous = layout
+        if layout is None:
+            layout = self._new_layout(system_prompt, conversation, message_tokens, model_name, max_blocks, context_window_tokens)
+            blocks = []
+        else:
+            blocks = self._cap_blocks(self._reuse_boundaries(layout, conversation), conversation, max_blocks)
+
+        if sum(message_tokens) >= MIN_CACHEABLE_TOKENS:
+            blocks = self._extend_layout(blocks, conversation, message_tokens, layout.threshold, max_blocks)
+
+        prepared_messages = [add_system_cache_control(system_prompt) if system_cached else system_prompt]
+        for block in blocks:
+            prepared_messages.append(_cache_block(block.text))
+        prepared_messages.extend(conversation[blocks[-1].end if blocks else 0:])
+
+        # Cache reads cover the longest unchanged prefix that is still warm at the provider
+        system_hash = _system_hash(system_prompt)
+        now = time.time()
+        warm = (
+            previous is not None
+            and previous.system_hash == system_hash
+            and now - previous.updated_at < PROVIDER_CACHE_TTL_SECONDS
+        )
+        predicted_read = 0
+        if warm:
+            reused_prefix = 0
+            for block in blocks:
+                if not block.reused:
+                    break
+                reused_prefix += block.tokens
+            if system_cached or reused_prefix:
+                predicted_read = system_tokens + reused_prefix
+        cached_total = system_tokens + sum(block.tokens for block in blocks) if system_cached or blocks else 0
+
+        layout.system_hash = system_hash
+        layout.boundaries = [
+            CacheBoundary(
+                last_message_id=conversation[block.end - 1]['message_id'],
+                message_count=block.end - block.start,
+                content_hash=block.content_hash,
+                tokens=block.tokens,
+            )
+            for block in blocks
+        ]
+        layout.updated_at = now
+        layout.prediction = {
+            'predicted_read_tokens': predicted_read,
+            'predicted_write_tokens': max(0, cached_total - predicted_read),
+            'blocks': len(blocks) + system_blocks,
+            'reused_blocks': sum(1 for block in blocks if block.reused),
+        }
+        await self.save_layout(thread_id, layout)
+
+        logger.info(
+            f"🧱 Cache layout: {len(blocks)} chunks ({layout.prediction['reused_blocks']} reused), "
+            f"predicted read {predicted_read} / write {layout.prediction['predicted_write_tokens']} tokens"
+        )
+        return prepared_messages
+
+    async def record_usage(self, thread_id: str, usage: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Compare the last prediction for a thread with the provider-reported cache usage.
+
+        Args:
+            thread_id: Thread the request belonged to
+            usage: Usage dict from the LLM response
+
+        Returns:
+            The per-turn record, or None if no prediction is pending for the thread
+        """
+        layout = await self.load_layout(thread_id, prefer_local=True)
+        if layout is None or not layout.prediction:
+            return None
+
+        prompt_tokens = int(usage.get('prompt_tokens', 0) or 0)
+        actual_read = int(usage.get('cache_read_input_tokens', 0) or 0)
+        if actual_read == 0:
+            actual_read = int((usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0) or 0)
+        actual_write = int(usage.get('cache_creation_input_tokens', 0) or 0)
+        predicted_read = layout.prediction.get('predicted_read_tokens', 0)
+
+        record = {
+            'predicted_read_tokens': predicted_read,
+            'actual_read_tokens': actual_read,
+            'actual_write_tokens': actual_write,
+            'prompt_tokens': prompt_tokens,
+            'hit_ratio': round(actual_read / prompt_tokens, 4) if prompt_tokens else 0.0,
+            'recorded_at': time.time(),
+        }
+
+        layout.stats['turns'] += 1
+        layout.stats['prompt_tokens'] += prompt_tokens
+        layout.stats['predicted_read_tokens'] += predicted_read
+        layout.stats['actual_read_tokens'] += actual_read
+        layout.stats['actual_write_tokens'] += actual_write
+        layout.history = (layout.history + [record])[-MAX_HISTORY_ENTRIES:]
+        layout.prediction = None
+        await self.save_layout(thread_id, layout)
+
+        logger.info(
+            f"🎯 Cache prediction for thread {thread_id}: predicted read {predicted_read}, "
+            f"actual read {actual_read}, write {actual_write} ({record['hit_ratio']:.1%} of prompt, "
+            f"thread hit ratio {layout.hit_ratio:.1%})"
+        )
+        return record
+
+
+cache_layout_engine = CacheLayoutEngine()
@@ -0,0 +1,258 @@
+"""
+Incremental context compaction for AgentPress threads.
+
+ContextManager.compress_messages re-counts and re-compresses the whole history
+on every call. For long threads that is a lot of repeated work, since only the
+messages appended since the previous turn are new. This module keeps a
+per-thread compaction state:
+
+- a compressed prefix made of segment summaries. Each segment replaces a run of
+  old messages and is written once, so its text stays byte-identical across
+  turns (good for prompt caching).
+- per-message token counts, so only new or changed messages are tokenized.
+
+State lives in Redis (via Cache) and is safe to lose: an empty state just means
+the next call tokenizes every message once and rebuilds it.
+"""
+
+import json
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Tuple
+
+from litellm.utils import token_counter
+from core.utils.cache import Cache
+from core.utils.logger import logger
+
+COMPACTION_STATE_TTL = 24 * 3600
+
+# Per-message excerpt length and number of lines kept in a segment summary
+SEGMENT_EXCERPT_CHARS = 120
+SEGMENT_MAX_LINES = 30
+
+
+@dataclass
+class CompactionSegment:
+    """A run of old messages replaced by a single summary message."""
+    message_ids: List[str]
+    summary: str
+    tokens: int
+
+
+@dataclass
+class CompactionState:
+    """Persisted compaction state for one thread."""
+    model: str
+    segments: List[CompactionSegment] = field(default_factory=list)
+    # message_id -> [content_length, token_count]
+    token_counts: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompactionState":
+        return cls(
+            model=data.get('model', ''),
+            segments=[CompactionSegment(**s) for s in data.get('segments', [])],
+            token_counts=data.get('token_counts', {}),
+        )
+
+    def compacted_ids(self) -> set:
+        return {message_id for segment in self.segments for message_id in segment.message_ids}
+
+
+@dataclass
+class CompactionResult:
+    messages: List[Dict[str, Any]]
+    total_tokens: int
+    max_tokens: int
+    newly_counted: int = 0
+    folded: int = 0
+
+    @property
+    def within_limit(self) -> bool:
+        return self.total_tokens <= self.max_tokens
+
+
+def _content_text(msg: Dict[str, Any]) -> str:
+    content = msg.get('content', '')
+    if isinstance(content, str):
+        return content
+    try:
+        return json.dumps(content)
+    except (TypeError, ValueError):
+        return str(content)
+
+
+class IncrementalContextCompactor:
+    """Maintains a compressed prefix and incremental token accounting per thread."""
+
+    def __init__(
+        self,
+        keep_recent_messages: int = 20,
+        compression_target_ratio: float = 0.6,
+        persist_state: bool = True
+    ):
+        """Initialize the compactor.
+
+        Args:
+            keep_recent_messages: Number of most recent messages never folded into the prefix
+            compression_target_ratio: Fold down to this fraction of max_tokens (hysteresis)
+            persist_state: Store state in Redis between turns. Disable for offline use.
+        """
+        self.keep_recent_messages = keep_recent_messages
+        self.compression_target_ratio = compression_target_ratio
+        self.persist_state = persist_state
+        self._local_states: Dict[str, CompactionState] = {}
+
+    @staticmethod
+    def _state_key(thread_id: str) -> str:
+        return f"context_compaction:{thread_id}"
+
+    async def load_state(self, thread_id: str, llm_model: str) -> CompactionState:
+        state = self._local_states.get(thread_id)
+        if state is None and self.persist_state:
+            try:
+                data = await Cache.get(self._state_key(thread_id))
+                if data:
+                    state = CompactionState.from_dict(data)
+            except Exception as e:
+                logger.debug(f"Failed to load compaction state for {thread_id}: {e}")
+
+        if state is None or state.model != llm_model:
+            # Token counts are model-specific; segments are kept only for the same model
+            state = CompactionState(model=llm_model)
+        return state
+
+    async def save_state(self, thread_id: str, state: CompactionState):
+        self._local_states[thread_id] = state
+        if not self.persist_state:
+            return
+        try:
+            await Cache.set(self._state_key(thread_id), asdict(state), ttl=COMPACTION_STATE_TTL)
+        except Exception as e:
+            logger.debug(f"Failed to save compaction state for {thread_id}: {e}")
+
+    async def reset(self, thread_id: str):
+        self._local_states.pop(thread_id, None)
+        if self.persist_state:
+            try:
+                await Cache.invalidate(self._state_key(thread_id))
+            except Exception as e:
+                logger.debug(f"Failed to reset compaction state for {thread_id}: {e}")
+
+    def _count_message(self, state: CompactionState, msg: Dict[str, Any], llm_model: str) -> Tuple[int, bool]:
+        """Return (token_count, was_counted_now) using the cached count when the content is unchanged."""
+        message_id = msg.get('message_id')
+        content_length = len(_content_text(msg))
+
+        if message_id:
+            cached = state.token_counts.get(message_id)
+            if cached and cached[0] == content_length:
+                return cached[1], False
+
+        tokens = token_counter(model=llm_model, messages=[{'role': msg.get('role', 'user'), 'content': _content_text(msg)}])
+        if message_id:
+            state.token_counts[message_id] = [content_length, tokens]
+        return tokens, True
+
+    def _build_segment(self, messages: List[Dict[str, Any]], llm_model: str) -> CompactionSegment:
+        """Create a deterministic summary for a run of messages."""
+        message_ids = [m['message_id'] for m in messages if m.get('message_id')]
+        lines = []
+        for msg in messages[:SEGMENT_MAX_LINES]:
+            excerpt = ' '.join(_content_text(msg).split())[:SEGMENT_EXCERPT_CHARS]
+            lines.append(f"- {msg.get('role', 'unknown')} ({msg.get('message_id', 'n/a')}): {excerpt}")
+        if len(messages) > SEGMENT_MAX_LINES:
+            lines.append(f"- ... {len(messages) - SEGMENT_MAX_LINES} more messages")
+
+        summary = (
+            f"[{len(messages)} earlier messages compacted for token management]\n"
+            + "\n".join(lines)
+            + "\nUse expand-message tool with a message_id above to view full content."
+        )
+        tokens = token_counter(model=llm_model, messages=[{'role': 'user', 'content': summary}])
+        return CompactionSegment(message_ids=message_ids, summary=summary, tokens=tokens)
+
+    @staticmethod
+    def _segment_message(segment: CompactionSegment) -> Dict[str, Any]:
+        return {'role': 'user', 'content': segment.summary}
+
+    async def compact(
+        self,
+        messages: List[Dict[str, Any]],
+        llm_model: str,
+        max_tokens: int,
+        thread_id: str,
+        system_prompt: Optional[Dict[str, Any]] = None
+    ) -> CompactionResult:
+        """Apply the stored prefix, count only new messages and fold more history if needed.
+
+        Args:
+            messages: Full LLM message list for the thread (oldest first)
+            llm_model: Model name, used for tokenization
+            max_tokens: Effective context limit for the conversation
+            thread_id: Thread the state belongs to
+            system_prompt: Optional system prompt, counted towards the total
+
+        Returns:
+            CompactionResult with the messages to send and the maintained token total
+        """
+        state = await self.load_state(thread_id, llm_model)
+        compacted_ids = state.compacted_ids()
+
+        live_messages = [m for m in messages if not (m.get('message_id') and m['message_id'] in compacted_ids)]
+
+        system_tokens = 0
+        if system_prompt:
+            system_tokens = token_counter(model=llm_model, messages=[system_prompt])
+
+        newly_counted = 0
+        live_tokens = []
+        for msg in live_messages:
+            tokens, counted = self._count_message(state, msg, llm_model)
+            live_tokens.append(tokens)
+            newly_counted += int(counted)
+
+        prefix_tokens = sum(segment.tokens for segment in state.segments)
+        total_tokens = system_tokens + prefix_tokens + sum(live_tokens)
+
+        folded = 0
+        if total_tokens > max_tokens:
+            target_tokens = int(max_tokens * self.compression_target_ratio)
+            foldable = max(0, len(live_messages) - self.keep_recent_messages)
+
+            fold_count = 0
+            running_total = total_tokens
+            while fold_count < foldable and running_total > target_tokens:
+                running_total -= live_tokens[fold_count]
+                fold_count += 1
+            # Don't start the live window with orphaned native tool results
+            while fold_count < len(live_messages) and live_messages[fold_count].get('role') == 'tool':
+                running_total -= live_tokens[fold_count]
+                fold_count += 1
+
+            if fold_count > 0:
+                segment = self._build_segment(live_messages[:fold_count], llm_model)
+                state.segments.append(segment)
+                for msg in live_messages[:fold_count]:
+                    state.token_counts.pop(msg.get('message_id'), None)
+
+                live_messages = live_messages[fold_count:]
+                live_tokens = live_tokens[fold_count:]
+                folded = fold_count
+                total_tokens = running_total + segment.tokens
+                logger.info(f"Compacted {fold_count} messages into segment #{len(state.segments)} for thread {thread_id}: {total_tokens} tokens (target {target_tokens})")
+
+        # Drop counts for messages that are no longer in the thread
+        live_ids = {m.get('message_id') for m in live_messages if m.get('message_id')}
+        state.token_counts = {k: v for k, v in state.token_counts.items() if k in live_ids}
+
+        await self.save_state(thread_id, state)
+
+        result_messages = [self._segment_message(segment) for segment in state.segments] + live_messages
+        logger.debug(f"Incremental compaction: {len(messages)} -> {len(result_messages)} messages, {total_tokens} tokens ({newly_counted} newly counted)")
+        return CompactionResult(
+            messages=result_messages,
+            total_tokens=total_tokens,
+            max_tokens=max_tokens,
+            newly_counted=newly_counted,
+            folded=folded,
+        )
@@ -15,9 +15,26 @@ from core.services.supabase import DBConnection
 from core.utils.logger import logger
 from core.ai_models import model_manager
 from core.agentpress.prompt_caching import apply_anthropic_caching_strategy
+from core.agentpress.thread_state import ThreadRunState
 
 DEFAULT_TOKEN_THRESHOLD = 120000
 
+def get_effective_context_limit(llm_model: str) -> int:
+    """Return the conversation token budget for a model (context window minus output reserve)."""
+    context_window = model_manager.get_context_window(llm_model)
+    
+    # Reserve tokens for output generation and safety margin
+    if context_window >= 1_000_000:  # Very large context models (Gemini)
+        return context_window - 300_000  # Large safety margin for huge contexts
+    elif context_window >= 400_000:  # Large context models (GPT-5)
+        return context_window - 64_000  # Reserve for output + margin
+    elif context_window >= 200_000:  # Medium context models (Claude Sonnet)
+        return context_window - 32_000  # Reserve for output + margin
+    elif context_window >= 100_000:  # Standard large context models
+        return context_window - 16_000  # Reserve for output + margin
+    else:  # Smaller context models
+        return context_window - 8_000   # Reserve for output + margin
+
 class ContextManager:
     """Manages thread context including token counting and summarization."""
     
@@ -720,25 +737,13 @@ class ContextManager:
                 result.append(msg)
         return result
 
-    async def compress_messages(self, messages: List[Dict[str, Any]], llm_model: str, max_tokens: Optional[int] = 41000, token_threshold: int = 4096, max_iterations: int = 5, actual_total_tokens: Optional[int] = None, system_prompt: Optional[Dict[str, Any]] = None, thread_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def compress_messages(self, messages: List[Dict[str, Any]], llm_model: str, max_tokens: Optional[int] = 41000, token_threshold: int = 4096, max_iterations: int = 5, actual_total_tokens: Optional[int] = None, system_prompt: Optional[Dict[str, Any]] = None, thread_id: Optional[str] = None, thread_state: Optional[ThreadRunState] = None) -> List[Dict[str, Any]]:
         """Compress the messages WITHOUT applying caching during iterations.
         
         Caching should be applied ONCE at the end by the caller, not during compression.
         """
         # Get model-specific token limits from constants
-        context_window = model_manager.get_context_window(llm_model)
-        
-        # Reserve tokens for output generation and safety margin
-        if context_window >= 1_000_000:  # Very large context models (Gemini)
-            max_tokens = context_window - 300_000  # Large safety margin for huge contexts
-        elif context_window >= 400_000:  # Large context models (GPT-5)
-            max_tokens = context_window - 64_000  # Reserve for output + margin
-        elif context_window >= 200_000:  # Medium context models (Claude Sonnet)
-            max_tokens = context_window - 32_000  # Reserve for output + margin
-        elif context_window >= 100_000:  # Standard large context models
-            max_tokens = context_window - 16_000  # Reserve for output + margin
-        else:  # Smaller context models
-            max_tokens = context_window - 8_000   # Reserve for output + margin
+        max_tokens = get_effective_context_limit(llm_model)
         
         # logger.debug(f"Model {llm_model}: context_window={context_window}, effective_limit={max_tokens}")
 
@@ -813,7 +818,11 @@ class ContextManager:
             logger.info(f"Tiered compression complete: {uncompressed_total_token_count} -> {current_token_count} tokens (target: {target_tokens})")
             
             # Set flag for cache rebuild on next turn (primary compression modified DB)
-            if thread_id and updated_count > 0:
+            if thread_state is not None and updated_count > 0:
+                # Run state is written back lazily when the run ends
+                logger.info(f"✂️ Compressed {updated_count} messages - cache will rebuild on next turn")
+                thread_state.request_cache_rebuild()
+            elif thread_id and updated_count > 0:
                 try:
                     logger.info(f"✂️ Compressed {updated_count} messages - cache will rebuild on next turn")
                     client = await self.db.client
@@ -860,7 +869,7 @@ class ContextManager:
             return await self.compress_messages(
                 result, llm_model, max_tokens, 
                 token_threshold // 2, max_iterations - 1, 
-                compressed_total, system_prompt, thread_id=thread_id
+                compressed_total, system_prompt, thread_id=thread_id, thread_state=thread_state
             )
         elif compressed_total > target_tokens:
             # Still over target but under max_tokens - use omit_messages to reach target
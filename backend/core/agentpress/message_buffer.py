@@ -0,0 +1,141 @@
+"""
+Write-behind buffer for non-LLM status messages.
+
+Status rows (thread_run_start, llm_response_start, tool_started, tool_completed,
+finish, thread_run_end, assistant_response_end, ...) are never sent back to the
+LLM, so they don't need to be persisted before the next chunk is streamed. This
+buffer assigns them client-generated IDs and timestamps, hands them back
+immediately for yielding, and bulk-inserts them in batches.
+
+LLM-visible messages (assistant, tool, user) and llm_response_end (billing)
+always go through the synchronous ThreadManager.add_message path.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from core.utils.logger import logger
+
+# Message types that are safe to persist lazily
+BUFFERED_MESSAGE_TYPES = frozenset({"status", "llm_response_start", "assistant_response_end"})
+
+
+class MessageWriteBuffer:
+    """Per-run buffer that batches non-LLM message inserts."""
+
+    def __init__(
+        self,
+        insert_batch_callback: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+        batch_size: int = 25,
+        max_flush_attempts: int = 3,
+    ):
+        """Initialize the buffer.
+
+        Args:
+            insert_batch_callback: Coroutine that persists a list of message rows in one call
+            batch_size: Number of pending rows that triggers a background flush
+            max_flush_attempts: How many times a failed batch is retried before being dropped
+        """
+        self.insert_batch = insert_batch_callback
+        self.batch_size = batch_size
+        self.max_flush_attempts = max_flush_attempts
+
+        self._pending: List[Dict[str, Any]] = []
+        self._failed_attempts = 0
+        self._flush_lock = asyncio.Lock()
+        self._background_flush: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def should_buffer(type: str, is_llm_message: bool) -> bool:
+        """Whether a message of this type can be persisted lazily."""
+        return not is_llm_message and type in BUFFERED_MESSAGE_TYPES
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def add(
+        self,
+        thread_id: str,
+        type: str,
+        content: Union[Dict[str, Any], List[Any], str],
+        metadata: Optional[Dict[str, Any]] = None,
+        agent_id: Optional[str] = None,
+        agent_version_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Queue a message for insertion and return it as if it had been saved.
+
+        The returned object has the same shape as a row returned by the
+        messages insert, so callers can yield it straight away.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        message = {
+            'message_id': str(uuid.uuid4()),
+            'thread_id': thread_id,
+            'type': type,
+            'content': content,
+            'is_llm_message': False,
+            'metadata': metadata or {},
+            'created_at': now,
+            'updated_at': now,
+        }
+        if agent_id:
+            message['agent_id'] = agent_id
+        if agent_version_id:
+            message['agent_version_id'] = agent_version_id
+
+        self._pending.append(message)
+
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush()
+
+        return message
+
+    def _schedule_flush(self):
+        """Start a background flush unless one is already running."""
+        if self._background_flush and not self._background_flush.done():
+            return
+        try:
+            self._background_flush = asyncio.create_task(self.flush())
+        except RuntimeError:
+            # No running loop - the next explicit flush will pick the rows up
+            pass
+
+    async def flush(self) -> int:
+        """Persist all pending rows. Returns the number of rows written.
+
+        Failed batches are put back at the front of the queue so ordering is
+        preserved, and dropped after max_flush_attempts consecutive failures.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch = self._pending
+            self._pending = []
+
+            try:
+                await self.insert_batch(batch)
+                self._failed_attempts = 0
+                logger.debug(f"Flushed {len(batch)} buffered status messages")
+                return len(batch)
+            except Exception as e:
+                self._failed_attempts += 1
+                if self._failed_attempts >= self.max_flush_attempts:
+                    logger.error(f"Dropping {len(batch)} buffered status messages after {self._failed_attempts} failed flushes: {str(e)}")
+                    self._failed_attempts = 0
+                else:
+                    logger.warning(f"Failed to flush {len(batch)} buffered status messages (attempt {self._failed_attempts}): {str(e)}")
+                    self._pending = batch + self._pending
+                return 0
+
+    async def close(self):
+        """Wait for any in-flight background flush, then flush what is left."""
+        if self._background_flush and not self._background_flush.done():
+            try:
+                await self._background_flush
+            except Exception:
+                pass
+        await self.flush()
@@ -20,6 +20,7 @@ Technical Features:
 - Accurate token counting using LiteLLM's model-specific tokenizers
 - Strategic 4-block distribution with automatic cache management
 - Fixed-size chunks prevent cache invalidation
+- Per-thread chunk boundaries are append-only and kept in Redis (see cache_layout.py)
 - Cost-benefit analysis for optimal caching strategy
 
 Cache Strategy:
@@ -35,136 +36,14 @@ Based on Anthropic documentation and mathematical optimization (Sept 2025).
 """
 
 from typing import Dict, Any, List, Optional
-from datetime import datetime, timezone
 from core.utils.logger import logger
 
 
-async def get_stored_threshold(thread_id: str, model: str) -> Optional[Dict[str, Any]]:
-    """Get stored cache threshold from thread metadata."""
-    from core.services.supabase import DBConnection
-    db = DBConnection()
-    client = await db.client
-    
-    try:
-        result = await client.table('threads').select('metadata').eq('thread_id', thread_id).single().execute()
-        if result.data:
-            metadata = result.data.get('metadata', {})
-            cache_config = metadata.get('cache_config', {})
-            
-            # Validate it's for the same model
-            if cache_config.get('model') == model:
-                return cache_config
-    except Exception as e:
-        logger.debug(f"No stored threshold found for thread {thread_id}: {e}")
-    
-    return None
-
-
-async def store_threshold(thread_id: str, threshold: int, model: str, reason: str, turn: int):
-    """Store cache threshold in thread metadata."""
-    from core.services.supabase import DBConnection
-    db = DBConnection()
-    client = await db.client
-    
-    try:
-        # Get existing metadata
-        result = await client.table('threads').select('metadata').eq('thread_id', thread_id).single().execute()
-        metadata = result.data.get('metadata', {}) if result.data else {}
-        
-        # Update cache config
-        metadata['cache_config'] = {
-            'threshold': threshold,
-            'model': model,
-            'last_calc_turn': turn,
-            'last_calc_reason': reason,
-            'updated_at': datetime.now(timezone.utc).isoformat()
-        }
-        
-        # Write back
-        await client.table('threads').update({'metadata': metadata}).eq('thread_id', thread_id).execute()
-        
-        logger.info(f"💾 Stored cache threshold: {threshold} tokens (reason: {reason})")
-    except Exception as e:
-        logger.warning(f"Failed to store threshold: {e}")
-
-
-async def get_stored_cached_blocks(thread_id: str, model: str) -> Optional[Dict[str, Any]]:
-    """Get stored cached blocks from thread metadata."""
-    from core.services.supabase import DBConnection
-    db = DBConnection()
-    client = await db.client
-    
-    try:
-        result = await client.table('threads').select('metadata').eq('thread_id', thread_id).single().execute()
-        if result.data:
-            metadata = result.data.get('metadata', {})
-            cached_blocks = metadata.get('cached_blocks')
-            cache_metadata = metadata.get('cache_metadata', {})
-            
-            # Validate model matches
-            if cache_metadata.get('model') == model and cached_blocks:
-                return {
-                    'blocks': cached_blocks,
-                    'last_message_id': cache_metadata.get('last_message_id'),
-                    'total_messages': cache_metadata.get('total_messages', 0)
-                }
-    except Exception as e:
-        logger.debug(f"No stored blocks found: {e}")
-    
-    return None
-
-
-async def store_cached_blocks(
-    thread_id: str, 
-    blocks: List[Dict[str, Any]], 
-    last_message_id: str,
-    total_messages: int,
-    model: str
-):
-    """Store prepared cached blocks in thread metadata."""
-    from core.services.supabase import DBConnection
-    
-    db = DBConnection()
-    client = await db.client
-    
-    try:
-        result = await client.table('threads').select('metadata').eq('thread_id', thread_id).single().execute()
-        metadata = result.data.get('metadata', {}) if result.data else {}
-        
-        metadata['cached_blocks'] = blocks
-        metadata['cache_metadata'] = {
-            'last_message_id': last_message_id,
-            'model': model,
-            'created_at': datetime.now(timezone.utc).isoformat(),
-            'total_messages': total_messages, 
-            'blocks_created': len(blocks)
-        }
-        
-        await client.table('threads').update({'metadata': metadata}).eq('thread_id', thread_id).execute()
-        logger.info(f"💾 Stored {len(blocks)} cached blocks covering {total_messages} messages")
-    except Exception as e:
-        logger.warning(f"Failed to store cached blocks: {e}")
-
-
 async def invalidate_cached_blocks(thread_id: str):
-    """Clear cached blocks (after compression or model change)."""
-    from core.services.supabase import DBConnection
-    
-    db = DBConnection()
-    client = await db.client
-    
-    try:
-        result = await client.table('threads').select('metadata').eq('thread_id', thread_id).single().execute()
-        metadata = result.data.get('metadata', {}) if result.data else {}
-        
-        # Remove cached blocks
-        metadata.pop('cached_blocks', None)
-        metadata.pop('cache_metadata', None)
-        
-        await client.table('threads').update({'metadata': metadata}).eq('thread_id', thread_id).execute()
-        logger.info(f"🗑️ Invalidated cached blocks for thread {thread_id}")
-    except Exception as e:
-        logger.warning(f"Failed to invalidate blocks: {e}")
+    """Clear the stored cache layout (after compression or model change)."""
+    from core.agentpress.cache_layout import cache_layout_engine
+    await cache_layout_engine.reset(thread_id)
+    logger.info(f"🗑️ Invalidated cache layout for thread {thread_id}")
 
 
 def get_resolved_model_id(model_name: str) -> str:
@@ -336,12 +215,40 @@ def add_cache_control(message: Dict[str, Any]) -> Dict[str, Any]:
         ]
     }
 
+def add_system_cache_control(system_prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """Add cache_control to a system prompt.
+
+    A system prompt made of several text blocks (a stable base plus blocks
+    added during the run) gets a breakpoint per block, so adding a block
+    keeps the blocks before it cached.
+    """
+    content = system_prompt.get('content')
+    if not isinstance(content, list) or len(content) < 2:
+        return add_cache_control(system_prompt)
+    return {
+        **system_prompt,
+        "content": [{**block, "cache_control": {"type": "ephemeral"}} for block in content]
+    }
+
+def system_cache_breakpoints(system_prompt: Dict[str, Any]) -> int:
+    """Cache breakpoints add_system_cache_control uses for a system prompt."""
+    content = system_prompt.get('content')
+    return len(content) if isinstance(content, list) and len(content) > 1 else 1
+
+def flatten_system_prompt(system_prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """Join a system prompt made of text blocks into one string, for models without block caching."""
+    content = system_prompt.get('content')
+    if not isinstance(content, list):
+        return system_prompt
+    text = "".join(block.get('text', '') for block in content if isinstance(block, dict) and block.get('type') == 'text')
+    return {**system_prompt, "content": text}
+
 async def apply_anthropic_caching_strategy(
     working_system_prompt: Dict[str, Any], 
     conversation_messages: List[Dict[str, Any]], 
     model_name: str,
-    thread_id: Optional[str] = None,  # NEW: for threshold storage
-    turn_number: Optional[int] = None,  # NEW: for tracking
+    thread_id: Optional[str] = None,  # Use the thread's persisted cache layout
+    turn_number: Optional[int] = None,  # Unused, kept for compatibility
     force_recalc: bool = False,  # NEW: for compression triggers
     context_window_tokens: Optional[int] = None,  # Auto-detect from model registry
     cache_threshold_tokens: Optional[int] = None  # Auto-calculate based on context window
@@ -381,52 +288,23 @@ async def apply_anthropic_caching_strategy(
         filtered_conversation = [msg for msg in conversation_messages if msg.get('role') != 'system']
         if len(filtered_conversation) < len(conversation_messages):
             logger.debug(f"🔧 Filtered out {len(conversation_messages) - len(filtered_conversation)} system messages")
-        return [working_system_prompt] + filtered_conversation
-    
-    # Try to load stored blocks (unless force rebuild)
-    if thread_id and not force_recalc:
-        stored = await get_stored_cached_blocks(thread_id, model_name)
-        
-        if stored:
-            cached_blocks = stored['blocks']
-            last_message_id = stored['last_message_id']
-            stored_count = stored['total_messages']
-            
-            # Find new messages (after last_message_id)
-            new_messages = []
-            found_last = False
-            for msg in conversation_messages:
-                if found_last:
-                    new_messages.append(msg)
-                elif msg.get('message_id') == last_message_id:
-                    found_last = True
-            
-            if new_messages:
-                logger.info(f"♻️ Loaded {len(cached_blocks)} cached blocks, appending {len(new_messages)} new messages")
-                # Return: system + cached_blocks + new messages
-                return [working_system_prompt] + cached_blocks + new_messages
-            else:
-                # No new messages, just return cached
-                logger.info(f"♻️ Loaded {len(cached_blocks)} cached blocks (no new messages)")
-                return [working_system_prompt] + cached_blocks
+        return [flatten_system_prompt(working_system_prompt)] + filtered_conversation
+    
+    # Threads use a persisted layout with stable, append-only chunk boundaries
+    if thread_id:
+        from core.agentpress.cache_layout import cache_layout_engine
+        return await cache_layout_engine.apply(
+            working_system_prompt,
+            conversation_messages,
+            model_name,
+            thread_id=thread_id,
+            force_recalc=force_recalc,
+            context_window_tokens=context_window_tokens
+        )
     
-    # No stored blocks or force rebuild - chunk from scratch
+    # No thread - chunk from scratch
     logger.info(f"🆕 Building cache blocks from scratch ({len(conversation_messages)} messages)")
     
-    # Check if we should use stored threshold
-    stored_config = None
-    should_recalculate = force_recalc
-    
-    if thread_id and not force_recalc:
-        stored_config = await get_stored_threshold(thread_id, model_name)
-        
-        if stored_config:
-            cache_threshold_tokens = stored_config['threshold']
-            logger.info(f"♻️ Reusing stored threshold: {cache_threshold_tokens} tokens (last calc: turn {stored_config['last_calc_turn']}, reason: {stored_config['last_calc_reason']})")
-        else:
-            should_recalculate = True
-            logger.info(f"🆕 No stored threshold - will calculate and store")
-    
     # Get context window from model registry
     if context_window_tokens is None:
         try:
@@ -438,7 +316,7 @@ async def apply_anthropic_caching_strategy(
             context_window_tokens = 200_000  # Safe default
     
     # Calculate mathematically optimized cache threshold
-    if cache_threshold_tokens is None or should_recalculate:
+    if cache_threshold_tokens is None:
         # Include system prompt tokens in calculation for accurate density (like compression does)
         # Use token_counter on combined messages to match compression's calculation method
         from litellm import token_counter
@@ -449,11 +327,6 @@ async def apply_anthropic_caching_strategy(
             len(conversation_messages),
             total_tokens  # Now includes system prompt for accurate density calculation
         )
-        
-        # Store it if we have thread_id
-        if thread_id and turn_number is not None:
-            reason = "compression" if force_recalc else "initial"
-            await store_threshold(thread_id, cache_threshold_tokens, model_name, reason, turn_number)
     
     logger.info(f"📊 Applying single cache breakpoint strategy for {len(conversation_messages)} messages")
     
@@ -469,10 +342,10 @@ async def apply_anthropic_caching_strategy(
     # Block 1: System prompt (cache if ≥1024 tokens)
     system_tokens = get_message_token_count(working_system_prompt, model_name)
     if system_tokens >= 1024:  # Anthropic's minimum cacheable size
-        cached_system = add_cache_control(working_system_prompt)
+        cached_system = add_system_cache_control(working_system_prompt)
         prepared_messages.append(cached_system)
         logger.info(f"🔥 Block 1: Cached system prompt ({system_tokens} tokens)")
-        blocks_used = 1
+        blocks_used = system_cache_breakpoints(working_system_prompt)
     else:
         prepared_messages.append(working_system_prompt)
         logger.debug(f"System prompt too small for caching: {system_tokens} tokens")
@@ -545,26 +418,6 @@ async def apply_anthropic_caching_strategy(
     
     logger.info(f"✅ Final structure: {cache_count} cache breakpoints, {len(prepared_messages)} total blocks")
     
-    # Store cached blocks for future use (if we have thread_id and created blocks)
-    if thread_id and 'last_cached_message_id' in locals() and last_cached_message_id:
-        # Extract cached blocks (those with cache_control)
-        cached_blocks_to_store = []
-        for msg in prepared_messages[1:]:  # Skip system prompt
-            if isinstance(msg.get('content'), list):
-                for item in msg['content']:
-                    if isinstance(item, dict) and 'cache_control' in item:
-                        cached_blocks_to_store.append(msg)
-                        break
-        
-        if cached_blocks_to_store:
-            await store_cached_blocks(
-                thread_id,
-                cached_blocks_to_store,
-                last_message_id=last_cached_message_id,
-                total_messages=len(conversation_messages),
-                model=model_name
-            )
-    
     return prepared_messages
 
 def create_conversation_chunks(
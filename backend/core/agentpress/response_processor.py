@@ -20,6 +20,8 @@ from core.agentpress.tool import ToolResult
 from core.agentpress.tool_registry import ToolRegistry
 from core.agentpress.xml_tool_parser import XMLToolParser
 from core.agentpress.error_processor import ErrorProcessor
+from core.agentpress.message_buffer import MessageWriteBuffer
+from core.agentpress.tool_scheduler import ToolExecutionScheduler
 from langfuse.client import StatefulTraceClient
 from core.services.langfuse import langfuse
 from core.utils.json_helpers import (
@@ -87,7 +89,7 @@ class ProcessorConfig:
 class ResponseProcessor:
     """Processes LLM responses, extracting and executing tool calls."""
     
-    def __init__(self, tool_registry: ToolRegistry, add_message_callback: Callable, trace: Optional[StatefulTraceClient] = None, agent_config: Optional[dict] = None):
+    def __init__(self, tool_registry: ToolRegistry, add_message_callback: Callable, trace: Optional[StatefulTraceClient] = None, agent_config: Optional[dict] = None, message_buffer: Optional[MessageWriteBuffer] = None, stop_event: Optional[asyncio.Event] = None):
         """Initialize the ResponseProcessor.
         
         Args:
@@ -95,9 +97,17 @@ class ResponseProcessor:
             add_message_callback: Callback function to add messages to the thread.
                 MUST return the full saved message object (dict) or None.
             agent_config: Optional agent configuration with version information
+            message_buffer: Optional write-behind buffer for non-LLM status messages.
+                When None, status messages are saved synchronously via add_message_callback.
+            stop_event: Optional event set when the run is stopped; cancels running tools
         """
         self.tool_registry = tool_registry
         self.add_message = add_message_callback
+        self.message_buffer = message_buffer
+        # Applies per-tool timeouts, concurrency limits and memoization to every tool call
+        self.tool_scheduler = ToolExecutionScheduler(
+            tool_registry, lambda tool_call: self._invoke_tool(tool_call), stop_event=stop_event
+        )
         
         self.trace = trace
         if not self.trace:
@@ -224,6 +234,33 @@ class ResponseProcessor:
             agent_version_id=agent_version_id
         )
 
+    async def _add_status_message(
+        self,
+        thread_id: str,
+        type: str,
+        content: Union[Dict[str, Any], List[Any], str],
+        is_llm_message: bool = False,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """Add a non-LLM message, deferring persistence to the write-behind buffer if configured."""
+        if self.message_buffer and MessageWriteBuffer.should_buffer(type, is_llm_message):
+            return self.message_buffer.add(
+                thread_id=thread_id, type=type, content=content, metadata=metadata
+            )
+        return await self.add_message(
+            thread_id=thread_id, type=type, content=content,
+            is_llm_message=is_llm_message, metadata=metadata
+        )
+
+    async def _flush_status_messages(self):
+        """Persist any buffered status messages. Never raises."""
+        if not self.message_buffer:
+            return
+        try:
+            await self.message_buffer.close()
+        except Exception as e:
+            logger.error(f"Error flushing buffered status messages: {str(e)}", exc_info=True)
+
     async def process_streaming_response(
         self,
         llm_response: AsyncGenerator,
@@ -293,7 +330,7 @@ class ResponseProcessor:
             # --- Save and Yield Start Events ---
             if auto_continue_count == 0:
                 start_content = {"status_type": "thread_run_start", "thread_run_id": thread_run_id}
-                start_msg_obj = await self.add_message(
+                start_msg_obj = await self._add_status_message(
                     thread_id=thread_id, type="status", content=start_content, 
                     is_llm_message=False, metadata={"thread_run_id": thread_run_id}
                 )
@@ -306,7 +343,7 @@ class ResponseProcessor:
                 "model": llm_model,
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
-            llm_start_msg_obj = await self.add_message(
+            llm_start_msg_obj = await self._add_status_message(
                 thread_id=thread_id, type="llm_response_start", content=llm_start_content, 
                 is_llm_message=False, metadata={
                     "thread_run_id": thread_run_id,
@@ -332,15 +369,13 @@ class ResponseProcessor:
                 
                 # Log info about chunks periodically for debugging
                 if chunk_count == 1 or (chunk_count % 1000 == 0) or hasattr(chunk, 'usage'):
-                    logger.debug(f"Processing chunk #{chunk_count}, type={type(chunk).__name__}")
+                    logger.debug("Processing chunk #%s, type=%s", chunk_count, type(chunk).__name__, sample_key="stream_chunk")
                 
                 # Store the complete LiteLLM response chunk when we get usage data
                 if hasattr(chunk, 'usage') and chunk.usage and final_llm_response is None:
-                    logger.info(f"🔍 STORING COMPLETE LiteLLM RESPONSE CHUNK AS RECEIVED")
                     final_llm_response = chunk  # Store the entire chunk object as-is
-                    logger.info(f"🔍 STORED MODEL: {getattr(chunk, 'model', 'NO_MODEL')}")
-                    logger.info(f"🔍 STORED USAGE: {chunk.usage}")
-                    logger.info(f"🔍 STORED RESPONSE TYPE: {type(chunk)}")
+                    logger.debug("🔍 Stored complete LiteLLM response chunk: model=%s, usage=%s, type=%s",
+                                 getattr(chunk, 'model', 'NO_MODEL'), chunk.usage, type(chunk))
 
                 if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'finish_reason') and chunk.choices[0].finish_reason:
                     finish_reason = chunk.choices[0].finish_reason
@@ -606,7 +641,7 @@ class ResponseProcessor:
 
             if finish_reason == "xml_tool_limit_reached":
                 finish_content = {"status_type": "finish", "finish_reason": "xml_tool_limit_reached"}
-                finish_msg_obj = await self.add_message(
+                finish_msg_obj = await self._add_status_message(
                     thread_id=thread_id, type="status", content=finish_content, 
                     is_llm_message=False, metadata={"thread_run_id": thread_run_id}
                 )
@@ -660,7 +695,7 @@ class ResponseProcessor:
                     self.trace.event(name="failed_to_save_final_assistant_message_for_thread", level="ERROR", status_message=(f"Failed to save final assistant message for thread {thread_id}"))
                     # Save and yield an error status
                     err_content = {"role": "system", "status_type": "error", "message": "Failed to save final assistant message"}
-                    err_msg_obj = await self.add_message(
+                    err_msg_obj = await self._add_status_message(
                         thread_id=thread_id, type="status", content=err_content, 
                         is_llm_message=False, metadata={"thread_run_id": thread_run_id}
                     )
@@ -732,7 +767,7 @@ class ResponseProcessor:
                 # Or execute now if not streamed
                 elif final_tool_calls_to_process and not config.execute_on_stream:
                     logger.info(f"🔄 STREAMING: Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream")
-                    logger.debug(f"📋 Final tool calls to process: {final_tool_calls_to_process}")
+                    logger.debug("📋 Final tool calls to process: %s", final_tool_calls_to_process, sample_key="tool_payload")
                     logger.debug(f"⚙️ Config: execute_on_stream={config.execute_on_stream}, strategy={config.tool_execution_strategy}")
                     self.trace.event(name="executing_tools_after_stream", level="DEFAULT", status_message=(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream"))
 
@@ -808,7 +843,7 @@ class ResponseProcessor:
                 # Check if tools were actually detected during this run
                 if xml_tool_call_count > 0 or len(complete_native_tool_calls) > 0:
                     finish_content["tools_executed"] = True
-                finish_msg_obj = await self.add_message(
+                finish_msg_obj = await self._add_status_message(
                     thread_id=thread_id, type="status", content=finish_content, 
                     is_llm_message=False, metadata={"thread_run_id": thread_run_id}
                 )
@@ -824,7 +859,7 @@ class ResponseProcessor:
                 
                 # Save and yield termination status
                 finish_content = {"status_type": "finish", "finish_reason": "agent_terminated"}
-                finish_msg_obj = await self.add_message(
+                finish_msg_obj = await self._add_status_message(
                     thread_id=thread_id, type="status", content=finish_content, 
                     is_llm_message=False, metadata={"thread_run_id": thread_run_id}
                 )
@@ -895,13 +930,11 @@ class ResponseProcessor:
                             logger.info("✅ Using complete LiteLLM response for llm_response_end (normal completion)")
                             
                             # Log the complete response object for debugging
-                            logger.info(f"🔍 COMPLETE RESPONSE OBJECT: {final_llm_response}")
-                            logger.info(f"🔍 RESPONSE OBJECT TYPE: {type(final_llm_response)}")
-                            logger.info(f"🔍 RESPONSE OBJECT DICT: {final_llm_response.__dict__ if hasattr(final_llm_response, '__dict__') else 'NO_DICT'}")
+                            logger.debug("🔍 COMPLETE RESPONSE OBJECT (%s): %s", type(final_llm_response), final_llm_response)
                             
                             # Serialize the complete response object as-is
                             llm_end_content = self._serialize_model_response(final_llm_response)
-                            logger.info(f"🔍 SERIALIZED CONTENT: {llm_end_content}")
+                            logger.debug("🔍 SERIALIZED CONTENT: %s", llm_end_content)
                             
                             # Add streaming flag and response timing if available
                             llm_end_content["streaming"] = True
@@ -924,8 +957,8 @@ class ResponseProcessor:
                             llm_end_content["llm_response_id"] = llm_response_id
                                 
                             # DEBUG: Log the actual response usage
-                            logger.info(f"🔍 RESPONSE PROCESSOR COMPLETE USAGE (normal): {llm_end_content.get('usage', 'NO_USAGE')}")
-                            logger.info(f"🔍 FINAL LLM END CONTENT: {llm_end_content}")
+                            logger.debug("🔍 RESPONSE PROCESSOR COMPLETE USAGE (normal): %s", llm_end_content.get('usage', 'NO_USAGE'))
+                            logger.debug("🔍 FINAL LLM END CONTENT: %s", llm_end_content)
                             
                             llm_end_msg_obj = await self.add_message(
                                 thread_id=thread_id,
@@ -954,12 +987,13 @@ class ResponseProcessor:
             
             # Save and yield error status message
             err_content = {"role": "system", "status_type": "error", "message": processed_error.message}
-            err_msg_obj = await self.add_message(
+            err_msg_obj = await self._add_status_message(
                 thread_id=thread_id, type="status", content=err_content, 
                 is_llm_message=False, metadata={"thread_run_id": thread_run_id if 'thread_run_id' in locals() else None}
             )
             if err_msg_obj: 
                 yield format_for_yield(err_msg_obj)
+            await self._flush_status_messages()
             raise
 
         finally:
@@ -1064,7 +1098,7 @@ class ResponseProcessor:
                     
                     end_content = {"status_type": "thread_run_end"}
                     
-                    end_msg_obj = await self.add_message(
+                    end_msg_obj = await self._add_status_message(
                         thread_id=thread_id, type="status", content=end_content, 
                         is_llm_message=False, metadata={"thread_run_id": thread_run_id if 'thread_run_id' in locals() else None}
                     )
@@ -1074,6 +1108,14 @@ class ResponseProcessor:
                     logger.error(f"Error in finally block: {str(final_e)}", exc_info=True)
                     self.trace.event(name="error_in_finally_block", level="ERROR", status_message=(f"Error in finally block: {str(final_e)}"))
 
+            # Streamed tool calls still running when the stream is stopped would otherwise keep running unobserved
+            for execution in pending_tool_executions:
+                if not execution["task"].done():
+                    execution["task"].cancel()
+
+            # Persist buffered status messages for this LLM call (also runs on stop/GeneratorExit)
+            await self._flush_status_messages()
+
     async def process_non_streaming_response(
         self,
         llm_response: Any,
@@ -1108,7 +1150,7 @@ class ResponseProcessor:
         try:
             # Save and Yield thread_run_start status message
             start_content = {"status_type": "thread_run_start", "thread_run_id": thread_run_id}
-            start_msg_obj = await self.add_message(
+            start_msg_obj = await self._add_status_message(
                 thread_id=thread_id, type="status", content=start_content,
                 is_llm_message=False, metadata={"thread_run_id": thread_run_id}
             )
@@ -1169,7 +1211,7 @@ class ResponseProcessor:
                  logger.error(f"Failed to save non-streaming assistant message for thread {thread_id}")
                  self.trace.event(name="failed_to_save_non_streaming_assistant_message_for_thread", level="ERROR", status_message=(f"Failed to save non-streaming assistant message for thread {thread_id}"))
                  err_content = {"role": "system", "status_type": "error", "message": "Failed to save assistant message"}
-                 err_msg_obj = await self.add_message(
+                 err_msg_obj = await self._add_status_message(
                      thread_id=thread_id, type="status", content=err_content, 
                      is_llm_message=False, metadata={"thread_run_id": thread_run_id}
                  )
@@ -1178,7 +1220,7 @@ class ResponseProcessor:
        # --- Execute Tools and Yield Results ---
             tool_calls_to_execute = [item['tool_call'] for item in all_tool_data]
             logger.debug(f"🔧 NON-STREAMING: Extracted {len(tool_calls_to_execute)} tool calls to execute")
-            logger.debug(f"📋 Tool calls data: {tool_calls_to_execute}")
+            logger.debug("📋 Tool calls data: %s", tool_calls_to_execute, sample_key="tool_payload")
 
             if config.execute_tools and tool_calls_to_execute:
                 logger.debug(f"🚀 NON-STREAMING: Executing {len(tool_calls_to_execute)} tools with strategy: {config.tool_execution_strategy}")
@@ -1236,7 +1278,7 @@ class ResponseProcessor:
             # --- Save and Yield Final Status ---
             if finish_reason:
                 finish_content = {"status_type": "finish", "finish_reason": finish_reason}
-                finish_msg_obj = await self.add_message(
+                finish_msg_obj = await self._add_status_message(
                     thread_id=thread_id, type="status", content=finish_content, 
                     is_llm_message=False, metadata={"thread_run_id": thread_run_id}
                 )
@@ -1249,7 +1291,7 @@ class ResponseProcessor:
                     response_dict = self._serialize_model_response(llm_response)
                     
                     # Save the serialized response object in content
-                    await self.add_message(
+                    await self._add_status_message(
                         thread_id=thread_id,
                         type="assistant_response_end",
                         content=response_dict,
@@ -1268,13 +1310,14 @@ class ResponseProcessor:
              
              # Save and yield error status
              err_content = {"role": "system", "status_type": "error", "message": processed_error.message}
-             err_msg_obj = await self.add_message(
+             err_msg_obj = await self._add_status_message(
                  thread_id=thread_id, type="status", content=err_content, 
                  is_llm_message=False, metadata={"thread_run_id": thread_run_id if 'thread_run_id' in locals() else None}
              )
              if err_msg_obj: 
                  yield format_for_yield(err_msg_obj)
              
+             await self._flush_status_messages()
              raise
 
         finally:
@@ -1297,10 +1340,11 @@ class ResponseProcessor:
             
             end_content = {"status_type": "thread_run_end"}
             
-            end_msg_obj = await self.add_message(
+            end_msg_obj = await self._add_status_message(
                 thread_id=thread_id, type="status", content=end_content, 
                 is_llm_message=False, metadata={"thread_run_id": thread_run_id if 'thread_run_id' in locals() else None}
             )
+            await self._flush_status_messages()
             if end_msg_obj: yield format_for_yield(end_msg_obj)
 
 
@@ -1342,11 +1386,8 @@ class ResponseProcessor:
                     current_tag = None
                     
                     # Find the earliest occurrence of any registered tool function name
-                    # Check for available function names
-                    available_functions = self.tool_registry.get_available_functions()
-                    for func_name in available_functions.keys():
-                        # Convert function name to potential tag name (underscore to dash)
-                        tag_name = func_name.replace('_', '-')
+                    # Tag names (underscore to dash) are cached by the registry
+                    for tag_name in self.tool_registry.get_xml_tag_map():
                         start_pattern = f'<{tag_name}'
                         tag_pos = content.find(start_pattern, pos)
                         
@@ -1432,7 +1473,7 @@ class ResponseProcessor:
                 parsing_details = xml_tool_call.parsing_details
                 parsing_details["raw_xml"] = xml_tool_call.raw_xml
                 
-                logger.debug(f"Parsed new format tool call: {tool_call}")
+                logger.debug("Parsed new format tool call: %s", tool_call, sample_key="tool_payload")
                 return tool_call, parsing_details
             
             # If not the expected <function_calls><invoke> format, return None
@@ -1473,7 +1514,11 @@ class ResponseProcessor:
 
     # Tool execution methods
     async def _execute_tool(self, tool_call: Dict[str, Any]) -> ToolResult:
-        """Execute a single tool call and return the result."""
+        """Execute a single tool call through the tool scheduler and return the result."""
+        return await self.tool_scheduler.execute(tool_call)
+
+    async def _invoke_tool(self, tool_call: Dict[str, Any]) -> ToolResult:
+        """Look up and call the tool function for a tool call."""
         span = self.trace.span(name=f"execute_tool.{tool_call['function_name']}", input=tool_call["arguments"])
         function_name = "unknown"
         try:
@@ -1482,23 +1527,21 @@ class ResponseProcessor:
 
             logger.debug(f"🔧 EXECUTING TOOL: {function_name}")
             # logger.debug(f"📝 RAW ARGUMENTS TYPE: {type(arguments)}")
-            logger.debug(f"📝 RAW ARGUMENTS VALUE: {arguments}")
+            logger.debug("📝 RAW ARGUMENTS VALUE: %s", arguments, sample_key="tool_payload")
             self.trace.event(name="executing_tool", level="DEFAULT", status_message=(f"Executing tool: {function_name} with arguments: {arguments}"))
 
-            # Get available functions from tool registry
+            # Look up the function in the tool registry's cached name -> callable map
             logger.debug(f"🔍 Looking up tool function: {function_name}")
-            available_functions = self.tool_registry.get_available_functions()
-            # logger.debug(f"📋 Available functions: {list(available_functions.keys())}")
-
-            # Look up the function by name
-            tool_fn = available_functions.get(function_name)
+            tool_fn = self.tool_registry.get_function(function_name)
             if not tool_fn:
+                available_function_names = self.tool_registry.get_function_names()
                 logger.error(f"❌ Tool function '{function_name}' not found in registry")
-                # logger.error(f"❌ Available functions: {list(available_functions.keys())}")
+                # logger.error(f"❌ Available functions: {available_function_names}")
                 span.end(status_message="tool_not_found", level="ERROR")
-                return ToolResult(success=False, output=f"Tool function '{function_name}' not found. Available: {list(available_functions.keys())}")
+                return ToolResult(success=False, output=f"Tool function '{function_name}' not found. Available: {available_function_names}")
 
             logger.debug(f"✅ Found tool function for '{function_name}'")
+            self.tool_registry.record_call(function_name)
             # logger.debug(f"🔧 Tool function type: {type(tool_fn)}")
 
             # Handle arguments - if it's a string, try to parse it, otherwise pass as-is
@@ -1535,7 +1578,7 @@ class ResponseProcessor:
 
             logger.debug(f"✅ Tool execution completed successfully")
             # logger.debug(f"📤 Result type: {type(result)}")
-            logger.debug(f"📤 Result: {result}")
+            logger.debug("📤 Result: %s", result, sample_key="tool_payload")
 
             # Validate result is a ToolResult object
             if not isinstance(result, ToolResult):
@@ -1579,7 +1622,7 @@ class ResponseProcessor:
             List of tuples containing the original tool call and its result
         """
         logger.debug(f"🎯 MAIN EXECUTE_TOOLS: Executing {len(tool_calls)} tools with strategy: {execution_strategy}")
-        logger.debug(f"📋 Tool calls received: {tool_calls}")
+        logger.debug("📋 Tool calls received: %s", tool_calls, sample_key="tool_payload")
 
         # Validate tool_calls structure
         if not isinstance(tool_calls, list):
@@ -1632,14 +1675,14 @@ class ResponseProcessor:
         try:
             tool_names = [t.get('function_name', 'unknown') for t in tool_calls]
             logger.debug(f"🔄 EXECUTING {len(tool_calls)} TOOLS SEQUENTIALLY: {tool_names}")
-            logger.debug(f"📋 Tool calls data: {tool_calls}")
+            logger.debug("📋 Tool calls data: %s", tool_calls, sample_key="tool_payload")
             self.trace.event(name="executing_tools_sequentially", level="DEFAULT", status_message=(f"Executing {len(tool_calls)} tools sequentially: {tool_names}"))
 
             results = []
             for index, tool_call in enumerate(tool_calls):
                 tool_name = tool_call.get('function_name', 'unknown')
                 logger.debug(f"🔧 Executing tool {index+1}/{len(tool_calls)}: {tool_name}")
-                logger.debug(f"📝 Tool call data: {tool_call}")
+                logger.debug("📝 Tool call data: %s", tool_call, sample_key="tool_payload")
 
                 try:
                     logger.debug(f"🚀 Calling _execute_tool for {tool_name}")
@@ -1711,6 +1754,8 @@ class ResponseProcessor:
 
         This method executes all tool calls simultaneously using asyncio.gather, which
         can significantly improve performance when executing multiple independent tools.
+        Each call goes through the tool scheduler, so per-tool concurrency limits,
+        timeouts and memoized results still apply.
 
         Args:
             tool_calls: List of tool calls to execute
@@ -1725,14 +1770,14 @@ class ResponseProcessor:
         try:
             tool_names = [t.get('function_name', 'unknown') for t in tool_calls]
             logger.debug(f"🔄 EXECUTING {len(tool_calls)} TOOLS IN PARALLEL: {tool_names}")
-            logger.debug(f"📋 Tool calls data: {tool_calls}")
+            logger.debug("📋 Tool calls data: %s", tool_calls, sample_key="tool_payload")
             self.trace.event(name="executing_tools_in_parallel", level="DEFAULT", status_message=(f"Executing {len(tool_calls)} tools in parallel: {tool_names}"))
 
             # Create tasks for all tool calls
             logger.debug("🛠️ Creating async tasks for parallel execution")
             tasks = []
             for i, tool_call in enumerate(tool_calls):
-                logger.debug(f"📋 Creating task {i+1} for tool: {tool_call.get('function_name', 'unknown')}")
+                logger.debug("📋 Creating task %s for tool: %s", i + 1, tool_call.get('function_name', 'unknown'), sample_key="tool_execution")
                 task = self._execute_tool(tool_call)
                 tasks.append(task)
 
@@ -1747,7 +1792,7 @@ class ResponseProcessor:
             processed_results = []
             for i, (tool_call, result) in enumerate(zip(tool_calls, results)):
                 tool_name = tool_call.get('function_name', 'unknown')
-                logger.debug(f"📊 Processing result {i+1} for tool: {tool_name}")
+                logger.debug("📊 Processing result %s for tool: %s", i + 1, tool_name, sample_key="tool_execution")
 
                 if isinstance(result, Exception):
                     logger.error(f"❌ EXCEPTION in parallel execution for tool {tool_name}: {str(result)}")
@@ -1765,7 +1810,7 @@ class ResponseProcessor:
                         error_result = ToolResult(success=False, output="Critical error in parallel execution")
                         processed_results.append((tool_call, error_result))
                 else:
-                    logger.debug(f"✅ Tool {tool_name} executed successfully in parallel")
+                    logger.debug("✅ Tool %s executed successfully in parallel", tool_name, sample_key="tool_execution")
                     # logger.debug(f"📤 Result type: {type(result)}")
 
                     # Validate result
@@ -2027,7 +2072,7 @@ class ResponseProcessor:
             "tool_call_id": context.tool_call.get("id") # Include tool_call ID if native
         }
         metadata = {"thread_run_id": thread_run_id}
-        saved_message_obj = await self.add_message(
+        saved_message_obj = await self._add_status_message(
             thread_id=thread_id, type="status", content=content, is_llm_message=False, metadata=metadata
         )
         return saved_message_obj # Return the full object (or None if saving failed)
@@ -2060,7 +2105,7 @@ class ResponseProcessor:
             self.trace.event(name="marking_tool_status_for_termination", level="DEFAULT", status_message=(f"Marking tool status for '{context.function_name}' with termination signal."))
         # <<< END ADDED >>>
 
-        saved_message_obj = await self.add_message(
+        saved_message_obj = await self._add_status_message(
             thread_id=thread_id, type="status", content=content, is_llm_message=False, metadata=metadata
         )
         return saved_message_obj
@@ -2078,7 +2123,7 @@ class ResponseProcessor:
         }
         metadata = {"thread_run_id": thread_run_id}
         # Save the status message with is_llm_message=False
-        saved_message_obj = await self.add_message(
+        saved_message_obj = await self._add_status_message(
             thread_id=thread_id, type="status", content=content, is_llm_message=False, metadata=metadata
         )
         return saved_message_obj
@@ -2,17 +2,23 @@
 Simplified conversation thread management system for AgentPress.
 """
 
+import asyncio
 import json
 from typing import List, Dict, Any, Optional, Type, Union, AsyncGenerator, Literal, cast
 from core.services.llm import make_llm_api_call, LLMError
 from core.agentpress.prompt_caching import apply_anthropic_caching_strategy, validate_cache_blocks
+from core.agentpress.cache_layout import cache_layout_engine
 from core.agentpress.tool import Tool
 from core.agentpress.tool_registry import ToolRegistry
-from core.agentpress.context_manager import ContextManager
+from core.agentpress.context_manager import ContextManager, get_effective_context_limit
+from core.agentpress.context_compaction import IncrementalContextCompactor
 from core.agentpress.response_processor import ResponseProcessor, ProcessorConfig
 from core.agentpress.error_processor import ErrorProcessor
+from core.agentpress.message_buffer import MessageWriteBuffer
+from core.agentpress.thread_state import ThreadRunState
 from core.services.supabase import DBConnection
 from core.utils.logger import logger
+from core.utils.config import config as app_config
 from langfuse.client import StatefulGenerationClient, StatefulTraceClient
 from core.services.langfuse import langfuse
 from datetime import datetime, timezone
@@ -24,7 +30,7 @@ ToolChoice = Literal["auto", "required", "none"]
 class ThreadManager:
     """Manages conversation threads with LLM models and tool execution."""
 
-    def __init__(self, trace: Optional[StatefulTraceClient] = None, agent_config: Optional[dict] = None):
+    def __init__(self, trace: Optional[StatefulTraceClient] = None, agent_config: Optional[dict] = None, stop_event: Optional[asyncio.Event] = None):
         self.db = DBConnection()
         self.tool_registry = ToolRegistry()
         
@@ -33,16 +39,51 @@ class ThreadManager:
             self.trace = langfuse.trace(name="anonymous:thread_manager")
             
         self.agent_config = agent_config
+        # Non-LLM status rows are persisted in batches instead of one insert each
+        self.message_buffer = MessageWriteBuffer(insert_batch_callback=self.add_messages_bulk)
+        # Keeps the compressed history prefix and per-message token counts across turns
+        self.context_compactor = IncrementalContextCompactor()
+        # Per-run thread facts (last usage, latest message, cache rebuild flag)
+        self._thread_states: Dict[str, ThreadRunState] = {}
         self.response_processor = ResponseProcessor(
             tool_registry=self.tool_registry,
             add_message_callback=self.add_message,
             trace=self.trace,
-            agent_config=self.agent_config
+            agent_config=self.agent_config,
+            message_buffer=self.message_buffer,
+            stop_event=stop_event
         )
 
-    def add_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
-        """Add a tool to the ThreadManager."""
-        self.tool_registry.register_tool(tool_class, function_names, **kwargs)
+    async def get_thread_state(self, thread_id: str) -> ThreadRunState:
+        """Get the run state for a thread, loading it from the database on first use."""
+        thread_state = self._thread_states.get(thread_id)
+        if thread_state is None:
+            thread_state = ThreadRunState(thread_id=thread_id)
+            self._thread_states[thread_id] = thread_state
+        if not thread_state.loaded:
+            await thread_state.load(await self.db.client)
+        return thread_state
+
+    async def get_latest_message_type(self, thread_id: str) -> Optional[str]:
+        """Type of the thread's latest conversation message, read from the database."""
+        thread_state = await self.get_thread_state(thread_id)
+        return await thread_state.refresh_latest_message_type(await self.db.client)
+
+    async def persist_thread_states(self):
+        """Write back thread state that changed during the run."""
+        if not self._thread_states:
+            return
+        client = await self.db.client
+        for thread_state in self._thread_states.values():
+            await thread_state.persist(client)
+
+    def cancel_tool_executions(self) -> int:
+        """Cancel tool calls still running in this run (e.g. when the run is stopped)."""
+        return self.response_processor.tool_scheduler.cancel_all()
+
+    def add_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, lazy: bool = False, **kwargs):
+        """Add a tool to the ThreadManager. With lazy=True the tool is constructed on its first call."""
+        self.tool_registry.register_tool(tool_class, function_names, lazy=lazy, **kwargs)
 
     async def create_thread(
         self,
@@ -106,8 +147,13 @@ class ThreadManager:
             if result.data and len(result.data) > 0 and 'message_id' in result.data[0]:
                 saved_message = result.data[0]
                 
+                thread_state = self._thread_states.get(thread_id)
+                if thread_state:
+                    thread_state.record_message(type, content)
+                
                 if type == "llm_response_end" and isinstance(content, dict):
                     await self._handle_billing(thread_id, content, saved_message)
+                    await self._record_cache_usage(thread_id, content)
                 
                 return saved_message
             else:
@@ -117,6 +163,29 @@ class ThreadManager:
             logger.error(f"Failed to add message to thread {thread_id}: {str(e)}", exc_info=True)
             raise
 
+    async def add_messages_bulk(self, messages: List[Dict[str, Any]]) -> None:
+        """Insert several pre-built message rows in a single round trip.
+
+        Used by the write-behind buffer for non-LLM status messages. Rows must
+        already carry their message_id; no billing is triggered from here.
+        """
+        if not messages:
+            return
+
+        client = await self.db.client
+        try:
+            await client.table('messages').insert(messages).execute()
+        except Exception as e:
+            logger.error(f"Failed to bulk insert {len(messages)} messages: {str(e)}", exc_info=True)
+            raise
+
+    async def _record_cache_usage(self, thread_id: str, content: dict):
+        """Compare the cache layout's predicted cache reads with the reported usage."""
+        try:
+            await cache_layout_engine.record_usage(thread_id, content.get("usage") or {})
+        except Exception as e:
+            logger.debug(f"Failed to record cache usage for thread {thread_id}: {e}")
+
     async def _handle_billing(self, thread_id: str, content: dict, saved_message: dict):
         try:
             llm_response_id = content.get("llm_response_id", "unknown")
@@ -323,30 +392,16 @@ class ThreadManager:
             # CRITICAL: Check if this is an auto-continue iteration FIRST (before any token counting)
             is_auto_continue = auto_continue_state.get('count', 0) > 0
             
+            # Thread facts are loaded once per run and kept current from saved messages
+            thread_state = await self.get_thread_state(thread_id)
+            
             if ENABLE_PROMPT_CACHING:
                 try:
-                    from core.ai_models import model_manager
                     from litellm.utils import token_counter
-                    client = await self.db.client
-                    
-                    # Query last llm_response_end message from messages table (already stored there!)
-                    last_usage_result = await client.table('messages')\
-                        .select('content')\
-                        .eq('thread_id', thread_id)\
-                        .eq('type', 'llm_response_end')\
-                        .order('created_at', desc=True)\
-                        .limit(1)\
-                        .maybe_single()\
-                        .execute()
                     
-                    if last_usage_result.data:
-                        llm_end_content = last_usage_result.data.get('content', {})
-                        if isinstance(llm_end_content, str):
-                            import json
-                            llm_end_content = json.loads(llm_end_content)
-                        
-                        usage = llm_end_content.get('usage', {})
-                        stored_model = llm_end_content.get('model', '')
+                    if thread_state.last_usage is not None:
+                        usage = thread_state.last_usage
+                        stored_model = thread_state.last_usage_model or ''
                         
                         # Normalize model names for comparison (strip any provider prefix like anthropic/, openai/, google/, etc.)
                         def normalize_model_name(model: str) -> str:
@@ -365,54 +420,24 @@ class ThreadManager:
                             
                             # Count tokens in new message (only for first turn, not auto-continue)
                             new_msg_tokens = 0
+                            new_msg_content = latest_user_message_content or thread_state.latest_user_message_content
                             
                             if is_auto_continue:
                                 # Auto-continue: No new user message, last_total already includes everything
                                 new_msg_tokens = 0
                                 logger.debug(f"✅ Auto-continue detected (count={auto_continue_state['count']}), skipping new message token count")
-                            elif latest_user_message_content:
-                                # First turn: Use passed content (avoids DB query)
+                            elif new_msg_content:
+                                # First turn: Use passed content, or the latest user message from the run state
                                 new_msg_tokens = token_counter(
                                     model=llm_model, 
-                                    messages=[{"role": "user", "content": latest_user_message_content}]
+                                    messages=[{"role": "user", "content": new_msg_content}]
                                 )
-                                logger.debug(f"First turn: counting {new_msg_tokens} tokens from latest_user_message_content")
-                            else:
-                                # First turn fallback: Query DB if content not provided
-                                latest_msg_result = await client.table('messages')\
-                                    .select('content')\
-                                    .eq('thread_id', thread_id)\
-                                    .eq('type', 'user')\
-                                    .order('created_at', desc=True)\
-                                    .limit(1)\
-                                    .single()\
-                                    .execute()
-                                
-                                if latest_msg_result.data:
-                                    new_msg_content = latest_msg_result.data.get('content', '')
-                                    if new_msg_content:
-                                        new_msg_tokens = token_counter(
-                                            model=llm_model, 
-                                            messages=[{"role": "user", "content": new_msg_content}]
-                                        )
-                                        logger.debug(f"First turn (DB fallback): counting {new_msg_tokens} tokens from DB query")
+                                logger.debug(f"First turn: counting {new_msg_tokens} tokens from latest user message")
                             
                             estimated_total = last_total_tokens + new_msg_tokens
                             estimated_total_tokens = estimated_total  # Store for response processor
                             
-                            # Calculate threshold (same logic as context_manager.py)
-                            context_window = model_manager.get_context_window(llm_model)
-                            
-                            if context_window >= 1_000_000:
-                                max_tokens = context_window - 300_000
-                            elif context_window >= 400_000:
-                                max_tokens = context_window - 64_000
-                            elif context_window >= 200_000:
-                                max_tokens = context_window - 32_000
-                            elif context_window >= 100_000:
-                                max_tokens = context_window - 16_000
-                            else:
-                                max_tokens = int(context_window * 0.84)
+                            max_tokens = get_effective_context_limit(llm_model)
                             
                             logger.info(f"⚡ Fast check: {last_total_tokens} + {new_msg_tokens} = {estimated_total} tokens (threshold: {max_tokens})")
                             
@@ -426,7 +451,7 @@ class ThreadManager:
                         else:
                             logger.debug(f"Fast check skipped - usage: {bool(usage)}, model_match: {normalized_stored == normalized_current}")
                     else:
-                        logger.debug(f"Fast check skipped - no last llm_response_end message found")
+                        logger.debug(f"Fast check skipped - no last llm_response_end usage in thread state")
                 except Exception as e:
                     logger.debug(f"Fast path check failed, falling back to full fetch: {e}")
             
@@ -440,7 +465,25 @@ class ThreadManager:
                 messages.append({"role": "assistant", "content": partial_content})
 
             # Apply context compression (only if needed based on fast path check)
-            if ENABLE_CONTEXT_MANAGER:
+            if ENABLE_CONTEXT_MANAGER and app_config.ENABLE_INCREMENTAL_COMPACTION:
+                # Always apply the stored prefix (even on the fast path) so folded history stays folded
+                compaction = await self.context_compactor.compact(
+                    messages, llm_model, get_effective_context_limit(llm_model),
+                    thread_id=thread_id, system_prompt=system_prompt
+                )
+                messages = compaction.messages
+                if not compaction.within_limit:
+                    # Recent window alone is over the limit - fall back to full compression
+                    logger.info(f"Incremental compaction left {compaction.total_tokens} tokens (limit {compaction.max_tokens}), running full compression")
+                    context_manager = ContextManager()
+                    messages = await context_manager.compress_messages(
+                        messages, llm_model, max_tokens=llm_max_tokens,
+                        actual_total_tokens=compaction.total_tokens,
+                        system_prompt=system_prompt,
+                        thread_id=thread_id,
+                        thread_state=thread_state
+                    )
+            elif ENABLE_CONTEXT_MANAGER:
                 if skip_fetch:
                     # Fast path: We know we're under threshold, skip compression entirely
                     logger.debug(f"Fast path: Skipping compression check (under threshold)")
@@ -452,7 +495,8 @@ class ThreadManager:
                         messages, llm_model, max_tokens=llm_max_tokens, 
                         actual_total_tokens=estimated_total_tokens,  # Use estimated from fast check!
                         system_prompt=system_prompt,
-                        thread_id=thread_id
+                        thread_id=thread_id,
+                        thread_state=thread_state
                     )
                     logger.debug(f"Context compression completed: {len(messages)} -> {len(compressed_messages)} messages")
                     messages = compressed_messages
@@ -464,26 +508,16 @@ class ThreadManager:
                         messages, llm_model, max_tokens=llm_max_tokens, 
                         actual_total_tokens=None,
                         system_prompt=system_prompt,
-                        thread_id=thread_id
+                        thread_id=thread_id,
+                        thread_state=thread_state
                     )
                     messages = compressed_messages
 
             # Check if cache needs rebuild due to compression
             force_rebuild = False
-            if ENABLE_PROMPT_CACHING:
-                try:
-                    client = await self.db.client
-                    result = await client.table('threads').select('metadata').eq('thread_id', thread_id).single().execute()
-                    if result.data:
-                        metadata = result.data.get('metadata', {})
-                        if metadata.get('cache_needs_rebuild'):
-                            force_rebuild = True
-                            logger.info("🔄 Rebuilding cache due to compression/model change")
-                            # Clear the flag
-                            metadata['cache_needs_rebuild'] = False
-                            await client.table('threads').update({'metadata': metadata}).eq('thread_id', thread_id).execute()
-                except Exception as e:
-                    logger.debug(f"Failed to check cache_needs_rebuild flag: {e}")
+            if ENABLE_PROMPT_CACHING and thread_state.consume_cache_rebuild():
+                force_rebuild = True
+                logger.info("🔄 Rebuilding cache due to compression/model change")
             
             # Apply caching
             if ENABLE_PROMPT_CACHING:
@@ -0,0 +1,149 @@
+"""
+Per-run in-memory thread state for AgentPress.
+
+Before every LLM call the run loop needs a few facts about the thread: the
+usage of the last LLM response (for the token fast path), the latest user
+message, the type of the latest conversation message (to decide whether the
+agent should keep going) and whether the prompt cache must be rebuilt after
+compression. Querying these per turn costs several database round trips.
+
+ThreadRunState loads them once when a run starts. ThreadManager keeps it up to
+date from the messages the response processor saves, and the rebuild flag is
+written back to threads.metadata only if it changed, when the run ends. The
+latest message type is re-read each turn (one single-row query), since other
+processes such as the API or triggers can add messages while a run is going.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+
+from core.utils.logger import logger
+
+# Message types that count as the latest conversation message
+CONVERSATION_MESSAGE_TYPES = ('assistant', 'tool', 'user')
+
+
+def _parse_content(content: Any) -> Any:
+    if isinstance(content, str):
+        try:
+            return json.loads(content)
+        except (json.JSONDecodeError, TypeError):
+            return content
+    return content
+
+
+@dataclass
+class ThreadRunState:
+    """Thread facts used by the run loop, cached for the lifetime of a run."""
+    thread_id: str
+    last_usage: Optional[Dict[str, Any]] = None
+    last_usage_model: Optional[str] = None
+    latest_message_type: Optional[str] = None
+    latest_user_message_content: Optional[str] = None
+    cache_needs_rebuild: bool = False
+    loaded: bool = False
+    dirty: bool = False
+
+    async def load(self, client) -> "ThreadRunState":
+        """Fetch the thread facts in one concurrent batch. Safe to call repeatedly.
+
+        If a query fails the state stays unloaded, so the next turn tries again
+        instead of running on empty defaults.
+        """
+        if self.loaded:
+            return self
+
+        def latest(query):
+            return query.eq('thread_id', self.thread_id).order('created_at', desc=True).limit(1).execute()
+
+        try:
+            usage_result, latest_result, user_result, thread_result = await asyncio.gather(
+                latest(client.table('messages').select('content').eq('type', 'llm_response_end')),
+                latest(client.table('messages').select('type').in_('type', list(CONVERSATION_MESSAGE_TYPES))),
+                latest(client.table('messages').select('content').eq('type', 'user')),
+                client.table('threads').select('metadata').eq('thread_id', self.thread_id).limit(1).execute(),
+            )
+
+            if usage_result.data:
+                content = _parse_content(usage_result.data[0].get('content')) or {}
+                if isinstance(content, dict):
+                    self.last_usage = content.get('usage') or None
+                    self.last_usage_model = content.get('model')
+
+            if latest_result.data:
+                self.latest_message_type = latest_result.data[0].get('type')
+
+            if user_result.data:
+                content = _parse_content(user_result.data[0].get('content'))
+                self.latest_user_message_content = content.get('content') if isinstance(content, dict) else (str(content) if content else None)
+
+            if thread_result.data:
+                metadata = thread_result.data[0].get('metadata') or {}
+                self.cache_needs_rebuild = bool(metadata.get('cache_needs_rebuild'))
+        except Exception as e:
+            logger.warning(f"Failed to load thread state for {self.thread_id}, retrying next turn: {e}")
+            return self
+
+        self.loaded = True
+        return self
+
+    async def refresh_latest_message_type(self, client) -> Optional[str]:
+        """Re-read the type of the latest conversation message, which other processes may have added.
+
+        Keeps the in-memory value if the query fails.
+        """
+        try:
+            result = await client.table('messages').select('type')\
+                .eq('thread_id', self.thread_id)\
+                .in_('type', list(CONVERSATION_MESSAGE_TYPES))\
+                .order('created_at', desc=True)\
+                .limit(1)\
+                .execute()
+            if result.data:
+                self.latest_message_type = result.data[0].get('type')
+        except Exception as e:
+            logger.debug(f"Failed to refresh latest message type for {self.thread_id}: {e}")
+        return self.latest_message_type
+
+    def record_message(self, type: str, content: Any):
+        """Update the state from a message that was just saved to the thread."""
+        if type in CONVERSATION_MESSAGE_TYPES:
+            self.latest_message_type = type
+        if type == 'user':
+            content = _parse_content(content)
+            self.latest_user_message_content = content.get('content') if isinstance(content, dict) else str(content)
+        elif type == 'llm_response_end':
+            content = _parse_content(content)
+            if isinstance(content, dict):
+                self.last_usage = content.get('usage') or None
+                self.last_usage_model = content.get('model')
+
+    def request_cache_rebuild(self):
+        """Mark the prompt cache for rebuild on the next turn (e.g. after compression)."""
+        if not self.cache_needs_rebuild:
+            self.cache_needs_rebuild = True
+            self.dirty = True
+
+    def consume_cache_rebuild(self) -> bool:
+        """Return whether the cache must be rebuilt and clear the flag."""
+        if not self.cache_needs_rebuild:
+            return False
+        self.cache_needs_rebuild = False
+        self.dirty = True
+        return True
+
+    async def persist(self, client):
+        """Write the rebuild flag back to threads.metadata if it changed during the run."""
+        if not self.dirty:
+            return
+        try:
+            result = await client.table('threads').select('metadata').eq('thread_id', self.thread_id).limit(1).execute()
+            metadata = (result.data[0].get('metadata') or {}) if result.data else {}
+            if bool(metadata.get('cache_needs_rebuild')) != self.cache_needs_rebuild:
+                metadata['cache_needs_rebuild'] = self.cache_needs_rebuild
+                await client.table('threads').update({'metadata': metadata}).eq('thread_id', self.thread_id).execute()
+            self.dirty = False
+        except Exception as e:
+            logger.warning(f"Failed to persist thread state for {self.thread_id}: {e}")
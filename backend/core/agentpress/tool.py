@@ -8,9 +8,10 @@ This module defines the base classes and decorators for creating tools:
 - Result containers for standardized tool outputs
 """
 
-from typing import Dict, Any, Union, Optional, List
+from typing import Dict, Any, Union, Optional, List, Mapping, Tuple, Type
 from dataclasses import dataclass, field
 from abc import ABC
+from types import MappingProxyType
 import json
 import inspect
 from enum import Enum
@@ -54,6 +55,9 @@ class ToolMetadata:
         is_core (bool): Whether this is a core tool (always enabled)
         weight (int): Sort order (lower = higher priority, default 100)
         visible (bool): Whether tool is visible in frontend UI (default False)
+        timeout (Optional[float]): Seconds a call may run before it is cancelled
+        max_concurrency (Optional[int]): Calls to this tool allowed to run at once in a run
+        idempotent (bool): Whether identical calls in a run may reuse the first result
     """
     display_name: str
     description: str
@@ -62,6 +66,9 @@ class ToolMetadata:
     is_core: bool = False
     weight: int = 100
     visible: bool = False
+    timeout: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    idempotent: bool = False
 
 @dataclass
 class MethodMetadata:
@@ -72,11 +79,119 @@ class MethodMetadata:
         description (str): Method description
         is_core (bool): Whether this is a core method (always enabled)
         visible (bool): Whether method is visible in frontend UI (default True)
+        timeout (Optional[float]): Overrides the tool's timeout for this method
+        max_concurrency (Optional[int]): Calls to this method allowed to run at once in a run
+        idempotent (Optional[bool]): Overrides the tool's idempotent flag for this method
     """
     display_name: str
     description: str
     is_core: bool = False
     visible: bool = True
+    timeout: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    idempotent: Optional[bool] = None
+
+@dataclass(frozen=True)
+class ToolExecutionPolicy:
+    """How calls to one tool function are scheduled, merged from tool and method metadata.
+    
+    Attributes:
+        timeout (Optional[float]): Seconds a call may run, None for the scheduler default
+        max_concurrency (Optional[int]): Calls allowed to run at once, None for unlimited
+        concurrency_key (Optional[str]): Calls sharing a key share the concurrency limit
+        idempotent (bool): Whether identical calls may reuse the first result
+    """
+    timeout: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    concurrency_key: Optional[str] = None
+    idempotent: bool = False
+
+@dataclass(frozen=True)
+class ToolClassSpec:
+    """Schemas and metadata declared on a Tool class.
+    
+    Computed once per class by get_tool_class_spec and shared by every
+    instance and ToolRegistry, so registering a tool does not re-scan it.
+    
+    Attributes:
+        metadata (Optional[ToolMetadata]): Tool-level metadata
+        schemas (Mapping[str, Tuple[ToolSchema, ...]]): Schemas per decorated method
+        method_metadata (Mapping[str, MethodMetadata]): Metadata per decorated method
+    """
+    metadata: Optional[ToolMetadata]
+    schemas: Mapping[str, Tuple[ToolSchema, ...]]
+    method_metadata: Mapping[str, MethodMetadata]
+
+_tool_class_specs: Dict[type, ToolClassSpec] = {}
+
+def get_tool_class_spec(tool_class: Type["Tool"]) -> ToolClassSpec:
+    """Get the immutable schema/metadata spec for a tool class, building it on first use.
+    
+    Args:
+        tool_class: Tool subclass to inspect
+        
+    Returns:
+        ToolClassSpec shared by all instances of the class
+    """
+    spec = _tool_class_specs.get(tool_class)
+    if spec is not None:
+        return spec
+    
+    schemas: Dict[str, Tuple[ToolSchema, ...]] = {}
+    method_metadata: Dict[str, MethodMetadata] = {}
+    for name, member in inspect.getmembers(tool_class, predicate=callable):
+        if inspect.isclass(member):
+            continue
+        if hasattr(member, 'tool_schemas'):
+            schemas[name] = tuple(member.tool_schemas)
+        if hasattr(member, '__method_metadata__'):
+            method_metadata[name] = member.__method_metadata__
+    
+    spec = ToolClassSpec(
+        metadata=getattr(tool_class, '__tool_metadata__', None),
+        schemas=MappingProxyType(schemas),
+        method_metadata=MappingProxyType(method_metadata)
+    )
+    _tool_class_specs[tool_class] = spec
+    return spec
+
+def get_execution_policy(tool_class: Type["Tool"], function_name: str) -> ToolExecutionPolicy:
+    """Get the execution policy for a tool function.
+    
+    Method metadata overrides tool metadata. A concurrency limit declared on
+    the tool is shared by all of its functions; one declared on a method
+    applies to that method only.
+    
+    Args:
+        tool_class: Tool subclass the function belongs to
+        function_name: Name of the tool function
+        
+    Returns:
+        ToolExecutionPolicy for the function
+    """
+    spec = get_tool_class_spec(tool_class)
+    tool = spec.metadata
+    method = spec.method_metadata.get(function_name)
+    
+    timeout = tool.timeout if tool else None
+    idempotent = tool.idempotent if tool else False
+    max_concurrency, concurrency_key = None, None
+    if tool and tool.max_concurrency:
+        max_concurrency, concurrency_key = tool.max_concurrency, tool_class.__name__
+    if method:
+        if method.timeout is not None:
+            timeout = method.timeout
+        if method.idempotent is not None:
+            idempotent = method.idempotent
+        if method.max_concurrency:
+            max_concurrency, concurrency_key = method.max_concurrency, f"{tool_class.__name__}.{function_name}"
+    
+    return ToolExecutionPolicy(
+        timeout=timeout,
+        max_concurrency=max_concurrency,
+        concurrency_key=concurrency_key,
+        idempotent=idempotent
+    )
 
 class Tool(ABC):
     """Abstract base class for all tools.
@@ -84,6 +199,9 @@ class Tool(ABC):
     Provides the foundation for implementing tools with schema registration
     and result handling capabilities.
     
+    Schemas and metadata come from the class-level ToolClassSpec, so
+    constructing a tool does not inspect its methods again.
+    
     Attributes:
         _schemas (Dict[str, List[ToolSchema]]): Registered schemas for tool methods
         _metadata (Optional[ToolMetadata]): Tool-level metadata
@@ -108,21 +226,14 @@ class Tool(ABC):
 
     def _register_metadata(self):
         """Register metadata from class and method decorators."""
-        # Register tool-level metadata
-        if hasattr(self.__class__, '__tool_metadata__'):
-            self._metadata = self.__class__.__tool_metadata__
-        
-        # Register method-level metadata
-        for name, method in inspect.getmembers(self, predicate=inspect.ismethod):
-            if hasattr(method, '__method_metadata__'):
-                self._method_metadata[name] = method.__method_metadata__
+        spec = get_tool_class_spec(self.__class__)
+        self._metadata = spec.metadata
+        self._method_metadata.update(spec.method_metadata)
 
     def _register_schemas(self):
         """Register schemas from all decorated methods."""
-        for name, method in inspect.getmembers(self, predicate=inspect.ismethod):
-            if hasattr(method, 'tool_schemas'):
-                self._schemas[name] = method.tool_schemas
-                # logger.debug(f"Registered schemas for method '{name}' in {self.__class__.__name__}")
+        for name, schemas in get_tool_class_spec(self.__class__).schemas.items():
+            self._schemas[name] = list(schemas)
 
     def get_schemas(self) -> Dict[str, List[ToolSchema]]:
         """Get all registered tool schemas.
@@ -201,7 +312,10 @@ def tool_metadata(
     color: Optional[str] = None,
     is_core: bool = False,
     weight: int = 100,
-    visible: bool = False
+    visible: bool = False,
+    timeout: Optional[float] = None,
+    max_concurrency: Optional[int] = None,
+    idempotent: bool = False
 ):
     """Decorator to add metadata to a Tool class.
     
@@ -215,6 +329,9 @@ def tool_metadata(
                 Examples: Core tools=10, File ops=20, Advanced=90
         visible: Whether tool is visible in frontend UI (default True)
                  Set to False to hide from UI (internal/experimental tools)
+        timeout: Seconds a call may run before it is cancelled (default: scheduler default)
+        max_concurrency: Calls to this tool allowed to run at once in a run (default: unlimited)
+        idempotent: Identical calls in a run reuse the first successful result
     
     Usage:
         @tool_metadata(
@@ -245,7 +362,10 @@ def tool_metadata(
             color=color,
             is_core=is_core,
             weight=weight,
-            visible=visible
+            visible=visible,
+            timeout=timeout,
+            max_concurrency=max_concurrency,
+            idempotent=idempotent
         )
         return cls
     return decorator
@@ -254,7 +374,10 @@ def method_metadata(
     display_name: str,
     description: str,
     is_core: bool = False,
-    visible: bool = True
+    visible: bool = True,
+    timeout: Optional[float] = None,
+    max_concurrency: Optional[int] = None,
+    idempotent: Optional[bool] = None
 ):
     """Decorator to add metadata to a tool method.
     
@@ -264,6 +387,9 @@ def method_metadata(
         is_core: Whether this is a core method that's always enabled
         visible: Whether method is visible in frontend UI (default True)
                  Set to False to hide from UI (internal/experimental methods)
+        timeout: Overrides the tool's timeout for this method
+        max_concurrency: Calls to this method allowed to run at once in a run
+        idempotent: Overrides the tool's idempotent flag for this method
     
     Usage:
         @method_metadata(
@@ -290,7 +416,10 @@ def method_metadata(
             display_name=display_name,
             description=description,
             is_core=is_core,
-            visible=visible
+            visible=visible,
+            timeout=timeout,
+            max_concurrency=max_concurrency,
+            idempotent=idempotent
         )
         return func
     return decorator
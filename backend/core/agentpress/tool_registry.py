@@ -1,7 +1,86 @@
 from typing import Dict, Type, Any, List, Optional, Callable
-from core.agentpress.tool import Tool, SchemaType
+from core.agentpress.tool import Tool, SchemaType, ToolExecutionPolicy, get_execution_policy, get_tool_class_spec
 from core.utils.logger import logger
 import json
+import time
+
+
+class _ToolTable(dict):
+    """Function name -> {"instance", "schema"} table that counts its mutations.
+
+    Some callers register tools by assigning into ToolRegistry.tools directly,
+    so derived lookups are cached against this version instead of being
+    invalidated explicitly.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+
+class ToolBinding:
+    """A registered tool class whose instance is constructed on first use.
+
+    Lazy registration only needs the class-level schemas, so tools that are
+    never called in a run never run their constructor (or pull configs and
+    clients from it).
+    """
+
+    def __init__(self, tool_class: Type[Tool], kwargs: Dict[str, Any], on_construct: Optional[Callable[[str, float], None]] = None):
+        self.tool_class = tool_class
+        self.kwargs = kwargs
+        self.on_construct = on_construct
+        self._instance: Optional[Tool] = None
+
+    @property
+    def is_constructed(self) -> bool:
+        return self._instance is not None
+
+    def get_instance(self) -> Tool:
+        if self._instance is None:
+            start = time.perf_counter()
+            self._instance = self.tool_class(**self.kwargs)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            logger.debug(f"🔧 Constructed {self.tool_class.__name__} on first use in {elapsed_ms:.1f}ms")
+            if self.on_construct:
+                self.on_construct(self.tool_class.__name__, elapsed_ms)
+        return self._instance
+
+
+def _uses_class_schemas(tool_class: Type[Tool]) -> bool:
+    """Whether a tool's schemas are fully declared on the class (not built at runtime)."""
+    return (
+        tool_class.get_schemas is Tool.get_schemas
+        and tool_class._register_schemas is Tool._register_schemas
+    )
 
 
 class ToolRegistry:
@@ -9,6 +88,8 @@ class ToolRegistry:
     
     Maintains a collection of tool instances and their schemas, allowing for
     selective registration of tool functions and easy access to tool capabilities.
+    Schemas are read from the class-level ToolClassSpec, and the name -> callable,
+    XML tag -> function and schema lists are cached until the tools change.
     
     Attributes:
         tools (Dict[str, Dict[str, Any]]): OpenAPI-style tools and schemas
@@ -16,29 +97,56 @@ class ToolRegistry:
     Methods:
         register_tool: Register a tool with optional function filtering
         get_tool: Get a specific tool by name
+        get_function: Get a tool function by name
+        get_xml_tag_map: Get XML tag names mapped to function names
         get_openapi_schemas: Get OpenAPI schemas for function calling
     """
     
     def __init__(self):
         """Initialize a new ToolRegistry instance."""
-        self.tools = {}
+        self.tools = _ToolTable()
+        self._cache_version = -1
+        self._functions: Dict[str, Callable] = {}
+        self._xml_tags: Dict[str, str] = {}
+        self._openapi_schemas: List[Dict[str, Any]] = []
+        self._execution_policies: Dict[str, ToolExecutionPolicy] = {}
+        # Tool class name -> constructor time in ms (eager and lazily constructed tools)
+        self.construction_times: Dict[str, float] = {}
+        # Function name -> number of calls executed through this registry, in first-call order
+        self.call_counts: Dict[str, int] = {}
         logger.debug("Initialized new ToolRegistry instance")
     
-    def register_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
+    def _record_construction(self, tool_name: str, elapsed_ms: float):
+        self.construction_times[tool_name] = round(elapsed_ms, 2)
+
+    def register_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, lazy: bool = False, **kwargs):
         """Register a tool with optional function filtering.
         
         Args:
             tool_class: The tool class to register
             function_names: Optional list of specific functions to register
+            lazy: Defer constructing the tool until one of its functions is first looked up
             **kwargs: Additional arguments passed to tool initialization
             
         Notes:
             - If function_names is None, all functions are registered
             - Handles OpenAPI schema registration
+            - Tools that build their schemas at runtime are always constructed eagerly
         """
         # logger.debug(f"Registering tool class: {tool_class.__name__}")
-        tool_instance = tool_class(**kwargs)
-        schemas = tool_instance.get_schemas()
+        if lazy and _uses_class_schemas(tool_class):
+            binding = ToolBinding(tool_class, kwargs, on_construct=self._record_construction)
+            entry = {"binding": binding}
+            schemas = get_tool_class_spec(tool_class).schemas
+        else:
+            start = time.perf_counter()
+            tool_instance = tool_class(**kwargs)
+            self._record_construction(tool_class.__name__, (time.perf_counter() - start) * 1000)
+            entry = {"instance": tool_instance}
+            if _uses_class_schemas(tool_class):
+                schemas = get_tool_class_spec(tool_class).schemas
+            else:
+                schemas = tool_instance.get_schemas()
         
         # logger.debug(f"Available schemas for {tool_class.__name__}: {list(schemas.keys())}")
         
@@ -49,7 +157,7 @@ class ToolRegistry:
                 for schema in schema_list:
                     if schema.schema_type == SchemaType.OPENAPI:
                         self.tools[func_name] = {
-                            "instance": tool_instance,
+                            **entry,
                             "schema": schema
                         }
                         registered_openapi += 1
@@ -57,23 +165,128 @@ class ToolRegistry:
         
         # logger.debug(f"Tool registration complete for {tool_class.__name__}: {registered_openapi} OpenAPI functions")
 
+    @staticmethod
+    def _resolve_instance(tool_info: Dict[str, Any]) -> Any:
+        """Return the tool instance for an entry, constructing a lazy binding if needed."""
+        instance = tool_info.get('instance')
+        if instance is None:
+            instance = tool_info['binding'].get_instance()
+            tool_info['instance'] = instance
+        return instance
+
+    @staticmethod
+    def _is_constructed(tool_info: Dict[str, Any]) -> bool:
+        return tool_info.get('instance') is not None or tool_info['binding'].is_constructed
+
+    def _refresh_caches(self):
+        """Rebuild the derived lookups if the tool table changed since the last build."""
+        if self._cache_version == self.tools.version:
+            return
+
+        # Only constructed tools are bound here; lazy ones are bound on first lookup
+        functions = {}
+        for function_name, tool_info in self.tools.items():
+            if self._is_constructed(tool_info):
+                functions[function_name] = getattr(self._resolve_instance(tool_info), function_name)
+
+        self._functions = functions
+        self._execution_policies = {}
+        self._xml_tags = {name.replace('_', '-'): name for name in self.tools}
+        self._openapi_schemas = [
+            tool_info['schema'].schema
+            for tool_info in self.tools.values()
+            if tool_info['schema'].schema_type == SchemaType.OPENAPI
+        ]
+        self._cache_version = self.tools.version
+
     def get_available_functions(self) -> Dict[str, Callable]:
         """Get all available tool functions.
         
+        Constructs any lazily registered tools; use get_function or
+        get_function_names when only one function or the names are needed.
+
         Returns:
-            Dict mapping function names to their implementations
+            Dict mapping function names to their implementations (shared, do not modify)
         """
-        available_functions = {}
+        self._refresh_caches()
+        for function_name in self.tools:
+            if function_name not in self._functions:
+                self.get_function(function_name)
+        # logger.debug(f"Retrieved {len(self._functions)} available functions")
+        return self._functions
         
-        # Get OpenAPI tool functions
-        for tool_name, tool_info in self.tools.items():
-            tool_instance = tool_info['instance']
-            function_name = tool_name
-            function = getattr(tool_instance, function_name)
-            available_functions[function_name] = function
+    def get_function(self, function_name: str) -> Optional[Callable]:
+        """Get a tool function by name.
             
-        # logger.debug(f"Retrieved {len(available_functions)} available functions")
-        return available_functions
+        Args:
+            function_name: Name of the tool function
+
+        Returns:
+            The bound tool method, or None if not registered
+        """
+        self._refresh_caches()
+        function = self._functions.get(function_name)
+        if function is None and function_name in self.tools:
+            function = getattr(self._resolve_instance(self.tools[function_name]), function_name)
+            self._functions[function_name] = function
+        return function
+
+    def get_function_names(self) -> List[str]:
+        """Get the names of all registered functions without constructing any tool."""
+        return list(self.tools.keys())
+
+    def get_tool_class(self, function_name: str) -> Optional[Type[Tool]]:
+        """Get the tool class a function is registered from without constructing it."""
+        tool_info = self.tools.get(function_name)
+        if not tool_info:
+            return None
+        binding = tool_info.get('binding')
+        return binding.tool_class if binding is not None else type(tool_info['instance'])
+
+    def get_execution_policy(self, function_name: str) -> ToolExecutionPolicy:
+        """Get the timeout, concurrency and memoization settings for a function without constructing its tool."""
+        self._refresh_caches()
+        policy = self._execution_policies.get(function_name)
+        if policy is None:
+            tool_class = self.get_tool_class(function_name)
+            policy = get_execution_policy(tool_class, function_name) if tool_class else ToolExecutionPolicy()
+            self._execution_policies[function_name] = policy
+        return policy
+
+    def record_call(self, function_name: str):
+        """Count a call to a registered function (used for tool selection recovery)."""
+        self.call_counts[function_name] = self.call_counts.get(function_name, 0) + 1
+
+    def get_construction_stats(self) -> Dict[str, Any]:
+        """Summarize tool construction for run startup metrics.
+
+        Returns:
+            Dict with constructed/deferred tool class names and per-tool construction times in ms
+        """
+        constructed, deferred = set(), set()
+        for tool_info in self.tools.values():
+            binding = tool_info.get('binding')
+            if binding is not None and not binding.is_constructed:
+                deferred.add(binding.tool_class.__name__)
+            elif binding is not None:
+                constructed.add(binding.tool_class.__name__)
+            else:
+                constructed.add(type(tool_info['instance']).__name__)
+        return {
+            "constructed": sorted(constructed),
+            "deferred": sorted(deferred),
+            "construction_ms": dict(self.construction_times),
+            "total_construction_ms": round(sum(self.construction_times.values()), 2),
+        }
+
+    def get_xml_tag_map(self) -> Dict[str, str]:
+        """Get XML tag names (underscores replaced by dashes) mapped to function names.
+
+        Returns:
+            Dict mapping tag names to function names (shared, do not modify)
+        """
+        self._refresh_caches()
+        return self._xml_tags
 
     def get_tool(self, tool_name: str) -> Dict[str, Any]:
         """Get a specific tool by name.
@@ -89,17 +302,23 @@ class ToolRegistry:
             logger.warning(f"Tool not found: {tool_name}")
         return tool
 
-    def get_openapi_schemas(self) -> List[Dict[str, Any]]:
+    def get_openapi_schemas(self, function_names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Get OpenAPI schemas for function calling.
+
+        Args:
+            function_names: Optional subset of functions to return schemas for,
+                in registration order
         
         Returns:
             List of OpenAPI-compatible schema definitions
         """
-        schemas = [
-            tool_info['schema'].schema 
-            for tool_info in self.tools.values()
-            if tool_info['schema'].schema_type == SchemaType.OPENAPI
-        ]
-        # logger.debug(f"Retrieved {len(schemas)} OpenAPI schemas")
-        return schemas
-
+        if function_names is not None:
+            wanted = set(function_names)
+            return [
+                tool_info['schema'].schema
+                for name, tool_info in self.tools.items()
+                if name in wanted and tool_info['schema'].schema_type == SchemaType.OPENAPI
+            ]
+        self._refresh_caches()
+        # logger.debug(f"Retrieved {len(self._openapi_schemas)} OpenAPI schemas")
+        return list(self._openapi_schemas)
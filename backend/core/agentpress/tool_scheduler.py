@@ -0,0 +1,183 @@
+"""
+Tool execution scheduler for AgentPress.
+
+Every tool call of a run goes through one ToolExecutionScheduler, which applies
+the settings declared with tool_metadata/method_metadata:
+
+- timeout: the call is cancelled and reported as a failed ToolResult once it
+  runs longer than its timeout (DEFAULT_TOOL_TIMEOUT if none is declared)
+- max_concurrency: calls sharing a concurrency key wait for a free slot, so a
+  burst of streamed tool calls cannot open unbounded browser or API sessions
+- idempotent: identical calls (same function, same canonical arguments) reuse
+  the first successful result for the rest of the run; concurrent duplicates
+  wait for the call already in flight
+
+Running calls are cancelled when the run's stop event is set or cancel_all is
+called, and report a failed ToolResult instead of hanging the run.
+"""
+
+import asyncio
+import json
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from core.agentpress.tool import ToolExecutionPolicy, ToolResult
+from core.agentpress.tool_registry import ToolRegistry
+from core.utils.json_helpers import safe_json_parse
+from core.utils.logger import logger
+
+# Backstop for tools that don't declare a timeout
+DEFAULT_TOOL_TIMEOUT = 15 * 60
+
+
+def canonical_arguments(arguments: Any) -> Optional[str]:
+    """Serialize tool arguments so that equal arguments give equal keys, or None if they can't be."""
+    if isinstance(arguments, str):
+        try:
+            arguments = safe_json_parse(arguments)
+        except Exception:
+            pass
+    try:
+        return json.dumps(arguments, sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ToolExecutionScheduler:
+    """Per-run scheduler applying timeouts, concurrency limits and memoization to tool calls."""
+
+    def __init__(
+        self,
+        tool_registry: ToolRegistry,
+        invoke: Callable[[Dict[str, Any]], Awaitable[ToolResult]],
+        stop_event: Optional[asyncio.Event] = None,
+        default_timeout: float = DEFAULT_TOOL_TIMEOUT,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            tool_registry: Registry the execution policies are read from
+            invoke: Coroutine that executes a single tool call
+            stop_event: Event set when the run is stopped; cancels running calls
+            default_timeout: Timeout in seconds for tools that don't declare one
+        """
+        self.tool_registry = tool_registry
+        self.invoke = invoke
+        self.stop_event = stop_event
+        self.default_timeout = default_timeout
+
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        # (function name, canonical arguments) -> result of the first call, in flight or done
+        self._memo: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._running: Set[asyncio.Task] = set()
+        self._cancelled = False
+        self.stats = {"executed": 0, "memo_hits": 0, "timeouts": 0, "cancelled": 0}
+
+    @property
+    def stop_requested(self) -> bool:
+        return self._cancelled or (self.stop_event is not None and self.stop_event.is_set())
+
+    def cancel_all(self) -> int:
+        """Cancel running tool calls and refuse new ones. Returns the number of calls cancelled."""
+        self._cancelled = True
+        running = [task for task in self._running if not task.done()]
+        for task in running:
+            task.cancel()
+        if running:
+            logger.info(f"🛑 Cancelled {len(running)} running tool executions")
+        return len(running)
+
+    async def execute(self, tool_call: Dict[str, Any]) -> ToolResult:
+        """Execute a tool call under its function's execution policy."""
+        function_name = tool_call.get("function_name", "unknown")
+        policy = self.tool_registry.get_execution_policy(function_name)
+
+        key = None
+        if policy.idempotent:
+            arguments = canonical_arguments(tool_call.get("arguments"))
+            if arguments is not None:
+                key = (function_name, arguments)
+
+        if key is None:
+            return await self._run(function_name, tool_call, policy)
+
+        existing = self._memo.get(key)
+        if existing is not None:
+            self.stats["memo_hits"] += 1
+            logger.debug(f"♻️ Reusing result of {function_name} from an identical call in this run")
+            try:
+                return await asyncio.shield(existing)
+            except asyncio.CancelledError:
+                # The first call was cancelled; run this one unless we are being cancelled ourselves
+                if asyncio.current_task().cancelling() or not existing.cancelled():
+                    raise
+                return await self.execute(tool_call)
+
+        future = asyncio.get_running_loop().create_future()
+        self._memo[key] = future
+        try:
+            result = await self._run(function_name, tool_call, policy)
+        except BaseException:
+            self._memo.pop(key, None)
+            future.cancel()
+            raise
+
+        future.set_result(result)
+        if not result.success:
+            # Only successful results are reused; a later identical call retries
+            self._memo.pop(key, None)
+        return result
+
+    def _semaphore(self, policy: ToolExecutionPolicy):
+        if not policy.max_concurrency or not policy.concurrency_key:
+            return nullcontext()
+        semaphore = self._semaphores.get(policy.concurrency_key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(policy.max_concurrency)
+            self._semaphores[policy.concurrency_key] = semaphore
+        return semaphore
+
+    async def _run(self, function_name: str, tool_call: Dict[str, Any], policy: ToolExecutionPolicy) -> ToolResult:
+        timeout = policy.timeout if policy.timeout is not None else self.default_timeout
+
+        async with self._semaphore(policy):
+            if self.stop_requested:
+                return self._cancelled_result(function_name)
+
+            self.stats["executed"] += 1
+            task = asyncio.create_task(self.invoke(tool_call))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+            waiters = {task}
+            stop_waiter = None
+            if self.stop_event is not None:
+                stop_waiter = asyncio.create_task(self.stop_event.wait())
+                waiters.add(stop_waiter)
+
+            try:
+                done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                if stop_waiter is not None:
+                    stop_waiter.cancel()
+
+            if task in done:
+                if task.cancelled():
+                    return self._cancelled_result(function_name)
+                return task.result()
+
+            task.cancel()
+            if self.stop_requested:
+                return self._cancelled_result(function_name)
+
+            self.stats["timeouts"] += 1
+            logger.warning(f"⏱️ Tool {function_name} timed out after {timeout:g}s")
+            return ToolResult(success=False, output=f"Tool '{function_name}' timed out after {timeout:g} seconds")
+
+    def _cancelled_result(self, function_name: str) -> ToolResult:
+        self.stats["cancelled"] += 1
+        logger.info(f"🛑 Tool {function_name} cancelled because the run was stopped")
+        return ToolResult(success=False, output=f"Tool '{function_name}' was cancelled because the run was stopped")
@@ -1127,6 +1127,7 @@ async def preview_proration(
 @router.post("/reconcile")
 async def trigger_reconciliation(
     admin_key: Optional[str] = Query(None, description="Admin API key"),
+    full: bool = Query(False, description="Check every account instead of only accounts changed since the last run"),
     account_id: str = Depends(verify_and_get_user_id_from_jwt)
 ) -> Dict:
 
@@ -1135,8 +1136,8 @@ async def trigger_reconciliation(
     
     try:
         payment_results = await reconciliation_service.reconcile_failed_payments()
-        balance_results = await reconciliation_service.verify_balance_consistency()
-        duplicate_results = await reconciliation_service.detect_double_charges()
+        balance_results = await reconciliation_service.verify_balance_consistency(incremental=not full)
+        duplicate_results = await reconciliation_service.detect_double_charges(incremental=not full)
         cleanup_results = await reconciliation_service.cleanup_expired_credits()
         
         return {
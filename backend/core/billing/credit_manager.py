@@ -4,6 +4,7 @@ from datetime import datetime, timezone, timedelta
 from core.services.supabase import DBConnection
 from core.utils.logger import logger
 from core.utils.cache import Cache
+from core.utils.distributed_lock import LockLostError
 import uuid
 
 
@@ -20,10 +21,19 @@ class CreditManager:
         description: str = "Credit added",
         expires_at: Optional[datetime] = None,
         type: Optional[str] = None,
-        stripe_event_id: Optional[str] = None
+        stripe_event_id: Optional[str] = None,
+        lock=None
     ) -> Dict:
+        """Add credits to an account.
+
+        When the grant runs under a DistributedLock, pass it as lock: its
+        fencing token is checked by atomic_add_credits in the same transaction
+        as the grant, so a holder whose lock expired raises LockLostError
+        instead of granting twice.
+        """
         client = await self.db.client
         amount = Decimal(str(amount))
+        fence = lock.fence_params() if lock is not None else {}
         
         if self.use_atomic_functions:
             try:
@@ -37,11 +47,14 @@ class CreditManager:
                     'p_expires_at': expires_at.isoformat() if expires_at else None,
                     'p_type': type,
                     'p_stripe_event_id': stripe_event_id,
-                    'p_idempotency_key': idempotency_key
+                    'p_idempotency_key': idempotency_key,
+                    **fence
                 }).execute()
                 
                 if result.data:
                     data = result.data
+                    if data.get('lock_lost'):
+                        raise LockLostError(f"Fencing token {fence.get('p_fencing_token')} for {fence.get('p_lock_key')} is stale")
                     logger.info(f"[ATOMIC] Added ${amount} credits to {account_id} atomically")
                     
                     await Cache.invalidate(f"credit_balance:{account_id}")
@@ -57,10 +70,16 @@ class CreditManager:
                 else:
                     logger.error(f"[ATOMIC] No data returned from atomic_add_credits")
                     
+            except LockLostError:
+                raise
             except Exception as e:
                 logger.error(f"[ATOMIC] Failed to use atomic function, falling back to legacy: {e}")
                 self.use_atomic_functions = False
         
+        # The legacy writes cannot check the token themselves
+        if lock is not None:
+            await lock.check_fence(client)
+        
         if stripe_event_id:
             existing_event = await client.from_('credit_ledger').select(
                 'id, amount, balance_after'
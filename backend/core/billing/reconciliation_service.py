@@ -1,3 +1,5 @@
+import asyncio
+import time
 from typing import Dict, List, Optional
 from decimal import Decimal
 from datetime import datetime, timezone, timedelta
@@ -9,6 +11,15 @@ from .credit_manager import credit_manager
 from .config import get_tier_by_price_id
 from .stripe_circuit_breaker import StripeAPIWrapper
 
+# Account-id hash partitions per check, and how many run at once
+PARTITIONS = 8
+PARTITION_CONCURRENCY = 4
+MAX_FINDINGS_RETURNED = 500
+CHECK_FUNCTIONS = {
+    'balance_consistency': 'reconcile_balance_partition',
+    'double_charges': 'detect_double_charges_partition',
+    'expired_credits': 'cleanup_expired_credits_partition',
+}
 
 class ReconciliationService:
     def __init__(self):
@@ -99,8 +110,105 @@ class ReconciliationService:
         logger.info(f"[RECONCILIATION] Complete: checked={results['checked']}, fixed={results['fixed']}, failed={results['failed']}")
         return results
     
-    async def verify_balance_consistency(self) -> Dict:
+    async def run_check(
+        self,
+        check_type: str,
+        incremental: bool = True,
+        fix: bool = True,
+        partitions: int = PARTITIONS
+    ) -> Dict:
+        """
+        Run one set-based reconciliation check in the database.
+
+        The check's SQL function is called once per account-id hash partition,
+        with up to PARTITION_CONCURRENCY partitions running at the same time on
+        separate connections. Each partition writes its findings to
+        billing_reconciliation_findings and adds its runtime and row counts to
+        the run in billing_reconciliation_runs.
+
+        Args:
+            check_type: 'balance_consistency', 'double_charges' or 'expired_credits'
+            incremental: Only check accounts with ledger or balance changes since
+                the last completed run (ignored for expired_credits, which
+                depends on time rather than on changes)
+            fix: Repair what the check can repair (balances, expired credits)
+            partitions: Number of account-id hash partitions
+
+        Returns:
+            Run summary with counts, duration and per-partition timings
+        """
+        function_name = CHECK_FUNCTIONS[check_type]
         client = await self.db.client
+
+        run = await client.rpc('begin_billing_reconciliation_run', {
+            'p_check_type': check_type,
+            'p_partitions': partitions,
+            'p_incremental': incremental and check_type != 'expired_credits'
+        }).execute()
+        run_id = run.data[0]['run_id']
+        since = run.data[0]['since']
+
+        semaphore = asyncio.Semaphore(PARTITION_CONCURRENCY)
+
+        async def run_partition(partition: int) -> Dict:
+            async with semaphore:
+                started = time.monotonic()
+                result = await client.rpc(function_name, {
+                    'p_run_id': run_id,
+                    'p_partition': partition,
+                    'p_partitions': partitions,
+                    'p_since': since,
+                    'p_fix': fix
+                }).execute()
+                row = result.data[0] if result.data else {}
+                return {
+                    'partition': partition,
+                    'duration_ms': round((time.monotonic() - started) * 1000),
+                    **row
+                }
+
+        started = time.monotonic()
+        outcomes = await asyncio.gather(*(run_partition(p) for p in range(partitions)), return_exceptions=True)
+        duration_ms = round((time.monotonic() - started) * 1000)
+
+        errors = [str(o) for o in outcomes if isinstance(o, Exception)]
+        partition_results = [o for o in outcomes if not isinstance(o, Exception)]
+        if errors:
+            # The run stays incomplete, so the next incremental run starts from the previous one
+            logger.error(f"[RECONCILIATION] {check_type} run {run_id}: {len(errors)}/{partitions} partitions failed: {errors[0]}")
+            await client.table('billing_reconciliation_runs').update({
+                'status': 'failed',
+                'error_message': '; '.join(errors)[:1000]
+            }).eq('id', run_id).execute()
+
+        summary = {
+            'run_id': run_id,
+            'check_type': check_type,
+            'mode': 'incremental' if since else 'full',
+            'since': since,
+            'partitions': partitions,
+            'accounts_checked': sum(r.get('accounts_checked') or 0 for r in partition_results),
+            'rows_scanned': sum(r.get('rows_scanned') or 0 for r in partition_results),
+            'findings': sum(r.get('findings') or 0 for r in partition_results),
+            'fixed': sum(r.get('fixed') or 0 for r in partition_results),
+            'amount': float(sum(Decimal(str(r.get('amount') or 0)) for r in partition_results)),
+            'duration_ms': duration_ms,
+            'partition_ms': {r['partition']: r['duration_ms'] for r in partition_results},
+            'errors': errors
+        }
+        logger.info(f"[RECONCILIATION] {check_type} ({summary['mode']}): {summary['accounts_checked']} accounts, "
+                   f"{summary['rows_scanned']} rows, {summary['findings']} findings, {summary['fixed']} fixed "
+                   f"in {duration_ms}ms across {partitions} partitions")
+        return summary
+    
+    async def get_findings(self, run_id: str, limit: int = MAX_FINDINGS_RETURNED) -> List[Dict]:
+        client = await self.db.client
+        result = await client.from_('billing_reconciliation_findings').select(
+            'account_id, details, fixed'
+        ).eq('run_id', run_id).limit(limit).execute()
+        return result.data or []
+    
+    async def verify_balance_consistency(self, incremental: bool = True) -> Dict:
         results = {
             'checked': 0,
             'fixed': 0,
@@ -108,76 +216,51 @@ class ReconciliationService:
         }
         
         try:
-            accounts = await client.from_('credit_accounts').select(
-                'account_id, balance, expiring_credits, non_expiring_credits'
-            ).execute()
+            run = await self.run_check('balance_consistency', incremental=incremental)
+            results['checked'] = run['accounts_checked']
+            results['fixed'] = run['fixed']
+            results['run'] = run
             
-            results['checked'] = len(accounts.data) if accounts.data else 0
-            
-            for account in accounts.data or []:
-                expected = Decimal(str(account['expiring_credits'])) + Decimal(str(account['non_expiring_credits']))
-                actual = Decimal(str(account['balance']))
-                
-                if abs(expected - actual) > Decimal('0.01'):
-                    logger.warning(f"[BALANCE CHECK] Discrepancy found for {account['account_id']}: "
-                                 f"expected=${expected:.2f}, actual=${actual:.2f}")
-                    
+            if run['findings']:
+                for finding in await self.get_findings(run['run_id']):
+                    details = finding['details']
+                    logger.warning(f"[BALANCE CHECK] Discrepancy found for {finding['account_id']}: "
+                                 f"expected=${float(details['expected']):.2f}, actual=${float(details['actual']):.2f}")
                     results['discrepancies_found'].append({
-                        'account_id': account['account_id'],
-                        'expected': float(expected),
-                        'actual': float(actual),
-                        'difference': float(expected - actual)
+                        'account_id': finding['account_id'],
+                        'expected': float(details['expected']),
+                        'actual': float(details['actual']),
+                        'difference': float(details['difference'])
                     })
-                    
-                    result = await client.rpc('reconcile_credit_balance', {
-                        'p_account_id': account['account_id']
-                    }).execute()
-                    
-                    if result.data and result.data[0].get('was_fixed'):
-                        results['fixed'] += 1
-                        logger.info(f"[BALANCE CHECK] Fixed balance for {account['account_id']}")
         
         except Exception as e:
             logger.error(f"[BALANCE CHECK] Error: {e}")
         
         return results
     
-    async def detect_double_charges(self) -> Dict:
-        client = await self.db.client
+    async def detect_double_charges(self, incremental: bool = True) -> Dict:
         results = {
             'duplicates_found': [],
             'total_checked': 0
         }
         
         try:
-            since = datetime.now(timezone.utc) - timedelta(days=7)
+            run = await self.run_check('double_charges', incremental=incremental, fix=False)
+            results['total_checked'] = run['rows_scanned']
+            results['run'] = run
             
-            ledger_entries = await client.from_('credit_ledger').select(
-                'id, account_id, amount, description, created_at, stripe_event_id'
-            ).gte('created_at', since.isoformat()).order('created_at', desc=True).execute()
-            
-            results['total_checked'] = len(ledger_entries.data) if ledger_entries.data else 0
-            
-            seen = {}
-            for entry in ledger_entries.data or []:
-                key = f"{entry['account_id']}_{entry['amount']}_{entry['description']}"
-                
-                if key in seen:
-                    time_diff = abs((datetime.fromisoformat(entry['created_at'].replace('Z', '+00:00')) - 
-                                   datetime.fromisoformat(seen[key]['created_at'].replace('Z', '+00:00'))).total_seconds())
-                    
-                    if time_diff < 60:
-                        results['duplicates_found'].append({
-                            'account_id': entry['account_id'],
-                            'amount': entry['amount'],
-                            'description': entry['description'],
-                            'entries': [entry['id'], seen[key]['id']],
-                            'time_difference_seconds': time_diff
-                        })
-                        logger.warning(f"[DUPLICATE CHECK] Potential duplicate found for {entry['account_id']}: "
-                                     f"${entry['amount']} - {entry['description']}")
-                else:
-                    seen[key] = entry
+            if run['findings']:
+                for finding in await self.get_findings(run['run_id']):
+                    details = finding['details']
+                    results['duplicates_found'].append({
+                        'account_id': finding['account_id'],
+                        'amount': details['amount'],
+                        'description': details['description'],
+                        'entries': details['entries'],
+                        'time_difference_seconds': float(details['time_difference_seconds'])
+                    })
+                    logger.warning(f"[DUPLICATE CHECK] Potential duplicate found for {finding['account_id']}: "
+                                 f"${details['amount']} - {details['description']}")
         
         except Exception as e:
             logger.error(f"[DUPLICATE CHECK] Error: {e}")
@@ -185,20 +268,19 @@ class ReconciliationService:
         return results
     
     async def cleanup_expired_credits(self) -> Dict:
-        client = await self.db.client
         results = {
             'accounts_cleaned': 0,
             'credits_removed': 0.0
         }
         
         try:
-            result = await client.rpc('cleanup_expired_credits').execute()
+            run = await self.run_check('expired_credits')
+            results['accounts_cleaned'] = run['fixed']
+            results['credits_removed'] = run['amount']
+            results['run'] = run
             
-            if result.data:
-                for row in result.data:
-                    results['accounts_cleaned'] += 1
-                    results['credits_removed'] += float(row.get('credits_removed', 0))
-                    logger.info(f"[CLEANUP] Removed ${row['credits_removed']:.2f} expired credits from {row['account_id']}")
+            if run['fixed']:
+                logger.info(f"[CLEANUP] Removed ${run['amount']:.2f} expired credits from {run['fixed']} accounts")
         
         except Exception as e:
             logger.error(f"[CLEANUP] Error: {e}")
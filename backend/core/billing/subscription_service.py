@@ -864,7 +864,8 @@ class SubscriptionService:
                 amount=TRIAL_CREDITS,
                 is_expiring=True,
                 description=f'{TRIAL_DURATION_DAYS}-day free trial credits',
-                expires_at=trial_ends_at
+                expires_at=trial_ends_at,
+                lock=lock
             )
             
             await client.from_('trial_history').upsert({
@@ -924,7 +925,8 @@ class SubscriptionService:
                 amount=full_amount,
                 is_expiring=True,
                 description=f"Tier upgrade to {new_tier['name']}",
-                expires_at=expires_at
+                expires_at=expires_at,
+                lock=lock
             )
             
             logger.info(f"[CREDIT GRANT] ✅ Successfully granted {full_amount} expiring credits for tier upgrade to {new_tier['name']}")
@@ -950,7 +952,8 @@ class SubscriptionService:
                 amount=Decimal(new_tier['credits']),
                 is_expiring=True,
                 description=f"Initial grant for {new_tier['name']} subscription",
-                expires_at=expires_at
+                expires_at=expires_at,
+                lock=lock
             )
             
             next_grant_date = datetime.fromtimestamp(subscription['current_period_end'], tz=timezone.utc)
@@ -0,0 +1,222 @@
+"""
+Stripe webhook ingestion queue.
+
+The webhook endpoint only verifies the signature, stores the event in
+webhook_events as pending and enqueues a Dramatiq message for the event's
+customer, so Stripe gets its 200 without waiting on Stripe API round trips,
+credit grants and billing writes (slow responses make Stripe retry, which
+multiplies the work during renewal storms).
+
+The consumer processes one customer at a time:
+
+- a DistributedLock per customer serializes that customer's events, while
+  other customers are processed in parallel by other workers; a message that
+  finds the lock taken returns, and the holder picks up the new events when
+  it re-checks for pending events after releasing the lock
+- pending events are processed in the order Stripe created them
+- subscriptions retrieved from Stripe are shared by every event in the
+  batch, and duplicate notifications of the same paid invoice
+  (invoice.paid + invoice.payment_succeeded) run the handler once
+
+Events whose message was lost, or whose consumer died mid-event, are not
+left behind: a redelivery from Stripe re-enqueues a stale pending event, and
+a periodic sweep in the API process resets events stuck in processing for
+longer than LOCK_TIMEOUT and re-enqueues every stale pending event.
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import stripe
+
+from core.services.supabase import DBConnection
+from core.utils.config import config
+from core.utils.distributed_lock import DistributedLock, WebhookLock
+from core.utils.logger import logger
+
+BATCH_SIZE = 50
+LOCK_TIMEOUT = 300
+SWEEP_INTERVAL = 60
+INVOICE_PAID_EVENTS = ('invoice.payment_succeeded', 'invoice.paid', 'invoice_payment.paid')
+
+
+def customer_key_for(event) -> str:
+    """Ordering key of an event: its Stripe customer, or the event itself when it has none."""
+    obj = event.data.object if getattr(event, 'data', None) else {}
+    customer = obj.get('customer') if obj else None
+    if isinstance(customer, dict):
+        customer = customer.get('id')
+    return customer or f"event:{event.id}"
+
+
+def _coalesce_key(event) -> Optional[str]:
+    if event.type in INVOICE_PAID_EVENTS:
+        invoice_id = event.data.object.get('invoice') if event.type == 'invoice_payment.paid' else event.data.object.get('id')
+        if invoice_id:
+            return f"invoice_paid:{invoice_id}"
+    return None
+
+
+def _enqueue_with_dramatiq(customer_key: str):
+    from run_agent_background import process_stripe_webhooks
+    process_stripe_webhooks.send(customer_key=customer_key)
+
+
+class WebhookQueue:
+    def __init__(
+        self,
+        enqueue: Optional[Callable[[str], Any]] = None,
+        batch_size: int = BATCH_SIZE,
+        sweep_interval: int = SWEEP_INTERVAL
+    ):
+        """
+        Args:
+            enqueue: Called with the customer key of each accepted event
+                (default: process_stripe_webhooks Dramatiq actor)
+            batch_size: Pending events loaded per query while draining a customer
+            sweep_interval: Seconds between sweeps for stale events
+        """
+        self._enqueue = enqueue or _enqueue_with_dramatiq
+        self.batch_size = batch_size
+        self.sweep_interval = sweep_interval
+        self._db = DBConnection()
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    async def accept(self, event, payload: Dict[str, Any]) -> Dict:
+        """Store a verified event and enqueue its customer for processing.
+
+        Args:
+            event: The event built by stripe.Webhook.construct_event
+            payload: The verified request body, decoded from JSON; stored as
+                the event payload the consumer rebuilds the event from
+        """
+        customer_key = customer_key_for(event)
+        created = getattr(event, 'created', None)
+        accepted, reason = await WebhookLock.record_webhook_received(
+            event.id,
+            event.type,
+            payload=payload,
+            customer_id=customer_key,
+            event_created_at=datetime.fromtimestamp(created, timezone.utc).isoformat() if created else None,
+            stale_after_seconds=LOCK_TIMEOUT
+        )
+        if not accepted:
+            logger.info(f"[WEBHOOK] Skipping event {event.id}: {reason}")
+            return {'status': 'success', 'message': f'Event already processed or in progress: {reason}'}
+
+        try:
+            self._enqueue(customer_key)
+        except Exception as e:
+            # Without the queue, drain the customer in the request. This claims the
+            # pending row like a consumer would, so the sweep cannot run it again
+            logger.warning(f"[WEBHOOK] Failed to enqueue event {event.id}, processing inline: {e}")
+            try:
+                await self.process_customer(customer_key)
+            except Exception as e:
+                logger.error(f"[WEBHOOK] Inline processing of event {event.id} failed, leaving it to the sweep: {e}")
+            return {'status': 'success'}
+
+        logger.info(f"[WEBHOOK] Queued event {event.type} (ID: {event.id}) for {customer_key}")
+        return {'status': 'success', 'queued': True}
+
+    async def requeue_stale(self) -> int:
+        """Re-enqueue customers with abandoned pending or processing events. Returns the number enqueued."""
+        customer_keys = await WebhookLock.requeue_stale_webhooks(stale_after_seconds=LOCK_TIMEOUT)
+        enqueued = 0
+        for customer_key in customer_keys:
+            try:
+                self._enqueue(customer_key)
+                enqueued += 1
+            except Exception as e:
+                logger.warning(f"[WEBHOOK] Failed to re-enqueue stale events for {customer_key}: {e}")
+        if enqueued:
+            logger.info(f"[WEBHOOK] Re-enqueued stale events for {enqueued} customers")
+        return enqueued
+
+    def start(self):
+        """Sweep for stale events periodically in the background."""
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweep_task and not self._sweep_task.done():
+            self._sweep_task.cancel()
+        self._sweep_task = None
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                await self.requeue_stale()
+            except Exception as e:
+                logger.error(f"[WEBHOOK] Stale event sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def process_customer(self, customer_key: str) -> int:
+        """Process the pending events of one customer in order. Returns the number processed."""
+        if not stripe.api_key:
+            stripe.api_key = config.STRIPE_SECRET_KEY
+
+        processed = 0
+        while True:
+            lock = DistributedLock(f"stripe_webhooks:{customer_key}", timeout_seconds=LOCK_TIMEOUT)
+            if not await lock.acquire(wait=False):
+                # The holder re-checks for pending events after releasing the lock
+                return processed
+            try:
+                processed += await self._drain(customer_key)
+            finally:
+                await lock.release()
+
+            if not await self._pending_events(customer_key, limit=1):
+                return processed
+
+    async def _drain(self, customer_key: str) -> int:
+        from .webhook_service import webhook_service, _subscription_memo
+
+        client = await self._db.client
+        processed = 0
+        handled: Dict[str, str] = {}
+        memo_token = _subscription_memo.set({})
+        try:
+            while True:
+                rows = await self._pending_events(customer_key, limit=self.batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    event_id = row['event_id']
+                    if not await WebhookLock.claim_pending_webhook(event_id):
+                        continue
+                    try:
+                        event = stripe.Event.construct_from(row['payload'], stripe.api_key)
+                        coalesce_key = _coalesce_key(event)
+                        if coalesce_key and coalesce_key in handled:
+                            logger.info(f"[WEBHOOK] Event {event_id} coalesced with {handled[coalesce_key]}")
+                        else:
+                            await webhook_service.handle_event(event, client)
+                            if coalesce_key:
+                                handled[coalesce_key] = event_id
+                        await WebhookLock.mark_webhook_completed(event_id)
+                    except Exception as e:
+                        logger.error(f"[WEBHOOK] Error processing event {event_id}: {e}")
+                        await WebhookLock.mark_webhook_failed(event_id, str(e))
+                    processed += 1
+        finally:
+            _subscription_memo.reset(memo_token)
+
+        if processed:
+            logger.info(f"[WEBHOOK] Processed {processed} events for {customer_key}")
+        return processed
+
+    async def _pending_events(self, customer_key: str, limit: int) -> List[Dict[str, Any]]:
+        client = await self._db.client
+        result = await client.from_('webhook_events').select('event_id, event_type, payload')\
+            .eq('customer_id', customer_key)\
+            .eq('status', 'pending')\
+            .order('event_created_at')\
+            .order('created_at')\
+            .limit(limit)\
+            .execute()
+        return result.data or []
+
+
+webhook_queue = WebhookQueue()
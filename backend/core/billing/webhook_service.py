@@ -1,5 +1,7 @@
+import json
 from fastapi import HTTPException, Request
-from typing import Dict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
 from decimal import Decimal
 from datetime import datetime, timezone, timedelta
 import stripe
@@ -21,12 +23,20 @@ from .config import (
 from .credit_manager import credit_manager
 from .stripe_circuit_breaker import StripeAPIWrapper
 
+# Subscriptions retrieved while the webhook queue processes one customer's batch
+_subscription_memo: ContextVar[Optional[Dict]] = ContextVar('stripe_subscription_memo', default=None)
+
 
 class WebhookService:
     def __init__(self):
         self.stripe = stripe
         
     async def process_stripe_webhook(self, request: Request) -> Dict:
+        """Verify a webhook, record it and hand it to the webhook queue.
+
+        Stripe gets its 200 as soon as the event is stored; the Dramatiq
+        consumer processes it in order with the customer's other events.
+        """
         event = None
         try:
             payload = await request.body()
@@ -45,6 +55,20 @@ class WebhookService:
             except ValueError as e:
                 raise HTTPException(status_code=400, detail="Invalid payload")
 
+            from .webhook_queue import webhook_queue
+            return await webhook_queue.accept(event, json.loads(payload))
+        
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"[WEBHOOK] Error accepting webhook: {e}")
+            if event and hasattr(event, 'id'):
+                await WebhookLock.mark_webhook_failed(event.id, str(e))
+            return {'status': 'success', 'error': 'processed_with_errors', 'message': 'Webhook logged as failed internally'}
+    
+    async def process_event(self, event) -> Dict:
+        """Process a verified event inline, claiming it through WebhookLock."""
+        try:
             can_process, reason = await WebhookLock.check_and_mark_webhook_processing(
                 event.id, 
                 event.type,
@@ -55,38 +79,9 @@ class WebhookService:
                 logger.info(f"[WEBHOOK] Skipping event {event.id}: {reason}")
                 return {'status': 'success', 'message': f'Event already processed or in progress: {reason}'}
             
-            cache_key = f"stripe_event:{event.id}"
-            await Cache.set(cache_key, True, ttl=7200)
-            
             db = DBConnection()
             client = await db.client
-            
-            logger.info(f"[WEBHOOK] Processing event type: {event.type} (ID: {event.id})")
-            
-            if event.type == 'checkout.session.completed':
-                logger.info(f"[WEBHOOK] Handling checkout.session.completed")
-                await self._handle_checkout_session_completed(event, client)
-            
-            elif event.type in ['customer.subscription.created', 'customer.subscription.updated']:
-                await self._handle_subscription_created_or_updated(event, client)
-            
-            elif event.type == 'customer.subscription.deleted':
-                await self._handle_subscription_deleted(event, client)
-            
-            elif event.type in ['invoice.payment_succeeded', 'invoice.paid', 'invoice_payment.paid']:
-                await self._handle_invoice_payment_succeeded(event, client)
-            
-            elif event.type == 'invoice.payment_failed':
-                await self._handle_invoice_payment_failed(event, client)
-            
-            elif event.type == 'customer.subscription.trial_will_end':
-                await self._handle_trial_will_end(event, client)
-            
-            elif event.type in ['charge.refunded', 'payment_intent.refunded']:
-                await self._handle_refund(event, client)
-            
-            else:
-                logger.info(f"[WEBHOOK] Unhandled event type: {event.type}")
+            await self.handle_event(event, client)
             
             await WebhookLock.mark_webhook_completed(event.id)
             
@@ -94,10 +89,71 @@ class WebhookService:
         
         except Exception as e:
             logger.error(f"[WEBHOOK] Error processing webhook: {e}")
-            if event and hasattr(event, 'id'):
-                await WebhookLock.mark_webhook_failed(event.id, str(e))
+            await WebhookLock.mark_webhook_failed(event.id, str(e))
             return {'status': 'success', 'error': 'processed_with_errors', 'message': 'Webhook logged as failed internally'}
     
+    async def handle_event(self, event, client) -> None:
+        """Run the handler for an event. Raises if the handler fails."""
+        cache_key = f"stripe_event:{event.id}"
+        await Cache.set(cache_key, True, ttl=7200)
+        
+        logger.info(f"[WEBHOOK] Processing event type: {event.type} (ID: {event.id})")
+        
+        if event.type == 'checkout.session.completed':
+            logger.info(f"[WEBHOOK] Handling checkout.session.completed")
+            await self._handle_checkout_session_completed(event, client)
+        
+        elif event.type in ['customer.subscription.created', 'customer.subscription.updated']:
+            await self._handle_subscription_created_or_updated(event, client)
+        
+        elif event.type == 'customer.subscription.deleted':
+            await self._handle_subscription_deleted(event, client)
+        
+        elif event.type in ['invoice.payment_succeeded', 'invoice.paid', 'invoice_payment.paid']:
+            await self._handle_invoice_payment_succeeded(event, client)
+        
+        elif event.type == 'invoice.payment_failed':
+            await self._handle_invoice_payment_failed(event, client)
+        
+        elif event.type == 'customer.subscription.trial_will_end':
+            await self._handle_trial_will_end(event, client)
+        
+        elif event.type in ['charge.refunded', 'payment_intent.refunded']:
+            await self._handle_refund(event, client)
+        
+        else:
+            logger.info(f"[WEBHOOK] Unhandled event type: {event.type}")
+    
+    async def _retrieve_subscription(self, subscription_id: str, expand: Optional[List[str]] = None):
+        """Retrieve a subscription, shared by every event in the current queue batch."""
+        memo = _subscription_memo.get()
+        key = (subscription_id, tuple(expand or ()))
+        if memo is not None:
+            # An expanded copy also serves plain lookups
+            cached = memo.get(key) or (memo.get((subscription_id, ('default_payment_method',))) if not expand else None)
+            if cached is not None:
+                return cached
+        
+        if expand:
+            subscription = await StripeAPIWrapper.safe_stripe_call(
+                stripe.Subscription.retrieve_async,
+                subscription_id,
+                expand=expand
+            )
+        else:
+            subscription = await StripeAPIWrapper.retrieve_subscription(subscription_id)
+        
+        if memo is not None:
+            memo[key] = subscription
+        return subscription
+    
+    @staticmethod
+    def _forget_subscription(subscription_id: str) -> None:
+        memo = _subscription_memo.get()
+        if memo is not None:
+            for key in [key for key in memo if key[0] == subscription_id]:
+                memo.pop(key, None)
+    
     async def _handle_checkout_session_completed(self, event, client):
         session = event.data.object
         logger.info(f"[WEBHOOK] Checkout session completed - ID: {session.get('id')}, Has subscription: {bool(session.get('subscription'))}, Metadata: {session.get('metadata', {})}")
@@ -213,7 +269,7 @@ class WebhookService:
             if trial_check.data and trial_check.data[0].get('trial_status') == 'active':
                 subscription_id = session.get('subscription')
                 if subscription_id:
-                    subscription = await StripeAPIWrapper.retrieve_subscription(subscription_id)
+                    subscription = await self._retrieve_subscription(subscription_id)
                     price_id = subscription['items']['data'][0]['price']['id'] if subscription.get('items') else None
                     tier_info = get_tier_by_price_id(price_id)
                     
@@ -237,11 +293,7 @@ class WebhookService:
             account_id = session['metadata'].get('account_id')
             if session.get('subscription'):
                 subscription_id = session['subscription']
-                subscription = await StripeAPIWrapper.safe_stripe_call(
-                    stripe.Subscription.retrieve_async, 
-                    subscription_id, 
-                    expand=['default_payment_method']
-                )
+                subscription = await self._retrieve_subscription(subscription_id, expand=['default_payment_method'])
 
                 price_id = subscription['items']['data'][0]['price']['id'] if subscription.get('items') else None
                 tier_info = get_tier_by_price_id(price_id)
@@ -290,7 +342,8 @@ class WebhookService:
                         amount=Decimal(str(tier_credits)),
                         is_expiring=True,
                         description=f"Converted from trial to {tier_info.display_name} plan",
-                        expires_at=expires_at
+                        expires_at=expires_at,
+                        lock=lock
                     )
                     
                     await client.from_('trial_history').update({
@@ -310,11 +363,7 @@ class WebhookService:
             account_id = session['metadata'].get('account_id')
             if session.get('subscription'):
                 subscription_id = session['subscription']
-                subscription = await StripeAPIWrapper.safe_stripe_call(
-                    stripe.Subscription.retrieve_async, 
-                    subscription_id, 
-                    expand=['default_payment_method']
-                )
+                subscription = await self._retrieve_subscription(subscription_id, expand=['default_payment_method'])
                 
                 if subscription.status == 'trialing':
                     lock_key = f"credit_grant:trial:{account_id}"
@@ -360,7 +409,8 @@ class WebhookService:
                             amount=TRIAL_CREDITS,
                             is_expiring=True,
                             description=f'{TRIAL_DURATION_DAYS}-day free trial credits',
-                            expires_at=trial_ends_at
+                            expires_at=trial_ends_at,
+                            lock=lock
                         )
 
                         await client.from_('trial_history').upsert({
@@ -380,11 +430,7 @@ class WebhookService:
         logger.info(f"[WEBHOOK CHECKOUT] Reached default handler section. Has subscription: {bool(session.get('subscription'))}")
         if session.get('subscription'):
             subscription_id = session['subscription']
-            subscription = await StripeAPIWrapper.safe_stripe_call(
-                stripe.Subscription.retrieve_async, 
-                subscription_id, 
-                expand=['default_payment_method']
-            )
+            subscription = await self._retrieve_subscription(subscription_id, expand=['default_payment_method'])
             
             logger.info(f"[WEBHOOK CHECKOUT DEFAULT] Subscription status: {subscription.status}")
             if subscription.status == 'active':
@@ -473,6 +519,7 @@ class WebhookService:
                             metadata={'account_id': account_id, 'trial_start': 'true'}
                         )
                         subscription['metadata'] = {'account_id': account_id, 'trial_start': 'true'}
+                        self._forget_subscription(subscription['id'])
                     except Exception as e:
                         logger.error(f"[WEBHOOK] Failed to update subscription metadata: {e}")
             
@@ -956,7 +1003,7 @@ class WebhookService:
                         account_id = customer_result.data[0]['account_id']
                         logger.info(f"[RENEWAL] Processing prorated upgrade for account {account_id}")
                         
-                        subscription = await StripeAPIWrapper.retrieve_subscription(subscription_id)
+                        subscription = await self._retrieve_subscription(subscription_id)
                         price_id = subscription['items']['data'][0]['price']['id'] if subscription.get('items') else None
                         
                         if price_id:
@@ -973,7 +1020,8 @@ class WebhookService:
                                         amount=tier_info.monthly_credits,
                                         is_expiring=True,
                                         description=f"Upgrade to {tier_info.display_name} tier",
-                                        stripe_event_id=stripe_event_id
+                                        stripe_event_id=stripe_event_id,
+                                        lock=lock
                                     )
                                     
                                     await client.from_('credit_accounts').update({
@@ -1027,7 +1075,7 @@ class WebhookService:
                     logger.info(f"[RENEWAL] Invoice {invoice_id} already processed, skipping")
                     return
                 
-                subscription = await StripeAPIWrapper.retrieve_subscription(subscription_id)
+                subscription = await self._retrieve_subscription(subscription_id)
                 subscription_status = subscription.get('status')
                 is_still_trialing = subscription_status == 'trialing'
                 
@@ -1092,7 +1140,8 @@ class WebhookService:
                         amount=Decimal(str(monthly_credits)),
                         is_expiring=True,
                         description=f"Initial subscription grant: {billing_reason}",
-                        stripe_event_id=stripe_event_id
+                        stripe_event_id=stripe_event_id,
+                        lock=lock
                     )
                     
                     update_data = {
@@ -1196,7 +1245,7 @@ class WebhookService:
             return
             
         try:
-            subscription = await StripeAPIWrapper.retrieve_subscription(subscription_id)
+            subscription = await self._retrieve_subscription(subscription_id)
             account_id = subscription.metadata.get('account_id')
             
             if not account_id:
@@ -1,4 +1,5 @@
 from .toolkit_service import ToolkitService, ToolkitInfo
+from .toolkit_catalog import ToolkitCatalog, get_toolkit_catalog
 from .auth_config_service import AuthConfigService, AuthConfig
 from .connected_account_service import ConnectedAccountService, ConnectedAccount
 from .mcp_server_service import MCPServerService, MCPServer, MCPUrlResponse
@@ -13,6 +14,8 @@ from .client import ComposioClient, get_composio_client
 __all__ = [
     "ToolkitService",
     "ToolkitInfo",
+    "ToolkitCatalog",
+    "get_toolkit_catalog",
     "AuthConfigService", 
     "AuthConfig",
     "ConnectedAccountService",
@@ -0,0 +1,394 @@
+"""
+Composio Toolkit Catalog
+
+Local index of Composio toolkits, categories, tools and icons.
+
+Catalog pages, search, icons and the integration dialogs used to call the
+synchronous Composio SDK from async request handlers on every request (and
+once per toolkit for icons). The catalog keeps one snapshot of the toolkit
+listing in memory, shares it between processes through Redis, refreshes it
+in the background, and serves listing, search and pagination from it.
+Per-toolkit details and tool lists are cached the same way on first use.
+Every SDK call runs in a dedicated thread pool so it never blocks the event
+loop.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from core.utils.logger import logger
+from .toolkit_service import DetailedToolkitInfo, ToolInfo, ToolkitInfo, ToolsListResponse
+
+CATALOG_CACHE_KEY = "composio:toolkit_catalog"
+# Snapshots older than this are refreshed in the background while still being served
+REFRESH_INTERVAL = 6 * 3600
+CATALOG_TTL = 24 * 3600
+DETAIL_TTL = 6 * 3600
+SDK_WORKERS = 8
+
+
+def _details_key(toolkit_slug: str, namespace: str = "") -> str:
+    return f"composio:toolkit_details{namespace}:{toolkit_slug}"
+
+
+def _tools_key(toolkit_slug: str, namespace: str = "") -> str:
+    return f"composio:toolkit_tools{namespace}:{toolkit_slug}"
+
+
+def _key_namespace(api_key: Optional[str]) -> str:
+    """Cache key suffix for catalogs read with a non-default API key."""
+    if not api_key:
+        return ""
+    return ":" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def paginate(items: List[Any], limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Offset pagination over a list.
+
+    Args:
+        items: Full result list
+        limit: Page size
+        cursor: Offset of the page as returned in next_cursor (None for the first page)
+
+    Returns:
+        Dict with items, total_items, total_pages, current_page and next_cursor
+    """
+    limit = max(1, int(limit))
+    offset = int(cursor) if cursor and str(cursor).isdigit() else 0
+    end = offset + limit
+    return {
+        "items": items[offset:end],
+        "total_items": len(items),
+        "total_pages": max(1, -(-len(items) // limit)),
+        "current_page": offset // limit + 1,
+        "next_cursor": str(end) if end < len(items) else None,
+    }
+
+
+@dataclass
+class CatalogSnapshot:
+    """One download of the toolkit listing."""
+    toolkits: List[ToolkitInfo]
+    icons: Dict[str, Optional[str]]
+    # Slugs per category, for categories that have been requested
+    categories: Dict[str, List[str]] = field(default_factory=dict)
+    refreshed_at: float = field(default_factory=time.time)
+    # Toolkits only returned by category fetches (not in the main listing)
+    extra_toolkits: List[ToolkitInfo] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.by_slug = {}
+        self.search_text = {}
+        self.add_toolkits(self.toolkits)
+        self.extra_toolkits = [toolkit for toolkit in self.extra_toolkits if self.add_toolkit(toolkit)]
+
+    def add_toolkit(self, toolkit: ToolkitInfo) -> bool:
+        """Index a toolkit; returns False if its slug is already known."""
+        if toolkit.slug in self.by_slug:
+            return False
+        self.by_slug[toolkit.slug] = toolkit
+        self.search_text[toolkit.slug] = (
+            toolkit.name.lower(),
+            (toolkit.description or "").lower(),
+            [tag.lower() for tag in toolkit.tags],
+        )
+        return True
+
+    def add_toolkits(self, toolkits: List[ToolkitInfo]):
+        for toolkit in toolkits:
+            self.add_toolkit(toolkit)
+
+    def add_category(self, category: str, toolkits: List[ToolkitInfo]):
+        """Record a category's toolkits, keeping the ones missing from the listing."""
+        self.categories[category] = [toolkit.slug for toolkit in toolkits]
+        self.extra_toolkits += [toolkit for toolkit in toolkits if self.add_toolkit(toolkit)]
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.refreshed_at
+
+    def to_cache(self) -> Dict[str, Any]:
+        return {
+            "toolkits": [toolkit.model_dump() for toolkit in self.toolkits],
+            "icons": self.icons,
+            "categories": self.categories,
+            "refreshed_at": self.refreshed_at,
+            "extra_toolkits": [toolkit.model_dump() for toolkit in self.extra_toolkits],
+        }
+
+    @classmethod
+    def from_cache(cls, data: Dict[str, Any]) -> "CatalogSnapshot":
+        return cls(
+            toolkits=[ToolkitInfo(**toolkit) for toolkit in data["toolkits"]],
+            icons=data.get("icons", {}),
+            categories=data.get("categories", {}),
+            refreshed_at=data.get("refreshed_at", 0),
+            extra_toolkits=[ToolkitInfo(**toolkit) for toolkit in data.get("extra_toolkits", [])],
+        )
+
+
+class ToolkitCatalog:
+    """
+    In-memory toolkit catalog backed by Redis and the Composio SDK.
+
+    Features:
+    - Listing, search and pagination served from one snapshot
+    - Snapshot shared through Redis; stale snapshots are served while a background refresh runs
+    - Concurrent cold requests share a single download
+    - Per-toolkit details and tool lists cached in memory and Redis
+    - SDK calls run in a thread pool
+    - One catalog (and cache namespace) per Composio API key
+    """
+
+    def __init__(
+        self,
+        source_factory: Optional[Callable[[], Any]] = None,
+        refresh_interval: float = REFRESH_INTERVAL,
+        use_redis: bool = True,
+        api_key: Optional[str] = None,
+    ):
+        """
+        Args:
+            source_factory: Returns the object with the blocking fetch_* SDK calls (default: ToolkitService)
+            refresh_interval: Seconds after which the snapshot is refreshed
+            use_redis: Share snapshots and per-toolkit data through Redis
+            api_key: Composio API key the catalog is read with (None for the default key)
+        """
+        self._source_factory = source_factory
+        self.api_key = api_key
+        self._namespace = _key_namespace(api_key)
+        self._catalog_key = CATALOG_CACHE_KEY + self._namespace
+        self._source = None
+        self.refresh_interval = refresh_interval
+        self.use_redis = use_redis
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._details: Dict[str, tuple] = {}
+        self._tools: Dict[str, tuple] = {}
+        self._executor = ThreadPoolExecutor(max_workers=SDK_WORKERS, thread_name_prefix="composio-sdk")
+        self.stats = {"sdk_calls": 0, "refreshes": 0, "redis_hits": 0}
+
+    @property
+    def source(self):
+        if self._source is None:
+            if self._source_factory is not None:
+                self._source = self._source_factory()
+            else:
+                from .toolkit_service import ToolkitService
+                self._source = ToolkitService(self.api_key, catalog=self)
+        return self._source
+
+    async def _call_sdk(self, method_name: str, *args):
+        self.stats["sdk_calls"] += 1
+        method = getattr(self.source, method_name)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+
+    async def _cache_get(self, key: str):
+        if not self.use_redis:
+            return None
+        try:
+            from core.utils.cache import Cache
+            return await Cache.get(key)
+        except Exception as e:
+            logger.debug(f"Toolkit catalog cache read failed for {key}: {e}")
+            return None
+
+    async def _cache_set(self, key: str, value: Any, ttl: int):
+        if not self.use_redis:
+            return
+        try:
+            from core.utils.cache import Cache
+            await Cache.set(key, value, ttl=ttl)
+        except Exception as e:
+            logger.debug(f"Toolkit catalog cache write failed for {key}: {e}")
+
+    # --- Snapshot -------------------------------------------------------------
+
+    async def snapshot(self) -> CatalogSnapshot:
+        """Current snapshot; loads it on first use and schedules a refresh when stale."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await self.refresh(prefer_cache=True)
+        if snapshot.age >= self.refresh_interval:
+            self._schedule_refresh()
+        return snapshot
+
+    async def refresh(self, prefer_cache: bool = False) -> CatalogSnapshot:
+        """
+        Replace the snapshot.
+
+        Args:
+            prefer_cache: Use a fresh enough snapshot from memory or Redis instead of calling the SDK
+
+        Returns:
+            The new snapshot
+        """
+        async with self._refresh_lock:
+            if prefer_cache:
+                if self._snapshot is not None:
+                    return self._snapshot
+                cached = await self._cache_get(self._catalog_key)
+                if cached:
+                    snapshot = CatalogSnapshot.from_cache(cached)
+                    if snapshot.age < self.refresh_interval:
+                        self.stats["redis_hits"] += 1
+                        self._snapshot = snapshot
+                        logger.debug(f"Loaded toolkit catalog from cache: {len(snapshot.toolkits)} toolkits")
+                        return snapshot
+
+            previous = self._snapshot
+            start = time.perf_counter()
+            try:
+                toolkits, icons = await self._call_sdk("fetch_toolkits")
+                snapshot = CatalogSnapshot(toolkits=toolkits, icons=icons)
+                for category in (previous.categories if previous else {}):
+                    category_toolkits, _ = await self._call_sdk("fetch_toolkits", category)
+                    snapshot.add_category(category, category_toolkits)
+            except Exception as e:
+                if previous is not None:
+                    logger.warning(f"Toolkit catalog refresh failed, serving previous snapshot: {e}")
+                    return previous
+                raise
+
+            self._snapshot = snapshot
+            self.stats["refreshes"] += 1
+            await self._cache_set(self._catalog_key, snapshot.to_cache(), ttl=CATALOG_TTL)
+            logger.info(
+                f"📚 Refreshed Composio toolkit catalog: {len(toolkits)} toolkits "
+                f"in {(time.perf_counter() - start) * 1000:.0f}ms"
+            )
+            return snapshot
+
+    def _schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_in_background())
+
+    async def _refresh_in_background(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Background toolkit catalog refresh failed: {e}")
+
+    def start(self):
+        """Warm the catalog and keep refreshing it in the background."""
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        for task in (self._loop_task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
+        self._loop_task = self._refresh_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                snapshot = await self.snapshot()
+                await asyncio.sleep(max(1.0, self.refresh_interval - snapshot.age))
+                # Another process may have refreshed the shared snapshot meanwhile
+                cached = await self._cache_get(self._catalog_key)
+                if cached and cached.get("refreshed_at", 0) > snapshot.refreshed_at:
+                    self._snapshot = CatalogSnapshot.from_cache(cached)
+                    self.stats["redis_hits"] += 1
+                else:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Toolkit catalog refresh loop error: {e}")
+                await asyncio.sleep(60)
+
+    async def _category_toolkits(self, snapshot: CatalogSnapshot, category: str) -> List[ToolkitInfo]:
+        slugs = snapshot.categories.get(category)
+        if slugs is None:
+            category_toolkits, _ = await self._call_sdk("fetch_toolkits", category)
+            snapshot.add_category(category, category_toolkits)
+            slugs = snapshot.categories[category]
+            await self._cache_set(self._catalog_key, snapshot.to_cache(), ttl=CATALOG_TTL)
+        return [snapshot.by_slug[slug] for slug in slugs if slug in snapshot.by_slug]
+
+    # --- Queries --------------------------------------------------------------
+
+    async def list_toolkits(self, limit: int = 500, cursor: Optional[str] = None, category: Optional[str] = None) -> Dict[str, Any]:
+        snapshot = await self.snapshot()
+        toolkits = await self._category_toolkits(snapshot, category) if category else snapshot.toolkits
+        return paginate(toolkits, limit, cursor)
+
+    async def search_toolkits(self, query: str, category: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Substring search over toolkit names, descriptions and tags, name matches first."""
+        snapshot = await self.snapshot()
+        toolkits = await self._category_toolkits(snapshot, category) if category else snapshot.toolkits
+        query_lower = query.lower()
+
+        name_matches, other_matches = [], []
+        for toolkit in toolkits:
+            name, description, tags = snapshot.search_text.get(toolkit.slug) or (
+                toolkit.name.lower(), (toolkit.description or "").lower(), [tag.lower() for tag in toolkit.tags]
+            )
+            if query_lower in name:
+                name_matches.append(toolkit)
+            elif query_lower in description or any(query_lower in tag for tag in tags):
+                other_matches.append(toolkit)
+        return paginate(name_matches + other_matches, limit, cursor)
+
+    async def get_toolkit(self, toolkit_slug: str) -> Optional[ToolkitInfo]:
+        snapshot = await self.snapshot()
+        return snapshot.by_slug.get(toolkit_slug)
+
+    async def get_icon(self, toolkit_slug: str) -> Optional[str]:
+        """Logo URL from the snapshot; toolkits missing from the listing are retrieved once."""
+        snapshot = await self.snapshot()
+        if toolkit_slug not in snapshot.icons:
+            snapshot.icons[toolkit_slug] = await self._call_sdk("fetch_toolkit_icon", toolkit_slug)
+        return snapshot.icons[toolkit_slug]
+
+    async def _cached_entry(self, memory: Dict[str, tuple], key: str, toolkit_slug: str, method_name: str, decode, encode):
+        entry = memory.get(toolkit_slug)
+        if entry and time.time() - entry[0] < DETAIL_TTL:
+            return entry[1]
+
+        cached = await self._cache_get(key)
+        if cached is not None:
+            value = decode(cached)
+            self.stats["redis_hits"] += 1
+        else:
+            value = await self._call_sdk(method_name, toolkit_slug)
+            await self._cache_set(key, encode(value), ttl=DETAIL_TTL)
+        memory[toolkit_slug] = (time.time(), value)
+        return value
+
+    async def get_detailed_toolkit_info(self, toolkit_slug: str) -> DetailedToolkitInfo:
+        return await self._cached_entry(
+            self._details, _details_key(toolkit_slug, self._namespace), toolkit_slug, "fetch_detailed_toolkit_info",
+            decode=lambda data: DetailedToolkitInfo(**data),
+            encode=lambda info: info.model_dump(),
+        )
+
+    async def get_toolkit_tools(self, toolkit_slug: str, limit: int = 50, cursor: Optional[str] = None) -> ToolsListResponse:
+        tools = await self._cached_entry(
+            self._tools, _tools_key(toolkit_slug, self._namespace), toolkit_slug, "fetch_toolkit_tools",
+            decode=lambda data: [ToolInfo(**tool) for tool in data],
+            encode=lambda items: [tool.model_dump() for tool in items],
+        )
+        return ToolsListResponse(**paginate(tools, limit, cursor))
+
+
+# One instance per API key (None is the default COMPOSIO_API_KEY)
+_toolkit_catalog_instances: Dict[Optional[str], ToolkitCatalog] = {}
+
+
+def get_toolkit_catalog(api_key: Optional[str] = None) -> ToolkitCatalog:
+    """Get the ToolkitCatalog instance for an API key (the shared one for the default key)"""
+    if api_key == os.getenv("COMPOSIO_API_KEY"):
+        api_key = None
+    catalog = _toolkit_catalog_instances.get(api_key)
+    if catalog is None:
+        catalog = _toolkit_catalog_instances[api_key] = ToolkitCatalog(api_key=api_key)
+    return catalog
@@ -4,9 +4,10 @@ Phase 2 Task 2.1.3
 
 Manages prompt modules with version control and dynamic loading.
 """
+import time
 from enum import Enum
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from core.utils.logger import logger
 
@@ -39,6 +40,16 @@ class ModuleConfig:
     cache_eligible: bool
 
 
+@dataclass
+class AssembledPrompt:
+    """A prompt assembled from modules, with what it took to build it"""
+    content: str
+    modules: Tuple[str, ...]
+    tokens: int
+    cache_hit: bool
+    build_ms: float
+
+
 class ModularPromptBuilder:
     """
     Builds prompts from modular components.
@@ -48,7 +59,7 @@ class ModularPromptBuilder:
     - Combine modules dynamically
     - Track module usage
     - Support versioning
-    - Cache-aware
+    - Cache-aware (fixed module order, assembled prompts memoized per module set)
     """
     
     def __init__(self, modules_dir: Optional[Path] = None):
@@ -66,6 +77,11 @@ class ModularPromptBuilder:
         
         self.modules: Dict[PromptModule, ModuleConfig] = {}
         self._load_all_modules()
+
+        # (ordered modules, strip_xml_examples) -> (content, tokens)
+        self._assembled: Dict[Tuple[Tuple[PromptModule, ...], bool], Tuple[str, int]] = {}
+        self._token_counts: Dict[str, int] = {}
+        self.stats = {"assembled": 0, "cache_hits": 0}
         
         logger.info(f"📦 ModularPromptBuilder initialized: {len(self.modules)} modules loaded")
     
@@ -104,6 +120,80 @@ class ModularPromptBuilder:
             except Exception as e:
                 logger.error(f"❌ Failed to load module {module.value}: {e}")
     
+    def _ordered_modules(self, modules_needed: Optional[List[PromptModule]]) -> Tuple[PromptModule, ...]:
+        """
+        Resolve the modules to include, in a fixed order.
+
+        Always-loaded core and response modules come first and conditional
+        modules follow, each group in PromptModule declaration order, so the
+        same module set always produces the same text and the core prefix
+        stays identical across module sets (prompt-cache friendly).
+        """
+        always = [m for m in PromptModule if m in self.modules and self.modules[m].always_load]
+        if modules_needed:
+            wanted = set(m for m in modules_needed if isinstance(m, PromptModule))
+            conditional = [m for m in PromptModule if m in wanted and m in self.modules and not self.modules[m].always_load]
+        else:
+            conditional = [m for m in PromptModule if m in self.modules and not self.modules[m].always_load]
+        return tuple(always + conditional)
+
+    def count_tokens(self, text: str) -> int:
+        """Count (and memoize) the tokens of a prompt text."""
+        tokens = self._token_counts.get(text)
+        if tokens is None:
+            try:
+                from litellm import token_counter
+                tokens = token_counter(model="gpt-4o", text=text)
+            except Exception:
+                tokens = len(text) // 4
+            self._token_counts[text] = tokens
+        return tokens
+
+    def assemble(
+        self,
+        modules_needed: Optional[List[PromptModule]] = None,
+        strip_xml_examples: bool = False
+    ) -> AssembledPrompt:
+        """
+        Assemble a prompt from modules, memoized per module set.
+
+        Args:
+            modules_needed: Conditional modules to include (None = all modules)
+            strip_xml_examples: Remove XML tool calling examples (native tool calling)
+
+        Returns:
+            AssembledPrompt with the content, modules, token count and cache status
+        """
+        start = time.perf_counter()
+        modules = self._ordered_modules(modules_needed)
+        key = (modules, strip_xml_examples)
+
+        cached = self._assembled.get(key)
+        cache_hit = cached is not None
+        if cached is None:
+            context = {'native_tool_calling': True} if strip_xml_examples else None
+            parts = []
+            for module in modules:
+                content = self.modules[module].content
+                if context:
+                    content = self._apply_context_modifications(module, content, context)
+                parts.append(content)
+            combined = "\n\n".join(parts)
+            cached = (combined, self.count_tokens(combined))
+            self._assembled[key] = cached
+            self.stats["assembled"] += 1
+        else:
+            self.stats["cache_hits"] += 1
+
+        content, tokens = cached
+        return AssembledPrompt(
+            content=content,
+            modules=tuple(m.value for m in modules),
+            tokens=tokens,
+            cache_hit=cache_hit,
+            build_ms=(time.perf_counter() - start) * 1000
+        )
+
     def build_prompt(
         self,
         modules_needed: Optional[List[PromptModule]] = None,
@@ -121,48 +211,13 @@ class ModularPromptBuilder:
         Returns:
             Combined prompt string
         """
-        parts = []
-        modules_used = []
-
-        # Always load core and response modules
-        for module in PromptModule:
-            if module in self.modules and self.modules[module].always_load:
-                content = self.modules[module].content
-
-                # Apply context-aware modifications
-                if context:
-                    content = self._apply_context_modifications(module, content, context)
-
-                parts.append(content)
-                modules_used.append(module.value)
-
-        # Load conditional modules if specified
-        if modules_needed:
-            for module in modules_needed:
-                if module in self.modules and not self.modules[module].always_load:
-                    content = self.modules[module].content
-
-                    # Apply context-aware modifications
-                    if context:
-                        content = self._apply_context_modifications(module, content, context)
-
-                    parts.append(content)
-                    modules_used.append(module.value)
-        else:
-            # If no modules specified, load all
-            for module in PromptModule:
-                if module in self.modules and not self.modules[module].always_load:
-                    content = self.modules[module].content
-
-                    # Apply context-aware modifications
-                    if context:
-                        content = self._apply_context_modifications(module, content, context)
-
-                    parts.append(content)
-                    modules_used.append(module.value)
+        strip_xml_examples = bool(context) and context.get('native_tool_calling', True)
+        assembled = self.assemble(modules_needed, strip_xml_examples=strip_xml_examples)
+        if assembled.cache_hit:
+            return assembled.content
 
-        # Combine parts
-        combined = "\n\n".join(parts)
+        combined = assembled.content
+        modules_used = list(assembled.modules)
 
         # Log module usage
         native_mode = context.get('native_tool_calling', True) if context else True
@@ -4,146 +4,270 @@ Phase 3.2 - Optional Upgrade
 
 Uses semantic similarity for intelligent module selection.
 
+Module embeddings are precomputed and stored as a versioned .npy artifact
+under core/prompts/embeddings/ (see precompute_module_embeddings), so
+constructing the router does not load the SentenceTransformer model. The
+model is loaded on the first query that misses the query-embedding cache.
+
 Author: Winston (Architect)
 Date: 2025-10-01
 """
 
-from typing import List, Dict
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import structlog
 
 from .router import DynamicPromptRouter, PromptModule
 
 logger = structlog.get_logger(__name__)
 
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDINGS_DIR = Path(__file__).parent / "embeddings"
+# Bump when the artifact layout changes; descriptions and model are part of the version too
+EMBEDDINGS_FORMAT_VERSION = 1
+QUERY_CACHE_SIZE = 1024
+ENCODE_BATCH_SIZE = 64
+
+# OPTION 4: Fine-tuned rich descriptions for better semantic matching
+MODULE_DESCRIPTIONS: Dict[PromptModule, str] = {
+    PromptModule.TOOL_TOOLKIT:
+        # File operations
+        "file operations: create file, edit file, read file, write file, delete file, "
+        "list files, move file, copy file, rename file, find file, search files, "
+        "file permissions, file size, file exists, file structure, directory operations, "
+        "folder management, path operations, symbolic links, file compression, archive, "
+        # Web browsing
+        "web browsing: navigate web, search web, fetch url, download file, upload file, "
+        "scrape website, web content, http requests, api calls, "
+        # Terminal & system
+        "terminal commands: shell commands, execute command, run script, bash, zsh, "
+        "system operations, process management, environment variables, "
+        # Visual & media
+        "screenshots: capture screen, take screenshot, image operations, visual content, "
+        "media files, image processing, thumbnails",
+
+    PromptModule.TOOL_DATA_PROCESSING:
+        # Data formats
+        "data processing: parse data, extract data, transform data, clean data, "
+        "csv files, json data, xml data, yaml data, excel files, spreadsheets, "
+        # Database operations
+        "database: query database, sql, database operations, data storage, "
+        "tables, records, database migration, backup database, "
+        # Data analysis
+        "data analysis: analyze data, statistics, metrics, aggregation, "
+        "filter data, sort data, group data, join data, merge data, "
+        # Data transformation
+        "data transformation: convert format, reshape data, pivot data, "
+        "normalize data, encode data, serialize data, compress data, "
+        # Data quality
+        "data quality: validate data, check integrity, deduplicate, "
+        "handle missing values, outliers, anomalies",
+
+    PromptModule.TOOL_WORKFLOW:
+        # Task management
+        "task management: organize tasks, create tasks, schedule tasks, "
+        "prioritize work, track progress, manage deadlines, todo lists, "
+        # Project management
+        "project management: project setup, project planning, roadmap, timeline, "
+        "milestones, sprints, backlog, agile, scrum, kanban, "
+        # Workflow & processes
+        "workflow: define workflow, process steps, automation, pipeline, "
+        "ci/cd, continuous integration, deployment pipeline, "
+        # Development operations
+        "development: initialize project, bootstrap, scaffold, setup environment, "
+        "configure settings, install dependencies, build project, compile, "
+        # Deployment & infrastructure
+        "deployment: deploy application, release version, rollback, "
+        "infrastructure, provision resources, scale services, load balancing, "
+        # Monitoring & maintenance
+        "monitoring: monitor metrics, logging, alerts, diagnostics, troubleshooting, "
+        "performance optimization, health checks",
+
+    PromptModule.TOOL_CONTENT_CREATION:
+        # Writing & composition
+        "writing: write content, compose text, draft document, create article, "
+        "write blog post, write essay, write story, write script, write copy, "
+        # Documentation
+        "documentation: write documentation, create readme, write guide, "
+        "write tutorial, api documentation, user manual, help docs, "
+        # Business content
+        "business writing: write report, write proposal, write email, "
+        "write letter, write announcement, press release, newsletter, "
+        # Marketing content
+        "marketing: write marketing content, ad copy, product description, "
+        "social media post, tweet, linkedin post, instagram caption, "
+        "seo content, landing page, call-to-action, "
+        # Creative content
+        "creative writing: blog title, headline, meta description, keywords, "
+        "captions, alt text, image descriptions, video scripts, podcast notes, "
+        # Technical writing
+        "technical writing: code comments, docstrings, changelog, release notes, "
+        "error messages, tooltips, ui text, form labels, validation messages"
+}
+
+
+def embeddings_version(model_name: str = DEFAULT_MODEL_NAME) -> str:
+    """Version of the module embeddings: changes with the model, the descriptions or the format."""
+    digest = hashlib.sha256(f"{EMBEDDINGS_FORMAT_VERSION}:{model_name}".encode())
+    for module, description in MODULE_DESCRIPTIONS.items():
+        digest.update(f"\n{module.value}={description}".encode())
+    return digest.hexdigest()[:12]
+
+
+def embeddings_path(model_name: str = DEFAULT_MODEL_NAME, embeddings_dir: Optional[Path] = None) -> Path:
+    """Path of the .npy artifact holding the module embeddings for a model."""
+    safe_name = model_name.replace('/', '_')
+    return (embeddings_dir or EMBEDDINGS_DIR) / f"module_embeddings-{safe_name}-{embeddings_version(model_name)}.npy"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _load_sentence_transformer(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
 
 class SemanticPromptRouter(DynamicPromptRouter):
     """
     Semantic similarity-based router.
-    
+
     Upgrades keyword-based routing with semantic understanding.
     Falls back to keyword matching if semantic fails.
-    
+
     Performance:
-    - Model: all-MiniLM-L6-v2 (90MB)
-    - Routing time: 50-100ms
+    - Model: all-MiniLM-L6-v2 (90MB), loaded on the first uncached query
+    - Module embeddings: precomputed .npy artifact (no model needed at startup)
+    - Query embeddings: LRU cached; route_batch encodes many queries in one call
     - Accuracy: 40-50% cost reduction (vs 21.1% keyword-based)
     """
-    
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        embeddings_dir: Optional[Path] = None,
+        query_cache_size: int = QUERY_CACHE_SIZE,
+        model_loader: Optional[Callable[[str], Any]] = None
+    ):
         """
         Initialize semantic router.
-        
+
         Args:
             model_name: SentenceTransformer model to use
+            embeddings_dir: Directory holding precomputed module embeddings
+            query_cache_size: Number of query embeddings kept in the LRU cache
+            model_loader: Loads the encoder for a model name (default: SentenceTransformer)
         """
         super().__init__()
-        
-        # Load semantic model
-        logger.info(f"🧠 Loading SentenceTransformer model: {model_name}")
-        self.model = SentenceTransformer(model_name)
-        
-        # Compute module embeddings
-        self.module_embeddings = self._compute_module_embeddings()
-        
-        logger.info(f"🧠 SemanticPromptRouter initialized with {model_name}")
-    
-    def _compute_module_embeddings(self) -> Dict[PromptModule, np.ndarray]:
+
+        self.model_name = model_name
+        self.embeddings_path = embeddings_path(model_name, embeddings_dir)
+        self.modules = list(MODULE_DESCRIPTIONS)
+        self.query_cache_size = query_cache_size
+        self._model_loader = model_loader or _load_sentence_transformer
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.stats = {"query_cache_hits": 0, "query_cache_misses": 0, "encoder_calls": 0, "model_load_ms": None}
+
+        # Precomputed module embeddings (one normalized row per module), if available
+        self._module_matrix = self._load_module_embeddings()
+
+        logger.info(
+            f"🧠 SemanticPromptRouter initialized with {model_name}",
+            precomputed_embeddings=self._module_matrix is not None
+        )
+
+    def _load_module_embeddings(self) -> Optional[np.ndarray]:
+        """Load the module embeddings artifact for this model version, if it exists."""
+        try:
+            matrix = np.load(self.embeddings_path)
+        except FileNotFoundError:
+            logger.info(f"📊 No precomputed module embeddings at {self.embeddings_path.name}, computing on first query")
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to load module embeddings from {self.embeddings_path}: {e}")
+            return None
+
+        if matrix.ndim != 2 or matrix.shape[0] != len(self.modules):
+            logger.warning(f"Ignoring module embeddings with unexpected shape {matrix.shape}")
+            return None
+        return _normalize(matrix)
+
+    @property
+    def model(self):
+        """The sentence encoder, loaded on first use."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    logger.info(f"🧠 Loading SentenceTransformer model: {self.model_name}")
+                    self._model = self._model_loader(self.model_name)
+                    self.stats["model_load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        self.stats["encoder_calls"] += 1
+        return _normalize(self.model.encode(texts, batch_size=ENCODE_BATCH_SIZE))
+
+    @property
+    def module_embeddings(self) -> Dict[PromptModule, np.ndarray]:
+        """Normalized embedding for each module."""
+        return dict(zip(self.modules, self._get_module_matrix()))
+
+    def _get_module_matrix(self) -> np.ndarray:
+        if self._module_matrix is None:
+            self._module_matrix = self._encode([MODULE_DESCRIPTIONS[m] for m in self.modules])
+            logger.info(f"📊 Computed embeddings for {len(self.modules)} modules")
+        return self._module_matrix
+
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
         """
-        Compute embeddings for each module.
-        
+        Embed queries through the LRU cache, encoding all misses in one call.
+
+        Args:
+            queries: Query strings
+
         Returns:
-            Dictionary mapping modules to embeddings
+            Array of normalized embeddings, one row per query
         """
-        # OPTION 4: Fine-tuned rich descriptions for better semantic matching
-        module_descriptions = {
-            PromptModule.TOOL_TOOLKIT:
-                # File operations
-                "file operations: create file, edit file, read file, write file, delete file, "
-                "list files, move file, copy file, rename file, find file, search files, "
-                "file permissions, file size, file exists, file structure, directory operations, "
-                "folder management, path operations, symbolic links, file compression, archive, "
-                # Web browsing
-                "web browsing: navigate web, search web, fetch url, download file, upload file, "
-                "scrape website, web content, http requests, api calls, "
-                # Terminal & system
-                "terminal commands: shell commands, execute command, run script, bash, zsh, "
-                "system operations, process management, environment variables, "
-                # Visual & media
-                "screenshots: capture screen, take screenshot, image operations, visual content, "
-                "media files, image processing, thumbnails",
-
-            PromptModule.TOOL_DATA_PROCESSING:
-                # Data formats
-                "data processing: parse data, extract data, transform data, clean data, "
-                "csv files, json data, xml data, yaml data, excel files, spreadsheets, "
-                # Database operations
-                "database: query database, sql, database operations, data storage, "
-                "tables, records, database migration, backup database, "
-                # Data analysis
-                "data analysis: analyze data, statistics, metrics, aggregation, "
-                "filter data, sort data, group data, join data, merge data, "
-                # Data transformation
-                "data transformation: convert format, reshape data, pivot data, "
-                "normalize data, encode data, serialize data, compress data, "
-                # Data quality
-                "data quality: validate data, check integrity, deduplicate, "
-                "handle missing values, outliers, anomalies",
-
-            PromptModule.TOOL_WORKFLOW:
-                # Task management
-                "task management: organize tasks, create tasks, schedule tasks, "
-                "prioritize work, track progress, manage deadlines, todo lists, "
-                # Project management
-                "project management: project setup, project planning, roadmap, timeline, "
-                "milestones, sprints, backlog, agile, scrum, kanban, "
-                # Workflow & processes
-                "workflow: define workflow, process steps, automation, pipeline, "
-                "ci/cd, continuous integration, deployment pipeline, "
-                # Development operations
-                "development: initialize project, bootstrap, scaffold, setup environment, "
-                "configure settings, install dependencies, build project, compile, "
-                # Deployment & infrastructure
-                "deployment: deploy application, release version, rollback, "
-                "infrastructure, provision resources, scale services, load balancing, "
-                # Monitoring & maintenance
-                "monitoring: monitor metrics, logging, alerts, diagnostics, troubleshooting, "
-                "performance optimization, health checks",
-
-            PromptModule.TOOL_CONTENT_CREATION:
-                # Writing & composition
-                "writing: write content, compose text, draft document, create article, "
-                "write blog post, write essay, write story, write script, write copy, "
-                # Documentation
-                "documentation: write documentation, create readme, write guide, "
-                "write tutorial, api documentation, user manual, help docs, "
-                # Business content
-                "business writing: write report, write proposal, write email, "
-                "write letter, write announcement, press release, newsletter, "
-                # Marketing content
-                "marketing: write marketing content, ad copy, product description, "
-                "social media post, tweet, linkedin post, instagram caption, "
-                "seo content, landing page, call-to-action, "
-                # Creative content
-                "creative writing: blog title, headline, meta description, keywords, "
-                "captions, alt text, image descriptions, video scripts, podcast notes, "
-                # Technical writing
-                "technical writing: code comments, docstrings, changelog, release notes, "
-                "error messages, tooltips, ui text, form labels, validation messages"
-        }
-        
-        embeddings = {}
-        for module, description in module_descriptions.items():
-            embedding = self.model.encode(description)
-            embeddings[module] = embedding
-            logger.debug(f"📊 Computed embedding for {module.value}: shape={embedding.shape}")
-        
-        logger.info(f"📊 Computed embeddings for {len(embeddings)} modules")
-        
+        missing = {}
+        for query in queries:
+            if query in self._query_cache:
+                self._query_cache.move_to_end(query)
+                self.stats["query_cache_hits"] += 1
+            else:
+                missing[query] = None
+        missing = list(missing)
+
+        if missing:
+            self.stats["query_cache_misses"] += len(missing)
+            for query, embedding in zip(missing, self._encode(missing)):
+                embedding.setflags(write=False)
+                self._query_cache[query] = embedding
+
+        embeddings = np.stack([self._query_cache[query] for query in queries])
+        while len(self._query_cache) > self.query_cache_size:
+            self._query_cache.popitem(last=False)
         return embeddings
-    
+
+    def embed_query(self, user_query: str) -> np.ndarray:
+        """Embed a single query (LRU cached)."""
+        return self.embed_queries([user_query])[0]
+
+    def _similarities(self, query_embedding: np.ndarray) -> Dict[PromptModule, float]:
+        scores = self._get_module_matrix() @ query_embedding
+        return {module: float(score) for module, score in zip(self.modules, scores)}
+
     def route(self, user_query: str, threshold: float = 0.3, use_hybrid: bool = True) -> List[PromptModule]:
         """
         Route query using semantic similarity with hybrid keyword fallback.
@@ -157,133 +281,172 @@ class SemanticPromptRouter(DynamicPromptRouter):
             List of modules to include
         """
         try:
-            # Always include core modules
-            modules = [
-                PromptModule.CORE_IDENTITY,
-                PromptModule.CORE_WORKSPACE,
-                PromptModule.CORE_CRITICAL_RULES,
-                PromptModule.RESPONSE_FORMAT
-            ]
-
-            # Get query embedding
-            query_embedding = self.model.encode(user_query)
-
-            # Calculate similarity with each module
-            similarities = {}
-            semantic_modules = []
-            for module, module_embedding in self.module_embeddings.items():
-                similarity = cosine_similarity(
-                    query_embedding.reshape(1, -1),
-                    module_embedding.reshape(1, -1)
-                )[0][0]
-                similarities[module] = similarity
-
-                if similarity >= threshold:
-                    semantic_modules.append(module)
-                    logger.debug(
-                        f"🎯 Semantic match: {module.value}",
-                        similarity=f"{similarity:.3f}",
-                        threshold=threshold
-                    )
-
-            # Hybrid approach: combine semantic + keyword
-            if use_hybrid:
-                # Get keyword matches
-                keyword_modules = super().route(user_query)
-                keyword_tool_modules = [m for m in keyword_modules if m.value.startswith("tools/")]
-
-                # Combine: semantic OR keyword (union)
-                all_tool_modules = list(set(semantic_modules + keyword_tool_modules))
-                modules.extend(all_tool_modules)
-
-                logger.info(
-                    f"🔀 Hybrid routing: {len(semantic_modules)} semantic + {len(keyword_tool_modules)} keyword = {len(all_tool_modules)} total",
-                    semantic=[m.value for m in semantic_modules],
-                    keyword=[m.value for m in keyword_tool_modules],
-                    final=[m.value for m in all_tool_modules]
-                )
-            else:
-                # Pure semantic: use only semantic matches
-                modules.extend(semantic_modules)
-
-                # Fallback: if no tool modules selected, use keyword routing
-                if not semantic_modules:
-                    logger.info("🔄 No semantic matches, falling back to keyword routing")
-                    return super().route(user_query)
-            
-            # Log routing decision
-            logger.info(
-                f"🧠 Semantic routing: {len(modules)} modules selected",
-                query_preview=user_query[:100],
-                modules=[m.value for m in modules],
-                threshold=threshold,
-                top_similarities={
-                    m.value: f"{s:.3f}" 
-                    for m, s in sorted(
-                        similarities.items(), 
-                        key=lambda x: x[1], 
-                        reverse=True
-                    )[:3]
-                }
-            )
-            
-            # Log to GlitchTip
-            try:
-                import sentry_sdk
-                sentry_sdk.set_context("semantic_routing", {
-                    "query_length": len(user_query),
-                    "query_preview": user_query[:200],
-                    "modules_selected": [m.value for m in modules],
-                    "module_count": len(modules),
-                    "similarities": {m.value: float(s) for m, s in similarities.items()},
-                    "threshold": threshold
-                })
-                sentry_sdk.capture_message(
-                    f"Semantic routing: {len(modules)} modules, avg similarity {np.mean(list(similarities.values())):.2f}",
-                    level="info"
-                )
-            except Exception as e:
-                logger.warning(f"Failed to log semantic routing to GlitchTip: {e}")
-            
-            return modules
-            
+            similarities = self._similarities(self.embed_query(user_query))
+            return self._route_with_similarities(user_query, similarities, threshold, use_hybrid)
         except Exception as e:
             logger.error(f"❌ Semantic routing failed: {e}", exc_info=True)
-            
+
             # Fallback to keyword routing
             logger.info("🔄 Falling back to keyword routing due to error")
             return super().route(user_query)
-    
+
+    def route_batch(self, user_queries: Sequence[str], threshold: float = 0.3, use_hybrid: bool = True) -> List[List[PromptModule]]:
+        """
+        Route many queries with a single encoder call for the uncached ones.
+
+        Args:
+            user_queries: User query strings
+            threshold: Similarity threshold (0-1)
+            use_hybrid: If True, combine semantic + keyword results
+
+        Returns:
+            List of module lists, in the order of the queries
+        """
+        if not user_queries:
+            return []
+        try:
+            embeddings = self.embed_queries(user_queries)
+        except Exception as e:
+            logger.error(f"❌ Semantic batch routing failed: {e}", exc_info=True)
+            logger.info("🔄 Falling back to keyword routing due to error")
+            return [DynamicPromptRouter.route(self, query) for query in user_queries]
+
+        return [
+            self._route_with_similarities(query, self._similarities(embedding), threshold, use_hybrid)
+            for query, embedding in zip(user_queries, embeddings)
+        ]
+
+    def _route_with_similarities(
+        self,
+        user_query: str,
+        similarities: Dict[PromptModule, float],
+        threshold: float,
+        use_hybrid: bool
+    ) -> List[PromptModule]:
+        # Always include core modules
+        modules = [
+            PromptModule.CORE_IDENTITY,
+            PromptModule.CORE_WORKSPACE,
+            PromptModule.CORE_CRITICAL_RULES,
+            PromptModule.RESPONSE_FORMAT
+        ]
+
+        semantic_modules = []
+        for module, similarity in similarities.items():
+            if similarity >= threshold:
+                semantic_modules.append(module)
+                logger.debug(
+                    f"🎯 Semantic match: {module.value}",
+                    similarity=f"{similarity:.3f}",
+                    threshold=threshold
+                )
+
+        # Hybrid approach: combine semantic + keyword
+        if use_hybrid:
+            # Get keyword matches
+            keyword_modules = DynamicPromptRouter.route(self, user_query)
+            keyword_tool_modules = [m for m in keyword_modules if m.value.startswith("tools/")]
+
+            # Combine: semantic OR keyword (union)
+            all_tool_modules = list(set(semantic_modules + keyword_tool_modules))
+            modules.extend(all_tool_modules)
+
+            logger.info(
+                f"🔀 Hybrid routing: {len(semantic_modules)} semantic + {len(keyword_tool_modules)} keyword = {len(all_tool_modules)} total",
+                semantic=[m.value for m in semantic_modules],
+                keyword=[m.value for m in keyword_tool_modules],
+                final=[m.value for m in all_tool_modules]
+            )
+        else:
+            # Pure semantic: use only semantic matches
+            modules.extend(semantic_modules)
+
+            # Fallback: if no tool modules selected, use keyword routing
+            if not semantic_modules:
+                logger.info("🔄 No semantic matches, falling back to keyword routing")
+                return DynamicPromptRouter.route(self, user_query)
+
+        # Log routing decision
+        logger.info(
+            f"🧠 Semantic routing: {len(modules)} modules selected",
+            query_preview=user_query[:100],
+            modules=[m.value for m in modules],
+            threshold=threshold,
+            top_similarities={
+                m.value: f"{s:.3f}"
+                for m, s in sorted(
+                    similarities.items(),
+                    key=lambda x: x[1],
+                    reverse=True
+                )[:3]
+            }
+        )
+
+        # Log to GlitchTip
+        try:
+            import sentry_sdk
+            sentry_sdk.set_context("semantic_routing", {
+                "query_length": len(user_query),
+                "query_preview": user_query[:200],
+                "modules_selected": [m.value for m in modules],
+                "module_count": len(modules),
+                "similarities": {m.value: float(s) for m, s in similarities.items()},
+                "threshold": threshold
+            })
+            sentry_sdk.capture_message(
+                f"Semantic routing: {len(modules)} modules, avg similarity {np.mean(list(similarities.values())):.2f}",
+                level="info"
+            )
+        except Exception as e:
+            logger.warning(f"Failed to log semantic routing to GlitchTip: {e}")
+
+        return modules
+
     def analyze_query(self, user_query: str) -> Dict[str, any]:
         """
         Analyze query with semantic information.
-        
+
         Args:
             user_query: User's query string
-        
+
         Returns:
             Analysis results with similarities
         """
         # Get base analysis
         analysis = super().analyze_query(user_query)
-        
+
         # Add semantic information
-        query_embedding = self.model.encode(user_query)
-        
-        similarities = {}
-        for module, module_embedding in self.module_embeddings.items():
-            similarity = cosine_similarity(
-                query_embedding.reshape(1, -1),
-                module_embedding.reshape(1, -1)
-            )[0][0]
-            similarities[module.value] = float(similarity)
-        
-        analysis["semantic_similarities"] = similarities
+        similarities = self._similarities(self.embed_query(user_query))
+
+        analysis["semantic_similarities"] = {m.value: s for m, s in similarities.items()}
         analysis["routing_method"] = "semantic"
-        
+
         return analysis
 
 
+def precompute_module_embeddings(
+    model_name: str = DEFAULT_MODEL_NAME,
+    embeddings_dir: Optional[Path] = None,
+    model_loader: Optional[Callable[[str], Any]] = None
+) -> Path:
+    """
+    Encode the module descriptions and write the versioned .npy artifact.
+
+    Run after changing MODULE_DESCRIPTIONS or the model:
+        python -m core.prompts.semantic_router
+
+    Returns:
+        Path of the written artifact
+    """
+    path = embeddings_path(model_name, embeddings_dir)
+    model = (model_loader or _load_sentence_transformer)(model_name)
+    matrix = _normalize(model.encode([MODULE_DESCRIPTIONS[m] for m in MODULE_DESCRIPTIONS], batch_size=ENCODE_BATCH_SIZE))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, matrix)
+    logger.info(f"📊 Saved module embeddings for {model_name} to {path}")
+    return path
+
+
 # Singleton instance
 _semantic_router = None
 
@@ -295,3 +458,12 @@ def get_semantic_router() -> SemanticPromptRouter:
         _semantic_router = SemanticPromptRouter()
     return _semantic_router
 
+
+if __name__ == "__main__":
+    import importlib.util
+
+    # Semantic routing is optional; image builds without it have nothing to precompute
+    if importlib.util.find_spec("sentence_transformers") is None:
+        print("sentence-transformers is not installed, skipping module embeddings")
+    else:
+        print(precompute_module_embeddings())
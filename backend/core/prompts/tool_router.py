@@ -0,0 +1,317 @@
+"""
+Tool Schema Router
+
+Selects which tool schemas are embedded in the system prompt.
+
+Every enabled tool's full JSON schema used to be sent with every LLM call,
+whatever the task. ToolSchemaRouter ranks the registered functions against
+the latest user message and the tools used recently in the thread, and keeps
+the top-N plus the always-on core functions. The other functions stay
+registered and executable: they are listed by name only, and once the model
+calls one of them it is added to the selection so its full schema is sent
+from the next turn on.
+"""
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from core.utils.logger import logger
+
+DEFAULT_TOP_N = 12
+# Below this many functions the schema payload is small and routing only risks misses
+MIN_FUNCTIONS_TO_ROUTE = 20
+
+# Functions the agent needs in every run to talk to the user and track its work
+ALWAYS_ON_FUNCTIONS = frozenset({
+    'ask', 'complete', 'wait',
+    'create_tasks', 'update_tasks', 'view_tasks',
+    'expand_message',
+})
+
+# Field weights for lexical matching
+NAME_WEIGHT = 3.0
+TOOL_WEIGHT = 1.5
+DESCRIPTION_WEIGHT = 1.0
+PARAMETER_WEIGHT = 0.75
+# Share of the best sibling's score a function inherits (tools are often used together)
+SIBLING_WEIGHT = 0.3
+# The most recently used functions are always kept; older ones get a decaying boost
+RECENT_USAGE_PINNED = 3
+RECENT_USAGE_BOOST = 4.0
+RECENT_USAGE_DECAY = 0.8
+
+RECENT_TOOLS_LIMIT = 10
+RECENT_TOOLS_TTL = 7 * 24 * 3600
+
+_STOPWORDS = frozenset("""
+a an and are as at be by can do for from has have how i if in into is it its me my of on or our
+please so that the their them then there these this to up us use using want was we what when
+which will with you your should would could all any some about just also need make get
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word: str) -> str:
+    for suffix, min_length in (('ing', 6), ('ies', 5), ('es', 5), ('ed', 5), ('s', 4)):
+        if word.endswith(suffix) and len(word) >= min_length and not word.endswith('ss'):
+            return word[:-len(suffix)] + ('y' if suffix == 'ies' else '')
+    return word
+
+
+def tokenize(text: str) -> Set[str]:
+    """Lowercase, split on non-alphanumerics, drop stopwords and stem."""
+    return {
+        _stem(word)
+        for word in _WORD_RE.findall(text.lower().replace('_', ' '))
+        if word not in _STOPWORDS and len(word) > 1
+    }
+
+
+@dataclass
+class ToolSelection:
+    """Functions whose schemas are sent in the system prompt for a run."""
+    selected: List[str]
+    omitted: List[str]
+    routed: bool
+    scores: Dict[str, float] = field(default_factory=dict)
+    full_schema_chars: int = 0
+    selected_schema_chars: int = 0
+    expanded: List[str] = field(default_factory=list)
+
+    def is_selected(self, function_name: str) -> bool:
+        return function_name in self.selected
+
+    @property
+    def savings_ratio(self) -> float:
+        if not self.full_schema_chars:
+            return 0.0
+        return 1 - self.selected_schema_chars / self.full_schema_chars
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "routed": self.routed,
+            "selected": len(self.selected),
+            "omitted": len(self.omitted),
+            "full_schema_chars": self.full_schema_chars,
+            "selected_schema_chars": self.selected_schema_chars,
+            "savings_ratio": round(self.savings_ratio, 3),
+            "expanded": list(self.expanded),
+        }
+
+
+@dataclass
+class _FunctionDocument:
+    name: str
+    tool_class: str
+    fields: Dict[str, Set[str]]
+    schema_chars: int
+    always_on: bool
+
+
+class ToolSchemaRouter:
+    """
+    Ranks registered tool functions against a query.
+
+    Features:
+    - Lexical matching on function names, descriptions and parameters (IDF weighted)
+    - Always includes core functions
+    - Keeps the functions used last in the thread and boosts siblings of strong matches
+    - Falls back to every schema when nothing matches
+    - Expands the selection when the model calls an unlisted function
+    """
+
+    def __init__(self, top_n: int = DEFAULT_TOP_N, always_on: Iterable[str] = ALWAYS_ON_FUNCTIONS):
+        self.top_n = top_n
+        self.always_on = frozenset(always_on)
+
+    def _build_documents(self, tool_registry) -> List[_FunctionDocument]:
+        from core.agentpress.tool import get_tool_class_spec
+
+        documents = []
+        for name in tool_registry.get_function_names():
+            schema = tool_registry.tools[name]['schema'].schema
+            function = schema.get('function', {})
+            tool_class = tool_registry.get_tool_class(name)
+            spec = get_tool_class_spec(tool_class) if tool_class else None
+            metadata = spec.metadata if spec else None
+            method_metadata = spec.method_metadata.get(name) if spec else None
+
+            tool_text = ''
+            if metadata:
+                tool_text = f"{metadata.display_name} {metadata.description}"
+            if method_metadata:
+                tool_text += f" {method_metadata.display_name} {method_metadata.description}"
+
+            documents.append(_FunctionDocument(
+                name=name,
+                tool_class=tool_class.__name__ if tool_class else '',
+                fields={
+                    'name': tokenize(name),
+                    'tool': tokenize(tool_text),
+                    'description': tokenize(function.get('description', '')),
+                    'parameters': tokenize(' '.join(function.get('parameters', {}).get('properties', {}).keys())),
+                },
+                schema_chars=len(json.dumps(schema, indent=2)),
+                always_on=(
+                    name in self.always_on
+                    or bool(metadata and metadata.is_core)
+                    or bool(method_metadata and method_metadata.is_core)
+                ),
+            ))
+        return documents
+
+    def _score(self, documents: List[_FunctionDocument], query_terms: Set[str]) -> Dict[str, float]:
+        weights = (
+            ('name', NAME_WEIGHT),
+            ('tool', TOOL_WEIGHT),
+            ('description', DESCRIPTION_WEIGHT),
+            ('parameters', PARAMETER_WEIGHT),
+        )
+        document_terms = [set().union(*doc.fields.values()) for doc in documents]
+        idf = {}
+        for term in query_terms:
+            frequency = sum(1 for terms in document_terms if term in terms)
+            if frequency:
+                idf[term] = math.log(1 + len(documents) / frequency)
+
+        scores = {}
+        for doc, terms in zip(documents, document_terms):
+            score = 0.0
+            for term in idf.keys() & terms:
+                score += idf[term] * max(weight for field_name, weight in weights if term in doc.fields[field_name])
+            scores[doc.name] = score
+        return scores
+
+    def select(self, tool_registry, query: Optional[str], recent_functions: Sequence[str] = ()) -> ToolSelection:
+        """
+        Select the functions whose schemas go into the system prompt.
+
+        Args:
+            tool_registry: ToolRegistry holding every enabled function
+            query: Latest user message
+            recent_functions: Recently called function names, most recent first
+
+        Returns:
+            ToolSelection with the selected and omitted function names
+        """
+        documents = self._build_documents(tool_registry)
+        full_chars = sum(doc.schema_chars for doc in documents)
+        names = [doc.name for doc in documents]
+
+        if len(documents) < MIN_FUNCTIONS_TO_ROUTE:
+            return ToolSelection(selected=names, omitted=[], routed=False,
+                                 full_schema_chars=full_chars, selected_schema_chars=full_chars)
+
+        own_scores = self._score(documents, tokenize(query or ''))
+
+        best_by_class: Dict[str, float] = {}
+        for doc in documents:
+            best_by_class[doc.tool_class] = max(best_by_class.get(doc.tool_class, 0.0), own_scores[doc.name])
+
+        scores = {}
+        for doc in documents:
+            sibling_best = best_by_class[doc.tool_class] if best_by_class[doc.tool_class] != own_scores[doc.name] else 0.0
+            scores[doc.name] = own_scores[doc.name] + SIBLING_WEIGHT * sibling_best
+
+        registered = set(names)
+        recent = [name for name in dict.fromkeys(recent_functions) if name in registered]
+        for rank, name in enumerate(recent):
+            scores[name] += RECENT_USAGE_BOOST * (RECENT_USAGE_DECAY ** rank)
+
+        if not any(own_scores.values()) and not recent:
+            # Nothing to go on: send everything rather than guess
+            logger.debug("🧭 No tool matched the query, including all tool schemas")
+            return ToolSelection(selected=names, omitted=[], routed=False, scores=scores,
+                                 full_schema_chars=full_chars, selected_schema_chars=full_chars)
+
+        ranked = sorted(
+            (doc for doc in documents if not doc.always_on and doc.name not in recent[:RECENT_USAGE_PINNED] and scores[doc.name] > 0),
+            key=lambda doc: scores[doc.name],
+            reverse=True,
+        )
+        chosen = {doc.name for doc in documents if doc.always_on}
+        chosen.update(recent[:RECENT_USAGE_PINNED])
+        chosen.update(doc.name for doc in ranked[:self.top_n])
+
+        selection = ToolSelection(
+            selected=[name for name in names if name in chosen],
+            omitted=[name for name in names if name not in chosen],
+            routed=True,
+            scores=scores,
+            full_schema_chars=full_chars,
+            selected_schema_chars=sum(doc.schema_chars for doc in documents if doc.name in chosen),
+        )
+        logger.info(
+            f"🧭 Tool routing: {len(selection.selected)}/{len(names)} functions selected, "
+            f"{selection.savings_ratio:.0%} of schema chars saved"
+        )
+        logger.debug(f"   Selected: {selection.selected}")
+        return selection
+
+    def expand(self, selection: ToolSelection, tool_registry, function_names: Iterable[str]) -> List[str]:
+        """
+        Add omitted functions the model has called to the selection.
+
+        Args:
+            selection: Selection to update in place
+            tool_registry: ToolRegistry the selection was built from
+            function_names: Function names the model called
+
+        Returns:
+            Newly added function names (empty if the selection is unchanged)
+        """
+        added = [name for name in dict.fromkeys(function_names) if name in selection.omitted]
+        if not added:
+            return []
+
+        selected = set(selection.selected) | set(added)
+        names = tool_registry.get_function_names()
+        selection.selected = [name for name in names if name in selected]
+        selection.omitted = [name for name in names if name not in selected]
+        selection.selected_schema_chars += sum(
+            len(json.dumps(schema, indent=2)) for schema in tool_registry.get_openapi_schemas(added)
+        )
+        selection.expanded.extend(added)
+        logger.info(f"🧭 Expanded tool selection with unlisted functions: {added}")
+        return added
+
+
+def _recent_tools_key(thread_id: str) -> str:
+    return f"recent_tools:{thread_id}"
+
+
+async def load_recent_functions(thread_id: str) -> List[str]:
+    """Load the functions called in earlier runs of a thread, most recent first."""
+    try:
+        from core.utils.cache import Cache
+        return list(await Cache.get(_recent_tools_key(thread_id)) or [])
+    except Exception as e:
+        logger.debug(f"Failed to load recent tools for {thread_id}: {e}")
+        return []
+
+
+async def save_recent_functions(thread_id: str, called: Sequence[str], previous: Sequence[str] = ()):
+    """Store the functions called in this run ahead of the earlier ones."""
+    if not called:
+        return
+    recent = list(dict.fromkeys([*reversed(list(called)), *previous]))[:RECENT_TOOLS_LIMIT]
+    try:
+        from core.utils.cache import Cache
+        await Cache.set(_recent_tools_key(thread_id), recent, ttl=RECENT_TOOLS_TTL)
+    except Exception as e:
+        logger.debug(f"Failed to save recent tools for {thread_id}: {e}")
+
+
+# Singleton instance
+_tool_router_instance = None
+
+
+def get_tool_router() -> ToolSchemaRouter:
+    """Get singleton instance of ToolSchemaRouter"""
+    global _tool_router_instance
+    if _tool_router_instance is None:
+        _tool_router_instance = ToolSchemaRouter()
+    return _tool_router_instance
@@ -2,6 +2,7 @@ import os
 import json
 import asyncio
 import datetime
+import time
 from typing import Optional, Dict, List, Any, AsyncGenerator
 from dataclasses import dataclass
 
@@ -21,6 +22,8 @@ from core.tools.sb_kb_tool import SandboxKbTool
 from core.tools.data_providers_tool import DataProvidersTool
 from core.tools.expand_msg_tool import ExpandMessageTool
 from core.prompts.prompt import get_system_prompt
+from core.prompts.module_manager import AssembledPrompt, get_prompt_builder
+from core.prompts.router import get_router
 
 from core.utils.logger import logger
 
@@ -37,6 +40,7 @@ from langfuse.client import StatefulTraceClient
 from core.tools.mcp_tool_wrapper import MCPToolWrapper
 from core.tools.task_list_tool import TaskListTool
 from core.agentpress.tool import SchemaType
+from core.prompts.tool_router import ToolSelection, get_tool_router, load_recent_functions, save_recent_functions
 from core.tools.sb_upload_file_tool import SandboxUploadFileTool
 from core.tools.sb_docs_tool import SandboxDocsTool
 from core.tools.people_search_tool import PeopleSearchTool
@@ -47,6 +51,30 @@ from core.tools.vapi_voice_tool import VapiVoiceTool
 
 load_dotenv()
 
+TOOL_CALLING_INSTRUCTIONS = """
+
+In this environment you have access to a set of tools you can use to answer the user's question.
+
+You can invoke functions by writing a <function_calls> block like the following as part of your reply to the user:
+
+<function_calls>
+<invoke name="function_name">
+<parameter name="param_name">param_value</parameter>
+...
+</invoke>
+</function_calls>
+
+String and scalar parameters should be specified as-is, while lists and objects should use JSON format.
+
+The functions available to you are listed {schemas_location}
+
+When using the tools:
+- Use the exact function names from the JSON schema
+- Include all required parameters as specified in the schema
+- Format complex data (objects, arrays) as JSON strings within the parameter tags
+- Boolean values should be "true" or "false" (lowercase)
+"""
+
 @dataclass
 class AgentConfig:
     thread_id: str
@@ -56,6 +84,7 @@ class AgentConfig:
     model_name: str = "openai/gpt-5-mini"
     agent_config: Optional[dict] = None
     trace: Optional[StatefulTraceClient] = None
+    stop_event: Optional[asyncio.Event] = None
 
 class ToolManager:
     def __init__(self, thread_manager: ThreadManager, project_id: str, thread_id: str, agent_config: Optional[dict] = None):
@@ -108,18 +137,18 @@ class ToolManager:
         if config.TAVILY_API_KEY or config.FIRECRAWL_API_KEY:
             if 'web_search_tool' not in disabled_tools:
                 enabled_methods = self._get_enabled_methods_for_tool('web_search_tool')
-                self.thread_manager.add_tool(SandboxWebSearchTool, function_names=enabled_methods, thread_manager=self.thread_manager, project_id=self.project_id)
+                self.thread_manager.add_tool(SandboxWebSearchTool, function_names=enabled_methods, lazy=True, thread_manager=self.thread_manager, project_id=self.project_id)
                 if enabled_methods:
                     logger.debug(f"✅ Registered web_search_tool with methods: {enabled_methods}")
         
         if config.SERPER_API_KEY:
             if 'image_search_tool' not in disabled_tools:
                 enabled_methods = self._get_enabled_methods_for_tool('image_search_tool')
-                self.thread_manager.add_tool(SandboxImageSearchTool, function_names=enabled_methods, thread_manager=self.thread_manager, project_id=self.project_id)
+                self.thread_manager.add_tool(SandboxImageSearchTool, function_names=enabled_methods, lazy=True, thread_manager=self.thread_manager, project_id=self.project_id)
                 if enabled_methods:
                     logger.debug(f"✅ Registered image_search_tool with methods: {enabled_methods}")
         
-        # Register other sandbox tools
+        # Register other sandbox tools (constructed on first call; only schemas are needed up front)
         sandbox_tools = [
             ('sb_shell_tool', SandboxShellTool, {'project_id': self.project_id, 'thread_manager': self.thread_manager}),
             ('sb_files_tool', SandboxFilesTool, {'project_id': self.project_id, 'thread_manager': self.thread_manager}),
@@ -136,7 +165,7 @@ class ToolManager:
         for tool_name, tool_class, kwargs in sandbox_tools:
             if tool_name not in disabled_tools:
                 enabled_methods = self._get_enabled_methods_for_tool(tool_name)
-                self.thread_manager.add_tool(tool_class, function_names=enabled_methods, **kwargs)
+                self.thread_manager.add_tool(tool_class, function_names=enabled_methods, lazy=True, **kwargs)
                 if enabled_methods:
                     logger.debug(f"✅ Registered {tool_name} with methods: {enabled_methods}")
     
@@ -235,6 +264,7 @@ class ToolManager:
             self.thread_manager.add_tool(
                 BrowserTool, 
                 function_names=enabled_methods, 
+                lazy=True,
                 project_id=self.project_id, 
                 thread_id=self.thread_id, 
                 thread_manager=self.thread_manager
@@ -324,13 +354,21 @@ class MCPManager:
 
 
 class PromptManager:
+    @staticmethod
+    def assemble_modular_prompt(user_query: Optional[str], xml_tool_calling: bool = True) -> AssembledPrompt:
+        """Assemble the default system prompt from the prompt modules routed for the user query."""
+        modules = get_router().route(user_query or "")
+        return get_prompt_builder().assemble(modules, strip_xml_examples=not xml_tool_calling)
+
     @staticmethod
     async def build_system_prompt(model_name: str, agent_config: Optional[dict], 
                                   thread_id: str, 
                                   mcp_wrapper_instance: Optional[MCPToolWrapper],
                                   client=None,
                                   tool_registry=None,
-                                  xml_tool_calling: bool = True) -> dict:
+                                  xml_tool_calling: bool = True,
+                                  tool_selection: Optional[ToolSelection] = None,
+                                  base_prompt: Optional[str] = None) -> dict:
         
         default_system_content = get_system_prompt()
         
@@ -340,8 +378,10 @@ class PromptManager:
         #         sample_response = file.read()
         #     default_system_content = default_system_content + "\n\n <sample_assistant_response>" + sample_response + "</sample_assistant_response>"
         
-        # Start with agent's normal system prompt or default
-        if agent_config and agent_config.get('system_prompt'):
+        # Start with the assembled modular prompt, the agent's normal system prompt or default
+        if base_prompt:
+            system_content = base_prompt
+        elif agent_config and agent_config.get('system_prompt'):
             system_content = agent_config['system_prompt'].strip()
         else:
             system_content = default_system_content
@@ -440,41 +480,28 @@ class PromptManager:
         
         # Add XML tool calling instructions to system prompt if requested
         if xml_tool_calling and tool_registry:
-            openapi_schemas = tool_registry.get_openapi_schemas()
-            
+            routed = tool_selection is not None and tool_selection.routed
+            if routed:
+                # Functions added mid-run go in their own block (add_tool_expansion), so this part stays the same
+                unlisted = {*tool_selection.omitted, *tool_selection.expanded}
+                omitted = [name for name in tool_registry.get_function_names() if name in unlisted]
+                openapi_schemas = tool_registry.get_openapi_schemas(
+                    [name for name in tool_selection.selected if name not in tool_selection.expanded]
+                )
+            else:
+                omitted = []
+                openapi_schemas = tool_registry.get_openapi_schemas()
             if openapi_schemas:
                 # Convert schemas to JSON string
                 schemas_json = json.dumps(openapi_schemas, indent=2)
-                
-                examples_content = f"""
-
-In this environment you have access to a set of tools you can use to answer the user's question.
-
-You can invoke functions by writing a <function_calls> block like the following as part of your reply to the user:
-
-<function_calls>
-<invoke name="function_name">
-<parameter name="param_name">param_value</parameter>
-...
-</invoke>
-</function_calls>
-
-String and scalar parameters should be specified as-is, while lists and objects should use JSON format.
-
-Here are the functions available in JSON Schema format:
-
-```json
-{schemas_json}
-```
-
-When using the tools:
-- Use the exact function names from the JSON schema above
-- Include all required parameters as specified in the schema
-- Format complex data (objects, arrays) as JSON strings within the parameter tags
-- Boolean values should be "true" or "false" (lowercase)
+                system_content += TOOL_CALLING_INSTRUCTIONS.format(
+                    schemas_location=f"below in JSON Schema format:\n\n```json\n{schemas_json}\n```"
+                )
+                if omitted:
+                    system_content += f"""
+These functions are also available but their schemas are not listed above: {', '.join(omitted)}
+If you need one of them, call it in the same format; its full schema will be included from the next turn.
 """
-                
-                system_content += examples_content
                 logger.debug("Appended XML tool examples to system prompt")
 
         now = datetime.datetime.now(datetime.timezone.utc)
@@ -490,11 +517,56 @@ When using the tools:
         system_message = {"role": "system", "content": system_content}
         return system_message
 
+    @staticmethod
+    def add_tool_expansion(system_message: dict, tool_registry, tool_selection: Optional[ToolSelection]) -> dict:
+        """
+        Add the schemas of functions the selection was expanded with to a system prompt.
+
+        They go in a second text block after the unchanged system prompt, so
+        the prompt caching gives them their own breakpoint and the block
+        before it stays cached.
+
+        Args:
+            system_message: System prompt built by build_system_prompt
+            tool_registry: ToolRegistry the selection was built from
+            tool_selection: Routed selection
+
+        Returns:
+            System message with the expansion block, or system_message when nothing was expanded
+        """
+        if not tool_registry or tool_selection is None or not tool_selection.expanded:
+            return system_message
+        openapi_schemas = tool_registry.get_openapi_schemas(tool_selection.expanded)
+        if not openapi_schemas:
+            return system_message
+
+        content = system_message['content']
+        if isinstance(content, list):
+            content = content[0]['text']
+        expansion = f"""
+
+=== ADDITIONAL FUNCTIONS ===
+The schemas of these functions, listed by name above, are now included in JSON Schema format:
+
+```json
+{json.dumps(openapi_schemas, indent=2)}
+```
+"""
+        return {
+            "role": "system",
+            "content": [
+                {"type": "text", "text": content},
+                {"type": "text", "text": expansion},
+            ]
+        }
+
 
 
 class AgentRunner:
     def __init__(self, config: AgentConfig):
         self.config = config
+        # Assembled modular prompt replacing the default system prompt, when the agent opted in
+        self._base_prompt: Optional[str] = None
     
     async def setup(self):
         if not self.config.trace:
@@ -502,7 +574,8 @@ class AgentRunner:
         
         self.thread_manager = ThreadManager(
             trace=self.config.trace, 
-            agent_config=self.config.agent_config
+            agent_config=self.config.agent_config,
+            stop_event=self.config.stop_event
         )
         
         self.client = await self.thread_manager.db.client
@@ -535,6 +608,7 @@ class AgentRunner:
         
         disabled_tools = self._get_disabled_tools_from_config()
         
+        start = time.perf_counter()
         tool_manager.register_all_tools(agent_id=agent_id, disabled_tools=disabled_tools)
         
         is_chainlens_agent = (self.config.agent_config and self.config.agent_config.get('is_chainlens_default', False)) or (self.config.agent_config is None)
@@ -545,6 +619,72 @@ class AgentRunner:
             self._register_chainlens_specific_tools(disabled_tools)
         else:
             logger.debug("Not a ChainLens agent, skipping ChainLens-specific tool registration")
+        
+        self._report_tool_startup_metrics((time.perf_counter() - start) * 1000)
+    
+    def _report_tool_startup_metrics(self, registration_ms: float):
+        """Log per-tool construction times for the tools built during setup."""
+        stats = self.thread_manager.tool_registry.get_construction_stats()
+        slowest = sorted(stats['construction_ms'].items(), key=lambda item: item[1], reverse=True)[:5]
+        logger.info(
+            f"🧰 Tool startup: {len(self.thread_manager.tool_registry.tools)} functions registered in {registration_ms:.1f}ms, "
+            f"{len(stats['constructed'])} tools constructed ({stats['total_construction_ms']:.1f}ms), "
+            f"{len(stats['deferred'])} deferred until first call; slowest: {slowest}"
+        )
+        if self.config.trace:
+            self.config.trace.event(
+                name="tool_startup_metrics",
+                level="DEFAULT",
+                status_message=json.dumps({"registration_ms": round(registration_ms, 2), **stats})
+            )
+    
+    async def _build_system_message(self, mcp_wrapper_instance: Optional[MCPToolWrapper], tool_selection: Optional[ToolSelection]) -> dict:
+        return await PromptManager.build_system_prompt(
+            self.config.model_name, self.config.agent_config, 
+            self.config.thread_id, 
+            mcp_wrapper_instance, self.client,
+            tool_registry=self.thread_manager.tool_registry,
+            xml_tool_calling=True,
+            tool_selection=tool_selection,
+            base_prompt=self._base_prompt
+        )
+    
+    def _use_modular_prompt(self) -> bool:
+        """Whether this agent opted into the modular prompt (only replaces the default prompt)."""
+        agent_config = self.config.agent_config
+        if not agent_config or not (agent_config.get('metadata') or {}).get('modular_prompt'):
+            return False
+        return agent_config.get('is_chainlens_default', False) or not agent_config.get('system_prompt')
+    
+    def _report_prompt_assembly(self, assembly: AssembledPrompt):
+        """Log the tokens the modular prompt saved against the monolithic default prompt."""
+        baseline_tokens = get_prompt_builder().count_tokens(get_system_prompt())
+        metrics = {
+            "modules": list(assembly.modules),
+            "tokens": assembly.tokens,
+            "baseline_tokens": baseline_tokens,
+            "tokens_saved": baseline_tokens - assembly.tokens,
+            "cache_hit": assembly.cache_hit,
+            "build_ms": round(assembly.build_ms, 2),
+        }
+        logger.info(
+            f"📦 Modular prompt: {len(assembly.modules)} modules, {assembly.tokens} tokens "
+            f"({metrics['tokens_saved']} saved vs default), cache_hit={assembly.cache_hit}, {assembly.build_ms:.1f}ms"
+        )
+        if self.config.trace:
+            self.config.trace.event(name="modular_prompt", level="DEFAULT", status_message=json.dumps(metrics))
+    
+    async def _report_tool_selection(self, tool_selection: ToolSelection, recent_functions: List[str]):
+        """Log how much schema payload routing saved and which omitted tools the model needed."""
+        called = list(self.thread_manager.tool_registry.call_counts)
+        summary = {**tool_selection.summary(), "called": called}
+        logger.info(
+            f"🧭 Tool routing for run: {summary['selected']} selected, {summary['omitted']} omitted, "
+            f"{summary['savings_ratio']:.0%} schema chars saved, misses: {summary['expanded']}"
+        )
+        if self.config.trace:
+            self.config.trace.event(name="tool_selection", level="DEFAULT", status_message=json.dumps(summary))
+        await save_recent_functions(self.config.thread_id, called, recent_functions)
     
     def _get_enabled_methods_for_tool(self, tool_name: str) -> Optional[List[str]]:
         if not self.config.agent_config or 'agentpress_tools' not in self.config.agent_config:
@@ -638,29 +778,34 @@ class AgentRunner:
         await self.setup_tools()
         mcp_wrapper_instance = await self.setup_mcp_tools()
         
-        system_message = await PromptManager.build_system_prompt(
-            self.config.model_name, self.config.agent_config, 
-            self.config.thread_id, 
-            mcp_wrapper_instance, self.client,
-            tool_registry=self.thread_manager.tool_registry,
-            xml_tool_calling=True
-        )
+        ENABLE_TOOL_ROUTING = True  # Only send the tool schemas relevant to the latest user message
+
+        # Loads last usage, latest message and cache flags once for the whole run
+        thread_state = await self.thread_manager.get_thread_state(self.config.thread_id)
+        latest_user_message_content = thread_state.latest_user_message_content
+        if latest_user_message_content and self.config.trace:
+            self.config.trace.update(input=latest_user_message_content)
+
+        tool_registry = self.thread_manager.tool_registry
+        tool_router = get_tool_router()
+        tool_selection = None
+        recent_functions = []
+        if ENABLE_TOOL_ROUTING:
+            recent_functions = await load_recent_functions(self.config.thread_id)
+            tool_selection = tool_router.select(tool_registry, latest_user_message_content, recent_functions)
+
+        if self._use_modular_prompt():
+            assembly = PromptManager.assemble_modular_prompt(latest_user_message_content, xml_tool_calling=True)
+            self._base_prompt = assembly.content
+            self._report_prompt_assembly(assembly)
+
+        system_message = await self._build_system_message(mcp_wrapper_instance, tool_selection)
+        base_system_message = system_message
         logger.info(f"📝 System message built once: {len(str(system_message.get('content', '')))} chars")
         logger.debug(f"model_name received: {self.config.model_name}")
         iteration_count = 0
         continue_execution = True
 
-        latest_user_message = await self.client.table('messages').select('*').eq('thread_id', self.config.thread_id).eq('type', 'user').order('created_at', desc=True).limit(1).execute()
-        latest_user_message_content = None
-        if latest_user_message.data and len(latest_user_message.data) > 0:
-            data = latest_user_message.data[0]['content']
-            if isinstance(data, str):
-                data = json.loads(data)
-            if self.config.trace:
-                self.config.trace.update(input=data['content'])
-            # Extract content for fast path optimization
-            latest_user_message_content = data.get('content') if isinstance(data, dict) else str(data)
-
         while continue_execution and iteration_count < self.config.max_iterations:
             iteration_count += 1
 
@@ -674,12 +819,15 @@ class AgentRunner:
                 }
                 break
 
-            latest_message = await self.client.table('messages').select('*').eq('thread_id', self.config.thread_id).in_('type', ['assistant', 'tool', 'user']).order('created_at', desc=True).limit(1).execute()
-            if latest_message.data and len(latest_message.data) > 0:
-                message_type = latest_message.data[0].get('type')
-                if message_type == 'assistant':
-                    continue_execution = False
-                    break
+            # Re-read, since messages can also be added outside this run (API, triggers)
+            if await self.thread_manager.get_latest_message_type(self.config.thread_id) == 'assistant':
+                continue_execution = False
+                break
+
+            # The model called a function whose schema was left out: include it from now on,
+            # in a block of its own so the system prompt before it stays cached
+            if tool_selection and tool_router.expand(tool_selection, tool_registry, tool_registry.call_counts):
+                system_message = PromptManager.add_tool_expansion(base_system_message, tool_registry, tool_selection)
 
             temporary_message = None
             # Don't set max_tokens by default - let LiteLLM and providers handle their own defaults
@@ -816,6 +964,16 @@ class AgentRunner:
             if generation:
                 generation.end()
 
+        stats = self.thread_manager.tool_registry.get_construction_stats()
+        logger.debug(f"🧰 Tools constructed during run: {stats['constructed']} ({stats['construction_ms']}), never used: {stats['deferred']}")
+
+        if tool_selection:
+            await self._report_tool_selection(tool_selection, recent_functions)
+
+        # Persist any status messages still sitting in the write-behind buffer
+        await self.thread_manager.message_buffer.close()
+        await self.thread_manager.persist_thread_states()
+
         try:
             asyncio.create_task(asyncio.to_thread(lambda: langfuse.flush()))
         except Exception as e:
@@ -830,7 +988,8 @@ async def run_agent(
     max_iterations: int = 100,
     model_name: str = "openai/gpt-5-mini",
     agent_config: Optional[dict] = None,    
-    trace: Optional[StatefulTraceClient] = None
+    trace: Optional[StatefulTraceClient] = None,
+    stop_event: Optional[asyncio.Event] = None
 ):
     effective_model = model_name
 
@@ -850,7 +1009,8 @@ async def run_agent(
         max_iterations=max_iterations,
         model_name=effective_model,
         agent_config=agent_config,
-        trace=trace
+        trace=trace,
+        stop_event=stop_event
     )
     
     runner = AgentRunner(config)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Shared headless Chromium for the sandbox export services.
+
+Launching Chromium costs more than rendering a small deck, so server.py keeps
+one browser alive for its whole lifetime and the HTML→PDF, HTML→PPTX and
+document PDF endpoints borrow pages from it:
+
+- every lease gets a fresh browser context (no cookies, storage or viewport
+  leak between exports) and at most BROWSER_POOL_MAX_PAGES leases are open at
+  once, so a large deck queues for pages instead of spiking memory
+- the browser is replaced after BROWSER_POOL_MAX_USES leases, or on the next
+  lease after it disconnected (crash, OOM kill); a replaced browser is closed
+  once its last lease ends
+- lease waits, page setup and launches are counted in stats() for
+  /browser-pool/stats
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+LAUNCH_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--force-device-scale-factor=1',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-features=VizDisplayCompositor',
+    '--disable-extensions',
+    '--disable-plugins',
+    '--disable-web-security',
+    '--disable-features=TranslateUI',
+    '--disable-ipc-flooding-protection'
+]
+
+MAX_PAGES = int(os.getenv("BROWSER_POOL_MAX_PAGES", "4"))
+MAX_USES = int(os.getenv("BROWSER_POOL_MAX_USES", "100"))
+LEASE_TIMEOUT = float(os.getenv("BROWSER_POOL_LEASE_TIMEOUT", "120"))
+
+
+def _start_playwright():
+    from playwright.async_api import async_playwright
+    return async_playwright().start()
+
+
+class BrowserPool:
+    """A long-lived Chromium with a bounded number of concurrently leased pages."""
+
+    def __init__(
+        self,
+        max_pages: int = MAX_PAGES,
+        max_uses: int = MAX_USES,
+        lease_timeout: float = LEASE_TIMEOUT,
+        launch_args: Optional[list] = None,
+        playwright_factory: Callable = _start_playwright,
+    ):
+        self.max_pages = max_pages
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self.launch_args = launch_args or LAUNCH_ARGS
+        self.playwright_factory = playwright_factory
+
+        self._playwright = None
+        self._browser = None
+        self._browser_uses = 0
+        # Leases still open per browser, so a replaced browser is closed only when idle
+        self._open_leases: Dict[Any, int] = {}
+        self._retired = set()
+        self._launch_lock = asyncio.Lock()
+        self._pages = asyncio.Semaphore(max_pages)
+        self._waiting = 0
+        self._stats = {
+            "launches": 0,
+            "recycles": 0,
+            "crashes": 0,
+            "leases": 0,
+            "failed_leases": 0,
+            "lease_wait_ms": 0.0,
+            "page_setup_ms": 0.0,
+            "last_launch_ms": None,
+        }
+
+    async def start(self):
+        """Launch the browser ahead of the first export."""
+        await self._get_browser(count_use=False)
+
+    async def stop(self):
+        """Close every browser and stop Playwright."""
+        async with self._launch_lock:
+            browsers = set(self._retired)
+            if self._browser is not None:
+                browsers.add(self._browser)
+            self._browser = None
+            self._retired.clear()
+            self._open_leases.clear()
+            for browser in browsers:
+                await self._close_browser(browser)
+            if self._playwright is not None:
+                try:
+                    await self._playwright.stop()
+                except Exception as e:
+                    print(f"⚠️ Error stopping Playwright: {e}")
+                self._playwright = None
+
+    def stats(self) -> Dict[str, Any]:
+        leases = self._stats["leases"]
+        return {
+            **self._stats,
+            "lease_wait_ms": round(self._stats["lease_wait_ms"], 1),
+            "page_setup_ms": round(self._stats["page_setup_ms"], 1),
+            "avg_lease_wait_ms": round(self._stats["lease_wait_ms"] / leases, 1) if leases else 0.0,
+            "avg_page_setup_ms": round(self._stats["page_setup_ms"] / leases, 1) if leases else 0.0,
+            "max_pages": self.max_pages,
+            "max_uses": self.max_uses,
+            "open_pages": sum(self._open_leases.values()),
+            "waiting": self._waiting,
+            "browser_uses": self._browser_uses,
+            "browser_connected": bool(self._browser is not None and self._browser.is_connected()),
+        }
+
+    @asynccontextmanager
+    async def page(self, viewport: Optional[Dict[str, int]] = None, device_scale_factor: Optional[float] = None):
+        """Lease a page in a fresh context; waits while max_pages pages are open.
+
+        Yields the page. Timings for the lease are in page.lease_timings
+        (wait_ms, setup_ms) so callers can report them per slide.
+        """
+        wait_start = time.perf_counter()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._pages.acquire(), timeout=self.lease_timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"No browser page became free within {self.lease_timeout:g}s")
+        finally:
+            self._waiting -= 1
+        wait_ms = (time.perf_counter() - wait_start) * 1000
+
+        browser = None
+        context = None
+        try:
+            setup_start = time.perf_counter()
+            browser = await self._get_browser()
+            context_options = {}
+            if viewport:
+                context_options["viewport"] = viewport
+            if device_scale_factor:
+                context_options["device_scale_factor"] = device_scale_factor
+            try:
+                context = await browser.new_context(**context_options)
+                page = await context.new_page()
+            except Exception:
+                self._stats["failed_leases"] += 1
+                raise
+            setup_ms = (time.perf_counter() - setup_start) * 1000
+
+            self._stats["leases"] += 1
+            self._stats["lease_wait_ms"] += wait_ms
+            self._stats["page_setup_ms"] += setup_ms
+            page.lease_timings = {"wait_ms": round(wait_ms, 1), "setup_ms": round(setup_ms, 1)}
+            yield page
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            if browser is not None:
+                await self._release(browser)
+            self._pages.release()
+
+    async def _get_browser(self, count_use: bool = True):
+        async with self._launch_lock:
+            browser = self._browser
+            if browser is not None and not browser.is_connected():
+                print("⚠️ Pooled browser disconnected, launching a new one")
+                self._stats["crashes"] += 1
+                self._retire(browser)
+                browser = None
+            elif browser is not None and self._browser_uses >= self.max_uses:
+                print(f"♻️ Recycling pooled browser after {self._browser_uses} uses")
+                self._stats["recycles"] += 1
+                self._retire(browser)
+                browser = None
+
+            if browser is None:
+                browser = await self._launch()
+                self._browser = browser
+                self._browser_uses = 0
+
+            if count_use:
+                self._browser_uses += 1
+                self._open_leases[browser] = self._open_leases.get(browser, 0) + 1
+            return browser
+
+    async def _launch(self):
+        start = time.perf_counter()
+        if self._playwright is None:
+            self._playwright = await self.playwright_factory()
+        browser = await self._playwright.chromium.launch(headless=True, args=self.launch_args)
+        launch_ms = (time.perf_counter() - start) * 1000
+        self._stats["launches"] += 1
+        self._stats["last_launch_ms"] = round(launch_ms, 1)
+        print(f"🌐 Launched pooled browser in {launch_ms:.0f}ms")
+        return browser
+
+    def _retire(self, browser):
+        """Stop handing out a browser; close it now if no lease still uses it."""
+        if self._open_leases.get(browser):
+            self._retired.add(browser)
+        else:
+            self._open_leases.pop(browser, None)
+            asyncio.create_task(self._close_browser(browser))
+
+    async def _release(self, browser):
+        remaining = self._open_leases.get(browser, 0) - 1
+        if remaining > 0:
+            self._open_leases[browser] = remaining
+            return
+        self._open_leases.pop(browser, None)
+        if browser in self._retired:
+            self._retired.discard(browser)
+            await self._close_browser(browser)
+
+    @staticmethod
+    async def _close_browser(browser):
+        try:
+            if browser.is_connected():
+                await browser.close()
+        except Exception as e:
+            print(f"⚠️ Error closing pooled browser: {e}")
+
+
+# Shared by every router in server.py
+browser_pool = BrowserPool()
@@ -7,8 +7,10 @@ Provides PDF conversion endpoints as a FastAPI router that can be included in ot
 
 import json
 import asyncio
+import shutil
+import time
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 import tempfile
 
 from fastapi import APIRouter, HTTPException
@@ -16,7 +18,7 @@ from fastapi.responses import Response
 from pydantic import BaseModel, Field
 
 try:
-    from playwright.async_api import async_playwright
+    import playwright.async_api  # noqa: F401
 except ImportError:
     raise ImportError("Playwright is not installed. Please install it with: pip install playwright")
 
@@ -25,9 +27,13 @@ try:
 except ImportError:
     raise ImportError("PyPDF2 is not installed. Please install it with: pip install PyPDF2")
 
+from browser_pool import browser_pool
+from render_cache import SlideRenderCache
 
-# Create router
+
+# Create routers
 router = APIRouter(prefix="/presentation", tags=["pdf-conversion"])
+document_router = APIRouter(prefix="/document", tags=["pdf-conversion"])
 
 # Create output directory for generated PDFs in workspace downloads
 workspace_dir = "/workspace"
@@ -38,6 +44,7 @@ output_dir.mkdir(parents=True, exist_ok=True)
 class ConvertRequest(BaseModel):
     presentation_path: str = Field(..., description="Path to the presentation folder containing metadata.json")
     download: bool = Field(False, description="If true, returns the PDF file directly. If false, returns JSON with download URL.")
+    use_cache: bool = Field(True, description="Reuse renders of slides unchanged since the last export.")
 
 
 class ConvertResponse(BaseModel):
@@ -46,15 +53,40 @@ class ConvertResponse(BaseModel):
     pdf_url: str
     filename: str
     total_slides: int
+    cached_slides: int = 0
+    slide_timings: Optional[List[Dict]] = None
+
+
+class DocumentPDFRequest(BaseModel):
+    html_path: str = Field(..., description="Path of the HTML file to print, inside /workspace")
+    output_path: str = Field(..., description="Path the PDF is written to, inside /workspace")
+    format: str = Field("A4", description="Paper format")
+    margin: str = Field("0.5in", description="Margin applied to all four sides")
+
+
+class DocumentPDFResponse(BaseModel):
+    success: bool
+    pdf_path: str
+    wait_ms: float
+    render_ms: float
+
+
+def _workspace_path(path: str) -> Path:
+    resolved = Path(path).resolve()
+    if resolved != Path(workspace_dir) and Path(workspace_dir) not in resolved.parents:
+        raise ValueError(f"Path must be inside {workspace_dir}: {path}")
+    return resolved
 
 
 class PresentationToPDFAPI:
-    def __init__(self, presentation_dir: str):
+    def __init__(self, presentation_dir: str, use_cache: bool = True):
         """Initialize the converter with presentation directory."""
         self.presentation_dir = Path(presentation_dir).resolve()
         self.metadata_path = self.presentation_dir / "metadata.json"
         self.metadata = None
         self.slides_info = []
+        self.slide_timings = []
+        self.cache = SlideRenderCache(self.presentation_dir, "pdf") if use_cache else None
         
         # Validate inputs
         if not self.presentation_dir.exists():
@@ -107,19 +139,37 @@ class PresentationToPDFAPI:
         except Exception as e:
             raise ValueError(f"Error loading metadata: {e}")
     
-    async def render_slide_to_pdf(self, browser, slide_info: Dict, temp_dir: Path) -> Path:
-        """Render a single HTML slide to PDF using Playwright."""
+    async def render_slide_to_pdf(self, slide_info: Dict, temp_dir: Path) -> Path:
+        """Render a single HTML slide to PDF on a page leased from the shared browser pool."""
         html_path = slide_info['path']
         slide_num = slide_info['number']
         
-        print(f"Rendering slide {slide_num}: {slide_info['title']}")
+        if self.cache is not None:
+            cached_pdf = self.cache.get_pdf(slide_info.get('cache_key'))
+            if cached_pdf is not None:
+                pdf_path = temp_dir / f"slide_{slide_num:02d}.pdf"
+                shutil.copy2(cached_pdf, pdf_path)
+                print(f"  ✓ Slide {slide_num} unchanged, reused cached render")
+                self.slide_timings.append({"slide": slide_num, "cached": True})
+                return pdf_path
         
-        # Create new page with exact presentation dimensions
-        page = await browser.new_page()
+        # Page with exact 1920x1080 presentation dimensions; waits while the pool is busy
+        async with browser_pool.page(viewport={"width": 1920, "height": 1080}) as page:
+            print(f"Rendering slide {slide_num}: {slide_info['title']}")
+            render_start = time.perf_counter()
+            pdf_path = await self._render_page_to_pdf(page, html_path, slide_num, temp_dir)
+            self.slide_timings.append({
+                "slide": slide_num,
+                **page.lease_timings,
+                "render_ms": round((time.perf_counter() - render_start) * 1000, 1),
+            })
         
+        if self.cache is not None:
+            self.cache.put_pdf(slide_info.get('cache_key'), pdf_path)
+        return pdf_path
+    
+    async def _render_page_to_pdf(self, page, html_path: Path, slide_num: int, temp_dir: Path) -> Path:
         try:
-            # Set exact viewport to 1920x1080
-            await page.set_viewport_size({"width": 1920, "height": 1080})
             await page.emulate_media(media='screen')
             
             # Override device pixel ratio for exact dimensions
@@ -177,8 +227,6 @@ class PresentationToPDFAPI:
             
         except Exception as e:
             raise RuntimeError(f"Error rendering slide {slide_num}: {e}")
-        finally:
-            await page.close()
     
     def combine_pdfs(self, pdf_paths: List[Path], output_path: Path) -> None:
         """Combine multiple PDF files into a single PDF."""
@@ -209,40 +257,28 @@ class PresentationToPDFAPI:
         
         # Load metadata
         self.load_metadata()
+        if self.cache is not None:
+            for slide_info in self.slides_info:
+                slide_info['cache_key'] = self.cache.key(slide_info['path'])
         
         # Create temporary directory for intermediate files
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
             
-            # Launch browser
-            async with async_playwright() as p:
-                print("🌐 Launching browser...")
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-dev-shm-usage',
-                        '--disable-gpu',
-                        '--force-device-scale-factor=1',
-                        '--disable-background-timer-throttling'
-                    ]
-                )
-                
-                try:
-                    # Process all slides concurrently using asyncio.gather
-                    print(f"📄 Processing {len(self.slides_info)} slides concurrently...")
-                    
-                    tasks = [
-                        self.render_slide_to_pdf(browser, slide_info, temp_path)
-                        for slide_info in self.slides_info
-                    ]
-                    
-                    # Wait for all slides to be processed concurrently
-                    pdf_paths = await asyncio.gather(*tasks)
-                    
-                finally:
-                    await browser.close()
+            # Slides render concurrently, bounded by the browser pool's page limit
+            print(f"📄 Processing {len(self.slides_info)} slides concurrently...")
+            
+            tasks = [
+                self.render_slide_to_pdf(slide_info, temp_path)
+                for slide_info in self.slides_info
+            ]
+            
+            # Wait for all slides to be processed concurrently
+            pdf_paths = await asyncio.gather(*tasks)
+            self.slide_timings.sort(key=lambda t: t["slide"])
+            if self.cache is not None:
+                print(f"♻️ Reused {self.cache.hits} cached slides, rendered {self.cache.misses}")
+                self.cache.prune(slide_info['cache_key'] for slide_info in self.slides_info)
             
             # Create output path
             presentation_name = self.metadata.get('presentation_name', 'presentation')
@@ -257,7 +293,6 @@ class PresentationToPDFAPI:
                 timestamp = int(asyncio.get_event_loop().time())
                 filename = f"{presentation_name}_{timestamp}.pdf"
                 final_output = output_dir / filename
-                import shutil
                 shutil.copy2(temp_output_path, final_output)
                 return final_output, len(self.slides_info)
             else:
@@ -280,7 +315,7 @@ async def convert_presentation_to_pdf(request: ConvertRequest):
         print(f"📥 Received conversion request for: {request.presentation_path}")
         
         # Create converter
-        converter = PresentationToPDFAPI(request.presentation_path)
+        converter = PresentationToPDFAPI(request.presentation_path, use_cache=request.use_cache)
         
         # If download is requested, don't store locally and return file directly
         if request.download:
@@ -307,7 +342,9 @@ async def convert_presentation_to_pdf(request: ConvertRequest):
             message=f"PDF generated successfully with {total_slides} slides",
             pdf_url=pdf_url,
             filename=pdf_path.name,
-            total_slides=total_slides
+            total_slides=total_slides,
+            cached_slides=converter.cache.hits if converter.cache else 0,
+            slide_timings=converter.slide_timings
         )
         
     except FileNotFoundError as e:
@@ -319,6 +356,40 @@ async def convert_presentation_to_pdf(request: ConvertRequest):
         raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
 
 
+@document_router.post("/convert-to-pdf")
+async def convert_document_to_pdf(request: DocumentPDFRequest):
+    """Print a single HTML document to PDF on a page leased from the shared browser pool."""
+    try:
+        html_path = _workspace_path(request.html_path)
+        output_path = _workspace_path(request.output_path)
+        if not html_path.exists():
+            raise FileNotFoundError(f"HTML file not found: {request.html_path}")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        async with browser_pool.page() as page:
+            render_start = time.perf_counter()
+            await page.goto(f"file://{html_path}", wait_until="networkidle", timeout=30000)
+            await page.pdf(
+                path=str(output_path),
+                format=request.format,
+                print_background=True,
+                margin={side: request.margin for side in ("top", "right", "bottom", "left")}
+            )
+            render_ms = round((time.perf_counter() - render_start) * 1000, 1)
+            wait_ms = page.lease_timings["wait_ms"]
+        
+        print(f"✅ Document PDF created: {output_path} ({render_ms:.0f}ms)")
+        return DocumentPDFResponse(success=True, pdf_path=str(output_path), wait_ms=wait_ms, render_ms=render_ms)
+        
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌ Document PDF error: {e}")
+        raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
+
+
 @router.get("/health")
 async def pdf_health_check():
     """PDF service health check endpoint."""
@@ -9,6 +9,7 @@ Uses smart batching and resource cleanup to handle large presentations efficient
 import json
 import asyncio
 import os
+import time
 from pathlib import Path
 from typing import Dict, List, Optional
 import tempfile
@@ -20,7 +21,7 @@ from fastapi.responses import Response
 from pydantic import BaseModel, Field
 
 try:
-    from playwright.async_api import async_playwright
+    import playwright.async_api  # noqa: F401
 except ImportError:
     raise ImportError("Playwright is not installed. Please install it with: pip install playwright")
 
@@ -32,6 +33,9 @@ try:
 except ImportError as e:
     raise ImportError(f"python-pptx is not installed. Please install it with: pip install python-pptx. Error: {e}")
 
+from browser_pool import browser_pool
+from render_cache import SlideRenderCache
+
 
 # Create router
 router = APIRouter(prefix="/presentation", tags=["pptx-conversion"])
@@ -45,6 +49,7 @@ output_dir.mkdir(parents=True, exist_ok=True)
 class ConvertRequest(BaseModel):
     presentation_path: str = Field(..., description="Path to the presentation folder containing metadata.json")
     download: bool = Field(False, description="If true, returns the PPTX file directly. If false, returns JSON with download URL.")
+    use_cache: bool = Field(True, description="Reuse analyses of slides unchanged since the last export.")
 
 
 class ConvertResponse(BaseModel):
@@ -53,6 +58,8 @@ class ConvertResponse(BaseModel):
     pptx_url: str
     filename: str
     total_slides: int
+    cached_slides: int = 0
+    slide_timings: Optional[List[Dict]] = None
 
 
 @dataclass
@@ -129,12 +136,14 @@ class CSSParser:
 
 
 class OptimizedHTMLToPPTXConverter:
-    def __init__(self, presentation_dir: str):
+    def __init__(self, presentation_dir: str, use_cache: bool = True):
         """Initialize the optimized converter."""
         self.presentation_dir = Path(presentation_dir).resolve()
         self.metadata_path = self.presentation_dir / "metadata.json"
         self.metadata = None
         self.slides_info = []
+        self.slide_timings = []
+        self.cache = SlideRenderCache(self.presentation_dir, "pptx") if use_cache else None
         
         # Validate inputs
         if not self.presentation_dir.exists():
@@ -1291,136 +1300,112 @@ class OptimizedHTMLToPPTXConverter:
         """Main conversion method - optimized and reliable."""
         # Load metadata
         self.load_metadata()
+        if self.cache is not None:
+            for slide_info in self.slides_info:
+                slide_info['cache_key'] = self.cache.key(slide_info['path'])
         
         # Create temporary directory for images
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
             
-            # Launch browser for processing
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-dev-shm-usage',
-                        '--disable-gpu',
-                        '--force-device-scale-factor=1',
-                        '--disable-background-timer-throttling',
-                        '--disable-backgrounding-occluded-windows',
-                        '--disable-renderer-backgrounding',
-                        '--disable-features=VizDisplayCompositor',
-                        '--disable-extensions',
-                        '--disable-plugins',
-                        '--disable-web-security',
-                        '--disable-features=TranslateUI',
-                        '--disable-ipc-flooding-protection'
-                    ]
-                )
+            async def process_single_slide(slide_info: Dict) -> Dict:
+                """Analyze a single slide on a page leased from the shared browser pool."""
+                slide_num = slide_info['number']
+                
+                if self.cache is not None:
+                    cached_analysis = self.cache.get_analysis(slide_info.get('cache_key'), TextElement)
+                    if cached_analysis is not None:
+                        self.slide_timings.append({'slide': slide_num, 'cached': True})
+                        return {'slide_info': slide_info, **cached_analysis}
                 
                 try:
-                    # Process all slides in parallel
-                    # Create semaphore to limit concurrent operations
-                    semaphore = asyncio.Semaphore(5)
-                    context = await browser.new_context(
-                        viewport={'width': 1920, 'height': 1080}
-                    )
-                    
-                    context = await browser.new_context(
-                        viewport={'width': 1920, 'height': 1080}
-                    )
-                    
-                    async def process_single_slide(slide_info: Dict) -> Dict:
-                        """Process a single slide with controlled concurrency."""
-                        async with semaphore:
-                            slide_num = slide_info['number']
+                    # Waits while the pool's page limit is reached
+                    async with browser_pool.page(viewport={'width': 1920, 'height': 1080}) as page:
+                        analysis_start = time.perf_counter()
+                        try:
+                            await page.emulate_media(media='screen')
                             
-                            try:
-                                # Create a new page for this slide
-                                page = await context.new_page()
-                                
-                                # Set exact viewport dimensions
-                                await page.set_viewport_size({"width": 1920, "height": 1080})
-                                await page.emulate_media(media='screen')
-                                
-                                # Force device pixel ratio to 1
-                                await page.evaluate(r"""
-                                    () => {
-                                        Object.defineProperty(window, 'devicePixelRatio', {
-                                            get: () => 1
-                                        });
-                                    }
-                                """)
-                                
-                                try:
-                                    # Extract visual elements
-                                    visual_elements = await self.extract_visual_elements(page, slide_info['path'], temp_path)
-                                    
-                                    # Capture clean background
-                                    background_path = await self.capture_clean_background(page, slide_info['path'], temp_path, visual_elements)
-                                    
-                                    # Extract text elements
-                                    text_elements = await self.extract_text_elements(page, slide_info['path'])
-                                    
-                                    slide_analysis = {
-                                        'slide_info': slide_info,
-                                        'visual_elements': visual_elements,
-                                        'background_path': background_path,
-                                        'text_elements': text_elements
-                                    }
-                                    
-                                    return slide_analysis
-                                    
-                                except Exception as e:
-                                    return {
-                                        'slide_info': slide_info,
-                                        'visual_elements': [],
-                                        'background_path': None,
-                                        'text_elements': [],
-                                        'error': str(e)
-                                    }
-                                    
-                                finally:
-                                    # Always close the page to free memory
-                                    await page.close()
-                                    
-                            except Exception as e:
-                                return {
-                                    'slide_info': slide_info,
-                                    'visual_elements': [],
-                                    'background_path': None,
-                                    'text_elements': [],
-                                    'error': f"Page creation failed: {str(e)}"
+                            # Force device pixel ratio to 1
+                            await page.evaluate(r"""
+                                () => {
+                                    Object.defineProperty(window, 'devicePixelRatio', {
+                                        get: () => 1
+                                    });
                                 }
-                    
-                    # Launch ALL slides in parallel
-                    parallel_tasks = [
-                        process_single_slide(slide_info) 
-                        for slide_info in self.slides_info
-                    ]
-                    
-                    # Wait for ALL slides to complete in parallel
-                    slide_analyses = await asyncio.gather(*parallel_tasks, return_exceptions=True)
-                    
-                    # Handle any top-level exceptions
-                    processed_analyses = []
-                    for i, result in enumerate(slide_analyses):
-                        if isinstance(result, Exception):
-                            error_analysis = {
-                                'slide_info': self.slides_info[i],
+                            """)
+                            
+                            # Extract visual elements
+                            visual_elements = await self.extract_visual_elements(page, slide_info['path'], temp_path)
+                            
+                            # Capture clean background
+                            background_path = await self.capture_clean_background(page, slide_info['path'], temp_path, visual_elements)
+                            
+                            # Extract text elements
+                            text_elements = await self.extract_text_elements(page, slide_info['path'])
+                            
+                            slide_analysis = {
+                                'slide_info': slide_info,
+                                'visual_elements': visual_elements,
+                                'background_path': background_path,
+                                'text_elements': text_elements
+                            }
+                            
+                        except Exception as e:
+                            slide_analysis = {
+                                'slide_info': slide_info,
                                 'visual_elements': [],
                                 'background_path': None,
                                 'text_elements': [],
-                                'error': str(result)
+                                'error': str(e)
                             }
-                            processed_analyses.append(error_analysis)
-                        else:
-                            processed_analyses.append(result)
-                    
-                    all_slide_analyses = processed_analyses
+                        
+                        self.slide_timings.append({
+                            'slide': slide_num,
+                            **page.lease_timings,
+                            'render_ms': round((time.perf_counter() - analysis_start) * 1000, 1)
+                        })
                     
-                finally:
-                    await browser.close()
+                    if self.cache is not None:
+                        self.cache.put_analysis(slide_info.get('cache_key'), slide_analysis)
+                    return slide_analysis
+                        
+                except Exception as e:
+                    return {
+                        'slide_info': slide_info,
+                        'visual_elements': [],
+                        'background_path': None,
+                        'text_elements': [],
+                        'error': f"Page creation failed: {str(e)}"
+                    }
+            
+            # Launch ALL slides in parallel; the browser pool bounds how many pages are open
+            parallel_tasks = [
+                process_single_slide(slide_info) 
+                for slide_info in self.slides_info
+            ]
+            
+            # Wait for ALL slides to complete in parallel
+            slide_analyses = await asyncio.gather(*parallel_tasks, return_exceptions=True)
+            self.slide_timings.sort(key=lambda t: t['slide'])
+            if self.cache is not None:
+                self.cache.prune(slide_info['cache_key'] for slide_info in self.slides_info)
+            
+            # Handle any top-level exceptions
+            processed_analyses = []
+            for i, result in enumerate(slide_analyses):
+                if isinstance(result, Exception):
+                    error_analysis = {
+                        'slide_info': self.slides_info[i],
+                        'visual_elements': [],
+                        'background_path': None,
+                        'text_elements': [],
+                        'error': str(result)
+                    }
+                    processed_analyses.append(error_analysis)
+                else:
+                    processed_analyses.append(result)
+            
+            all_slide_analyses = processed_analyses
             
             # Build PPTX presentation
             # Create new PowerPoint presentation
@@ -1518,7 +1503,7 @@ async def convert_presentation_to_pptx(request: ConvertRequest):
             raise HTTPException(status_code=400, detail=f"metadata.json not found in: {request.presentation_path}")
         
         # Create converter
-        converter = OptimizedHTMLToPPTXConverter(request.presentation_path)
+        converter = OptimizedHTMLToPPTXConverter(request.presentation_path, use_cache=request.use_cache)
         
         # If download is requested, don't store locally and return file directly
         if request.download:
@@ -1541,7 +1526,9 @@ async def convert_presentation_to_pptx(request: ConvertRequest):
             message=f"PPTX generated successfully with {total_slides} slides",
             pptx_url=pptx_url,
             filename=pptx_path.name,
-            total_slides=total_slides
+            total_slides=total_slides,
+            cached_slides=converter.cache.hits if converter.cache else 0,
+            slide_timings=converter.slide_timings
         )
         
     except FileNotFoundError as e:
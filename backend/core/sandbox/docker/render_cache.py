@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Per-presentation cache of rendered slides for the PDF and PPTX exports.
+
+Agents tend to export, edit one slide and export again. Each slide's render
+is stored under /tmp/render-cache/<hash of the presentation path>/<kind>/
+(outside /workspace, so it is never listed, uploaded or downloaded with the
+user's files) keyed by a hash of the slide HTML and every local file it
+references (images, stylesheets, scripts), so a re-export only sends changed
+slides through the browser and stitches the rest from the cache:
+
+- pdf: the single-page PDF of the slide
+- pptx: the slide analysis (visual elements, clean background, text
+  elements) with its screenshots
+
+Entries for slides that are no longer part of the deck are pruned after
+each export, so the cache never holds more than one render per slide. Only
+entries last used before the export started are pruned, so a concurrent
+export of another version of the deck keeps its renders.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import unquote, urlparse
+
+# Bump when the renderers change in a way that invalidates stored renders
+RENDER_CACHE_VERSION = "1"
+
+CACHE_ROOT = Path(os.getenv("RENDER_CACHE_DIR", "/tmp/render-cache"))
+
+_ASSET_REF = re.compile(r"""(?:src|href|poster)\s*=\s*["']([^"']+)["']|url\(\s*["']?([^"')]+)["']?\s*\)""", re.IGNORECASE)
+
+
+def _local_asset(ref: str, html_path: Path) -> Optional[Path]:
+    ref = ref.strip()
+    if not ref or ref.startswith(("#", "data:", "javascript:", "mailto:")):
+        return None
+    parsed = urlparse(ref)
+    if parsed.scheme and parsed.scheme != "file":
+        return None
+    path = Path(unquote(parsed.path))
+    if not path.is_absolute():
+        path = html_path.parent / path
+    return path if path.is_file() else None
+
+
+def slide_cache_key(html_path: Path) -> str:
+    """Hash of a slide's HTML and the contents of the local files it references."""
+    digest = hashlib.sha256(RENDER_CACHE_VERSION.encode())
+    html_bytes = html_path.read_bytes()
+    digest.update(html_bytes)
+
+    refs = set()
+    for match in _ASSET_REF.finditer(html_bytes.decode("utf-8", errors="ignore")):
+        ref = match.group(1) or match.group(2)
+        refs.add(ref)
+    for ref in sorted(refs):
+        # Remote references are keyed by URL only
+        digest.update(ref.encode())
+        asset = _local_asset(ref, html_path)
+        if asset is not None:
+            digest.update(asset.read_bytes())
+    return digest.hexdigest()
+
+
+class SlideRenderCache:
+    """Slide renders of one presentation for one export kind ('pdf' or 'pptx')."""
+
+    def __init__(self, presentation_dir: Path, kind: str, cache_root: Optional[Path] = None):
+        presentation_key = hashlib.sha256(str(Path(presentation_dir).resolve()).encode()).hexdigest()[:16]
+        self.root = Path(cache_root or CACHE_ROOT) / presentation_key / kind
+        # Entries used since the export started belong to it (or to a concurrent export)
+        self.started_at = time.time()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, html_path: Path) -> Optional[str]:
+        try:
+            return slide_cache_key(html_path)
+        except OSError as e:
+            print(f"⚠️ Could not hash slide {html_path}: {e}")
+            return None
+
+    def get_pdf(self, key: Optional[str]) -> Optional[Path]:
+        path = self.root / f"{key}.pdf" if key else None
+        return self._count(self._touch(path) if path is not None and path.exists() else None)
+
+    def put_pdf(self, key: Optional[str], pdf_path: Path) -> None:
+        if not key:
+            return
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = self.root / f".{key}.{uuid.uuid4().hex}.tmp"
+            shutil.copy2(pdf_path, tmp)
+            os.replace(tmp, self.root / f"{key}.pdf")
+        except OSError as e:
+            print(f"⚠️ Could not cache slide PDF: {e}")
+
+    def get_analysis(self, key: Optional[str], text_element_type=None) -> Optional[Dict]:
+        """Load a stored slide analysis with image paths pointing into the cache."""
+        entry = self.root / key if key else None
+        if entry is None or not (entry / "analysis.json").exists():
+            return self._count(None)
+        try:
+            with open(entry / "analysis.json", "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return self._count(None)
+        self._touch(entry)
+
+        visual_elements = []
+        for element in stored["visual_elements"]:
+            element = dict(element)
+            element["image_path"] = entry / element["image_path"]
+            visual_elements.append(element)
+        text_elements = stored["text_elements"]
+        if text_element_type is not None:
+            text_elements = [text_element_type(**element) for element in text_elements]
+
+        return self._count({
+            "visual_elements": visual_elements,
+            "background_path": entry / stored["background_path"] if stored.get("background_path") else None,
+            "text_elements": text_elements,
+        })
+
+    def put_analysis(self, key: Optional[str], analysis: Dict) -> None:
+        """Store a slide analysis, copying its screenshots into the cache."""
+        if not key or analysis.get("error"):
+            return
+        entry = self.root / key
+        if entry.exists():
+            self._touch(entry)
+            return
+        tmp = self.root / f".{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            tmp.mkdir(parents=True)
+            visual_elements = []
+            for element in analysis["visual_elements"]:
+                element = dict(element)
+                image_path = Path(element["image_path"])
+                shutil.copy2(image_path, tmp / image_path.name)
+                element["image_path"] = image_path.name
+                visual_elements.append(element)
+
+            background_name = None
+            if analysis.get("background_path"):
+                background_path = Path(analysis["background_path"])
+                shutil.copy2(background_path, tmp / background_path.name)
+                background_name = background_path.name
+
+            stored = {
+                "visual_elements": visual_elements,
+                "background_path": background_name,
+                "text_elements": [asdict(e) if is_dataclass(e) else e for e in analysis["text_elements"]],
+            }
+            with open(tmp / "analysis.json", "w", encoding="utf-8") as f:
+                json.dump(stored, f)
+            os.replace(tmp, entry)
+        except OSError as e:
+            # A concurrent export may have stored the same slide first
+            if not entry.exists():
+                print(f"⚠️ Could not cache slide analysis: {e}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def prune(self, keep: Iterable[Optional[str]]) -> None:
+        """Remove renders of slides that are no longer in the deck and were last used before this export."""
+        if not self.root.exists():
+            return
+        keep = {key for key in keep if key}
+        for path in self.root.iterdir():
+            if path.name.startswith("."):
+                continue
+            if path.name.split(".")[0] in keep:
+                continue
+            try:
+                if path.stat().st_mtime >= self.started_at:
+                    continue
+            except OSError:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _touch(path: Path) -> Path:
+        """Mark an entry as used so exports that started earlier do not prune it."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def _count(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
@@ -2,14 +2,17 @@ from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.base import BaseHTTPMiddleware
 import uvicorn
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 # Import PDF router, PPTX router, DOCX router, and Visual HTML Editor router
-from html_to_pdf_router import router as pdf_router
+from html_to_pdf_router import router as pdf_router, document_router as document_pdf_router
 from visual_html_editor_router import router as editor_router
 from html_to_pptx_router import router as pptx_router
 from html_to_docx_router import router as docx_router
+from browser_pool import browser_pool
 
 # Ensure we're serving from the /workspace directory
 workspace_dir = "/workspace"
@@ -22,11 +25,27 @@ class WorkspaceDirMiddleware(BaseHTTPMiddleware):
             os.makedirs(workspace_dir, exist_ok=True)
         return await call_next(request)
 
-app = FastAPI()
+async def _prewarm_browser_pool():
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        # Exports launch the browser on demand if prewarming fails
+        print(f"⚠️ Could not prewarm browser pool: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One browser for the server's lifetime instead of one per export request
+    prewarm = asyncio.create_task(_prewarm_browser_pool())
+    yield
+    prewarm.cancel()
+    await browser_pool.stop()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(WorkspaceDirMiddleware)
 
 # Include routers
 app.include_router(pdf_router)
+app.include_router(document_pdf_router)
 app.include_router(editor_router)
 app.include_router(pptx_router)
 app.include_router(docx_router)
@@ -45,6 +64,11 @@ output_dir.mkdir(exist_ok=True)
 # Initial directory creation
 os.makedirs(workspace_dir, exist_ok=True)
 
+@app.get("/browser-pool/stats")
+async def browser_pool_stats():
+    """Launches, recycles, crashes and lease timings of the shared export browser"""
+    return browser_pool.stats()
+
 # Add visual HTML editor root endpoint
 @app.get("/editor")
 async def list_html_files():
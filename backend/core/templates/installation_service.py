@@ -778,11 +778,9 @@ class InstallationService:
             return False
     
     async def _increment_download_count(self, template_id: str) -> None:
-        client = await self._db.client
+        from core.templates.services.marketplace_index import get_marketplace_index
         try:
-            await client.rpc('increment_template_download_count', {
-                'template_id_param': template_id
-            }).execute()
+            await get_marketplace_index(self._db).record_download(template_id)
         except Exception as e:
             logger.warning(f"Failed to increment download count for template {template_id}: {e}")
 
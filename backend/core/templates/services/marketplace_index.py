@@ -0,0 +1,320 @@
+"""
+Marketplace read model for public agent templates.
+
+Marketplace pages used to query agent_templates with an unindexable
+ILIKE '%term%', per-tag filters and select('*'), then batch-load creator
+names from basejump.accounts on every request. Listing now reads
+marketplace_template_listings, a projection of the public templates kept in
+sync by database triggers: search is a prefix match of every word against
+the full-text index over name and tags, tags are served by a GIN index, and
+the creator name is denormalized into the row.
+
+- The first pages of unsearched listings (and their counts) are cached in
+  Redis for a short time; publishing, unpublishing or deleting a template
+  bumps a version number that is part of every cache key.
+- Downloads are counted in a Redis hash and applied to agent_templates in
+  one set-based update per flush instead of one UPDATE per install. Counts
+  taken by a process that died mid-flush are merged back on startup.
+"""
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from core.utils.logger import logger
+
+LISTINGS_TABLE = "marketplace_template_listings"
+LISTING_COLUMNS = (
+    "template_id, creator_id, creator_name, name, config, tags, categories, is_epsilon_team, "
+    "marketplace_published_at, download_count, created_at, updated_at, icon_name, icon_color, "
+    "icon_background, metadata, usage_examples"
+)
+LISTING_VERSION_KEY = "marketplace:listing_version"
+PENDING_DOWNLOADS_KEY = "marketplace:pending_downloads"
+# Unsearched pages beyond this are read from the database every time
+CACHED_PAGES = 5
+PAGE_TTL = 60
+FLUSH_INTERVAL = 30
+# Processing keys older than this belong to a flush that died and are merged back
+ORPHANED_FLUSH_AGE = 600
+
+
+def _prefix_tsquery(search: Optional[str]) -> Optional[str]:
+    """to_tsquery text matching every word of search as a prefix, e.g. 'slack:* & dai:*'."""
+    words = re.findall(r"\w+", search or "")
+    return " & ".join(f"{word}:*" for word in words) or None
+
+
+class MarketplaceIndex:
+    """Reads marketplace listings from the projection and batches download counts."""
+
+    def __init__(self, db, page_ttl: int = PAGE_TTL, flush_interval: float = FLUSH_INTERVAL, use_redis: bool = True):
+        """
+        Args:
+            db: DBConnection used for listing queries and download flushes
+            page_ttl: Seconds a cached listing page stays valid
+            flush_interval: Seconds between download count flushes
+            use_redis: Cache pages and count downloads in Redis
+        """
+        self._db = db
+        self.page_ttl = page_ttl
+        self.flush_interval = flush_interval
+        self.use_redis = use_redis
+        self._flush_task: Optional[asyncio.Task] = None
+        self.stats = {"page_hits": 0, "page_misses": 0, "downloads_flushed": 0}
+
+    # --- Listing -------------------------------------------------------------
+
+    async def list_templates(
+        self,
+        is_epsilon_team: Optional[bool] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        search: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        creator_id: Optional[str] = None,
+        sort_by: str = "download_count",
+        sort_order: str = "desc",
+    ) -> List[Dict[str, Any]]:
+        """Listing rows for a marketplace page, from the page cache when possible."""
+        cache_key = None
+        if self._is_cacheable(search, creator_id, limit, offset):
+            cache_key = await self._cache_key("page", is_epsilon_team, tags, limit, offset, sort_by, sort_order)
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                self.stats["page_hits"] += 1
+                return cached
+            self.stats["page_misses"] += 1
+
+        client = await self._db.client
+        query = self._apply_filters(
+            client.table(LISTINGS_TABLE).select(LISTING_COLUMNS), is_epsilon_team, search, tags, creator_id
+        )
+        desc = sort_order == "desc"
+        if sort_by == "newest":
+            query = query.order('marketplace_published_at', desc=True)
+        elif sort_by == "name":
+            query = query.order('name', desc=desc)
+        else:
+            query = query.order('download_count', desc=desc if sort_by == "download_count" else True)\
+                         .order('marketplace_published_at', desc=True)
+        if limit:
+            query = query.range(offset, offset + limit - 1)
+        elif offset:
+            query = query.offset(offset)
+
+        result = await query.execute()
+        rows = result.data or []
+        if cache_key:
+            await self._cache_set(cache_key, rows)
+        return rows
+
+    async def count_templates(
+        self,
+        is_epsilon_team: Optional[bool] = None,
+        search: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        creator_id: Optional[str] = None,
+    ) -> int:
+        """Number of listings matching the filters."""
+        cache_key = None
+        if self._is_cacheable(search, creator_id):
+            cache_key = await self._cache_key("count", is_epsilon_team, tags)
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+
+        client = await self._db.client
+        query = self._apply_filters(
+            client.table(LISTINGS_TABLE).select('template_id', count='exact').limit(1),
+            is_epsilon_team, search, tags, creator_id
+        )
+        result = await query.execute()
+        total = result.count or 0
+        if cache_key:
+            await self._cache_set(cache_key, total)
+        return total
+
+    async def invalidate(self):
+        """Drop cached pages, e.g. after a template was published or removed."""
+        if not self.use_redis:
+            return
+        try:
+            from core.services import redis
+            redis_client = await redis.get_client()
+            await redis_client.incr(LISTING_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate marketplace page cache: {e}")
+
+    @staticmethod
+    def _apply_filters(query, is_epsilon_team, search, tags, creator_id):
+        if is_epsilon_team is not None:
+            query = query.eq('is_epsilon_team', is_epsilon_team)
+        if creator_id is not None:
+            query = query.eq('creator_id', creator_id)
+        tsquery = _prefix_tsquery(search)
+        if tsquery:
+            # Every word as a prefix of a word in the name or tags, one or many words alike
+            query = query.filter('search_vector', 'fts(simple)', tsquery)
+        if tags:
+            query = query.contains('tags', list(tags))
+        return query
+
+    def _is_cacheable(self, search, creator_id, limit: Optional[int] = None, offset: int = 0) -> bool:
+        if not self.use_redis or search or creator_id is not None:
+            return False
+        return not limit or offset // limit < CACHED_PAGES
+
+    async def _cache_key(self, kind: str, *params) -> str:
+        version = 0
+        try:
+            from core.services import redis
+            version = await redis.get(LISTING_VERSION_KEY) or 0
+        except Exception:
+            pass
+        params = [sorted(p) if isinstance(p, list) else p for p in params]
+        return f"marketplace:{kind}:{version}:{json.dumps(params, separators=(',', ':'))}"
+
+    async def _cache_get(self, key: str):
+        try:
+            from core.utils.cache import Cache
+            return await Cache.get(key)
+        except Exception as e:
+            logger.debug(f"Marketplace cache read failed for {key}: {e}")
+            return None
+
+    async def _cache_set(self, key: str, value: Any):
+        try:
+            from core.utils.cache import Cache
+            await Cache.set(key, value, ttl=self.page_ttl)
+        except Exception as e:
+            logger.debug(f"Marketplace cache write failed for {key}: {e}")
+
+    # --- Downloads -----------------------------------------------------------
+
+    async def record_download(self, template_id: str):
+        """Count a template download; applied to the database on the next flush."""
+        if self.use_redis:
+            try:
+                from core.services import redis
+                redis_client = await redis.get_client()
+                await redis_client.hincrby(PENDING_DOWNLOADS_KEY, template_id, 1)
+                return
+            except Exception as e:
+                logger.warning(f"Failed to queue download count for {template_id}, writing directly: {e}")
+
+        client = await self._db.client
+        await client.rpc('increment_template_download_count', {
+            'template_id_param': template_id
+        }).execute()
+
+    async def flush_downloads(self) -> int:
+        """Apply queued download counts in one update. Returns the number of downloads applied."""
+        if not self.use_redis:
+            return 0
+        from core.services import redis
+        redis_client = await redis.get_client()
+
+        # Take the pending counts atomically; concurrent flushes in other processes find nothing
+        processing_key = _processing_key()
+        try:
+            await redis_client.rename(PENDING_DOWNLOADS_KEY, processing_key)
+        except Exception:
+            return 0
+
+        counts = {template_id: int(count) for template_id, count in (await redis_client.hgetall(processing_key)).items()}
+        try:
+            client = await self._db.client
+            await client.rpc('apply_template_download_counts', {'p_counts': counts}).execute()
+        except Exception as e:
+            # Put the counts back for the next flush
+            logger.error(f"Failed to apply {sum(counts.values())} template downloads: {e}")
+            for template_id, count in counts.items():
+                await redis_client.hincrby(PENDING_DOWNLOADS_KEY, template_id, count)
+            await redis_client.delete(processing_key)
+            return 0
+
+        await redis_client.delete(processing_key)
+        applied = sum(counts.values())
+        self.stats["downloads_flushed"] += applied
+        logger.debug(f"📥 Applied {applied} template downloads across {len(counts)} templates")
+        return applied
+
+    async def recover_orphaned_downloads(self, max_age: float = ORPHANED_FLUSH_AGE) -> int:
+        """Merge counts left in processing keys by flushes that died back into the pending hash.
+
+        Returns:
+            Number of downloads recovered
+        """
+        if not self.use_redis:
+            return 0
+        from core.services import redis
+        redis_client = await redis.get_client()
+
+        recovered = 0
+        cutoff = time.time() - max_age
+        async for key in redis_client.scan_iter(match=f"{PENDING_DOWNLOADS_KEY}:*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            taken_at = key[len(PENDING_DOWNLOADS_KEY) + 1:].split(":")[0]
+            if not taken_at.isdigit() or int(taken_at) > cutoff:
+                continue
+            # Claim the key so only one process merges it
+            claimed_key = _processing_key()
+            try:
+                await redis_client.rename(key, claimed_key)
+            except Exception:
+                continue
+            for template_id, count in (await redis_client.hgetall(claimed_key)).items():
+                await redis_client.hincrby(PENDING_DOWNLOADS_KEY, template_id, int(count))
+                recovered += int(count)
+            await redis_client.delete(claimed_key)
+
+        if recovered:
+            logger.info(f"📥 Recovered {recovered} template downloads from interrupted flushes")
+        return recovered
+
+    def start(self):
+        """Flush queued download counts periodically in the background."""
+        if self.use_redis and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
+        try:
+            await self.flush_downloads()
+        except Exception as e:
+            logger.warning(f"Final template download flush failed: {e}")
+
+    async def _flush_loop(self):
+        try:
+            await self.recover_orphaned_downloads()
+        except Exception as e:
+            logger.error(f"Recovering interrupted template download flushes failed: {e}")
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_downloads()
+            except Exception as e:
+                logger.error(f"Template download flush failed: {e}")
+
+
+def _processing_key() -> str:
+    return f"{PENDING_DOWNLOADS_KEY}:{int(time.time())}:{uuid.uuid4().hex}"
+
+
+_marketplace_index: Optional[MarketplaceIndex] = None
+
+
+def get_marketplace_index(db=None) -> MarketplaceIndex:
+    """Get singleton instance of MarketplaceIndex"""
+    global _marketplace_index
+    if _marketplace_index is None:
+        if db is None:
+            from core.services.supabase import DBConnection
+            db = DBConnection()
+        _marketplace_index = MarketplaceIndex(db)
+    return _marketplace_index
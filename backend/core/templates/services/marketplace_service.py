@@ -45,29 +45,27 @@ class MarketplaceService:
             limit = pagination_params.page_size
             offset = (pagination_params.page - 1) * pagination_params.page_size
             
-            templates = await template_service.get_public_templates(
+            from .marketplace_index import get_marketplace_index
+            marketplace_index = get_marketplace_index(db_connection)
+            
+            rows = await marketplace_index.list_templates(
                 is_epsilon_team=filters.is_epsilon_team,
                 limit=limit,
                 offset=offset,
                 search=filters.search,
-                tags=filters.tags
+                tags=filters.tags,
+                creator_id=filters.creator_id,
+                sort_by=filters.sort_by,
+                sort_order=filters.sort_order
             )
+            templates = [template_service._map_to_template({**row, 'is_public': True}) for row in rows]
             
-            base_query = self._build_marketplace_base_query(filters)
-            count_query = self._build_marketplace_count_query(filters)
-            count_result = await count_query.execute()
-            total_items = count_result.count if count_result.count is not None else 0
-            
-            if filters.creator_id is not None:
-                templates = [t for t in templates if t.creator_id == filters.creator_id]
-                if filters.creator_id:
-                    all_templates = await template_service.get_public_templates(
-                        is_epsilon_team=filters.is_epsilon_team,
-                        search=filters.search,
-                        tags=filters.tags
-                    )
-                    filtered_templates = [t for t in all_templates if t.creator_id == filters.creator_id]
-                    total_items = len(filtered_templates)
+            total_items = await marketplace_index.count_templates(
+                is_epsilon_team=filters.is_epsilon_team,
+                search=filters.search,
+                tags=filters.tags,
+                creator_id=filters.creator_id
+            )
             
             template_responses = []
             for template in templates:
@@ -178,55 +176,6 @@ class MarketplaceService:
             logger.error(f"Error fetching user templates: {error_str}")
             raise
 
-    def _build_marketplace_base_query(self, filters: MarketplaceFilters):
-        query = self.db.table('agent_templates').select('*').eq('is_public', True)
-        
-        if filters.search:
-            search_term = f"%{filters.search}%"
-            query = query.ilike("name", search_term)
-        
-        if filters.is_epsilon_team is not None:
-            query = query.eq('is_epsilon_team', filters.is_epsilon_team)
-            
-        if filters.creator_id is not None:
-            query = query.eq('creator_id', filters.creator_id)
-        
-        if filters.tags:
-            for tag in filters.tags:
-                query = query.contains('tags', [tag])
-        
-        if filters.sort_by == "download_count":
-            query = query.order('download_count', desc=(filters.sort_order == "desc"))
-            query = query.order('marketplace_published_at', desc=True)
-        elif filters.sort_by == "newest":
-            query = query.order('marketplace_published_at', desc=True)
-        elif filters.sort_by == "name":
-            query = query.order('name', desc=(filters.sort_order == "desc"))
-        else:
-            query = query.order('download_count', desc=True)
-            query = query.order('marketplace_published_at', desc=True)
-        
-        return query
-
-    def _build_marketplace_count_query(self, filters: MarketplaceFilters):
-        query = self.db.table('agent_templates').select('*', count='exact').eq('is_public', True)
-        
-        if filters.search:
-            search_term = f"%{filters.search}%"
-            query = query.ilike("name", search_term)
-        
-        if filters.is_epsilon_team is not None:
-            query = query.eq('is_epsilon_team', filters.is_epsilon_team)
-            
-        if filters.creator_id is not None:
-            query = query.eq('creator_id', filters.creator_id)
-            
-        if filters.tags:
-            for tag in filters.tags:
-                query = query.contains('tags', [tag])
-                
-        return query
-
     def _build_user_templates_base_query(self, filters: MarketplaceFilters):
         query = self.db.table('agent_templates').select('*')
         
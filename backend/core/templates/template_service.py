@@ -221,6 +221,8 @@ class TemplateService:
         )
         
         await self._save_template(template)
+        if make_public:
+            await self._invalidate_marketplace()
         
         logger.debug(f"Created template {template.template_id} from agent {agent_id}")
         return template.template_id
@@ -300,57 +302,18 @@ class TemplateService:
         search: Optional[str] = None,
         tags: Optional[List[str]] = None
     ) -> List[AgentTemplate]:
-        client = await self._db.client
-        
-        query = client.table('agent_templates').select('*').eq('is_public', True)
-        
-        if is_epsilon_team is not None:
-            query = query.eq('is_epsilon_team', is_epsilon_team)
-        
-        if search:
-            query = query.ilike("name", f"%{search}%")
-        
-        if tags:
-            for tag in tags:
-                query = query.contains('tags', [tag])
-        
-        query = query.order('download_count', desc=True)\
-                    .order('marketplace_published_at', desc=True)
-        
-        if limit:
-            query = query.limit(limit)
-        if offset:
-            query = query.offset(offset)
-        
-        result = await query.execute()
-        
-        if not result.data:
-            return []
-        
-        creator_ids = list(set(template['creator_id'] for template in result.data))
-        
-        from core.utils.query_utils import batch_query_in
-        
-        accounts_data = await batch_query_in(
-            client=client,
-            table_name='accounts',
-            select_fields='id, name, slug',
-            in_field='id',
-            in_values=creator_ids,
-            schema='basejump'
+        from core.templates.services.marketplace_index import get_marketplace_index
+        
+        # Listing rows come from the marketplace projection, with creator_name denormalized
+        rows = await get_marketplace_index(self._db).list_templates(
+            is_epsilon_team=is_epsilon_team,
+            limit=limit,
+            offset=offset,
+            search=search,
+            tags=tags
         )
         
-        creator_names = {}
-        for account in accounts_data:
-            creator_names[account['id']] = account.get('name') or account.get('slug')
-        
-        templates = []
-        for template_data in result.data:
-            creator_name = creator_names.get(template_data['creator_id'])
-            template_data['creator_name'] = creator_name
-            templates.append(self._map_to_template(template_data))
-        
-        return templates
+        return [self._map_to_template({**row, 'is_public': True}) for row in rows]
     
     async def publish_template(
         self, 
@@ -378,6 +341,7 @@ class TemplateService:
         success = len(result.data) > 0
         if success:
             logger.debug(f"Published template {template_id}")
+            await self._invalidate_marketplace()
         
         return success
     
@@ -396,6 +360,7 @@ class TemplateService:
         success = len(result.data) > 0
         if success:
             logger.debug(f"Unpublished template {template_id}")
+            await self._invalidate_marketplace()
         
         return success
     
@@ -429,14 +394,17 @@ class TemplateService:
         success = len(result.data) > 0
         if success:
             logger.debug(f"Successfully deleted template {template_id}")
+            await self._invalidate_marketplace()
         
         return success
     
     async def increment_download_count(self, template_id: str) -> None:
-        client = await self._db.client
-        await client.rpc('increment_template_download_count', {
-            'template_id_param': template_id
-        }).execute()
+        from core.templates.services.marketplace_index import get_marketplace_index
+        await get_marketplace_index(self._db).record_download(template_id)
+    
+    async def _invalidate_marketplace(self) -> None:
+        from core.templates.services.marketplace_index import get_marketplace_index
+        await get_marketplace_index(self._db).invalidate()
     
     async def validate_access(self, template: AgentTemplate, user_id: str) -> None:
         if template.creator_id != user_id and not template.is_public:
@@ -17,7 +17,9 @@ from core.utils.config import config
     icon="Globe",
     color="bg-cyan-100 dark:bg-cyan-800/50",
     weight=60,
-    visible=True
+    visible=True,
+    timeout=300,
+    max_concurrency=1
 )
 class BrowserTool(SandboxToolsBase):
     """
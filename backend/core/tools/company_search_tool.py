@@ -19,7 +19,9 @@ from core.services.supabase import DBConnection
     icon="Building",
     color="bg-slate-100 dark:bg-slate-800/50",
     weight=260,
-    visible=True
+    visible=True,
+    timeout=180,
+    idempotent=True
 )
 class CompanySearchTool(Tool):
     def __init__(self, thread_manager: ThreadManager):
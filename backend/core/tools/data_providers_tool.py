@@ -14,7 +14,9 @@ from core.tools.data_providers.TwitterProvider import TwitterProvider
     icon="Database",
     color="bg-lime-100 dark:bg-lime-800/50",
     weight=140,
-    visible=True
+    visible=True,
+    timeout=120,
+    idempotent=True
 )
 class DataProvidersTool(Tool):
     """Tool for making requests to various data providers."""
@@ -14,7 +14,9 @@ from typing import Union, List
     icon="ImageSearch",
     color="bg-fuchsia-100 dark:bg-fuchsia-800/50",
     weight=130,
-    visible=True
+    visible=True,
+    timeout=60,
+    idempotent=True
 )
 class SandboxImageSearchTool(SandboxToolsBase):
     """Tool for performing image searches using SERPER API."""
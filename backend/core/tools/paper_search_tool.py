@@ -14,7 +14,9 @@ from core.agentpress.thread_manager import ThreadManager
     icon="GraduationCap",
     color="bg-emerald-100 dark:bg-emerald-800/50",
     weight=270,
-    visible=True
+    visible=True,
+    timeout=120,
+    idempotent=True
 )
 class PaperSearchTool(Tool):
     def __init__(self, thread_manager: ThreadManager):
@@ -19,7 +19,9 @@ from core.services.supabase import DBConnection
     icon="Users",
     color="bg-sky-100 dark:bg-sky-800/50",
     weight=250,
-    visible=True
+    visible=True,
+    timeout=180,
+    idempotent=True
 )
 class PeopleSearchTool(Tool):
     def __init__(self, thread_manager: ThreadManager):
@@ -1,5 +1,6 @@
 import json
 import os
+import httpx
 from typing import Optional, Dict, Any, List
 from core.agentpress.tool import openapi_schema, tool_metadata
 from core.sandbox.tool_base import SandboxToolsBase
@@ -735,6 +736,86 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
         
         return doc_html
     
+    async def _render_pdf(self, html_path: str, pdf_path: str, doc_id: str) -> Optional[str]:
+        """Print an HTML file in the sandbox to PDF. Returns an error message, or None on success.
+
+        Uses the sandbox server's shared browser pool; when the
+        /document/convert-to-pdf endpoint is missing (older images) or fails,
+        falls back to a one-off Playwright script.
+        """
+        try:
+            async with httpx.AsyncClient(timeout=60.0) as client:
+                response = await client.post(
+                    f"{self.sandbox_url}/document/convert-to-pdf",
+                    json={
+                        "html_path": html_path,
+                        "output_path": pdf_path,
+                        "format": "A4",
+                        "margin": "0.5in"
+                    }
+                )
+            if response.is_success:
+                timings = response.json()
+                logger.debug(f"PDF rendered by sandbox browser pool (wait {timings.get('wait_ms')}ms, render {timings.get('render_ms')}ms)")
+                return None
+            # Older images answer 404/405 (or another error) for the unknown route; the script reports real failures too
+            logger.warning(f"Sandbox PDF endpoint returned {response.status_code}, falling back to script: {response.text[:200]}")
+        except httpx.HTTPError as e:
+            logger.warning(f"Sandbox PDF endpoint unavailable, falling back to script: {e}")
+        
+        pdf_generation_script = f"""
+import asyncio
+from playwright.async_api import async_playwright
+import sys
+
+async def html_to_pdf():
+    try:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(
+                headless=True,
+                args=['--no-sandbox', '--disable-setuid-sandbox']
+            )
+            
+            page = await browser.new_page()
+            
+            await page.goto('file://{html_path}', wait_until='networkidle')
+            
+            await page.pdf(
+                path='{pdf_path}',
+                format='A4',
+                print_background=True,
+                margin={{
+                    'top': '0.5in',
+                    'right': '0.5in',
+                    'bottom': '0.5in',
+                    'left': '0.5in'
+                }}
+            )
+            
+            await browser.close()
+            
+    except Exception as e:
+        print(f"ERROR: {{str(e)}}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(html_to_pdf())
+"""
+        
+        script_path = f"/workspace/temp_pdf_script_{doc_id}.py"
+        await self.sandbox.fs.upload_file(pdf_generation_script.encode(), script_path)
+        
+        response = await self.sandbox.process.exec(
+            f"cd /workspace && python {script_path}",
+            timeout=30
+        )
+        
+        await self.sandbox.fs.delete_file(script_path)
+        
+        if response.exit_code != 0:
+            return response.result
+        return None
+    
     @openapi_schema({
         "type": "function",
         "function": {
@@ -799,67 +880,16 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
             
             logger.info(f"Creating PDF from document: {title}")
             
-            pdf_generation_script = f"""
-import asyncio
-from playwright.async_api import async_playwright
-import sys
-
-async def html_to_pdf():
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox']
-            )
-            
-            page = await browser.new_page()
-            
-            await page.goto('file://{temp_html_path}', wait_until='networkidle')
-            
-            pdf_filename = '{self._sanitize_filename(title)}_{doc_id}.pdf'
-            pdf_path = f'/workspace/docs/{{pdf_filename}}'
-            
-            await page.pdf(
-                path=pdf_path,
-                format='A4',
-                print_background=True,
-                margin={{
-                    'top': '0.5in',
-                    'right': '0.5in',
-                    'bottom': '0.5in',
-                    'left': '0.5in'
-                }}
-            )
-            
-            await browser.close()
-            
-            print(pdf_path)
-            return pdf_path
-            
-    except Exception as e:
-        print(f"ERROR: {{str(e)}}", file=sys.stderr)
-        sys.exit(1)
-
-if __name__ == "__main__":
-    pdf_path = asyncio.run(html_to_pdf())
-"""
-            
-            script_path = f"/workspace/temp_pdf_script_{doc_id}.py"
-            await self.sandbox.fs.upload_file(pdf_generation_script.encode(), script_path)
-            
-            response = await self.sandbox.process.exec(
-                f"cd /workspace && python {script_path}",
-                timeout=30
-            )
-            
-            await self.sandbox.fs.delete_file(temp_html_path)
-            await self.sandbox.fs.delete_file(script_path)
+            pdf_path = f"/workspace/docs/{self._sanitize_filename(title)}_{doc_id}.pdf"
+            try:
+                pdf_error = await self._render_pdf(temp_html_path, pdf_path, doc_id)
+            finally:
+                await self.sandbox.fs.delete_file(temp_html_path)
             
-            if response.exit_code != 0:
-                logger.error(f"PDF generation failed: {response.result}")
-                return self.fail_response(f"Failed to generate PDF: {response.result}")
+            if pdf_error:
+                logger.error(f"PDF generation failed: {pdf_error}")
+                return self.fail_response(f"Failed to generate PDF: {pdf_error}")
             
-            pdf_path = response.result.strip()
             pdf_filename = pdf_path.split('/')[-1]
             
             pdf_info = {
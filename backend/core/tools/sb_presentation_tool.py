@@ -2,14 +2,20 @@ from core.agentpress.tool import ToolResult, openapi_schema, tool_metadata
 from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
 from core.utils.logger import logger
+from core.utils.template_archives import get_template_archive
 from typing import List, Dict, Optional, Union
 import json
 import os
 from datetime import datetime
 import re
 import asyncio
+import shlex
+import uuid
 import httpx
 
+# Template archives already uploaded to a sandbox, named by template version
+SANDBOX_TEMPLATE_CACHE_DIR = "/tmp/presentation-templates"
+
 @tool_metadata(
     display_name="Presentations",
     description="Create and manage stunning presentation slides",
@@ -124,7 +130,10 @@ class SandboxPresentationTool(SandboxToolsBase):
             return ""
 
     async def _copy_template_to_workspace(self, template_name: str, presentation_name: str) -> str:
-        """Copy entire template directory structure to workspace using os.walk
+        """Copy entire template directory structure to workspace
+        
+        The template is extracted from its archive inside the sandbox; files are
+        uploaded one by one only if that fails.
         
         Returns:
             The presentation path in the workspace
@@ -139,37 +148,11 @@ class SandboxPresentationTool(SandboxToolsBase):
         # Ensure presentation directory exists
         await self._ensure_presentation_dir(presentation_name)
         
-        # Use os.walk to recursively copy all files
-        copied_files = []
-        for root, dirs, files in os.walk(template_path):
-            # Calculate relative path from template root
-            rel_path = os.path.relpath(root, template_path)
-            
-            # Create corresponding directory in workspace (if not root)
-            if rel_path != '.':
-                target_dir = os.path.join(presentation_path, rel_path)
-                target_dir_path = target_dir.replace('\\', '/')  # Normalize path separators
-                try:
-                    await self.sandbox.fs.create_folder(target_dir_path, "755")
-                except:
-                    pass  # Directory might already exist
-            else:
-                target_dir_path = presentation_path
-            
-            # Copy all files
-            for file in files:
-                source_file = os.path.join(root, file)
-                rel_file_path = os.path.relpath(source_file, template_path)
-                target_file = os.path.join(presentation_path, rel_file_path).replace('\\', '/')
-                
-                try:
-                    with open(source_file, 'rb') as f:
-                        file_content = f.read()
-                    await self.sandbox.fs.upload_file(file_content, target_file)
-                    copied_files.append(rel_file_path)
-                except Exception as e:
-                    # Log error but continue with other files
-                    print(f"Error copying {rel_file_path}: {str(e)}")
+        try:
+            await self._extract_template_archive(template_name, presentation_path)
+        except Exception as e:
+            logger.warning(f"Extracting template archive for {template_name} failed, copying files individually: {str(e)}")
+            await self._upload_template_files(template_path, presentation_path)
         
         # Update metadata.json with correct paths for the new presentation
         metadata = await self._load_presentation_metadata(presentation_path)
@@ -201,6 +184,65 @@ class SandboxPresentationTool(SandboxToolsBase):
         
         return presentation_path
 
+    async def _extract_template_archive(self, template_name: str, presentation_path: str):
+        """Extract a template into the presentation directory from its archive
+        
+        The archive is uploaded only when the sandbox doesn't have this template
+        version cached yet, so a copy takes one or three sandbox calls.
+        """
+        archive = get_template_archive(template_name, self.templates_dir)
+        cached_archive = f"{SANDBOX_TEMPLATE_CACHE_DIR}/{template_name}-{archive.version}.tar.gz"
+        extract = f"tar -xzf {shlex.quote(cached_archive)} -C {shlex.quote(presentation_path)}"
+        
+        response = await self.sandbox.process.exec(f"test -f {shlex.quote(cached_archive)} && {extract}", timeout=60)
+        if response.exit_code == 0:
+            logger.debug(f"Template {template_name} ({archive.version}) extracted from sandbox cache")
+            return
+        
+        upload_path = f"/tmp/{template_name}-{archive.version}-{uuid.uuid4().hex[:8]}.tar.gz"
+        await self.sandbox.fs.upload_file(archive.data, upload_path)
+        response = await self.sandbox.process.exec(
+            f"mkdir -p {SANDBOX_TEMPLATE_CACHE_DIR} && mv {shlex.quote(upload_path)} {shlex.quote(cached_archive)} && {extract}",
+            timeout=60
+        )
+        if response.exit_code != 0:
+            raise RuntimeError(response.result)
+        logger.debug(f"Template {template_name} ({archive.version}) uploaded as archive: {archive.file_count} files")
+
+    async def _upload_template_files(self, template_path: str, presentation_path: str):
+        """Copy a template file by file using os.walk"""
+        copied_files = []
+        for root, dirs, files in os.walk(template_path):
+            # Calculate relative path from template root
+            rel_path = os.path.relpath(root, template_path)
+            
+            # Create corresponding directory in workspace (if not root)
+            if rel_path != '.':
+                target_dir = os.path.join(presentation_path, rel_path)
+                target_dir_path = target_dir.replace('\\', '/')  # Normalize path separators
+                try:
+                    await self.sandbox.fs.create_folder(target_dir_path, "755")
+                except:
+                    pass  # Directory might already exist
+            else:
+                target_dir_path = presentation_path
+            
+            # Copy all files
+            for file in files:
+                source_file = os.path.join(root, file)
+                rel_file_path = os.path.relpath(source_file, template_path)
+                target_file = os.path.join(presentation_path, rel_file_path).replace('\\', '/')
+                
+                try:
+                    with open(source_file, 'rb') as f:
+                        file_content = f.read()
+                    await self.sandbox.fs.upload_file(file_content, target_file)
+                    copied_files.append(rel_file_path)
+                except Exception as e:
+                    # Log error but continue with other files
+                    print(f"Error copying {rel_file_path}: {str(e)}")
+        return copied_files
+
     def _extract_style_from_html(self, html_content: str) -> Dict:
         """Extract CSS styles and design patterns from HTML content"""
         style_info = {
@@ -1067,6 +1109,7 @@ print(json.dumps(result))
                         "pptx_file": f"{self.presentations_dir}/{safe_name}/{safe_name}.pptx",
                         "download_url": f"/workspace/downloads/{pptx_filename}",
                         "total_slides": result.get("total_slides"),
+                        "cached_slides": result.get("cached_slides", 0),
                         "stored_locally": True,
                         "note": "PPTX file is stored in /workspace/downloads/ and can be downloaded repeatedly"
                     })
@@ -1168,6 +1211,7 @@ print(json.dumps(result))
                         "pdf_file": f"{self.presentations_dir}/{safe_name}/{safe_name}.pdf",
                         "download_url": f"/workspace/downloads/{pdf_filename}",
                         "total_slides": result.get("total_slides"),
+                        "cached_slides": result.get("cached_slides", 0),
                         "stored_locally": True,
                         "note": "PDF file is stored in /workspace/downloads/ and can be downloaded repeatedly"
                     })
@@ -22,6 +22,155 @@ class Task(BaseModel):
     status: TaskStatus = TaskStatus.PENDING
     section_id: str  # Reference to section ID instead of section name
 
+def _parse_task_list(content: Any) -> tuple[List[Section], List[Task]]:
+    if isinstance(content, str):
+        content = json.loads(content)
+    
+    sections = [Section(**s) for s in content.get('sections', [])]
+    tasks = [Task(**t) for t in content.get('tasks', [])]
+    
+    # Handle migration from old format
+    if not sections and 'sections' in content:
+        # Create sections from old nested format
+        for old_section in content['sections']:
+            section = Section(title=old_section['title'])
+            sections.append(section)
+            
+            # Update tasks to reference section ID
+            for old_task in old_section.get('tasks', []):
+                task = Task(
+                    content=old_task['content'],
+                    status=TaskStatus(old_task.get('status', 'pending')),
+                    section_id=section.id
+                )
+                if 'id' in old_task:
+                    task.id = old_task['id']
+                tasks.append(task)
+    
+    return sections, tasks
+
+class TaskListState:
+    """Task list of a thread, loaded once per run and written back only when it changed.
+    
+    Agents update tasks after almost every step; re-reading and rewriting the
+    whole document on each call made traffic grow with run length. The state is
+    read once per run, and each tool call that changes it is written back right
+    away, so a stopped run loses nothing and write errors reach the tool result.
+    Once the list exists, a write sends only the tasks that changed since the
+    last write (patch_task_list), not the whole document.
+    """
+    
+    def __init__(self, thread_id: str, message_type: str = "task_list"):
+        self.thread_id = thread_id
+        self.message_type = message_type
+        self.sections: List[Section] = []
+        self.tasks: List[Task] = []
+        self.message_id: Optional[str] = None
+        self.loaded = False
+        self.dirty = False
+        # What the stored message holds, as of the last load or write; None
+        # when it is unknown (e.g. an old format), so the next write is a full one
+        self._stored: Optional[Dict[str, Any]] = None
+    
+    async def load(self, client) -> "TaskListState":
+        """Load the latest task list message. Safe to call repeatedly.
+        
+        Raises on read errors and stays unloaded, so the next call tries again
+        instead of starting from an empty list and writing it over the stored one.
+        """
+        if self.loaded:
+            return self
+        try:
+            result = await client.table('messages').select('message_id, content')\
+                .eq('thread_id', self.thread_id)\
+                .eq('type', self.message_type)\
+                .order('created_at', desc=True).limit(1).execute()
+        except Exception as e:
+            logger.error(f"Error loading data: {e}")
+            raise
+        
+        if result.data:
+            self.message_id = result.data[0].get('message_id')
+            content = result.data[0].get('content')
+            if content:
+                self.sections, self.tasks = _parse_task_list(content)
+                raw = json.loads(content) if isinstance(content, str) else content
+                self._stored = self.to_content() if raw == self.to_content() else None
+            else:
+                self._stored = None
+        
+        self.loaded = True
+        return self
+    
+    def replace(self, sections: List[Section], tasks: List[Task]):
+        self.sections = list(sections)
+        self.tasks = list(tasks)
+        self.dirty = True
+    
+    def to_content(self) -> Dict[str, Any]:
+        return {
+            'sections': [section.model_dump(mode='json') for section in self.sections],
+            'tasks': [task.model_dump(mode='json') for task in self.tasks]
+        }
+    
+    def _patch(self, content: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Arguments for patch_task_list that turn the stored list into content, or None if equal."""
+        stored_tasks = {task['id']: task for task in self._stored['tasks']}
+        current_ids = [task['id'] for task in content['tasks']]
+        remaining = set(current_ids)
+        deleted = [task_id for task_id in stored_tasks if task_id not in remaining]
+        changed = [task for task in content['tasks'] if stored_tasks.get(task['id']) != task]
+        sections = content['sections'] if content['sections'] != self._stored['sections'] else None
+        
+        # Changed tasks keep their place and new ones are appended; send the
+        # full order only when the list was rearranged some other way
+        expected_order = [task_id for task_id in stored_tasks if task_id not in deleted]
+        expected_order += [task_id for task_id in current_ids if task_id not in stored_tasks]
+        order = current_ids if current_ids != expected_order else None
+        
+        if not changed and not deleted and sections is None and order is None:
+            return None
+        return {
+            'p_message_id': self.message_id,
+            'p_sections': sections,
+            'p_tasks': changed,
+            'p_deleted_task_ids': deleted,
+            'p_task_order': order
+        }
+    
+    async def persist(self, client):
+        """Write the task list back if it changed since the last write. Raises on write errors."""
+        if not self.dirty:
+            return
+        try:
+            content = self.to_content()
+            if self.message_id and self._stored is not None:
+                patch = self._patch(content)
+                if patch is not None:
+                    result = await client.rpc('patch_task_list', patch).execute()
+                    if not result.data:
+                        # The message was deleted under us; start a new one
+                        self.message_id = None
+            elif self.message_id:
+                await client.table('messages').update({'content': content})\
+                    .eq('message_id', self.message_id).execute()
+            
+            if not self.message_id:
+                result = await client.table('messages').insert({
+                    'thread_id': self.thread_id,
+                    'type': self.message_type,
+                    'content': content,
+                    'is_llm_message': False,
+                    'metadata': {}
+                }).execute()
+                if result.data:
+                    self.message_id = result.data[0].get('message_id')
+            self._stored = content
+            self.dirty = False
+        except Exception as e:
+            logger.error(f"Error saving data: {e}")
+            raise
+
 @tool_metadata(
     display_name="Task Management",
     description="Create and track your action plan with organized to-do lists",
@@ -44,83 +193,24 @@ class TaskListTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.thread_id = thread_id
         self.task_list_message_type = "task_list"
+        self.state = TaskListState(thread_id=thread_id, message_type=self.task_list_message_type)
     
     async def _load_data(self) -> tuple[List[Section], List[Task]]:
-        """Load sections and tasks from storage"""
-        try:
+        """Load sections and tasks, from storage on first use in this run"""
+        if not self.state.loaded:
             client = await self.thread_manager.db.client
-            result = await client.table('messages').select('*')\
-                .eq('thread_id', self.thread_id)\
-                .eq('type', self.task_list_message_type)\
-                .order('created_at', desc=True).limit(1).execute()
-            
-            if result.data and result.data[0].get('content'):
-                content = result.data[0]['content']
-                if isinstance(content, str):
-                    content = json.loads(content)
-                
-                sections = [Section(**s) for s in content.get('sections', [])]
-                tasks = [Task(**t) for t in content.get('tasks', [])]
-                
-                # Handle migration from old format
-                if not sections and 'sections' in content:
-                    # Create sections from old nested format
-                    for old_section in content['sections']:
-                        section = Section(title=old_section['title'])
-                        sections.append(section)
-                        
-                        # Update tasks to reference section ID
-                        for old_task in old_section.get('tasks', []):
-                            task = Task(
-                                content=old_task['content'],
-                                status=TaskStatus(old_task.get('status', 'pending')),
-                                section_id=section.id
-                            )
-                            if 'id' in old_task:
-                                task.id = old_task['id']
-                            tasks.append(task)
-                
-                return sections, tasks
-            
-            # Return empty lists - no default section
-            return [], []
-            
-        except Exception as e:
-            logger.error(f"Error loading data: {e}")
-            return [], []
+            await self.state.load(client)
+        # Copies, so a call whose write fails leaves the stored list untouched
+        return [s.model_copy() for s in self.state.sections], [t.model_copy() for t in self.state.tasks]
     
     async def _save_data(self, sections: List[Section], tasks: List[Task]):
-        """Save sections and tasks to storage"""
+        """Record and write back sections and tasks; on a write error the previous list is kept"""
+        previous = (self.state.sections, self.state.tasks, self.state.dirty)
+        self.state.replace(sections, tasks)
         try:
-            client = await self.thread_manager.db.client
-            
-            content = {
-                'sections': [section.model_dump() for section in sections],
-                'tasks': [task.model_dump() for task in tasks]
-            }
-            
-            # Find existing message
-            result = await client.table('messages').select('message_id')\
-                .eq('thread_id', self.thread_id)\
-                .eq('type', self.task_list_message_type)\
-                .order('created_at', desc=True).limit(1).execute()
-            
-            if result.data:
-                # Update existing
-                await client.table('messages').update({'content': content})\
-                    .eq('message_id', result.data[0]['message_id']).execute()
-            else:
-                # Create new
-                await client.table('messages').insert({
-                    'thread_id': self.thread_id,
-                    'type': self.task_list_message_type,
-                    'content': content,
-                    'is_llm_message': False,
-                    'metadata': {}
-                }).execute()
-            
-        except Exception as e:
-            logger.error(f"Error saving data: {e}")
+            await self.state.persist(await self.thread_manager.db.client)
+        except Exception:
+            self.state.sections, self.state.tasks, self.state.dirty = previous
             raise
     
     def _format_response(self, sections: List[Section], tasks: List[Task]) -> Dict[str, Any]:
@@ -1,7 +1,7 @@
 from tavily import AsyncTavilyClient
 import httpx
 from dotenv import load_dotenv
-from core.agentpress.tool import Tool, ToolResult, openapi_schema, tool_metadata
+from core.agentpress.tool import Tool, ToolResult, openapi_schema, tool_metadata, method_metadata
 from core.utils.config import config
 from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
@@ -18,7 +18,9 @@ import logging
     icon="Search",
     color="bg-green-100 dark:bg-green-800/50",
     weight=30,
-    visible=True
+    visible=True,
+    timeout=180,
+    max_concurrency=4
 )
 class SandboxWebSearchTool(SandboxToolsBase):
     """Tool for performing web searches using Tavily API and web scraping using Firecrawl."""
@@ -40,6 +42,11 @@ class SandboxWebSearchTool(SandboxToolsBase):
         # Tavily asynchronous search client
         self.tavily_client = AsyncTavilyClient(api_key=self.tavily_api_key)
 
+    @method_metadata(
+        display_name="Web Search",
+        description="Search the web for up-to-date information",
+        idempotent=True
+    )
     @openapi_schema({
         "type": "function",
         "function": {
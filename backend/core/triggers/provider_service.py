@@ -14,6 +14,7 @@ from core.services.supabase import DBConnection
 from core.utils.logger import logger
 from core.utils.config import config, EnvMode
 from .trigger_service import Trigger, TriggerEvent, TriggerResult, TriggerType
+from .scheduler import SCHEDULER_WORKER, scheduler_mode, scheduler_running
 
 
 class TriggerProvider(ABC):
@@ -70,6 +71,20 @@ class ScheduleProvider(TriggerProvider):
         return config
     
     async def setup_trigger(self, trigger: Trigger) -> bool:
+        if scheduler_mode() == SCHEDULER_WORKER and not await scheduler_running():
+            logger.error(
+                f"TRIGGER_SCHEDULER=worker but no trigger scheduler is running "
+                f"(python -m core.triggers.scheduler); using Supabase Cron for trigger {trigger.trigger_id}"
+            )
+        elif scheduler_mode() == SCHEDULER_WORKER:
+            # Fired by the worker-side TriggerScheduler instead of a Supabase Cron job
+            trigger.config['scheduler'] = SCHEDULER_WORKER
+            trigger.config.pop('cron_job_name', None)
+            trigger.config.pop('cron_job_id', None)
+            logger.debug(f"Trigger {trigger.trigger_id} will be fired by the worker scheduler")
+            return True
+
+        trigger.config.pop('scheduler', None)
         try:
             # Note: webhook_url removed - scheduled triggers may need alternative configuration
             webhook_url = f"http://localhost:8000/api/triggers/{trigger.trigger_id}/webhook"
@@ -134,6 +149,10 @@ class ScheduleProvider(TriggerProvider):
             return False
     
     async def teardown_trigger(self, trigger: Trigger) -> bool:
+        if trigger.config.get('scheduler') == SCHEDULER_WORKER:
+            # The worker scheduler drops inactive or deleted triggers on its next reload
+            return True
+
         try:
             job_name = trigger.config.get('cron_job_name') or f"trigger_{trigger.trigger_id}"
             client = await self._db.client
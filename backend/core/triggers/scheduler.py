@@ -0,0 +1,400 @@
+"""
+Trigger Scheduler
+
+Worker-side scheduler for schedule triggers, as an alternative to one
+Supabase Cron HTTP job per trigger.
+
+With Supabase Cron every trigger fires its own HTTP request back to the
+webhook endpoint, so thousands of schedules on the same minute arrive as a
+thundering herd. The scheduler instead loads the active schedule triggers
+that opted in (config.scheduler == "worker", set by ScheduleProvider when
+TRIGGER_SCHEDULER=worker), keeps their next fire times in a heap, and on
+each tick:
+
+1. pops every trigger that is due,
+2. claims the due fires in one Redis round trip per batch (SET NX per fire,
+   so several scheduler replicas never fire a trigger twice),
+3. enqueues the claimed fires onto Dramatiq with a random delay, spreading a
+   large batch over a jitter window instead of starting every run at once.
+
+Each fire runs at most once. execute_scheduled_trigger records the fire
+before it starts the agent run, so a redelivered Dramatiq message never
+starts a second run for the same slot. The cost is that a worker crashing
+between that record and the dispatch loses that fire; the trigger fires
+again at its next scheduled time. A missed scheduled run is preferred to a
+duplicated one, which could send a report or message twice.
+
+Run with: python -m core.triggers.scheduler (the trigger-scheduler service
+in docker-compose). The scheduler refreshes a heartbeat in Redis, and
+ScheduleProvider keeps using Supabase Cron for new triggers while no
+scheduler is running, so TRIGGER_SCHEDULER=worker cannot silently stop
+triggers from firing.
+"""
+import asyncio
+import heapq
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import croniter
+import pytz
+
+from core.services.supabase import DBConnection
+from core.utils.logger import logger
+
+SCHEDULER_WORKER = "worker"
+
+# Seconds between reloads of the schedule triggers from the database
+RELOAD_INTERVAL = 30
+LOAD_PAGE_SIZE = 1000
+CLAIM_BATCH_SIZE = 500
+CLAIM_TTL = 3600
+# A batch of n fires is spread over min(MAX_JITTER_S, n * JITTER_PER_FIRE_S) seconds
+MAX_JITTER_S = 30.0
+JITTER_PER_FIRE_S = 0.05
+MAX_SLEEP_S = 5.0
+HEARTBEAT_KEY = "trigger_scheduler:heartbeat"
+HEARTBEAT_TTL = 3 * RELOAD_INTERVAL
+
+
+def scheduler_mode() -> str:
+    """Which scheduler new schedule triggers use: "cron" (Supabase Cron, default) or "worker"."""
+    return os.getenv("TRIGGER_SCHEDULER", "cron").strip().lower()
+
+
+def next_fire_time(cron_expression: str, user_timezone: str, after: float) -> float:
+    """Next fire time (epoch seconds) strictly after `after`, evaluated in the trigger's timezone."""
+    tz = pytz.timezone(user_timezone or 'UTC')
+    start = datetime.fromtimestamp(after, tz)
+    return croniter.croniter(cron_expression, start).get_next(float)
+
+
+async def scheduler_running() -> bool:
+    """Whether a TriggerScheduler refreshed its heartbeat recently."""
+    from core.services import redis
+    try:
+        return bool(await redis.get(HEARTBEAT_KEY))
+    except Exception as e:
+        logger.warning(f"Could not read the trigger scheduler heartbeat: {e}")
+        return False
+
+
+def _claim_key(trigger_id: str, fire_time: float) -> str:
+    return f"trigger_fire:{trigger_id}:{int(fire_time)}"
+
+
+def _execution_key(trigger_id: str, scheduled_time: str) -> str:
+    return f"trigger_fire_executed:{trigger_id}:{scheduled_time}"
+
+
+@dataclass
+class ScheduledTrigger:
+    trigger_id: str
+    agent_id: str
+    cron_expression: str
+    timezone: str
+    updated_at: str
+    next_fire: float
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any], now: float) -> "ScheduledTrigger":
+        config = row.get('config') or {}
+        user_timezone = config.get('timezone', 'UTC')
+        return cls(
+            trigger_id=row['trigger_id'],
+            agent_id=row['agent_id'],
+            cron_expression=config['cron_expression'],
+            timezone=user_timezone,
+            updated_at=row.get('updated_at', ''),
+            next_fire=next_fire_time(config['cron_expression'], user_timezone, now),
+        )
+
+
+@dataclass
+class DueFire:
+    trigger: ScheduledTrigger
+    fire_time: float
+
+
+class TriggerScheduler:
+    """
+    Heap of next fire times for worker-scheduled triggers.
+
+    Features:
+    - Incremental reload: only new or updated triggers are rescheduled
+    - Lazy heap deletion for removed or rescheduled triggers
+    - Missed fires are coalesced into one (no backfill after downtime)
+    - Batched claims through a Redis pipeline
+    - Jittered Dramatiq dispatch
+    """
+
+    def __init__(
+        self,
+        db: Optional[DBConnection] = None,
+        redis_client_factory: Optional[Callable] = None,
+        enqueue: Optional[Callable[[str, str, int], None]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            db: Database connection for loading triggers
+            redis_client_factory: Async callable returning the Redis client (default: core.services.redis.get_client)
+            enqueue: Called with (trigger_id, scheduled_time ISO string, delay_ms) per claimed fire
+                (default: run_scheduled_trigger Dramatiq actor)
+            clock: Time source (epoch seconds)
+        """
+        self._db = db or DBConnection()
+        self._redis_client_factory = redis_client_factory
+        self._enqueue = enqueue or _enqueue_with_dramatiq
+        self._clock = clock
+        self._heap: List[Tuple[float, str]] = []
+        self._entries: Dict[str, ScheduledTrigger] = {}
+        self._last_reload = 0.0
+        self.instance_id = str(uuid.uuid4())[:8]
+        self.stats = {"due": 0, "claimed": 0, "dispatched": 0, "lost_claims": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- Heap -----------------------------------------------------------------
+
+    def sync(self, rows: List[Dict[str, Any]], now: Optional[float] = None):
+        """
+        Reconcile the heap with the active triggers.
+
+        Args:
+            rows: agent_triggers rows (trigger_id, agent_id, config, updated_at)
+            now: Current time; new or changed triggers get their next fire after it
+        """
+        now = self._clock() if now is None else now
+        seen = set()
+        for row in rows:
+            trigger_id = row['trigger_id']
+            seen.add(trigger_id)
+            current = self._entries.get(trigger_id)
+            if current and current.updated_at == row.get('updated_at', ''):
+                continue
+            try:
+                entry = ScheduledTrigger.from_row(row, now)
+            except Exception as e:
+                logger.warning(f"Skipping schedule trigger {trigger_id} with invalid config: {e}")
+                self._entries.pop(trigger_id, None)
+                continue
+            self._entries[trigger_id] = entry
+            heapq.heappush(self._heap, (entry.next_fire, trigger_id))
+
+        for trigger_id in set(self._entries) - seen:
+            del self._entries[trigger_id]
+
+        # Drop stale heap entries once they dominate the heap
+        if len(self._heap) > 2 * max(len(self._entries), 1):
+            self._heap = [(entry.next_fire, trigger_id) for trigger_id, entry in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def pop_due(self, now: float, limit: Optional[int] = None) -> List[DueFire]:
+        """Pop triggers due at `now` and schedule their next fire."""
+        due = []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+            fire_time, trigger_id = heapq.heappop(self._heap)
+            entry = self._entries.get(trigger_id)
+            if entry is None or entry.next_fire != fire_time:
+                continue  # removed or rescheduled
+            due.append(DueFire(trigger=entry, fire_time=fire_time))
+            entry.next_fire = next_fire_time(entry.cron_expression, entry.timezone, max(now, fire_time))
+            heapq.heappush(self._heap, (entry.next_fire, trigger_id))
+        self.stats["due"] += len(due)
+        return due
+
+    def next_wakeup(self, now: float) -> float:
+        """Seconds until the next fire or reload, capped at MAX_SLEEP_S."""
+        next_fire = self._heap[0][0] if self._heap else now + MAX_SLEEP_S
+        next_reload = self._last_reload + RELOAD_INTERVAL
+        return max(0.0, min(next_fire - now, next_reload - now, MAX_SLEEP_S))
+
+    # --- Claim and dispatch ---------------------------------------------------
+
+    async def _redis(self):
+        if self._redis_client_factory is not None:
+            return await self._redis_client_factory()
+        from core.services import redis
+        return await redis.get_client()
+
+    async def claim(self, fires: List[DueFire]) -> List[DueFire]:
+        """
+        Claim fires so that exactly one scheduler replica dispatches each.
+
+        Args:
+            fires: Due fires
+
+        Returns:
+            The fires this scheduler won
+        """
+        claimed = []
+        client = await self._redis()
+        for start in range(0, len(fires), CLAIM_BATCH_SIZE):
+            batch = fires[start:start + CLAIM_BATCH_SIZE]
+            pipe = client.pipeline(transaction=False)
+            for fire in batch:
+                pipe.set(_claim_key(fire.trigger.trigger_id, fire.fire_time), self.instance_id, nx=True, ex=CLAIM_TTL)
+            results = await pipe.execute()
+            claimed.extend(fire for fire, won in zip(batch, results) if won)
+        self.stats["claimed"] += len(claimed)
+        self.stats["lost_claims"] += len(fires) - len(claimed)
+        return claimed
+
+    def dispatch(self, fires: List[DueFire]) -> List[int]:
+        """
+        Enqueue claimed fires with jitter.
+
+        Returns:
+            The delay (ms) given to each fire
+        """
+        window_s = min(MAX_JITTER_S, len(fires) * JITTER_PER_FIRE_S)
+        delays = []
+        for fire in fires:
+            delay_ms = int(random.uniform(0, window_s) * 1000)
+            scheduled_time = datetime.fromtimestamp(fire.fire_time, timezone.utc).isoformat()
+            try:
+                self._enqueue(fire.trigger.trigger_id, scheduled_time, delay_ms)
+                delays.append(delay_ms)
+            except Exception as e:
+                logger.error(f"Failed to enqueue scheduled trigger {fire.trigger.trigger_id}: {e}")
+        self.stats["dispatched"] += len(delays)
+        return delays
+
+    # --- Loop -----------------------------------------------------------------
+
+    async def load_rows(self) -> List[Dict[str, Any]]:
+        """Load active worker-scheduled triggers, page by page."""
+        client = await self._db.client
+        rows = []
+        offset = 0
+        while True:
+            result = await client.table('agent_triggers').select(
+                'trigger_id, agent_id, config, updated_at'
+            ).eq('trigger_type', 'schedule').eq('is_active', True).eq(
+                'config->>scheduler', SCHEDULER_WORKER
+            ).order('trigger_id').range(offset, offset + LOAD_PAGE_SIZE - 1).execute()
+            rows.extend(result.data or [])
+            if len(result.data or []) < LOAD_PAGE_SIZE:
+                return rows
+            offset += LOAD_PAGE_SIZE
+
+    async def reload(self):
+        rows = await self.load_rows()
+        self.sync(rows)
+        self._last_reload = self._clock()
+        client = await self._redis()
+        await client.set(HEARTBEAT_KEY, self.instance_id, ex=HEARTBEAT_TTL)
+        logger.debug(f"⏰ Trigger scheduler loaded {len(self._entries)} schedule triggers")
+
+    async def tick(self) -> int:
+        """Reload if due, then claim and dispatch every due fire. Returns the number dispatched."""
+        now = self._clock()
+        if now - self._last_reload >= RELOAD_INTERVAL:
+            await self.reload()
+        due = self.pop_due(now)
+        if not due:
+            return 0
+        claimed = await self.claim(due)
+        dispatched = len(self.dispatch(claimed))
+        logger.info(f"⏰ Dispatched {dispatched}/{len(due)} due schedule triggers")
+        return dispatched
+
+    async def run(self):
+        logger.info(f"⏰ Starting trigger scheduler {self.instance_id}")
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Trigger scheduler tick failed: {e}", exc_info=True)
+            await asyncio.sleep(self.next_wakeup(self._clock()))
+
+
+def _enqueue_with_dramatiq(trigger_id: str, scheduled_time: str, delay_ms: int):
+    from run_agent_background import run_scheduled_trigger
+    run_scheduled_trigger.send_with_options(
+        kwargs={"trigger_id": trigger_id, "scheduled_time": scheduled_time},
+        delay=delay_ms,
+    )
+
+
+async def execute_scheduled_trigger(db: DBConnection, trigger_id: str, scheduled_time: str) -> Dict[str, Any]:
+    """
+    Run a claimed fire the way the webhook endpoint does, without the HTTP round trip.
+
+    Runs at most once per fire: the fire is recorded before the agent run is
+    started, so a redelivered message is skipped and one slot never starts two
+    agent runs. A crash after the record loses the fire (see module docstring).
+
+    Args:
+        db: Database connection
+        trigger_id: Schedule trigger to fire
+        scheduled_time: Fire time (ISO, UTC)
+
+    Returns:
+        Execution result
+    """
+    from core.services import redis
+    from .execution_service import get_execution_service
+    from .trigger_service import TriggerEvent, get_trigger_service
+
+    try:
+        first_delivery = await redis.set(_execution_key(trigger_id, scheduled_time), "1", nx=True, ex=CLAIM_TTL)
+    except Exception as e:
+        logger.warning(f"Could not record execution of scheduled trigger {trigger_id}, running anyway: {e}")
+        first_delivery = True
+    if not first_delivery:
+        logger.info(f"Scheduled trigger {trigger_id} ({scheduled_time}) already executed, skipping redelivery")
+        return {"success": False, "error": "Already executed"}
+
+    trigger_service = get_trigger_service(db)
+    trigger = await trigger_service.get_trigger(trigger_id)
+    if not trigger or not trigger.is_active:
+        logger.debug(f"Scheduled trigger {trigger_id} was removed or disabled before it ran")
+        return {"success": False, "error": "Trigger not found or inactive"}
+
+    raw_data = {
+        "trigger_id": trigger_id,
+        "agent_id": trigger.agent_id,
+        "agent_prompt": trigger.config.get('agent_prompt'),
+        "timestamp": scheduled_time,
+    }
+    result = await trigger_service.process_trigger_event(trigger_id, raw_data)
+    if not result.success or not result.should_execute_agent:
+        return {"success": result.success, "error": result.error_message}
+
+    event = TriggerEvent(
+        trigger_id=trigger_id,
+        agent_id=trigger.agent_id,
+        trigger_type=trigger.trigger_type,
+        raw_data=raw_data,
+    )
+    return await get_execution_service(db).execute_trigger_result(
+        agent_id=trigger.agent_id,
+        trigger_result=result,
+        trigger_event=event,
+    )
+
+
+async def main():
+    from core.services import redis
+
+    db = DBConnection()
+    await db.initialize()
+    await redis.initialize_async()
+    try:
+        await TriggerScheduler(db).run()
+    finally:
+        await redis.close()
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
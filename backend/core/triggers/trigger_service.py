@@ -150,6 +150,7 @@ class TriggerService:
             from .provider_service import get_provider_service
             provider_service = get_provider_service(self._db)
 
+            config_before_setup = dict(trigger.config)
             if config_changed:
                 # For config changes, fully teardown and (re)setup if active
                 await provider_service.teardown_trigger(trigger)
@@ -165,6 +166,10 @@ class TriggerService:
                         raise ValueError(f"Failed to enable trigger: {trigger_id}")
                 else:
                     await provider_service.teardown_trigger(trigger)
+
+            # Persist provider-managed config (cron job name, scheduler)
+            if trigger.config != config_before_setup:
+                await self._update_trigger(trigger)
         
         logger.debug(f"Updated trigger {trigger_id}")
         return trigger
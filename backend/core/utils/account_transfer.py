@@ -0,0 +1,443 @@
+"""
+Bulk export and import of accounts' projects, threads, messages and agent runs.
+
+Exports read each table in keyset-paginated batches (ordered by primary key,
+children scoped to chunks of the account's threads) and append every batch
+to compressed files, so memory stays bounded by the batch size however large
+an account is:
+
+    <out>/<account_id>/<table>.ndjson.gz          (one gzip member per batch)
+    <out>/<account_id>/<table>/part-00001.parquet (one file per batch, needs pyarrow)
+
+A checkpoint.json next to the files records, per table, the last key and the
+file size or part count after each batch. An interrupted run resumes from
+there: a partially written batch is truncated away and read again. Imports
+upsert the files back in dependency order and checkpoint the rows imported.
+
+An import into another account (--target-account) copies the rows under new
+IDs: every primary key and the foreign keys between the exported tables are
+replaced by a UUID derived from the target account and the original ID, so
+the source account's rows are left alone and a resumed import writes the
+same IDs again.
+
+Accounts are processed in parallel, with every database call sharing one
+concurrency budget. After each account the exported or imported rows are
+compared with the counts in the database and written to manifest.json.
+
+Usage:
+    python -m core.utils.account_transfer export --accounts <id>[,<id>...] --out exports/
+    python -m core.utils.account_transfer import --accounts <id>[,<id>...] --src exports/ [--target-account <id>]
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core.services.supabase import DBConnection
+from core.utils.logger import logger
+
+BATCH_SIZE = 1000
+THREAD_CHUNK_SIZE = 100
+DB_CONCURRENCY = 8
+ACCOUNT_CONCURRENCY = 4
+CHECKPOINT_NAME = "checkpoint.json"
+MANIFEST_NAME = "manifest.json"
+FORMATS = ("ndjson", "parquet")
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    name: str
+    key: str
+    # Parent tables are filtered by account_id, the others by the account's threads
+    by_account: bool
+    # Columns referencing the keys of the tables before this one
+    references: Tuple[str, ...] = ()
+
+
+# Import order: every table after the ones it references
+TABLES = (
+    TableSpec("projects", "project_id", by_account=True),
+    TableSpec("threads", "thread_id", by_account=True, references=("project_id",)),
+    TableSpec("messages", "message_id", by_account=False, references=("thread_id",)),
+    TableSpec("agent_runs", "id", by_account=False, references=("thread_id",)),
+)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow, pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet files need pyarrow: pip install pyarrow")
+
+
+def _remap_id(target_account_id: str, value: Optional[str]) -> Optional[str]:
+    """ID of a copied row in the target account; the same for every run."""
+    if value is None:
+        return None
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{target_account_id}/{value}"))
+
+
+def _copy_row(spec: TableSpec, row: Dict[str, Any], target_account_id: str) -> Dict[str, Any]:
+    row = dict(row)
+    for column in (spec.key, *spec.references):
+        if column in row:
+            row[column] = _remap_id(target_account_id, row[column])
+    if spec.by_account:
+        row['account_id'] = target_account_id
+    return row
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+class _TableFiles:
+    """Batch-appendable files of one table in one format."""
+
+    def __init__(self, account_dir: Path, table: str, fmt: str):
+        self.fmt = fmt
+        if fmt == "ndjson":
+            self.path = account_dir / f"{table}.ndjson.gz"
+        else:
+            self.path = account_dir / table
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """Drop anything written after the last checkpointed batch."""
+        if self.fmt == "ndjson":
+            if self.path.exists():
+                with open(self.path, "r+b") as f:
+                    f.truncate(state.get("bytes", 0))
+            return
+        if self.path.exists():
+            for part in self.path.glob("part-*.parquet"):
+                if int(part.stem.split("-")[1]) > state.get("parts", 0):
+                    part.unlink()
+
+    def append(self, rows: List[Dict[str, Any]], state: Dict[str, Any]) -> None:
+        if self.fmt == "ndjson":
+            data = "".join(json.dumps(row, default=str) + "\n" for row in rows).encode()
+            with open(self.path, "ab") as f:
+                f.write(gzip.compress(data))
+                f.flush()
+                os.fsync(f.fileno())
+                state["bytes"] = f.tell()
+            return
+
+        pa, pq = _import_pyarrow()
+        self.path.mkdir(parents=True, exist_ok=True)
+        # JSON columns are stored as strings so batches share a flat schema
+        json_columns = sorted({k for row in rows for k, v in row.items() if isinstance(v, (dict, list))})
+        encoded = [{k: json.dumps(v) if k in json_columns and v is not None else v for k, v in row.items()} for row in rows]
+        table = pa.Table.from_pylist(encoded)
+        table = table.replace_schema_metadata({"json_columns": json.dumps(json_columns)})
+        part = state.get("parts", 0) + 1
+        pq.write_table(table, self.path / f"part-{part:05d}.parquet", compression="zstd")
+        state["parts"] = part
+
+    def iter_batches(self, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        # Tables without rows have no files
+        if not self.path.exists():
+            return
+        if self.fmt == "ndjson":
+            with gzip.open(self.path, "rt") as f:
+                while True:
+                    lines = list(islice(f, batch_size))
+                    if not lines:
+                        return
+                    yield [json.loads(line) for line in lines]
+
+        _, pq = _import_pyarrow()
+        for part in sorted(self.path.glob("part-*.parquet")):
+            parquet_file = pq.ParquetFile(part)
+            metadata = parquet_file.schema_arrow.metadata or {}
+            json_columns = set(json.loads(metadata.get(b"json_columns", b"[]")))
+            for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+                yield [
+                    {k: json.loads(v) if k in json_columns and v is not None else v for k, v in row.items()}
+                    for row in record_batch.to_pylist()
+                ]
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        for batch in self.iter_batches(BATCH_SIZE):
+            yield from batch
+
+
+class AccountTransfer:
+    """Exports and imports accounts with a shared database concurrency budget."""
+
+    def __init__(
+        self,
+        db: Optional[DBConnection] = None,
+        fmt: str = "ndjson",
+        batch_size: int = BATCH_SIZE,
+        thread_chunk_size: int = THREAD_CHUNK_SIZE,
+        db_concurrency: int = DB_CONCURRENCY,
+        account_concurrency: int = ACCOUNT_CONCURRENCY,
+    ):
+        """
+        Args:
+            db: Database connection (default: DBConnection())
+            fmt: File format, "ndjson" (gzip-compressed) or "parquet"
+            batch_size: Rows per query and per written batch
+            thread_chunk_size: Threads per query when exporting messages and agent runs
+            db_concurrency: Database calls in flight across all accounts
+            account_concurrency: Accounts processed at the same time
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+        if fmt == "parquet":
+            _import_pyarrow()
+        self._db = db or DBConnection()
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.thread_chunk_size = thread_chunk_size
+        self.account_concurrency = account_concurrency
+        self._db_slots = asyncio.Semaphore(db_concurrency)
+
+    async def _execute(self, query):
+        async with self._db_slots:
+            return await query.execute()
+
+    # --- Export --------------------------------------------------------------
+
+    async def export_accounts(self, account_ids: List[str], out_dir: str) -> Dict[str, Dict[str, Any]]:
+        """Export accounts into out_dir/<account_id>/. Returns each account's manifest."""
+        return await self._run_accounts(account_ids, lambda account_id: self.export_account(account_id, Path(out_dir) / account_id))
+
+    async def export_account(self, account_id: str, account_dir: Path) -> Dict[str, Any]:
+        account_dir.mkdir(parents=True, exist_ok=True)
+        checkpoint_path = account_dir / CHECKPOINT_NAME
+        checkpoint = self._load_checkpoint(checkpoint_path, "export")
+        client = await self._db.client
+        start = time.time()
+
+        for spec in TABLES:
+            state = checkpoint["tables"].setdefault(spec.name, {"rows": 0, "last_key": None, "done": False})
+            if state["done"]:
+                continue
+            files = _TableFiles(account_dir, spec.name, self.fmt)
+            files.restore(state)
+
+            if spec.by_account:
+                batches = self._account_batches(client, spec, account_id, state)
+            else:
+                batches = self._thread_batches(client, spec, account_dir, state)
+            async for rows in batches:
+                await asyncio.to_thread(files.append, rows, state)
+                state["rows"] += len(rows)
+                state["last_key"] = rows[-1][spec.key]
+                _write_json_atomic(checkpoint_path, checkpoint)
+
+            state["done"] = True
+            _write_json_atomic(checkpoint_path, checkpoint)
+            logger.debug(f"📤 Exported {state['rows']} {spec.name} rows for account {account_id}")
+
+        exported = {name: state["rows"] for name, state in checkpoint["tables"].items()}
+        manifest = await self._validate(client, account_id, exported)
+        manifest.update({"operation": "export", "format": self.fmt, "seconds": round(time.time() - start, 1)})
+        _write_json_atomic(account_dir / MANIFEST_NAME, manifest)
+        return manifest
+
+    async def _account_batches(self, client, spec: TableSpec, account_id: str, state: Dict[str, Any]):
+        while True:
+            query = client.table(spec.name).select('*').eq('account_id', account_id)
+            if state["last_key"]:
+                query = query.gt(spec.key, state["last_key"])
+            result = await self._execute(query.order(spec.key).limit(self.batch_size))
+            rows = result.data or []
+            if rows:
+                yield rows
+            if len(rows) < self.batch_size:
+                return
+
+    async def _thread_batches(self, client, spec: TableSpec, account_dir: Path, state: Dict[str, Any]):
+        """Rows of a child table, a chunk of the exported threads at a time."""
+        thread_ids = (row["thread_id"] for row in _TableFiles(account_dir, "threads", self.fmt).iter_rows())
+        # Threads before thread_offset are finished
+        thread_ids = islice(thread_ids, state.setdefault("thread_offset", 0), None)
+        while True:
+            chunk = list(islice(thread_ids, self.thread_chunk_size))
+            if not chunk:
+                return
+            while True:
+                query = client.table(spec.name).select('*').in_('thread_id', chunk)
+                if state["last_key"]:
+                    query = query.gt(spec.key, state["last_key"])
+                result = await self._execute(query.order(spec.key).limit(self.batch_size))
+                rows = result.data or []
+                if rows:
+                    yield rows
+                if len(rows) < self.batch_size:
+                    break
+            state["thread_offset"] += len(chunk)
+            state["last_key"] = None
+
+    # --- Import --------------------------------------------------------------
+
+    async def import_accounts(
+        self,
+        account_ids: List[str],
+        src_dir: str,
+        target_account_id: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Import exported accounts from src_dir/<account_id>/. Returns each account's manifest."""
+        if target_account_id and len(account_ids) > 1:
+            raise ValueError("target_account_id can only be used when importing a single account")
+        return await self._run_accounts(
+            account_ids,
+            lambda account_id: self.import_account(account_id, Path(src_dir) / account_id, target_account_id)
+        )
+
+    async def import_account(self, account_id: str, account_dir: Path, target_account_id: Optional[str] = None) -> Dict[str, Any]:
+        """Upsert an exported account, or copy it into another account under new IDs."""
+        if not account_dir.exists():
+            raise FileNotFoundError(f"No export for account {account_id} in {account_dir.parent}")
+        checkpoint_path = account_dir / f"import_{CHECKPOINT_NAME}"
+        checkpoint = self._load_checkpoint(checkpoint_path, "import")
+        client = await self._db.client
+        target = target_account_id or account_id
+        copy = target != account_id
+        start = time.time()
+
+        for spec in TABLES:
+            state = checkpoint["tables"].setdefault(spec.name, {"rows": 0, "done": False})
+            files = _TableFiles(account_dir, spec.name, self.fmt)
+            if state["done"] or not files.exists():
+                state["done"] = True
+                continue
+
+            # Upserts are idempotent, so skipping whole batches is enough to resume
+            skip = state["rows"]
+            for rows in files.iter_batches(self.batch_size):
+                if skip >= len(rows):
+                    skip -= len(rows)
+                    continue
+                rows, skip = rows[skip:], 0
+                if copy:
+                    rows = [_copy_row(spec, row, target) for row in rows]
+                await self._execute(client.table(spec.name).upsert(rows, on_conflict=spec.key))
+                state["rows"] += len(rows)
+                _write_json_atomic(checkpoint_path, checkpoint)
+
+            state["done"] = True
+            _write_json_atomic(checkpoint_path, checkpoint)
+            logger.debug(f"📥 Imported {state['rows']} {spec.name} rows into account {target}")
+
+        imported = {name: state["rows"] for name, state in checkpoint["tables"].items()}
+        manifest = await self._validate(client, target, imported, exact=False)
+        manifest.update({"operation": "import", "source_account_id": account_id, "seconds": round(time.time() - start, 1)})
+        _write_json_atomic(account_dir / f"import_{MANIFEST_NAME}", manifest)
+        return manifest
+
+    # --- Shared --------------------------------------------------------------
+
+    async def _run_accounts(self, account_ids: List[str], run) -> Dict[str, Dict[str, Any]]:
+        account_slots = asyncio.Semaphore(self.account_concurrency)
+        results: Dict[str, Dict[str, Any]] = {}
+
+        async def run_one(account_id: str):
+            async with account_slots:
+                try:
+                    results[account_id] = await run(account_id)
+                except Exception as e:
+                    logger.error(f"Account transfer failed for {account_id}: {e}")
+                    results[account_id] = {"account_id": account_id, "valid": False, "error": str(e)}
+
+        await asyncio.gather(*(run_one(account_id) for account_id in account_ids))
+        return results
+
+    def _load_checkpoint(self, path: Path, operation: str) -> Dict[str, Any]:
+        if path.exists():
+            with open(path, "r") as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("format") != self.fmt:
+                raise ValueError(f"{path} was written for format {checkpoint.get('format')}, not {self.fmt}")
+            logger.info(f"Resuming {operation} from {path}")
+            return checkpoint
+        return {"format": self.fmt, "tables": {}}
+
+    async def _count(self, client, spec: TableSpec, account_id: str) -> int:
+        if spec.by_account:
+            query = client.table(spec.name).select(spec.key, count='exact', head=True).eq('account_id', account_id)
+        else:
+            query = client.table(spec.name).select(f"{spec.key}, threads!inner(account_id)", count='exact', head=True)\
+                .eq('threads.account_id', account_id)
+        result = await self._execute(query)
+        return result.count or 0
+
+    async def _validate(self, client, account_id: str, transferred: Dict[str, int], exact: bool = True) -> Dict[str, Any]:
+        """Compare transferred row counts with the database.
+
+        Exports must match exactly; an import target may also hold rows of its own.
+        """
+        tables = {}
+        for spec in TABLES:
+            database = await self._count(client, spec, account_id)
+            tables[spec.name] = {"rows": transferred.get(spec.name, 0), "database": database}
+        valid = all(
+            counts["rows"] == counts["database"] if exact else counts["database"] >= counts["rows"]
+            for counts in tables.values()
+        )
+        if not valid:
+            logger.warning(f"Row counts for account {account_id} don't match the database: {tables}")
+        return {"account_id": account_id, "valid": valid, "tables": tables}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bulk export and import of account threads, messages and agent runs")
+    parser.add_argument("operation", choices=["export", "import"])
+    parser.add_argument("--accounts", required=True, help="Comma-separated account IDs")
+    parser.add_argument("--out", help="Export directory")
+    parser.add_argument("--src", help="Import directory")
+    parser.add_argument("--target-account", help="Copy a single account into this account ID, under new row IDs")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--db-concurrency", type=int, default=DB_CONCURRENCY)
+    parser.add_argument("--parallel-accounts", type=int, default=ACCOUNT_CONCURRENCY)
+    args = parser.parse_args()
+
+    db = DBConnection()
+    await db.initialize()
+    transfer = AccountTransfer(
+        db,
+        fmt=args.format,
+        batch_size=args.batch_size,
+        db_concurrency=args.db_concurrency,
+        account_concurrency=args.parallel_accounts,
+    )
+    account_ids = [a.strip() for a in args.accounts.split(",") if a.strip()]
+    if args.operation == "export":
+        if not args.out:
+            parser.error("export needs --out")
+        results = await transfer.export_accounts(account_ids, args.out)
+    else:
+        if not args.src:
+            parser.error("import needs --src")
+        results = await transfer.import_accounts(account_ids, args.src, args.target_account)
+
+    for account_id, manifest in results.items():
+        status = "✅" if manifest.get("valid") else "❌"
+        counts = ", ".join(f"{name}={c['rows']}/{c['database']}" for name, c in manifest.get("tables", {}).items())
+        print(f"{status} {account_id}: {counts or manifest.get('error')}")
+    await db.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -359,10 +359,14 @@ class Configuration:
     STRIPE_PRODUCT_ID_STAGING: Optional[str] = 'prod_SCgIj3G7yPOAWY'
     
     # Sandbox configuration
-    SANDBOX_IMAGE_NAME = "kortix/suna:0.1.3.24"
-    SANDBOX_SNAPSHOT_NAME = "kortix/suna:0.1.3.24"
+    SANDBOX_IMAGE_NAME = "kortix/suna:0.1.3.25"
+    SANDBOX_SNAPSHOT_NAME = "kortix/suna:0.1.3.25"
     SANDBOX_ENTRYPOINT = "/usr/bin/supervisord -n -c /etc/supervisor/conf.d/supervisord.conf"
 
+    # Context compaction: fold only messages appended since the last compaction
+    # (False = compress the full history with ContextManager every turn)
+    ENABLE_INCREMENTAL_COMPACTION: bool = True
+
     # LangFuse configuration
     LANGFUSE_PUBLIC_KEY: Optional[str] = None
     LANGFUSE_SECRET_KEY: Optional[str] = None
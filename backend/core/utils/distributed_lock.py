@@ -1,18 +1,65 @@
 import asyncio
+import os
+import time
 import uuid
-from typing import Optional
+from typing import Callable, List, Optional
 from datetime import datetime, timezone, timedelta
 from contextlib import asynccontextmanager
 from core.utils.logger import logger
 from core.services.supabase import DBConnection
 
-class DistributedLock:
+# "redis" (default) or "postgres", chosen once per process. The two backends
+# do not see each other's locks, so a Redis error fails the acquire instead of
+# switching some callers over to Postgres.
+LOCK_BACKEND = os.getenv("DISTRIBUTED_LOCK_BACKEND", "redis").strip().lower()
+
+# Fence counters of locks unused for this long are dropped
+FENCE_TTL_MS = 7 * 24 * 3600 * 1000
+
+# Takes the lock and issues its fencing token in one step. Tokens follow the
+# Redis clock (microseconds), so they keep increasing even if the fence
+# counter expires or is lost with a Redis restart.
+_ACQUIRE_SCRIPT = """
+if not redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return false
+end
+local now = redis.call('TIME')
+local token = math.max(tonumber(now[1]) * 1000000 + tonumber(now[2]), tonumber(redis.call('GET', KEYS[2]) or '0') + 1)
+redis.call('SET', KEYS[2], string.format('%d', token), 'PX', ARGV[3])
+return token
+"""
+
+# Delete and extend only while the caller still holds the lock
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('PUBLISH', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+_EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class LockLostError(RuntimeError):
+    """The lock expired or was taken over while a guarded write was about to run."""
+
+
+class PostgresDistributedLock:
+    """Lock row in distributed_locks, taken through the acquire_distributed_lock RPC."""
     def __init__(self, lock_key: str, timeout_seconds: int = 300, holder_id: Optional[str] = None):
         self.lock_key = lock_key
         self.timeout_seconds = timeout_seconds
         self.holder_id = holder_id or f"{uuid.uuid4()}"
         self.db = DBConnection()
         self._acquired = False
+        self.fencing_token: Optional[int] = None
     
     async def acquire(self, wait: bool = False, wait_timeout: int = 30) -> bool:
         client = await self.db.client
@@ -78,6 +125,234 @@ class DistributedLock:
         await self.release()
 
 
+class RedisDistributedLock:
+    """Lock key in Redis with fencing tokens.
+
+    Acquiring is SET NX PX plus an update of the lock's fence counter, so
+    every holder gets a larger fencing_token than the one before it. Waiters sleep
+    on the lock's release channel instead of polling, and while the lock is
+    held its lease is extended every timeout_seconds / 3.
+    """
+
+    def __init__(
+        self,
+        lock_key: str,
+        timeout_seconds: int = 300,
+        holder_id: Optional[str] = None,
+        auto_extend: bool = True,
+        redis_client_factory: Optional[Callable] = None
+    ):
+        self.lock_key = lock_key
+        self.timeout_seconds = timeout_seconds
+        self.holder_id = holder_id or f"{uuid.uuid4()}"
+        self.auto_extend = auto_extend
+        self.fencing_token: Optional[int] = None
+        self.lost = False
+        self._redis_client_factory = redis_client_factory
+        self._acquired = False
+        self._extend_task: Optional[asyncio.Task] = None
+        self._key = f"lock:{lock_key}"
+        self._fence_key = f"lock_fence:{lock_key}"
+        self._channel = f"lock_released:{lock_key}"
+
+    async def _redis(self):
+        if self._redis_client_factory is not None:
+            return await self._redis_client_factory()
+        from core.services import redis
+        return await redis.get_client()
+
+    async def _try_acquire(self, client) -> bool:
+        token = await client.eval(
+            _ACQUIRE_SCRIPT, 2, self._key, self._fence_key, self.holder_id, int(self.timeout_seconds * 1000), FENCE_TTL_MS
+        )
+        if not token:
+            return False
+        self._acquired = True
+        self.lost = False
+        self.fencing_token = int(token)
+        if self.auto_extend:
+            self._extend_task = asyncio.create_task(self._extend_loop())
+        logger.info(f"[LOCK] Acquired lock: {self.lock_key} by {self.holder_id} (fencing token {self.fencing_token})")
+        return True
+
+    async def acquire(self, wait: bool = False, wait_timeout: int = 30) -> bool:
+        """Raises on Redis errors."""
+        client = await self._redis()
+        if await self._try_acquire(client):
+            return True
+        if not wait:
+            logger.warning(f"[LOCK] Failed to acquire lock (no wait): {self.lock_key}")
+            return False
+
+        deadline = time.monotonic() + wait_timeout
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self._channel)
+        try:
+            while True:
+                # Subscribed before retrying, so a release in between is not missed
+                if await self._try_acquire(client):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"[LOCK] Lock acquisition timeout after {wait_timeout}s: {self.lock_key}")
+                    return False
+                # A holder that dies never publishes; wake up when its lease runs out at the latest
+                ttl_ms = await client.pttl(self._key)
+                timeout = min(remaining, ttl_ms / 1000) if ttl_ms and ttl_ms > 0 else min(remaining, 0.05)
+                await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        finally:
+            try:
+                await pubsub.unsubscribe(self._channel)
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    async def release(self) -> bool:
+        if not self._acquired:
+            return True
+        self._acquired = False
+        if self._extend_task is not None:
+            self._extend_task.cancel()
+            self._extend_task = None
+
+        try:
+            client = await self._redis()
+            released = await client.eval(_RELEASE_SCRIPT, 2, self._key, self._channel, self.holder_id)
+            if released:
+                logger.info(f"[LOCK] Released lock: {self.lock_key} by {self.holder_id}")
+            else:
+                logger.warning(f"[LOCK] Lock {self.lock_key} was no longer held by {self.holder_id} at release")
+            return bool(released)
+        except Exception as e:
+            logger.error(f"[LOCK] Error releasing lock {self.lock_key}: {e}")
+            return False
+
+    async def extend(self) -> bool:
+        """Reset the lease to timeout_seconds; False if the lock is no longer ours."""
+        client = await self._redis()
+        extended = await client.eval(_EXTEND_SCRIPT, 1, self._key, self.holder_id, int(self.timeout_seconds * 1000))
+        return bool(extended)
+
+    async def _extend_loop(self):
+        while self._acquired:
+            await asyncio.sleep(self.timeout_seconds / 3)
+            try:
+                if not await self.extend():
+                    self.lost = True
+                    logger.error(f"[LOCK] Lost lock {self.lock_key} held by {self.holder_id}")
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[LOCK] Failed to extend lock {self.lock_key}: {e}")
+
+    async def __aenter__(self):
+        acquired = await self.acquire(wait=True, wait_timeout=30)
+        if not acquired:
+            raise RuntimeError(f"Failed to acquire lock: {self.lock_key}")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+
+class DistributedLock:
+    """Redis lock, or the Postgres lock when DISTRIBUTED_LOCK_BACKEND=postgres.
+
+    The backend is fixed for the process. While Redis is unreachable the Redis
+    lock cannot be acquired (acquire returns False) rather than being replaced
+    by a Postgres lock that holders on Redis would not see.
+    """
+
+    def __init__(self, lock_key: str, timeout_seconds: int = 300, holder_id: Optional[str] = None):
+        self.lock_key = lock_key
+        self.timeout_seconds = timeout_seconds
+        self.holder_id = holder_id or f"{uuid.uuid4()}"
+        self._lock = None
+
+    @property
+    def fencing_token(self) -> Optional[int]:
+        return self._lock.fencing_token if self._lock is not None else None
+
+    @property
+    def backend(self) -> Optional[str]:
+        if self._lock is None:
+            return None
+        return "redis" if isinstance(self._lock, RedisDistributedLock) else "postgres"
+
+    async def acquire(self, wait: bool = False, wait_timeout: int = 30) -> bool:
+        if LOCK_BACKEND == "postgres":
+            self._lock = PostgresDistributedLock(self.lock_key, self.timeout_seconds, self.holder_id)
+            return await self._lock.acquire(wait=wait, wait_timeout=wait_timeout)
+
+        self._lock = RedisDistributedLock(self.lock_key, self.timeout_seconds, self.holder_id)
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            try:
+                return await self._lock.acquire(wait=wait, wait_timeout=max(0, deadline - time.monotonic()))
+            except Exception as e:
+                logger.error(f"[LOCK] Redis unavailable, not acquiring lock {self.lock_key}: {e}")
+                if not wait or time.monotonic() >= deadline:
+                    return False
+                await asyncio.sleep(1)
+
+    async def release(self) -> bool:
+        if self._lock is None:
+            return True
+        return await self._lock.release()
+
+    def fence_params(self) -> dict:
+        """RPC arguments that let a guarded write check the fencing token itself.
+
+        Functions that take p_lock_key and p_fencing_token (atomic_add_credits)
+        advance the fence in the same transaction as the write, so the check
+        cannot go stale before the write commits. Empty for the Postgres lock,
+        which has no fencing tokens.
+
+        Raises:
+            LockLostError: If the lock is not held
+        """
+        lock = self._lock
+        if lock is None or getattr(lock, "lost", False):
+            raise LockLostError(f"Lock {self.lock_key} is not held")
+        if lock.fencing_token is None:
+            return {}
+        return {'p_lock_key': self.lock_key, 'p_fencing_token': lock.fencing_token}
+
+    async def check_fence(self, client=None) -> None:
+        """Make sure this holder may still write, before a guarded write.
+
+        The fencing token is recorded by the database (advance_lock_fence), which
+        rejects any token older than one it has already seen, so a holder whose
+        lease expired cannot write after its successor did.
+
+        Raises:
+            LockLostError: If the lock was lost or a newer holder already wrote
+        """
+        lock = self._lock
+        if lock is None or getattr(lock, "lost", False):
+            raise LockLostError(f"Lock {self.lock_key} is not held")
+        if lock.fencing_token is None:
+            return
+        if client is None:
+            client = await DBConnection().client
+        result = await client.rpc('advance_lock_fence', {
+            'p_lock_key': self.lock_key,
+            'p_token': lock.fencing_token
+        }).execute()
+        if not result.data:
+            raise LockLostError(f"Fencing token {lock.fencing_token} for {self.lock_key} is stale")
+
+    async def __aenter__(self):
+        acquired = await self.acquire(wait=True, wait_timeout=30)
+        if not acquired:
+            raise RuntimeError(f"Failed to acquire lock: {self.lock_key}")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+
 @asynccontextmanager
 async def distributed_lock(lock_key: str, timeout_seconds: int = 300, wait: bool = True):
     lock = DistributedLock(lock_key, timeout_seconds)
@@ -143,6 +418,14 @@ class RenewalLock:
             return False
 
 
+def _parse_timestamp(value: Optional[str]) -> datetime:
+    """Parse a timestamptz from PostgREST; missing values count as infinitely old."""
+    if not value:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
 class WebhookLock:
     @staticmethod
     async def check_and_mark_webhook_processing(
@@ -192,6 +475,113 @@ class WebhookLock:
         
         return True, None
     
+    @staticmethod
+    async def record_webhook_received(
+        event_id: str,
+        event_type: str,
+        payload: dict = None,
+        customer_id: Optional[str] = None,
+        event_created_at: Optional[str] = None,
+        stale_after_seconds: int = 300
+    ) -> tuple[bool, Optional[str]]:
+        """Store an incoming event as pending. Returns (False, reason) for an event already received.
+
+        A redelivered event that is still pending or processing after
+        stale_after_seconds (its queue message was lost or its consumer died)
+        is accepted again so it gets re-enqueued.
+        """
+        db = DBConnection()
+        client = await db.client
+        
+        existing = await client.from_('webhook_events').select(
+            'id, status, retry_count, created_at, processing_started_at'
+        ).eq('event_id', event_id).execute()
+        
+        if existing.data:
+            event = existing.data[0]
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_after_seconds)
+            if event['status'] == 'pending' and _parse_timestamp(event.get('created_at')) < cutoff:
+                logger.info(f"[WEBHOOK] Re-enqueueing stale pending event {event_id}")
+                return True, None
+            if event['status'] == 'processing' and _parse_timestamp(event.get('processing_started_at')) < cutoff:
+                logger.info(f"[WEBHOOK] Requeueing event {event_id} stuck in processing")
+                result = await client.from_('webhook_events').update({
+                    'status': 'pending',
+                    'retry_count': (event.get('retry_count') or 0) + 1
+                }).eq('id', event['id']).eq('status', 'processing').execute()
+                return (True, None) if result.data else (False, 'processing')
+            if event['status'] != 'failed':
+                logger.info(f"[WEBHOOK] Event {event_id} already received ({event['status']})")
+                return False, event['status']
+            logger.info(f"[WEBHOOK] Requeueing previously failed event {event_id}")
+            await client.from_('webhook_events').update({
+                'status': 'pending',
+                'retry_count': (event.get('retry_count') or 0) + 1
+            }).eq('id', event['id']).execute()
+            return True, None
+        
+        try:
+            await client.from_('webhook_events').insert({
+                'event_id': event_id,
+                'event_type': event_type,
+                'status': 'pending',
+                'payload': payload,
+                'customer_id': customer_id,
+                'event_created_at': event_created_at
+            }).execute()
+            return True, None
+        except Exception as e:
+            if 'duplicate key' in str(e).lower() or 'unique' in str(e).lower():
+                logger.warning(f"[WEBHOOK] Event {event_id} was received concurrently")
+                return False, 'race_condition'
+            raise
+    
+    @staticmethod
+    async def requeue_stale_webhooks(stale_after_seconds: int = 300, limit: int = 500) -> List[str]:
+        """
+        Reset events stuck in processing and find events left pending.
+
+        Args:
+            stale_after_seconds: Age after which a pending or processing event is considered abandoned
+            limit: Maximum events of each status handled per call
+
+        Returns:
+            Customer keys whose pending events need to be enqueued again
+        """
+        db = DBConnection()
+        client = await db.client
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=stale_after_seconds)).isoformat()
+
+        stuck = await client.from_('webhook_events').select('id, event_id, customer_id, retry_count')\
+            .eq('status', 'processing').lt('processing_started_at', cutoff).limit(limit).execute()
+        customer_keys = []
+        for event in stuck.data or []:
+            result = await client.from_('webhook_events').update({
+                'status': 'pending',
+                'retry_count': (event.get('retry_count') or 0) + 1
+            }).eq('id', event['id']).eq('status', 'processing').execute()
+            if result.data:
+                logger.warning(f"[WEBHOOK] Requeued event {event['event_id']} stuck in processing")
+                customer_keys.append(event['customer_id'] or f"event:{event['event_id']}")
+
+        pending = await client.from_('webhook_events').select('event_id, customer_id')\
+            .eq('status', 'pending').lt('created_at', cutoff).limit(limit).execute()
+        customer_keys += [event['customer_id'] or f"event:{event['event_id']}" for event in pending.data or []]
+        return list(dict.fromkeys(customer_keys))
+
+    @staticmethod
+    async def claim_pending_webhook(event_id: str) -> bool:
+        """Move a pending event to processing; False if another consumer claimed it first."""
+        db = DBConnection()
+        client = await db.client
+        
+        result = await client.from_('webhook_events').update({
+            'status': 'processing',
+            'processing_started_at': datetime.now(timezone.utc).isoformat()
+        }).eq('event_id', event_id).eq('status', 'pending').execute()
+        
+        return bool(result.data)
+    
     @staticmethod
     async def mark_webhook_completed(event_id: str):
         db = DBConnection()
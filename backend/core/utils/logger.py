@@ -1,41 +1,437 @@
-import structlog, logging, os
+"""
+Structured logging for the backend.
+
+Log calls on the caller's thread only do the cheap work: level filtering,
+sampling, timestamping and capturing context variables. Rendering and
+writing happen on a background thread fed by a bounded queue, so hot paths
+(streamed chunks, tool execution) do not block on formatting or stdout.
+
+Environment:
+    LOGGING_LEVEL: default level (INFO in production, DEBUG elsewhere)
+    LOGGING_MODULE_LEVELS: per-module overrides, e.g.
+        "core.agentpress.response_processor=INFO,core.run=DEBUG"
+    LOGGING_SAMPLE_RATE: max events per second per sample_key (default 5)
+    LOGGING_CALLSITE: "true" to add filename/func_name/lineno (stack inspection per call)
+    LOGGING_ASYNC: "false" to render and write on the calling thread
+
+High-frequency debug events pass a sample_key and are rate limited per key;
+the next event that gets through reports how many were dropped:
+
+    logger.debug("Processing chunk #%s", chunk_count, sample_key="stream_chunk")
+
+Large payloads should be passed as positional arguments rather than
+embedded in f-strings, so they are only formatted if the event is emitted.
+Emitted events whose arguments are mutable (dicts, lists, objects) are
+formatted on the calling thread, so later changes do not leak into the log.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional, TextIO
+
+import structlog
 
 ENV_MODE = os.getenv("ENV_MODE", "LOCAL")
 
 # Set default logging level based on environment
 if ENV_MODE.upper() == "PRODUCTION":
-    default_level = "DEBUG"
+    default_level = "INFO"
 else:
-    default_level = "DEBUG" 
-    # default_level = "INFO"
+    default_level = "DEBUG"
 
 LOGGING_LEVEL = logging.getLevelNamesMapping().get(
-    os.getenv("LOGGING_LEVEL", default_level).upper(), 
-    logging.DEBUG  
+    os.getenv("LOGGING_LEVEL", default_level).upper(),
+    logging.DEBUG
 )
 
-renderer = [structlog.processors.JSONRenderer()]
-if ENV_MODE.lower() == "local".lower() or ENV_MODE.lower() == "staging".lower():
-    renderer = [structlog.dev.ConsoleRenderer(colors=True)]
+LOG_QUEUE_SIZE = 10_000
+_LEVELS = logging.getLevelNamesMapping()
 
-structlog.configure(
-    processors=[
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def parse_module_levels(spec: Optional[str]) -> Dict[str, int]:
+    """Parse "module=LEVEL,module=LEVEL" into {module: level}."""
+    levels = {}
+    for item in (spec or "").split(","):
+        module, _, level = item.partition("=")
+        level_value = logging.getLevelNamesMapping().get(level.strip().upper())
+        if module.strip() and level_value is not None:
+            levels[module.strip()] = level_value
+    return levels
+
+
+class ModuleLevelFilter:
+    """Drop events below the level configured for the module that logged them.
+
+    Only installed when LOGGING_MODULE_LEVELS is set. Finds the calling
+    module from the first frame outside structlog and this file; the longest
+    matching module prefix wins.
+    """
+
+    def __init__(self, default_level: int, module_levels: Dict[str, int]):
+        self.default_level = default_level
+        self.module_levels = module_levels
+        self._resolved: Dict[str, int] = {}
+
+    def _level_for(self, module: str) -> int:
+        level = self._resolved.get(module)
+        if level is None:
+            level = self.default_level
+            best = -1
+            for prefix, prefix_level in self.module_levels.items():
+                if (module == prefix or module.startswith(prefix + ".")) and len(prefix) > best:
+                    level, best = prefix_level, len(prefix)
+            self._resolved[module] = level
+        return level
+
+    def __call__(self, logger, method_name, event_dict):
+        frame = sys._getframe(1)
+        while frame is not None:
+            module = frame.f_globals.get("__name__", "")
+            if not module.startswith("structlog") and module != __name__:
+                break
+            frame = frame.f_back
+        level = _LEVELS.get(method_name.upper(), logging.INFO)
+        if level < self._level_for(module if frame is not None else ""):
+            raise structlog.DropEvent
+        return event_dict
+
+
+class RateLimitSampler:
+    """Rate limit events that carry a sample_key to a number per second per key."""
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self._windows: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, logger, method_name, event_dict):
+        key = event_dict.pop("sample_key", None)
+        if key is None:
+            return event_dict
+
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(key, [now, 0, 0])  # [window start, emitted, dropped]
+            if now - window[0] >= 1.0:
+                window[0], window[1] = now, 0
+            if window[1] >= self.per_second:
+                window[2] += 1
+                raise structlog.DropEvent
+            window[1] += 1
+            dropped, window[2] = window[2], 0
+
+        if dropped:
+            event_dict["sampled_out"] = dropped
+        return event_dict
+
+
+_IMMUTABLE_ARG_TYPES = (str, bytes, int, float, complex, bool, type(None))
+
+
+def _is_immutable(value) -> bool:
+    if isinstance(value, tuple):
+        return all(_is_immutable(item) for item in value)
+    return isinstance(value, _IMMUTABLE_ARG_TYPES)
+
+
+_format_positional_args = structlog.stdlib.PositionalArgumentsFormatter()
+
+
+def _freeze_mutable_args(logger, method_name, event_dict):
+    """Format the message on the calling thread if an argument could change before the writer renders it."""
+    args = event_dict.get("positional_args")
+    if args and not all(_is_immutable(arg) for arg in args):
+        return _format_positional_args(logger, method_name, event_dict)
+    return event_dict
+
+
+def _capture_exc_info(logger, method_name, event_dict):
+    """Resolve exc_info=True on the calling thread (sys.exc_info is thread local)."""
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+def _to_writer(logger, method_name, event_dict):
+    """Hand the event dict to the logger unrendered; the writer thread renders it."""
+    return (event_dict,), {}
+
+
+_timestamper = structlog.processors.TimeStamper(fmt="iso")
+
+
+class QueuedLogWriter:
+    """Renders and writes log events on a background thread.
+
+    Events are dropped instead of blocking when the queue is full; the
+    number dropped is reported in a warning event of its own. Remaining events are flushed at interpreter exit. The thread is
+    started on the first event of each process, so forked workers get
+    their own writer instead of queueing to a thread that does not exist.
+    """
+
+    def __init__(self, processors, stream: Optional[TextIO] = None, maxsize: int = LOG_QUEUE_SIZE):
+        self.processors = processors
+        self.stream = stream or sys.stdout
+        self.maxsize = maxsize
+        self.queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked child: the parent's thread is gone and its queue may hold half-written state
+                self.queue = queue.Queue(maxsize=self.maxsize)
+                self.dropped = 0
+            threading.Thread(target=self._run, args=(self.queue,), name="log-writer", daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, method_name: str, event_dict: dict):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((method_name, event_dict))
+        except queue.Full:
+            self.dropped += 1
+
+    def _render(self, method_name: str, event_dict: dict) -> Optional[str]:
+        event = event_dict.get("event")
+        try:
+            rendered = event_dict
+            for processor in self.processors:
+                rendered = processor(None, method_name, rendered)
+        except structlog.DropEvent:
+            return None
+        except Exception as e:
+            return f"log rendering failed: {e!r} for event {event!r}"
+        if isinstance(rendered, bytes):
+            return rendered.decode("utf-8", errors="replace")
+        return rendered if isinstance(rendered, str) else str(rendered)
+
+    def _run(self, events: "queue.Queue"):
+        while True:
+            method_name, event_dict = events.get()
+            try:
+                if self.dropped:
+                    dropped, self.dropped = self.dropped, 0
+                    self._write(self._render("warning", self._dropped_event(dropped)))
+                self._write(self._render(method_name, event_dict))
+            except Exception:
+                pass
+            finally:
+                events.task_done()
+
+    def _write(self, line: Optional[str]):
+        if line is not None:
+            print(line, file=self.stream, flush=True)
+
+    @staticmethod
+    def _dropped_event(dropped: int) -> dict:
+        """Event reporting dropped events, with the fields the caller processors would add."""
+        event = {"event": "Log queue full, events dropped", "dropped_events": dropped, "level": "warning"}
+        return _timestamper(None, "warning", event)
+
+    def flush(self):
+        """Block until every queued event has been written."""
+        if self._pid == os.getpid():
+            self.queue.join()
+
+
+class QueueLogger:
+    """structlog logger that forwards event dicts to a QueuedLogWriter."""
+
+    def __init__(self, writer: QueuedLogWriter):
+        self._writer = writer
+
+    def _make_method(method_name):
+        def method(self, event_dict):
+            self._writer.submit(method_name, event_dict)
+        return method
+
+    debug = _make_method("debug")
+    info = _make_method("info")
+    warning = warn = _make_method("warning")
+    error = exception = _make_method("error")
+    critical = fatal = _make_method("critical")
+    msg = _make_method("info")
+    del _make_method
+
+
+def _renderers():
+    if ENV_MODE.lower() == "local".lower() or ENV_MODE.lower() == "staging".lower():
+        # ConsoleRenderer formats exc_info itself
+        return [structlog.dev.ConsoleRenderer(colors=True)]
+    return [structlog.processors.dict_tracebacks, structlog.processors.JSONRenderer()]
+
+
+def make_lazy_filtering_bound_logger(min_level: int):
+    """
+    Like structlog.make_filtering_bound_logger, but positional arguments are
+    passed on unformatted (as positional_args) instead of being %-formatted
+    at the call site, so sampled-out or queued events are formatted late or
+    never. Levels below min_level stay no-ops.
+    """
+    base = structlog.make_filtering_bound_logger(min_level)
+
+    def make_method(name: str, level: int):
+        if level < min_level:
+            return getattr(base, name)
+
+        def meth(self, event, *args, **kw):
+            if args:
+                kw["positional_args"] = args
+            return self._proxy_to_logger(name, event, **kw)
+
+        meth.__name__ = name
+        return meth
+
+    def log(self, level, event, *args, **kw):
+        if level < min_level:
+            return None
+        if args:
+            kw["positional_args"] = args
+        return self._proxy_to_logger(logging.getLevelName(level).lower(), event, **kw)
+
+    methods = {
+        name: make_method(name, level)
+        for name, level in (
+            ("debug", logging.DEBUG),
+            ("info", logging.INFO),
+            ("warning", logging.WARNING),
+            ("warn", logging.WARNING),
+            ("error", logging.ERROR),
+            ("critical", logging.CRITICAL),
+            ("fatal", logging.CRITICAL),
+        )
+    }
+    methods["log"] = log
+    return type(f"Lazy{base.__name__}", (base,), methods)
+
+
+def build_processors(
+    level: int = LOGGING_LEVEL,
+    module_levels: Optional[Dict[str, int]] = None,
+    sample_rate: float = 5.0,
+    callsite: bool = False,
+    renderers=None,
+):
+    """
+    Build the processor chain.
+
+    Args:
+        level: Default minimum level
+        module_levels: Per-module minimum levels (module prefix -> level)
+        sample_rate: Max events per second per sample_key
+        callsite: Add filename, func_name and lineno (inspects the stack per call)
+        renderers: Final rendering processors (default: console locally, JSON otherwise)
+
+    Returns:
+        (processors that run on the calling thread, formatting and rendering processors)
+    """
+    # Cheap processors that must run on the calling thread
+    caller_processors = []
+    if module_levels:
+        caller_processors.append(ModuleLevelFilter(level, module_levels))
+    caller_processors += [
+        RateLimitSampler(sample_rate),
         structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.dict_tracebacks,
-        structlog.processors.CallsiteParameterAdder(
+        _capture_exc_info,
+    ]
+    if callsite:
+        caller_processors.append(structlog.processors.CallsiteParameterAdder(
             {
                 structlog.processors.CallsiteParameter.FILENAME,
                 structlog.processors.CallsiteParameter.FUNC_NAME,
                 structlog.processors.CallsiteParameter.LINENO,
             }
-        ),
+        ))
+    caller_processors += [
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.contextvars.merge_contextvars,
-        *renderer,
-    ],
+        _freeze_mutable_args,
+    ]
+
+    render_processors = [
+        structlog.stdlib.PositionalArgumentsFormatter(),
+        *(renderers if renderers is not None else _renderers()),
+    ]
+    return caller_processors, render_processors
+
+
+def build_logger(
+    level: int = LOGGING_LEVEL,
+    module_levels: Optional[Dict[str, int]] = None,
+    sample_rate: float = 5.0,
+    callsite: bool = False,
+    use_queue: bool = True,
+    stream: Optional[TextIO] = None,
+    renderers=None,
+):
+    """
+    Build a standalone bound logger with the backend's processor chain.
+
+    Args:
+        use_queue: Render and write on a background thread
+        stream: Output stream (default stdout)
+        (other arguments as for build_processors)
+
+    Returns:
+        (bound logger, QueuedLogWriter or None)
+    """
+    module_levels = module_levels or {}
+    caller_processors, render_processors = build_processors(level, module_levels, sample_rate, callsite, renderers)
+    wrapper_class = make_lazy_filtering_bound_logger(min([level, *module_levels.values()]))
+
+    if use_queue:
+        writer = QueuedLogWriter(render_processors, stream=stream)
+        return structlog.wrap_logger(
+            QueueLogger(writer),
+            processors=[*caller_processors, _to_writer],
+            wrapper_class=wrapper_class,
+            cache_logger_on_first_use=True,
+        ), writer
+
+    return structlog.wrap_logger(
+        structlog.PrintLogger(stream or sys.stdout),
+        processors=[*caller_processors, *render_processors],
+        wrapper_class=wrapper_class,
+        cache_logger_on_first_use=True,
+    ), None
+
+
+MODULE_LEVELS = parse_module_levels(os.getenv("LOGGING_MODULE_LEVELS"))
+SAMPLE_RATE = float(os.getenv("LOGGING_SAMPLE_RATE", "5"))
+CALLSITE = _env_flag("LOGGING_CALLSITE", False)
+ASYNC_LOGGING = _env_flag("LOGGING_ASYNC", True)
+
+_caller_processors, _render_processors = build_processors(LOGGING_LEVEL, MODULE_LEVELS, SAMPLE_RATE, CALLSITE)
+log_writer: Optional[QueuedLogWriter] = QueuedLogWriter(_render_processors) if ASYNC_LOGGING else None
+
+structlog.configure(
+    processors=[*_caller_processors, _to_writer] if log_writer else [*_caller_processors, *_render_processors],
+    logger_factory=(lambda *args: QueueLogger(log_writer)) if log_writer else structlog.PrintLoggerFactory(),
     cache_logger_on_first_use=True,
-    wrapper_class=structlog.make_filtering_bound_logger(LOGGING_LEVEL),
+    wrapper_class=make_lazy_filtering_bound_logger(min([LOGGING_LEVEL, *MODULE_LEVELS.values()])),
 )
 
 logger: structlog.stdlib.BoundLogger = structlog.get_logger()
+
+
+def flush_logs():
+    """Wait until queued log events are written (e.g. before a worker exits)."""
+    if log_writer:
+        log_writer.flush()
@@ -1,9 +1,143 @@
 """
 Query utilities for handling large datasets and avoiding URI length limits.
 """
-from typing import List, Any, Dict, Optional
+import asyncio
+from typing import List, Any, Awaitable, Callable, Dict, Optional, AsyncIterator
+from urllib.parse import quote
 from core.utils.logger import logger
 
+# PostgREST sits behind proxies that commonly reject request lines over ~8KB.
+# Leave headroom for the host, path, select list and other filters.
+DEFAULT_MAX_URI_LENGTH = 6000
+
+# Upper bound on concurrent batch requests issued by a single call
+DEFAULT_MAX_CONCURRENCY = 5
+
+
+def _dedupe_values(in_values: List[Any]) -> List[Any]:
+    """Remove duplicate values while preserving the original order."""
+    try:
+        return list(dict.fromkeys(in_values))
+    except TypeError:
+        # Unhashable values - fall back to a linear scan
+        unique = []
+        for value in in_values:
+            if value not in unique:
+                unique.append(value)
+        return unique
+
+
+def _split_batches(in_values: List[Any], batch_size: int, max_uri_length: Optional[int]) -> List[List[Any]]:
+    """Split values into batches bounded by both count and encoded URI length.
+
+    Short values (e.g. UUIDs) are packed up to batch_size; long values produce
+    smaller batches so the generated `in.(...)` filter stays under max_uri_length.
+    """
+    batches = []
+    current: List[Any] = []
+    current_length = 0
+
+    for value in in_values:
+        # Encoded value plus the separating comma
+        value_length = len(quote(str(value), safe='')) + 3
+        over_length = max_uri_length is not None and current and current_length + value_length > max_uri_length
+        if len(current) >= batch_size or over_length:
+            batches.append(current)
+            current = []
+            current_length = 0
+        current.append(value)
+        current_length += value_length
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _build_query(
+    client,
+    table_name: str,
+    select_fields: str,
+    in_field: str,
+    batch_values: List[Any],
+    additional_filters: Optional[Dict[str, Any]] = None,
+    schema: Optional[str] = None
+):
+    query = client.schema(schema).from_(table_name) if schema else client.table(table_name)
+    query = query.select(select_fields).in_(in_field, batch_values)
+
+    # Apply additional filters
+    if additional_filters:
+        for field, value in additional_filters.items():
+            if field.endswith('_gte'):
+                query = query.gte(field[:-4], value)
+            elif field.endswith('_eq'):
+                query = query.eq(field[:-3], value)
+            else:
+                query = query.eq(field, value)
+
+    return query
+
+
+def _batch_runner(
+    client,
+    table_name: str,
+    select_fields: str,
+    in_field: str,
+    additional_filters: Optional[Dict[str, Any]],
+    schema: Optional[str],
+    max_concurrency: int
+) -> Callable[[List[Any]], Awaitable[List[Dict[str, Any]]]]:
+    """Return a coroutine function that queries one batch, with at most max_concurrency in flight."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_batch(batch_values: List[Any]) -> List[Dict[str, Any]]:
+        async with semaphore:
+            query = _build_query(client, table_name, select_fields, in_field, batch_values, additional_filters, schema)
+            result = await query.execute()
+            return result.data or []
+
+    return run_batch
+
+
+async def iter_batch_query_in(
+    client,
+    table_name: str,
+    select_fields: str,
+    in_field: str,
+    in_values: List[Any],
+    batch_size: int = 100,
+    additional_filters: Optional[Dict[str, Any]] = None,
+    schema: Optional[str] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_uri_length: Optional[int] = DEFAULT_MAX_URI_LENGTH,
+    dedupe: bool = True
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Stream the results of a batched .in_() query as each batch completes.
+
+    Batches run concurrently (bounded by max_concurrency) and are yielded in
+    completion order, so callers can start processing before the slowest batch
+    returns. Arguments are the same as batch_query_in.
+
+    Yields:
+        List of records returned by one batch
+    """
+    if not in_values:
+        return
+
+    values = _dedupe_values(in_values) if dedupe else list(in_values)
+    batches = _split_batches(values, batch_size, max_uri_length)
+    run_batch = _batch_runner(client, table_name, select_fields, in_field, additional_filters, schema, max_concurrency)
+
+    tasks = [asyncio.create_task(run_batch(batch)) for batch in batches]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            yield await completed
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
 
 async def batch_query_in(
     client,
@@ -13,11 +147,14 @@ async def batch_query_in(
     in_values: List[Any],
     batch_size: int = 100,
     additional_filters: Optional[Dict[str, Any]] = None,
-    schema: Optional[str] = None
+    schema: Optional[str] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_uri_length: Optional[int] = DEFAULT_MAX_URI_LENGTH,
+    dedupe: bool = True
 ) -> List[Dict[str, Any]]:
     """
     Execute a query with .in_() filtering, automatically batching large arrays to avoid URI limits.
-    
+
     Args:
         client: Supabase client
         table_name: Name of the table to query
@@ -27,55 +164,35 @@ async def batch_query_in(
         batch_size: Maximum number of values per batch (default: 100)
         additional_filters: Optional dict of additional filters to apply
         schema: Optional schema name (for basejump tables)
-    
+        max_concurrency: Maximum number of batches in flight at once (1 = sequential)
+        max_uri_length: Approximate budget for the encoded IN list; batches shrink
+            when values are long. None disables length-based sizing.
+        dedupe: Drop duplicate values before querying
+
     Returns:
-        List of all matching records from all batches
+        List of all matching records from all batches, in batch order
     """
     if not in_values:
         return []
-    
-    all_results = []
-    
+
+    values = _dedupe_values(in_values) if dedupe else list(in_values)
+    batches = _split_batches(values, batch_size, max_uri_length)
+
     # If values list is small, do a single query
-    if len(in_values) <= batch_size:
-        query = client.schema(schema).from_(table_name) if schema else client.table(table_name)
-        query = query.select(select_fields).in_(in_field, in_values)
-        
-        # Apply additional filters
-        if additional_filters:
-            for field, value in additional_filters.items():
-                if field.endswith('_gte'):
-                    query = query.gte(field[:-4], value)
-                elif field.endswith('_eq'):
-                    query = query.eq(field[:-3], value)
-                else:
-                    query = query.eq(field, value)
-        
+    if len(batches) == 1:
+        query = _build_query(client, table_name, select_fields, in_field, batches[0], additional_filters, schema)
         result = await query.execute()
         return result.data or []
-    
+
     # Batch processing for large arrays
-    logger.debug(f"Batching {len(in_values)} {in_field} values into chunks of {batch_size}")
-    
-    for i in range(0, len(in_values), batch_size):
-        batch_values = in_values[i:i + batch_size]
-        
-        query = client.schema(schema).from_(table_name) if schema else client.table(table_name)
-        query = query.select(select_fields).in_(in_field, batch_values)
-        
-        # Apply additional filters
-        if additional_filters:
-            for field, value in additional_filters.items():
-                if field.endswith('_gte'):
-                    query = query.gte(field[:-4], value)
-                elif field.endswith('_eq'):
-                    query = query.eq(field[:-3], value)
-                else:
-                    query = query.eq(field, value)
-        
-        batch_result = await query.execute()
-        if batch_result.data:
-            all_results.extend(batch_result.data)
-    
+    logger.debug(f"Batching {len(values)} {in_field} values into {len(batches)} chunks (max {batch_size}, concurrency {max_concurrency})")
+
+    run_batch = _batch_runner(client, table_name, select_fields, in_field, additional_filters, schema, max_concurrency)
+    batch_results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+
+    all_results = []
+    for batch_data in batch_results:
+        all_results.extend(batch_data)
+
     logger.debug(f"Batched query returned {len(all_results)} total results")
     return all_results
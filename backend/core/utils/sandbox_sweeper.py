@@ -0,0 +1,318 @@
+"""
+Sandbox fleet sweeper.
+
+Shared runner for the sandbox maintenance scripts in core/utils/scripts
+(archive stopped sandboxes, stop started sandboxes, delete free users'
+sandboxes). A script only provides a SweepPolicy: which sandboxes to look
+at, whether to act on one, and the Daytona call to make. The sweeper:
+
+- processes sandboxes with a bounded pool of workers, running the blocking
+  Daytona SDK calls in threads
+- rate limits Daytona calls with a token bucket shared by all workers
+- checkpoints progress to a JSON file (sandboxes are processed in ID order,
+  so the checkpoint is a cursor plus the few IDs finished past it) and skips
+  finished sandboxes when the same sweep is started again; sandboxes that
+  failed are retried. A sweep that gets through every sandbox deletes its
+  checkpoint, so the next run starts over and sees sandboxes created since
+- supports dry runs, where policies decide but never act
+- logs progress (rate, ETA, outcomes) while it runs and returns the totals
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from core.utils.logger import logger
+
+CONCURRENCY = 8
+RATE_PER_SECOND = 5.0
+PROGRESS_INTERVAL = 10.0
+CHECKPOINT_INTERVAL = 1.0
+
+
+def sandbox_state(sandbox) -> str:
+    """Lower-case state of an SDK sandbox (SandboxState enum or string)."""
+    state = getattr(sandbox, 'state', None)
+    return str(getattr(state, 'value', state) or '').lower()
+
+
+@dataclass
+class SweepTarget:
+    sandbox_id: str
+    state: Optional[str] = None
+    # The SDK object when the target came from Daytona.list()
+    sandbox: Any = field(default=None, repr=False, compare=False)
+
+
+class SweepPolicy:
+    """What a sweep does. Subclasses set name and implement targets() and act()."""
+
+    name = "sweep"
+
+    def targets(self, daytona) -> Iterable[SweepTarget]:
+        """Sandboxes to consider (runs in a thread, may call Daytona)."""
+        raise NotImplementedError
+
+    async def decide(self, target: SweepTarget) -> Tuple[bool, str]:
+        """Whether to act on a sandbox, and the outcome to count when not acting."""
+        return True, "selected"
+
+    def act(self, daytona, target: SweepTarget) -> str:
+        """Make the Daytona call for a sandbox (runs in a thread). Returns the outcome to count."""
+        raise NotImplementedError
+
+    def dry_run_outcome(self) -> str:
+        return f"would_{self.name}"
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` calls per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SweepCheckpoint:
+    """Resume state of a sweep.
+
+    Every sandbox ID <= cursor is finished except those in `failed`, which
+    are retried on the next run; `done` holds IDs finished past the cursor.
+    """
+
+    def __init__(self, path: Optional[str], policy_name: str):
+        self.path = path
+        self.policy_name = policy_name
+        self.cursor: Optional[str] = None
+        self.done: set = set()
+        self.failed: set = set()
+        self.outcomes: Dict[str, int] = {}
+        self._saved_at = 0.0
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get("policy") != policy_name:
+                raise ValueError(f"Checkpoint {path} belongs to sweep '{data.get('policy')}', not '{policy_name}'")
+            self.cursor = data.get("cursor")
+            self.done = set(data.get("done", []))
+            self.failed = set(data.get("failed", []))
+            self.outcomes = data.get("outcomes", {})
+            logger.info(f"Resuming {policy_name} sweep from {path} (cursor {self.cursor}, {len(self.failed)} failed to retry)")
+
+    def is_done(self, sandbox_id: str) -> bool:
+        if sandbox_id in self.done:
+            return True
+        return self.cursor is not None and sandbox_id <= self.cursor and sandbox_id not in self.failed
+
+    def record(self, sandbox_id: str, outcome: str):
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        if outcome == "error":
+            self.failed.add(sandbox_id)
+        else:
+            self.failed.discard(sandbox_id)
+            self.done.add(sandbox_id)
+
+    def advance(self, sandbox_id: str):
+        """Move the cursor to sandbox_id, once every sandbox before it has finished."""
+        if self.cursor is None or sandbox_id > self.cursor:
+            self.cursor = sandbox_id
+        self.done.discard(sandbox_id)
+
+    def clear(self):
+        """Forget the sweep's progress once it has finished."""
+        self.cursor = None
+        self.done.clear()
+        self.failed.clear()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def save(self, force: bool = False):
+        if not self.path or (not force and time.monotonic() - self._saved_at < CHECKPOINT_INTERVAL):
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({
+                "policy": self.policy_name,
+                "cursor": self.cursor,
+                "done": sorted(self.done),
+                "failed": sorted(self.failed),
+                "outcomes": self.outcomes,
+                "updated_at": time.time(),
+            }, f, indent=2)
+        os.replace(tmp, self.path)
+        self._saved_at = time.monotonic()
+
+
+class SandboxSweeper:
+    def __init__(
+        self,
+        policy: SweepPolicy,
+        daytona=None,
+        concurrency: int = CONCURRENCY,
+        rate_per_second: float = RATE_PER_SECOND,
+        checkpoint_path: Optional[str] = None,
+        dry_run: bool = False,
+        limit: Optional[int] = None,
+        progress_interval: float = PROGRESS_INTERVAL,
+    ):
+        """
+        Args:
+            policy: What to sweep
+            daytona: Daytona client (default: Daytona() from the daytona SDK)
+            concurrency: Sandboxes processed at the same time
+            rate_per_second: Daytona calls per second across all workers (0 = unlimited)
+            checkpoint_path: JSON file to resume from and save progress to (None = no checkpoint)
+            dry_run: Decide, but don't make any Daytona changes
+            limit: Process at most this many sandboxes in this run
+            progress_interval: Seconds between progress logs
+        """
+        self.policy = policy
+        self._daytona = daytona
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate_per_second)
+        # Dry runs don't move the cursor of the real sweep
+        self.checkpoint = SweepCheckpoint(None if dry_run else checkpoint_path, policy.name)
+        self.dry_run = dry_run
+        self.limit = limit
+        self.progress_interval = progress_interval
+        self.stats: Dict[str, Any] = {"total": 0, "skipped_done": 0, "processed": 0, "errors": 0, "outcomes": {}}
+
+    @property
+    def daytona(self):
+        if self._daytona is None:
+            from daytona import Daytona
+            self._daytona = Daytona()
+        return self._daytona
+
+    async def run(self) -> Dict[str, Any]:
+        """Sweep every target once. Returns counts of outcomes for this run."""
+        await self.rate_limiter.acquire()
+        targets = await asyncio.to_thread(lambda: list(self.policy.targets(self.daytona)))
+        targets.sort(key=lambda t: t.sandbox_id)
+        self.stats["total"] = len(targets)
+
+        todo = [t for t in targets if not self.checkpoint.is_done(t.sandbox_id)]
+        self.stats["skipped_done"] = len(targets) - len(todo)
+        complete = not self.limit or len(todo) <= self.limit
+        if self.limit:
+            todo = todo[:self.limit]
+        logger.info(
+            f"🧹 {self.policy.name} sweep: {len(targets)} sandboxes, {len(todo)} to process"
+            f"{' (dry run)' if self.dry_run else ''}, {self.concurrency} workers"
+        )
+
+        self._todo = todo
+        self._finished = [False] * len(todo)
+        self._next = 0
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, target in enumerate(todo):
+            queue.put_nowait((index, target))
+
+        started = time.monotonic()
+        progress = asyncio.create_task(self._report_progress(len(todo), started))
+        try:
+            workers = [asyncio.create_task(self._worker(queue)) for _ in range(max(1, self.concurrency))]
+            await asyncio.gather(*workers)
+        finally:
+            progress.cancel()
+            self.checkpoint.save(force=True)
+
+        # Sandboxes created after this sweep may sort before its cursor
+        if complete:
+            self.checkpoint.clear()
+
+        self.stats["seconds"] = round(time.monotonic() - started, 1)
+        self._log_progress(len(todo), started, final=True)
+        return self.stats
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            try:
+                index, target = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            outcome = await self._process(target)
+            self.stats["processed"] += 1
+            self.stats["outcomes"][outcome] = self.stats["outcomes"].get(outcome, 0) + 1
+
+            self.checkpoint.record(target.sandbox_id, outcome)
+            self._finished[index] = True
+            while self._next < len(self._todo) and self._finished[self._next]:
+                self.checkpoint.advance(self._todo[self._next].sandbox_id)
+                self._next += 1
+            self.checkpoint.save()
+
+    async def _process(self, target: SweepTarget) -> str:
+        try:
+            should_act, outcome = await self.policy.decide(target)
+            if not should_act:
+                return outcome
+            if self.dry_run:
+                logger.debug(f"[DRY RUN] Would {self.policy.name} sandbox {target.sandbox_id}")
+                return self.policy.dry_run_outcome()
+            await self.rate_limiter.acquire()
+            return await asyncio.to_thread(self.policy.act, self.daytona, target)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"✗ {self.policy.name} failed for sandbox {target.sandbox_id}: {e}")
+            return "error"
+
+    async def _report_progress(self, todo: int, started: float):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self._log_progress(todo, started)
+
+    def _log_progress(self, todo: int, started: float, final: bool = False):
+        done = self.stats["processed"]
+        elapsed = max(time.monotonic() - started, 1e-6)
+        rate = done / elapsed
+        eta = (todo - done) / rate if rate > 0 else None
+        outcomes = ", ".join(f"{k}={v}" for k, v in sorted(self.stats["outcomes"].items())) or "none"
+        prefix = "✅ Finished" if final else "⏳ Progress"
+        logger.info(
+            f"{prefix} {self.policy.name}: {done}/{todo} sandboxes, {rate:.1f}/s"
+            f"{f', ETA {eta:.0f}s' if eta is not None and not final else ''}, outcomes: {outcomes}"
+        )
+
+
+def add_sweeper_arguments(parser, default_checkpoint: str):
+    """CLI flags shared by the sweep scripts."""
+    parser.add_argument('--dry-run', action='store_true', help='Show what would be done without changing any sandbox')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help=f'Sandboxes processed at once (default: {CONCURRENCY})')
+    parser.add_argument('--rate', type=float, default=RATE_PER_SECOND, help=f'Max Daytona calls per second (default: {RATE_PER_SECOND:g}, 0 = unlimited)')
+    parser.add_argument('--checkpoint', type=str, default=default_checkpoint, help=f'Checkpoint file for resuming (default: {default_checkpoint})')
+    parser.add_argument('--fresh', action='store_true', help='Ignore and replace an existing checkpoint')
+    parser.add_argument('--limit', type=int, help='Process at most this many sandboxes in this run')
+
+
+def sweeper_from_args(policy: SweepPolicy, args, daytona=None) -> SandboxSweeper:
+    if args.fresh and args.checkpoint and os.path.exists(args.checkpoint) and not args.dry_run:
+        os.remove(args.checkpoint)
+    return SandboxSweeper(
+        policy,
+        daytona=daytona,
+        concurrency=args.concurrency,
+        rate_per_second=args.rate,
+        checkpoint_path=args.checkpoint,
+        dry_run=args.dry_run,
+        limit=args.limit,
+    )
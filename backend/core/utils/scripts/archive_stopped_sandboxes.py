@@ -2,16 +2,21 @@
 """
 Simple script to archive all Daytona sandboxes with "STOPPED" state.
 
+Runs on the sandbox sweeper: concurrent, rate limited and resumable from
+its checkpoint file.
+
 Usage:
-    python archive_stopped_sandboxes.py [--dry-run]
+    python archive_stopped_sandboxes.py [--dry-run] [--concurrency N] [--rate N] [--fresh]
 """
 
 import sys
 import argparse
+import asyncio
 import json
 import re
 from datetime import datetime
 from core.utils.config import config
+from core.utils.sandbox_sweeper import SweepPolicy, SweepTarget, add_sweeper_arguments, sandbox_state, sweeper_from_args
 
 try:
     from daytona import Daytona
@@ -67,19 +72,42 @@ def get_stopped_sandboxes_from_json(json_file):
         print(f"✗ Failed to parse JSON file: {e}")
         return []
 
-def archive_stopped_sandboxes(dry_run=False, save_json=False, json_filename=None, use_existing_json=None):
+class ArchiveStoppedPolicy(SweepPolicy):
+    """Archive every sandbox in STOPPED state."""
+
+    name = "archive"
+
+    def __init__(self, sandbox_ids=None, save_json=False, json_filename=None):
+        self.sandbox_ids = sandbox_ids
+        self.save_json = save_json
+        self.json_filename = json_filename
+
+    def targets(self, daytona):
+        if self.sandbox_ids is not None:
+            return [SweepTarget(sandbox_id, 'stopped') for sandbox_id in self.sandbox_ids]
+
+        sandboxes = daytona.list()
+        print(f"✓ Found {len(sandboxes)} total sandboxes")
+        if self.save_json:
+            save_raw_list_as_json(sandboxes, self.json_filename)
+
+        stopped = [
+            SweepTarget(getattr(sb, 'id', 'unknown'), 'stopped', sb)
+            for sb in sandboxes if sandbox_state(sb) == 'stopped'
+        ]
+        print(f"✓ Found {len(stopped)} sandboxes in STOPPED state")
+        return stopped
+
+    def act(self, daytona, target):
+        sandbox = target.sandbox or daytona.get(target.sandbox_id)
+        sandbox.archive()
+        return "archived"
+
+
+def archive_stopped_sandboxes(args, use_existing_json=None):
     """Archive all sandboxes in STOPPED state."""
     
-    # Initialize Daytona client using config
-    try:
-        daytona = Daytona()
-        print("✓ Connected to Daytona")
-    except Exception as e:
-        print(f"✗ Failed to connect to Daytona: {e}")
-        return False
-    
-    stopped_sandbox_ids = []
-    
+    stopped_sandbox_ids = None
     if use_existing_json:
         # Parse existing JSON file for STOPPED sandboxes
         print(f"🔍 Parsing existing JSON file: {use_existing_json}")
@@ -89,61 +117,21 @@ def archive_stopped_sandboxes(dry_run=False, save_json=False, json_filename=None
         # Log some sample IDs for verification
         if stopped_sandbox_ids:
             print(f"📋 Sample STOPPED sandbox IDs: {stopped_sandbox_ids[:5]}...")
-    else:
-        # Get all sandboxes from API
-        try:
-            sandboxes = daytona.list()
-            print(f"✓ Found {len(sandboxes)} total sandboxes")
-            
-            # Print sandbox data for debugging
-            print("\nSandbox data structure:")
-            for i, sandbox in enumerate(sandboxes[:2]):  # Show first 2 for debugging
-                print(f"Sandbox {i+1}: {sandbox}")
-                print(f"  - ID: {getattr(sandbox, 'id', 'N/A')}")
-                print(f"  - State: {getattr(sandbox, 'state', 'N/A')}")
-                print(f"  - Name: {getattr(sandbox, 'name', 'N/A')}")
-                
-        except Exception as e:
-            print(f"✗ Failed to list sandboxes: {e}")
-            return False
-        
-        # Save raw list as JSON if requested
-        if save_json:
-            save_raw_list_as_json(sandboxes, json_filename)
-        
-        # Filter for STOPPED sandboxes
-        stopped_sandboxes = [sb for sb in sandboxes if getattr(sb, 'state', None) == 'STOPPED']
-        stopped_sandbox_ids = [getattr(sb, 'id', 'unknown') for sb in stopped_sandboxes]
-        print(f"✓ Found {len(stopped_sandbox_ids)} sandboxes in STOPPED state")
     
-    if not stopped_sandbox_ids:
-        print("No sandboxes to archive")
-        return True
-    
-    # Archive each stopped sandbox
-    success_count = 0
-    for sandbox_id in stopped_sandbox_ids:
-        try:
-            if dry_run:
-                print(f"[DRY RUN] Would archive: {sandbox_id}")
-                success_count += 1
-            else:
-                print(f"Archiving: {sandbox_id}")
-                # Get the sandbox object and archive it
-                sandbox = daytona.get(sandbox_id)
-                sandbox.archive()
-                print(f"✓ Archived: {sandbox_id}")
-                success_count += 1
-                
-        except Exception as e:
-            print(f"✗ Failed to archive {sandbox_id}: {e}")
+    policy = ArchiveStoppedPolicy(stopped_sandbox_ids, save_json=args.save_json, json_filename=args.json_file)
+    try:
+        stats = asyncio.run(sweeper_from_args(policy, args).run())
+    except Exception as e:
+        print(f"✗ Archive sweep failed: {e}")
+        return False
     
-    print(f"\nSummary: {success_count}/{len(stopped_sandbox_ids)} sandboxes processed")
-    return success_count == len(stopped_sandbox_ids)
+    print(f"\nSummary: {stats['processed'] - stats['errors']}/{stats['processed']} sandboxes processed "
+          f"({stats['skipped_done']} already done in a previous run)")
+    return stats['errors'] == 0
 
 def main():
     parser = argparse.ArgumentParser(description="Archive stopped Daytona sandboxes and optionally save list as JSON")
-    parser.add_argument('--dry-run', action='store_true', help='Show what would be archived')
+    add_sweeper_arguments(parser, default_checkpoint='archive_stopped_sandboxes.checkpoint.json')
     parser.add_argument('--save-json', action='store_true', help='Save sandboxes list as JSON file')
     parser.add_argument('--json-file', type=str, help='Custom filename for JSON output (default: sandboxes_TIMESTAMP.json)')
     parser.add_argument('--use-json', type=str, help='Use existing JSON file to get STOPPED sandbox IDs (e.g., raw_sandboxes_20250817_194448.json)')
@@ -172,12 +160,7 @@ def main():
             print(f"✗ Failed to save JSON: {e}")
             sys.exit(1)
     
-    success = archive_stopped_sandboxes(
-        dry_run=args.dry_run,
-        save_json=args.save_json,
-        json_filename=args.json_file,
-        use_existing_json=args.use_json
-    )
+    success = archive_stopped_sandboxes(args, use_existing_json=args.use_json)
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark the set-based billing reconciliation checks.
+
+Runs each check in the database with fixes disabled (findings are still
+recorded) for every requested partition count and prints the runtime and
+row counts. Runs are full by default; --incremental runs from the last
+completed run of each check instead.
+
+Usage:
+    python benchmark_billing_reconciliation.py [--partitions 1,4,8] [--checks balance_consistency,double_charges] [--incremental]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend directory to path (go up 3 levels from scripts dir)
+backend_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.services.supabase import DBConnection
+from core.utils.logger import logger
+from core.billing.reconciliation_service import CHECK_FUNCTIONS, reconciliation_service
+
+async def benchmark(checks, partition_counts, incremental):
+    db = DBConnection()
+    await db.initialize()
+
+    rows = []
+    try:
+        for check_type in checks:
+            for partitions in partition_counts:
+                run = await reconciliation_service.run_check(
+                    check_type, incremental=incremental, fix=False, partitions=partitions
+                )
+                seconds = max(run['duration_ms'], 1) / 1000
+                slowest = max(run['partition_ms'].values(), default=0)
+                rows.append((check_type, partitions, run['mode'], run['duration_ms'], slowest,
+                             run['accounts_checked'], run['rows_scanned'], run['findings'],
+                             round(run['rows_scanned'] / seconds), len(run['errors'])))
+    finally:
+        await db.disconnect()
+
+    logger.info("="*110)
+    logger.info(f"{'check':<22}{'parts':>6}{'mode':>13}{'total ms':>10}{'slowest ms':>12}"
+                f"{'accounts':>10}{'rows':>10}{'findings':>10}{'rows/s':>10}{'errors':>8}")
+    logger.info("="*110)
+    for check_type, partitions, mode, total_ms, slowest, accounts, scanned, findings, rate, errors in rows:
+        logger.info(f"{check_type:<22}{partitions:>6}{mode:>13}{total_ms:>10}{slowest:>12}"
+                    f"{accounts:>10}{scanned:>10}{findings:>10}{rate:>10}{errors:>8}")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the billing reconciliation checks")
+    parser.add_argument('--checks', type=str, default=','.join(CHECK_FUNCTIONS),
+                        help='Comma-separated checks to run (default: all)')
+    parser.add_argument('--partitions', type=str, default='1,4,8',
+                        help='Comma-separated partition counts to compare (default: 1,4,8)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only check accounts changed since the last completed run')
+    args = parser.parse_args()
+
+    checks = [c.strip() for c in args.checks.split(',') if c.strip()]
+    unknown = [c for c in checks if c not in CHECK_FUNCTIONS]
+    if unknown:
+        logger.error(f"Unknown checks: {', '.join(unknown)} (choose from {', '.join(CHECK_FUNCTIONS)})")
+        sys.exit(1)
+    partition_counts = [int(p) for p in args.partitions.split(',') if p.strip()]
+
+    rows = asyncio.run(benchmark(checks, partition_counts, args.incremental))
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
+
+if __name__ == "__main__":
+    main()
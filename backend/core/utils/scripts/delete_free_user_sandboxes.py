@@ -8,6 +8,9 @@ For each SANDBOX_ID provided:
 3. Checks user's Stripe subscription status via billing system
 4. If user is on free tier, deletes the sandbox via Daytona API
 
+Sandboxes are processed concurrently on the sandbox sweeper (rate limited,
+resumable from its checkpoint file).
+
 Usage:
     python delete_free_user_sandboxes.py [--dry-run] [--sandbox-ids ID1,ID2,ID3] [--use-json file.json]
 """
@@ -30,14 +33,15 @@ if PROD_STRIPE_SECRET_KEY:
 
 import sys
 import argparse
+import asyncio
 import json
 import re
-from datetime import datetime
-from typing import List, Optional, Dict, Set
+from typing import List, Optional, Dict, Tuple
 from core.utils.config import config
 from core.utils.logger import logger
 from core.services.supabase import DBConnection
 from core.billing.subscription_service import subscription_service
+from core.utils.sandbox_sweeper import SweepPolicy, SweepTarget, add_sweeper_arguments, sweeper_from_args
 
 try:
     from daytona import Daytona
@@ -108,107 +112,92 @@ async def is_user_free_tier(user_id: str) -> tuple[bool, str]:
         
     Returns:
         Tuple of (is_free_tier, subscription_info)
-    """
-    try:
-        # Get user's subscription
-        subscription_info = await subscription_service.get_subscription(user_id)
-        subscription = subscription_info.get('subscription')
-        
-        if not subscription:
-            # No subscription = free tier
-            return True, "no_subscription"
-        
-        # Extract price ID from subscription
-        price_id = None
-        if subscription.get('items') and subscription['items'].get('data') and len(subscription['items']['data']) > 0:
-            price_id = subscription['items']['data'][0]['price']['id']
-        else:
-            price_id = subscription.get('price_id', config.STRIPE_FREE_TIER_ID)
-        
-        # Check if price ID matches free tier
-        is_free = price_id == config.STRIPE_FREE_TIER_ID
-        subscription_info = f"price_id={price_id}, free_tier_id={config.STRIPE_FREE_TIER_ID}"
         
-        return is_free, subscription_info
-        
-    except Exception as e:
-        logger.error(f"Error checking subscription for user {user_id}: {e}")
-        # Default to false (don't delete) if we can't determine subscription
-        return False, f"error: {str(e)}"
-
-async def delete_sandbox_if_free_user(
-    daytona_client, 
-    supabase_client, 
-    sandbox_id: str, 
-    dry_run: bool = False
-) -> tuple[bool, str]:
+    Raises:
+        Exception: If the subscription can't be looked up; the sweep counts
+            the sandbox as an error (nothing is deleted) and retries it on
+            the next run
     """
-    Delete sandbox if the associated user is on free tier.
+    # Get user's subscription
+    subscription_info = await subscription_service.get_subscription(user_id)
+    subscription = subscription_info.get('subscription')
     
-    Args:
-        daytona_client: Daytona API client
-        supabase_client: Supabase database client
-        sandbox_id: The sandbox ID to potentially delete
-        dry_run: If True, only simulate the action
-        
-    Returns:
-        Tuple of (action_taken, reason)
-    """
-    try:
+    if not subscription:
+        # No subscription = free tier
+        return True, "no_subscription"
+    
+    # Extract price ID from subscription
+    price_id = None
+    if subscription.get('items') and subscription['items'].get('data') and len(subscription['items']['data']) > 0:
+        price_id = subscription['items']['data'][0]['price']['id']
+    else:
+        price_id = subscription.get('price_id', config.STRIPE_FREE_TIER_ID)
+    
+    # Check if price ID matches free tier
+    is_free = price_id == config.STRIPE_FREE_TIER_ID
+    subscription_info = f"price_id={price_id}, free_tier_id={config.STRIPE_FREE_TIER_ID}"
+    
+    return is_free, subscription_info
+
+class DeleteFreeUserSandboxesPolicy(SweepPolicy):
+    """Delete the given sandboxes when their project belongs to a free tier user."""
+
+    name = "delete"
+
+    def __init__(self, sandbox_ids: List[str], supabase_client):
+        self.sandbox_ids = sandbox_ids
+        self.supabase_client = supabase_client
+        # Several sandboxes usually belong to the same account
+        self._free_tier: Dict[str, asyncio.Task] = {}
+
+    def targets(self, daytona) -> List[SweepTarget]:
+        return [SweepTarget(sandbox_id) for sandbox_id in self.sandbox_ids]
+
+    async def decide(self, target: SweepTarget) -> Tuple[bool, str]:
         # Find project associated with this sandbox
-        project = await find_project_by_sandbox_id(supabase_client, sandbox_id)
+        project = await find_project_by_sandbox_id(self.supabase_client, target.sandbox_id)
         if not project:
-            return False, "project_not_found"
-        
+            logger.info(f"  → SKIPPED (no project): {target.sandbox_id}")
+            return False, "skipped_project_not_found"
+
         account_id = project['account_id']
-        project_id = project['project_id']
-        
-        # Check if user is on free tier
-        is_free, subscription_info = await is_user_free_tier(account_id)
-        
+        if account_id not in self._free_tier:
+            self._free_tier[account_id] = asyncio.create_task(is_user_free_tier(account_id))
+        try:
+            is_free, subscription_info = await self._free_tier[account_id]
+        except Exception:
+            # Look the account up again for its next sandbox
+            self._free_tier.pop(account_id, None)
+            raise
+
         if not is_free:
-            return False, f"paid_user ({subscription_info})"
-        
-        # User is on free tier - delete sandbox
-        if dry_run:
-            return True, f"would_delete (project: {project_id}, user: {account_id}, {subscription_info})"
-        else:
-            # Actually delete the sandbox
-            try:
-                sandbox = daytona_client.get(sandbox_id)
-                sandbox.delete()
-                logger.info(f"Successfully deleted sandbox {sandbox_id} for free user {account_id}")
-                return True, f"deleted (project: {project_id}, user: {account_id}, {subscription_info})"
-            except Exception as delete_error:
-                logger.error(f"Failed to delete sandbox {sandbox_id}: {delete_error}")
-                return False, f"delete_failed: {str(delete_error)}"
-    
-    except Exception as e:
-        logger.error(f"Error processing sandbox {sandbox_id}: {e}")
-        return False, f"error: {str(e)}"
+            logger.info(f"  → SKIPPED (paid user): {target.sandbox_id} ({subscription_info})")
+            return False, "skipped_paid_user"
+
+        logger.info(f"  ✓ Free user {account_id}: sandbox {target.sandbox_id} (project: {project['project_id']}, {subscription_info})")
+        return True, "selected"
+
+    def act(self, daytona, target: SweepTarget) -> str:
+        sandbox = daytona.get(target.sandbox_id)
+        sandbox.delete()
+        logger.info(f"Successfully deleted sandbox {target.sandbox_id}")
+        return "deleted"
+
 
 async def delete_free_user_sandboxes(
     sandbox_ids: List[str],
-    dry_run: bool = False
+    args
 ) -> Dict[str, int]:
     """
     Main function to delete sandboxes for free tier users.
     
     Args:
         sandbox_ids: List of sandbox IDs to process
-        dry_run: If True, only simulate actions
+        args: Parsed command line arguments (sweeper flags)
         
     Returns:
         Dictionary with statistics
     """
-    # Initialize clients
-    try:
-        daytona = Daytona()
-        logger.info("✓ Connected to Daytona")
-    except Exception as e:
-        logger.error(f"✗ Failed to connect to Daytona: {e}")
-        return {"error": 1}
-    
     try:
         db = DBConnection()
         await db.initialize()
@@ -218,49 +207,29 @@ async def delete_free_user_sandboxes(
         logger.error(f"✗ Failed to connect to Supabase: {e}")
         return {"error": 1}
     
-    # Track statistics
-    stats = {
-        "total_processed": 0,
-        "deleted": 0,
-        "skipped_paid_user": 0,
-        "skipped_project_not_found": 0,
-        "errors": 0
-    }
-    
-    logger.info(f"Processing {len(sandbox_ids)} sandbox IDs...")
-    
-    # Process each sandbox ID
-    for i, sandbox_id in enumerate(sandbox_ids):
-        stats["total_processed"] += 1
-        
-        logger.info(f"[{i+1}/{len(sandbox_ids)}] Processing sandbox: {sandbox_id}")
-        
-        action_taken, reason = await delete_sandbox_if_free_user(
-            daytona, supabase_client, sandbox_id, dry_run
-        )
-        
-        if action_taken:
-            stats["deleted"] += 1
-            status = "WOULD DELETE" if dry_run else "DELETED"
-            logger.info(f"  ✓ {status}: {reason}")
-        elif "paid_user" in reason:
-            stats["skipped_paid_user"] += 1
-            logger.info(f"  → SKIPPED (paid user): {reason}")
-        elif "project_not_found" in reason:
-            stats["skipped_project_not_found"] += 1
-            logger.info(f"  → SKIPPED (no project): {reason}")
-        else:
-            stats["errors"] += 1
-            logger.warning(f"  ✗ ERROR: {reason}")
-    
-    # Cleanup database connection
+    policy = DeleteFreeUserSandboxesPolicy(sandbox_ids, supabase_client)
     try:
-        await db.disconnect()
-        logger.debug("✓ Database connection closed")
+        result = await sweeper_from_args(policy, args).run()
     except Exception as e:
-        logger.warning(f"Error closing database connection: {e}")
+        logger.error(f"✗ Delete sweep failed: {e}")
+        return {"error": 1}
+    finally:
+        # Cleanup database connection
+        try:
+            await db.disconnect()
+            logger.debug("✓ Database connection closed")
+        except Exception as e:
+            logger.warning(f"Error closing database connection: {e}")
     
-    return stats
+    outcomes = result["outcomes"]
+    return {
+        "total_processed": result["processed"],
+        "skipped_done": result["skipped_done"],
+        "deleted": outcomes.get("deleted", 0) + outcomes.get(policy.dry_run_outcome(), 0),
+        "skipped_paid_user": outcomes.get("skipped_paid_user", 0),
+        "skipped_project_not_found": outcomes.get("skipped_project_not_found", 0),
+        "errors": result["errors"]
+    }
 
 def main():
     parser = argparse.ArgumentParser(
@@ -278,10 +247,9 @@ Examples:
         """,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
-    parser.add_argument('--dry-run', action='store_true', help='Show what would be deleted without actually deleting')
+    add_sweeper_arguments(parser, default_checkpoint='delete_free_user_sandboxes.checkpoint.json')
     parser.add_argument('--sandbox-ids', type=str, help='Comma-separated list of sandbox IDs to process')
     parser.add_argument('--use-json', type=str, help='JSON file containing sandbox data (e.g., raw_sandboxes_20250817_194448.json)')
-    parser.add_argument('--limit', type=int, help='Limit the number of sandboxes to process (for testing)')
     parser.add_argument('--force', action='store_true', help='Required for processing more than 50 sandboxes without dry-run')
     
     args = parser.parse_args()
@@ -318,15 +286,15 @@ Examples:
         logger.error("No sandbox IDs to process")
         sys.exit(1)
     
-    # Apply limit if specified
+    # Apply limit if specified (the sweeper applies it again after skipping finished sandboxes)
+    to_process = len(sandbox_ids)
     if args.limit and args.limit > 0:
-        original_count = len(sandbox_ids)
-        sandbox_ids = sandbox_ids[:args.limit]
-        logger.info(f"Limited processing to {len(sandbox_ids)} sandboxes (from {original_count})")
+        to_process = min(to_process, args.limit)
+        logger.info(f"Limited processing to {to_process} sandboxes (from {len(sandbox_ids)})")
     
     # Safety check - prevent accidental mass deletion
-    if not args.dry_run and len(sandbox_ids) > 50 and not args.force:
-        logger.error(f"Safety check: Attempting to delete {len(sandbox_ids)} sandboxes without --dry-run")
+    if not args.dry_run and to_process > 50 and not args.force:
+        logger.error(f"Safety check: Attempting to delete {to_process} sandboxes without --dry-run")
         logger.error("This operation would delete many sandboxes. Please:")
         logger.error("1. First run with --dry-run to see what would be deleted")
         logger.error("2. Use --limit to process a smaller batch")
@@ -338,21 +306,20 @@ Examples:
     logger.info("")
     
     # Run the deletion process
-    import asyncio
-    
     async def run():
-        stats = await delete_free_user_sandboxes(sandbox_ids, dry_run=args.dry_run)
+        stats = await delete_free_user_sandboxes(sandbox_ids, args)
         
         # Print summary
         logger.info("")
         logger.info("=== SUMMARY ===")
         logger.info(f"Total processed: {stats.get('total_processed', 0)}")
+        logger.info(f"Already done in a previous run: {stats.get('skipped_done', 0)}")
         logger.info(f"Deleted: {stats.get('deleted', 0)}")
         logger.info(f"Skipped (paid users): {stats.get('skipped_paid_user', 0)}")
         logger.info(f"Skipped (no project): {stats.get('skipped_project_not_found', 0)}")
         logger.info(f"Errors: {stats.get('errors', 0)}")
         
-        success = stats.get('errors', 0) == 0
+        success = stats.get('errors', 0) == 0 and 'error' not in stats
         return success
     
     try:
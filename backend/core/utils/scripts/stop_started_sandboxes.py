@@ -4,7 +4,8 @@ Script to stop all Daytona sandboxes in "STARTED" state.
 
 This script connects to Daytona API, lists all sandboxes, filters for those
 in "STARTED" state, and stops them. Useful for cleanup operations or
-resource management.
+resource management. Runs on the sandbox sweeper: concurrent, rate limited
+and resumable from its checkpoint file.
 
 Usage:
     python stop_started_sandboxes.py [--dry-run] [--save-json] [--json-file filename]
@@ -18,6 +19,9 @@ Examples:
     
     # Save list of sandboxes to JSON file before stopping
     python stop_started_sandboxes.py --save-json --json-file started_sandboxes.json
+    
+    # Stop with 16 workers, at most 10 Daytona calls per second
+    python stop_started_sandboxes.py --concurrency 16 --rate 10
 """
 
 PROD_DAYTONA_API_KEY = ""  # Your production Daytona API key
@@ -32,11 +36,13 @@ if PROD_DAYTONA_API_KEY:
 
 import sys
 import argparse
+import asyncio
 import json
 from datetime import datetime
 from typing import List, Dict, Optional
 from core.utils.config import config
 from core.utils.logger import logger
+from core.utils.sandbox_sweeper import SweepPolicy, SweepTarget, add_sweeper_arguments, sandbox_state, sweeper_from_args
 
 try:
     from daytona import Daytona
@@ -74,109 +80,68 @@ def save_sandboxes_as_json(sandboxes_list: List, filename: Optional[str] = None)
         logger.error(f"✗ Failed to save JSON file: {e}")
         return None
 
-def stop_started_sandboxes(dry_run: bool = False, save_json: bool = False, json_filename: Optional[str] = None) -> Dict[str, int]:
+class StopStartedPolicy(SweepPolicy):
+    """Stop every sandbox in STARTED state."""
+
+    name = "stop"
+
+    def __init__(self, save_json: bool = False, json_filename: Optional[str] = None):
+        self.save_json = save_json
+        self.json_filename = json_filename
+        self.total_sandboxes = 0
+
+    def targets(self, daytona) -> List[SweepTarget]:
+        all_sandboxes = daytona.list()
+        self.total_sandboxes = len(all_sandboxes)
+        logger.info(f"✓ Found {len(all_sandboxes)} total sandboxes")
+
+        started_sandboxes = [sb for sb in all_sandboxes if sandbox_state(sb) == 'started']
+        logger.info(f"✓ Found {len(started_sandboxes)} sandboxes in STARTED state")
+
+        # Save to JSON if requested
+        if self.save_json and started_sandboxes:
+            save_sandboxes_as_json(started_sandboxes, self.json_filename)
+
+        return [SweepTarget(getattr(sb, 'id', 'unknown'), 'started', sb) for sb in started_sandboxes]
+
+    def act(self, daytona, target: SweepTarget) -> str:
+        sandbox = target.sandbox or daytona.get(target.sandbox_id)
+        sandbox.stop()
+
+        # Wait for sandbox to stop (with timeout)
+        try:
+            sandbox.wait_for_sandbox_stop()
+        except Exception as wait_error:
+            # Still count as success since stop command was sent
+            logger.warning(f"  ⚠ Sandbox {target.sandbox_id} stop command sent, but wait failed: {wait_error}")
+        return "stopped"
+
+
+def stop_started_sandboxes(args) -> Dict[str, int]:
     """
     Stop all sandboxes in STARTED state.
     
     Args:
-        dry_run: If True, only simulate the action without actually stopping
-        save_json: If True, save the list of sandboxes to JSON file
-        json_filename: Custom filename for JSON output
+        args: Parsed command line arguments (sweeper flags, --save-json, --json-file)
         
     Returns:
         Dictionary with statistics about the operation
     """
-    # Initialize Daytona client
-    try:
-        daytona = Daytona()
-        logger.info("✓ Connected to Daytona")
-    except Exception as e:
-        logger.error(f"✗ Failed to connect to Daytona: {e}")
-        return {"error": 1}
-    
-    # Get all sandboxes
+    policy = StopStartedPolicy(save_json=args.save_json, json_filename=args.json_file)
     try:
-        all_sandboxes = daytona.list()
-        logger.info(f"✓ Found {len(all_sandboxes)} total sandboxes")
-        
-        # Print sample sandbox data for debugging
-        if all_sandboxes:
-            logger.info("Sample sandbox data structure:")
-            sample_sandbox = all_sandboxes[0]
-            logger.info(f"  - ID: {getattr(sample_sandbox, 'id', 'N/A')}")
-            logger.info(f"  - State: {getattr(sample_sandbox, 'state', 'N/A')}")
-            logger.info(f"  - Name: {getattr(sample_sandbox, 'name', 'N/A')}")
-            
-            # Show a few more samples to see different states
-            logger.info("Additional samples:")
-            for i, sb in enumerate(all_sandboxes[1:6]):  # Show next 5 samples
-                logger.info(f"  Sample {i+2}: State='{getattr(sb, 'state', 'N/A')}', ID={getattr(sb, 'id', 'N/A')[:20]}...")
-            
+        result = asyncio.run(sweeper_from_args(policy, args).run())
     except Exception as e:
-        logger.error(f"✗ Failed to list sandboxes: {e}")
+        logger.error(f"✗ Stop sweep failed: {e}")
         return {"error": 1}
     
-    # Filter for STARTED sandboxes
-    started_sandboxes = [sb for sb in all_sandboxes if getattr(sb, 'state', None) == 'started']
-    logger.info(f"✓ Found {len(started_sandboxes)} sandboxes in STARTED state")
-    
-    # Save to JSON if requested
-    if save_json and started_sandboxes:
-        save_sandboxes_as_json(started_sandboxes, json_filename)
-    
-    if not started_sandboxes:
-        logger.info("No sandboxes to stop")
-        return {
-            "total_sandboxes": len(all_sandboxes),
-            "started_sandboxes": 0,
-            "stopped": 0,
-            "errors": 0
-        }
-    
-    # Track statistics
-    stats = {
-        "total_sandboxes": len(all_sandboxes),
-        "started_sandboxes": len(started_sandboxes),
-        "stopped": 0,
-        "errors": 0
+    outcomes = result["outcomes"]
+    return {
+        "total_sandboxes": policy.total_sandboxes,
+        "started_sandboxes": result["total"],
+        "skipped_done": result["skipped_done"],
+        "stopped": outcomes.get("stopped", 0) + outcomes.get(policy.dry_run_outcome(), 0),
+        "errors": result["errors"]
     }
-    
-    # Log some sample IDs for verification
-    sample_ids = [getattr(sb, 'id', 'unknown') for sb in started_sandboxes[:5]]
-    logger.info(f"Sample STARTED sandbox IDs: {sample_ids}...")
-    
-    # Stop each started sandbox
-    for i, sandbox in enumerate(started_sandboxes):
-        sandbox_id = getattr(sandbox, 'id', 'unknown')
-        sandbox_name = getattr(sandbox, 'name', 'unknown')
-        
-        logger.info(f"[{i+1}/{len(started_sandboxes)}] Processing sandbox: {sandbox_id} ({sandbox_name})")
-        
-        try:
-            if dry_run:
-                logger.info(f"  [DRY RUN] Would stop sandbox: {sandbox_id}")
-                stats["stopped"] += 1
-            else:
-                logger.info(f"  Stopping sandbox: {sandbox_id}")
-                
-                # Stop the sandbox
-                sandbox.stop()
-                
-                # Wait for sandbox to stop (with timeout)
-                try:
-                    sandbox.wait_for_sandbox_stop()
-                    logger.info(f"  ✓ Successfully stopped sandbox: {sandbox_id}")
-                    stats["stopped"] += 1
-                except Exception as wait_error:
-                    logger.warning(f"  ⚠ Sandbox {sandbox_id} stop command sent, but wait failed: {wait_error}")
-                    # Still count as success since stop command was sent
-                    stats["stopped"] += 1
-                
-        except Exception as e:
-            logger.error(f"  ✗ Failed to stop sandbox {sandbox_id}: {e}")
-            stats["errors"] += 1
-    
-    return stats
 
 def main():
     parser = argparse.ArgumentParser(
@@ -194,7 +159,7 @@ Examples:
         """,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
-    parser.add_argument('--dry-run', action='store_true', help='Show what would be stopped without actually stopping')
+    add_sweeper_arguments(parser, default_checkpoint='stop_started_sandboxes.checkpoint.json')
     parser.add_argument('--save-json', action='store_true', help='Save list of started sandboxes as JSON file')
     parser.add_argument('--json-file', type=str, help='Custom filename for JSON output (default: started_sandboxes_TIMESTAMP.json)')
     
@@ -213,17 +178,14 @@ Examples:
     
     # Run the stop operation
     try:
-        stats = stop_started_sandboxes(
-            dry_run=args.dry_run,
-            save_json=args.save_json,
-            json_filename=args.json_file
-        )
+        stats = stop_started_sandboxes(args)
         
         # Print summary
         logger.info("")
         logger.info("=== SUMMARY ===")
         logger.info(f"Total sandboxes: {stats.get('total_sandboxes', 0)}")
         logger.info(f"Started sandboxes: {stats.get('started_sandboxes', 0)}")
+        logger.info(f"Already stopped in a previous run: {stats.get('skipped_done', 0)}")
         logger.info(f"Stopped: {stats.get('stopped', 0)}")
         logger.info(f"Errors: {stats.get('errors', 0)}")
         
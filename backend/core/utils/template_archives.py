@@ -0,0 +1,150 @@
+"""
+Prepackaged archives of the built-in presentation templates.
+
+Copying a template into a sandbox file by file costs one sandbox RPC per file
+and directory. Instead each template is packed into a deterministic .tar.gz
+(sorted entries, fixed mtimes and owners), so its SHA-256 identifies the
+template version: the sandbox keeps extracted archives under that hash and
+only needs an upload when it hasn't seen the version before.
+
+Archives are built at image build time:
+
+    python -m core.utils.template_archives
+
+which writes <templates>/.archives/<template>.tar.gz and a manifest. When no
+prebuilt archive exists (local development) or it is older than the
+template, the archive is built in memory on first use.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import tarfile
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from core.utils.logger import logger
+
+PRESENTATION_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "presentations")
+ARCHIVES_DIR_NAME = ".archives"
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass(frozen=True)
+class TemplateArchive:
+    name: str
+    data: bytes
+    sha256: str
+    file_count: int
+
+    @property
+    def version(self) -> str:
+        return self.sha256[:16]
+
+
+_archives: Dict[Tuple[str, str], TemplateArchive] = {}
+
+
+def _template_files(template_path: str):
+    for root, dirs, files in os.walk(template_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for file in sorted(files):
+            source_file = os.path.join(root, file)
+            yield source_file, os.path.relpath(source_file, template_path).replace('\\', '/')
+
+
+def _latest_mtime(template_path: str) -> float:
+    mtimes = [os.path.getmtime(path) for path, _ in _template_files(template_path)]
+    return max(mtimes, default=0.0)
+
+
+def build_template_archive(template_path: str, name: Optional[str] = None) -> TemplateArchive:
+    """Pack a template directory into a deterministic .tar.gz."""
+    buffer = io.BytesIO()
+    file_count = 0
+    # mtime=0 keeps the gzip header, and with it the hash, stable across builds
+    with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as gz:
+        with tarfile.open(fileobj=gz, mode="w", format=tarfile.PAX_FORMAT) as tar:
+            for source_file, arcname in _template_files(template_path):
+                with open(source_file, 'rb') as f:
+                    content = f.read()
+                info = tarfile.TarInfo(arcname)
+                info.size = len(content)
+                info.mode = 0o644
+                info.mtime = 0
+                tar.addfile(info, io.BytesIO(content))
+                file_count += 1
+
+    data = buffer.getvalue()
+    return TemplateArchive(
+        name=name or os.path.basename(os.path.normpath(template_path)),
+        data=data,
+        sha256=hashlib.sha256(data).hexdigest(),
+        file_count=file_count,
+    )
+
+
+def _load_prebuilt(templates_dir: str, template_name: str) -> Optional[TemplateArchive]:
+    archives_dir = os.path.join(templates_dir, ARCHIVES_DIR_NAME)
+    archive_path = os.path.join(archives_dir, f"{template_name}.tar.gz")
+    try:
+        with open(os.path.join(archives_dir, MANIFEST_NAME), 'r') as f:
+            entry = json.load(f)[template_name]
+        if os.path.getmtime(archive_path) < _latest_mtime(os.path.join(templates_dir, template_name)):
+            return None
+        with open(archive_path, 'rb') as f:
+            data = f.read()
+    except (OSError, KeyError, ValueError):
+        return None
+
+    if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+        logger.warning(f"Prebuilt archive for template {template_name} doesn't match its manifest, rebuilding")
+        return None
+    return TemplateArchive(name=template_name, data=data, sha256=entry["sha256"], file_count=entry["file_count"])
+
+
+def get_template_archive(template_name: str, templates_dir: str = PRESENTATION_TEMPLATES_DIR) -> TemplateArchive:
+    """Archive of a template, from the prebuilt archives or built and kept in memory.
+
+    Raises:
+        FileNotFoundError: If the template doesn't exist
+    """
+    template_path = os.path.join(templates_dir, template_name)
+    if not os.path.isdir(template_path):
+        raise FileNotFoundError(f"Template not found: {template_name}")
+
+    key = (templates_dir, template_name)
+    archive = _archives.get(key)
+    if archive is None:
+        archive = _load_prebuilt(templates_dir, template_name) or build_template_archive(template_path, template_name)
+        _archives[key] = archive
+        logger.debug(f"📦 Template {template_name} archive ready: {archive.file_count} files, {len(archive.data)} bytes, version {archive.version}")
+    return archive
+
+
+def build_all_archives(templates_dir: str = PRESENTATION_TEMPLATES_DIR) -> Dict[str, Dict]:
+    """Write prebuilt archives and their manifest for every template in templates_dir."""
+    archives_dir = os.path.join(templates_dir, ARCHIVES_DIR_NAME)
+    os.makedirs(archives_dir, exist_ok=True)
+
+    manifest = {}
+    for item in sorted(os.listdir(templates_dir)):
+        template_path = os.path.join(templates_dir, item)
+        if not os.path.isdir(template_path) or item.startswith('.'):
+            continue
+        archive = build_template_archive(template_path, item)
+        with open(os.path.join(archives_dir, f"{item}.tar.gz"), 'wb') as f:
+            f.write(archive.data)
+        manifest[item] = {"sha256": archive.sha256, "file_count": archive.file_count, "size": len(archive.data)}
+
+    with open(os.path.join(archives_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    built = build_all_archives()
+    for name, entry in built.items():
+        print(f"{name}: {entry['file_count']} files, {entry['size']} bytes, {entry['sha256'][:16]}")
@@ -58,6 +58,31 @@ async def check_health(key: str):
     structlog.contextvars.clear_contextvars()
     await redis.set(key, "healthy", ex=redis.REDIS_KEY_TTL)
 
+@dramatiq.actor
+async def run_scheduled_trigger(trigger_id: str, scheduled_time: str):
+    """Fire a schedule trigger claimed by the worker-side TriggerScheduler.
+
+    Redelivered messages (e.g. after a worker died) are skipped by execute_scheduled_trigger.
+    """
+    structlog.contextvars.clear_contextvars()
+    structlog.contextvars.bind_contextvars(trigger_id=trigger_id)
+
+    await initialize()
+    from core.triggers.scheduler import execute_scheduled_trigger
+    result = await execute_scheduled_trigger(db, trigger_id, scheduled_time)
+    if not result.get("success"):
+        logger.warning(f"Scheduled trigger {trigger_id} ({scheduled_time}) did not start an agent run: {result.get('error')}")
+
+@dramatiq.actor
+async def process_stripe_webhooks(customer_key: str):
+    """Process the pending Stripe webhook events of one customer, in order."""
+    structlog.contextvars.clear_contextvars()
+    structlog.contextvars.bind_contextvars(stripe_customer=customer_key)
+
+    await initialize()
+    from core.billing.webhook_queue import webhook_queue
+    await webhook_queue.process_customer(customer_key)
+
 @dramatiq.actor
 async def run_agent_background(
     agent_run_id: str,
@@ -117,6 +142,8 @@ async def run_agent_background(
     pubsub = None
     stop_checker = None
     stop_signal_received = False
+    # Set together with stop_signal_received; cancels tool calls that are still running
+    stop_event = asyncio.Event()
 
     # Define Redis keys and channels
     response_list_key = f"agent_run:{agent_run_id}:responses"
@@ -137,6 +164,7 @@ async def run_agent_background(
                     if data == "STOP":
                         logger.debug(f"Received STOP signal for agent run {agent_run_id} (Instance: {instance_id})")
                         stop_signal_received = True
+                        stop_event.set()
                         break
                 # Periodically refresh the active run key TTL
                 if total_responses % 50 == 0: # Refresh every 50 responses or so
@@ -148,6 +176,7 @@ async def run_agent_background(
         except Exception as e:
             logger.error(f"Error in stop signal checker for {agent_run_id}: {e}", exc_info=True)
             stop_signal_received = True # Stop the run if the checker fails
+            stop_event.set()
 
     trace = langfuse.trace(name="agent_run", id=agent_run_id, session_id=thread_id, metadata={"project_id": project_id, "instance_id": instance_id})
 
@@ -173,6 +202,7 @@ async def run_agent_background(
             model_name=effective_model,
             agent_config=agent_config,
             trace=trace,
+            stop_event=stop_event,
         )
 
         final_status = "running"
@@ -0,0 +1,178 @@
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Listing projection of public agent templates for the marketplace.
+-- Kept in sync with agent_templates and basejump.accounts by triggers, so
+-- listing pages read one indexed table with the creator name denormalized.
+CREATE TABLE IF NOT EXISTS marketplace_template_listings (
+    template_id UUID PRIMARY KEY REFERENCES agent_templates(template_id) ON DELETE CASCADE,
+    creator_id UUID NOT NULL,
+    creator_name TEXT,
+    name VARCHAR(255) NOT NULL,
+    config JSONB DEFAULT '{}'::jsonb,
+    tags TEXT[] DEFAULT '{}',
+    categories TEXT[] DEFAULT '{}',
+    is_epsilon_team BOOLEAN DEFAULT false,
+    marketplace_published_at TIMESTAMPTZ,
+    download_count INTEGER DEFAULT 0,
+    created_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ,
+    icon_name VARCHAR(100),
+    icon_color VARCHAR(7),
+    icon_background VARCHAR(7),
+    metadata JSONB DEFAULT '{}'::jsonb,
+    usage_examples JSONB DEFAULT '[]'::jsonb,
+    search_vector TSVECTOR
+);
+
+-- Substring search on name (ILIKE '%term%') uses the trigram index
+CREATE INDEX IF NOT EXISTS idx_marketplace_listings_name_trgm
+    ON marketplace_template_listings USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_marketplace_listings_search_vector
+    ON marketplace_template_listings USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS idx_marketplace_listings_tags
+    ON marketplace_template_listings USING gin (tags);
+CREATE INDEX IF NOT EXISTS idx_marketplace_listings_popular
+    ON marketplace_template_listings (download_count DESC, marketplace_published_at DESC);
+CREATE INDEX IF NOT EXISTS idx_marketplace_listings_newest
+    ON marketplace_template_listings (marketplace_published_at DESC);
+CREATE INDEX IF NOT EXISTS idx_marketplace_listings_creator_id
+    ON marketplace_template_listings (creator_id);
+
+ALTER TABLE marketplace_template_listings ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Anyone can view marketplace listings" ON marketplace_template_listings;
+CREATE POLICY "Anyone can view marketplace listings" ON marketplace_template_listings
+    FOR SELECT USING (true);
+
+CREATE OR REPLACE FUNCTION refresh_marketplace_template_listing(p_template_id UUID)
+RETURNS void
+SECURITY DEFINER
+SET search_path = public, basejump
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM marketplace_template_listings
+    WHERE template_id = p_template_id
+      AND NOT EXISTS (
+          SELECT 1 FROM agent_templates
+          WHERE template_id = p_template_id AND is_public = true
+      );
+
+    INSERT INTO marketplace_template_listings (
+        template_id, creator_id, creator_name, name, config, tags, categories,
+        is_epsilon_team, marketplace_published_at, download_count, created_at,
+        updated_at, icon_name, icon_color, icon_background, metadata,
+        usage_examples, search_vector
+    )
+    SELECT
+        t.template_id, t.creator_id, COALESCE(a.name, a.slug), t.name, t.config,
+        COALESCE(t.tags, '{}'), COALESCE(t.categories, '{}'),
+        COALESCE(t.is_epsilon_team, false), t.marketplace_published_at,
+        COALESCE(t.download_count, 0), t.created_at, t.updated_at, t.icon_name,
+        t.icon_color, t.icon_background, COALESCE(t.metadata, '{}'::jsonb),
+        COALESCE(t.usage_examples, '[]'::jsonb),
+        setweight(to_tsvector('simple', COALESCE(t.name, '')), 'A') ||
+            setweight(to_tsvector('simple', array_to_string(COALESCE(t.tags, '{}'), ' ')), 'B')
+    FROM agent_templates t
+    LEFT JOIN basejump.accounts a ON a.id = t.creator_id
+    WHERE t.template_id = p_template_id AND t.is_public = true
+    ON CONFLICT (template_id) DO UPDATE SET
+        creator_id = EXCLUDED.creator_id,
+        creator_name = EXCLUDED.creator_name,
+        name = EXCLUDED.name,
+        config = EXCLUDED.config,
+        tags = EXCLUDED.tags,
+        categories = EXCLUDED.categories,
+        is_epsilon_team = EXCLUDED.is_epsilon_team,
+        marketplace_published_at = EXCLUDED.marketplace_published_at,
+        download_count = EXCLUDED.download_count,
+        created_at = EXCLUDED.created_at,
+        updated_at = EXCLUDED.updated_at,
+        icon_name = EXCLUDED.icon_name,
+        icon_color = EXCLUDED.icon_color,
+        icon_background = EXCLUDED.icon_background,
+        metadata = EXCLUDED.metadata,
+        usage_examples = EXCLUDED.usage_examples,
+        search_vector = EXCLUDED.search_vector;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION sync_marketplace_template_listing()
+RETURNS TRIGGER
+SECURITY DEFINER
+SET search_path = public, basejump
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM marketplace_template_listings WHERE template_id = OLD.template_id;
+        RETURN OLD;
+    END IF;
+
+    IF NEW.is_public OR (TG_OP = 'UPDATE' AND OLD.is_public) THEN
+        PERFORM refresh_marketplace_template_listing(NEW.template_id);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_sync_marketplace_template_listing ON agent_templates;
+CREATE TRIGGER trigger_sync_marketplace_template_listing
+    AFTER INSERT OR UPDATE OR DELETE ON agent_templates
+    FOR EACH ROW EXECUTE FUNCTION sync_marketplace_template_listing();
+
+CREATE OR REPLACE FUNCTION sync_marketplace_creator_name()
+RETURNS TRIGGER
+SECURITY DEFINER
+SET search_path = public, basejump
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.name IS DISTINCT FROM OLD.name OR NEW.slug IS DISTINCT FROM OLD.slug THEN
+        UPDATE marketplace_template_listings
+        SET creator_name = COALESCE(NEW.name, NEW.slug)
+        WHERE creator_id = NEW.id;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_sync_marketplace_creator_name ON basejump.accounts;
+CREATE TRIGGER trigger_sync_marketplace_creator_name
+    AFTER UPDATE ON basejump.accounts
+    FOR EACH ROW EXECUTE FUNCTION sync_marketplace_creator_name();
+
+-- Downloads are counted in Redis and applied here in batches
+CREATE OR REPLACE FUNCTION apply_template_download_counts(p_counts JSONB)
+RETURNS INTEGER
+SECURITY DEFINER
+SET search_path = public
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE agent_templates t
+    SET download_count = COALESCE(t.download_count, 0) + c.value::int,
+        updated_at = NOW()
+    FROM jsonb_each_text(p_counts) c
+    WHERE t.template_id = c.key::uuid;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION apply_template_download_counts(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_template_download_counts(JSONB) TO service_role;
+
+-- Backfill the projection from the currently public templates
+SELECT refresh_marketplace_template_listing(template_id)
+FROM agent_templates
+WHERE is_public = true;
+
+ANALYZE marketplace_template_listings;
+
+COMMIT;
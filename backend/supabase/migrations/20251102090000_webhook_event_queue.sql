@@ -0,0 +1,16 @@
+BEGIN;
+
+-- Stripe webhooks are stored as pending and processed by the webhook queue,
+-- one customer at a time in the order Stripe created the events.
+ALTER TABLE public.webhook_events
+    ADD COLUMN IF NOT EXISTS customer_id TEXT,
+    ADD COLUMN IF NOT EXISTS event_created_at TIMESTAMP WITH TIME ZONE;
+
+CREATE INDEX IF NOT EXISTS idx_webhook_events_pending_by_customer
+    ON public.webhook_events(customer_id, event_created_at, created_at)
+    WHERE status = 'pending';
+
+COMMENT ON COLUMN public.webhook_events.customer_id IS 'Stripe customer the event belongs to; events of one customer are processed in order';
+COMMENT ON COLUMN public.webhook_events.event_created_at IS 'Creation time of the event at Stripe, used to order processing';
+
+COMMIT;
@@ -0,0 +1,38 @@
+BEGIN;
+
+-- Highest fencing token seen per lock. Writes guarded by a DistributedLock
+-- record their holder's token here first; a token lower than the stored one
+-- belongs to a holder whose lease expired and is rejected.
+CREATE TABLE IF NOT EXISTS public.lock_fences (
+    lock_key TEXT PRIMARY KEY,
+    fencing_token BIGINT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE public.lock_fences ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION advance_lock_fence(
+    p_lock_key TEXT,
+    p_token BIGINT
+) RETURNS BOOLEAN AS $$
+DECLARE
+    v_token BIGINT;
+BEGIN
+    INSERT INTO public.lock_fences (lock_key, fencing_token)
+    VALUES (p_lock_key, p_token)
+    ON CONFLICT (lock_key) DO UPDATE
+        SET fencing_token = EXCLUDED.fencing_token,
+            updated_at = NOW()
+        WHERE lock_fences.fencing_token <= EXCLUDED.fencing_token
+    RETURNING fencing_token INTO v_token;
+
+    RETURN v_token IS NOT NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION advance_lock_fence(TEXT, BIGINT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION advance_lock_fence(TEXT, BIGINT) TO service_role;
+
+COMMENT ON TABLE public.lock_fences IS 'Highest fencing token per distributed lock, used to reject writes from expired lock holders';
+
+COMMIT;
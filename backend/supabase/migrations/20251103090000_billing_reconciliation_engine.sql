@@ -0,0 +1,466 @@
+BEGIN;
+
+-- Billing reconciliation runs server-side as set-based SQL, one call per
+-- account-id hash partition. Partitions are independent, so callers run
+-- them in parallel on separate connections (one backend process each).
+-- Incremental runs only look at accounts with ledger or balance changes
+-- since the start of the last completed run of the same check.
+
+CREATE TABLE IF NOT EXISTS public.billing_reconciliation_runs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    check_type TEXT NOT NULL CHECK (check_type IN ('balance_consistency', 'double_charges', 'expired_credits')),
+    mode TEXT NOT NULL CHECK (mode IN ('full', 'incremental')),
+    since TIMESTAMP WITH TIME ZONE,
+    partition_count INTEGER NOT NULL CHECK (partition_count > 0),
+    completed_partitions INTEGER[] NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'completed', 'failed')),
+    accounts_checked BIGINT NOT NULL DEFAULT 0,
+    rows_scanned BIGINT NOT NULL DEFAULT 0,
+    findings_count BIGINT NOT NULL DEFAULT 0,
+    fixed_count BIGINT NOT NULL DEFAULT 0,
+    amount DECIMAL(14, 4) NOT NULL DEFAULT 0,
+    partition_stats JSONB NOT NULL DEFAULT '[]',
+    error_message TEXT,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE,
+    duration_ms BIGINT
+);
+
+CREATE INDEX IF NOT EXISTS idx_billing_reconciliation_runs_check
+ON public.billing_reconciliation_runs(check_type, started_at DESC)
+WHERE status = 'completed';
+
+CREATE TABLE IF NOT EXISTS public.billing_reconciliation_findings (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    run_id UUID NOT NULL REFERENCES public.billing_reconciliation_runs(id) ON DELETE CASCADE,
+    check_type TEXT NOT NULL,
+    account_id UUID NOT NULL,
+    details JSONB NOT NULL DEFAULT '{}',
+    fixed BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_billing_reconciliation_findings_run
+ON public.billing_reconciliation_findings(run_id);
+
+CREATE INDEX IF NOT EXISTS idx_billing_reconciliation_findings_account
+ON public.billing_reconciliation_findings(account_id, created_at DESC);
+
+ALTER TABLE public.billing_reconciliation_runs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.billing_reconciliation_findings ENABLE ROW LEVEL SECURITY;
+
+-- Incremental runs find changed accounts by time range
+CREATE INDEX IF NOT EXISTS idx_credit_ledger_created_at
+ON credit_ledger(created_at);
+
+CREATE INDEX IF NOT EXISTS idx_credit_accounts_updated_at
+ON credit_accounts(updated_at);
+
+CREATE OR REPLACE FUNCTION billing_account_partition(p_account_id UUID, p_partitions INTEGER)
+RETURNS INTEGER AS $$
+    SELECT (hashtext(p_account_id::text) & 2147483647) % p_partitions;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION begin_billing_reconciliation_run(
+    p_check_type TEXT,
+    p_partitions INTEGER,
+    p_incremental BOOLEAN DEFAULT TRUE
+) RETURNS TABLE(run_id UUID, since TIMESTAMPTZ) AS $$
+#variable_conflict use_column
+DECLARE
+    v_since TIMESTAMPTZ;
+    v_run_id UUID;
+BEGIN
+    IF p_incremental THEN
+        SELECT r.started_at INTO v_since
+        FROM public.billing_reconciliation_runs r
+        WHERE r.check_type = p_check_type
+        AND r.status = 'completed'
+        ORDER BY r.started_at DESC
+        LIMIT 1;
+    END IF;
+
+    INSERT INTO public.billing_reconciliation_runs (check_type, mode, since, partition_count)
+    VALUES (
+        p_check_type,
+        CASE WHEN v_since IS NULL THEN 'full' ELSE 'incremental' END,
+        v_since,
+        p_partitions
+    )
+    RETURNING id INTO v_run_id;
+
+    run_id := v_run_id;
+    since := v_since;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Accounts of one partition to check: all of them, or those with ledger
+-- entries or balance updates since p_since.
+CREATE OR REPLACE FUNCTION billing_reconciliation_candidates(
+    p_partition INTEGER,
+    p_partitions INTEGER,
+    p_since TIMESTAMPTZ
+) RETURNS TABLE(account_id UUID) AS $$
+#variable_conflict use_column
+BEGIN
+    IF p_since IS NULL THEN
+        RETURN QUERY
+        SELECT ca.account_id
+        FROM credit_accounts ca
+        WHERE billing_account_partition(ca.account_id, p_partitions) = p_partition;
+    ELSE
+        RETURN QUERY
+        SELECT changed.account_id
+        FROM (
+            SELECT cl.account_id FROM credit_ledger cl WHERE cl.created_at >= p_since
+            UNION
+            SELECT ca.account_id FROM credit_accounts ca WHERE ca.updated_at >= p_since
+        ) changed
+        WHERE billing_account_partition(changed.account_id, p_partitions) = p_partition;
+    END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Adds one partition's counts to its run and completes the run when every
+-- partition has reported. A retried partition is only counted once.
+CREATE OR REPLACE FUNCTION record_billing_reconciliation_partition(
+    p_run_id UUID,
+    p_partition INTEGER,
+    p_started_at TIMESTAMPTZ,
+    p_accounts_checked BIGINT,
+    p_rows_scanned BIGINT,
+    p_findings BIGINT,
+    p_fixed BIGINT,
+    p_amount DECIMAL
+) RETURNS VOID AS $$
+BEGIN
+    UPDATE public.billing_reconciliation_runs r
+    SET
+        completed_partitions = r.completed_partitions || p_partition,
+        accounts_checked = r.accounts_checked + p_accounts_checked,
+        rows_scanned = r.rows_scanned + p_rows_scanned,
+        findings_count = r.findings_count + p_findings,
+        fixed_count = r.fixed_count + p_fixed,
+        amount = r.amount + p_amount,
+        partition_stats = r.partition_stats || jsonb_build_array(jsonb_build_object(
+            'partition', p_partition,
+            'duration_ms', (EXTRACT(EPOCH FROM clock_timestamp() - p_started_at) * 1000)::BIGINT,
+            'accounts_checked', p_accounts_checked,
+            'rows_scanned', p_rows_scanned,
+            'findings', p_findings
+        )),
+        status = CASE WHEN cardinality(r.completed_partitions) + 1 >= r.partition_count THEN 'completed' ELSE r.status END,
+        finished_at = CASE WHEN cardinality(r.completed_partitions) + 1 >= r.partition_count THEN clock_timestamp() END,
+        duration_ms = CASE WHEN cardinality(r.completed_partitions) + 1 >= r.partition_count
+            THEN (EXTRACT(EPOCH FROM clock_timestamp() - r.started_at) * 1000)::BIGINT END
+    WHERE r.id = p_run_id
+    AND r.status = 'running'
+    AND NOT (p_partition = ANY(r.completed_partitions));
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION reconcile_balance_partition(
+    p_run_id UUID,
+    p_partition INTEGER,
+    p_partitions INTEGER,
+    p_since TIMESTAMPTZ DEFAULT NULL,
+    p_fix BOOLEAN DEFAULT TRUE
+) RETURNS TABLE(
+    accounts_checked BIGINT,
+    rows_scanned BIGINT,
+    findings BIGINT,
+    fixed BIGINT,
+    amount DECIMAL
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_started_at TIMESTAMPTZ := clock_timestamp();
+    v_checked BIGINT;
+    v_findings BIGINT;
+    v_fixed BIGINT;
+    v_amount DECIMAL;
+BEGIN
+    WITH checked AS (
+        SELECT ca.account_id, ca.balance, ca.expiring_credits, ca.non_expiring_credits,
+               ca.expiring_credits + ca.non_expiring_credits AS expected
+        FROM credit_accounts ca
+        JOIN billing_reconciliation_candidates(p_partition, p_partitions, p_since) c
+            ON c.account_id = ca.account_id
+    ),
+    discrepancies AS (
+        SELECT * FROM checked WHERE ABS(balance - expected) > 0.01
+    ),
+    repaired AS (
+        -- Recomputed from the current row, in case credits moved since the scan
+        UPDATE credit_accounts ca
+        SET
+            balance = ca.expiring_credits + ca.non_expiring_credits,
+            updated_at = NOW()
+        FROM discrepancies d
+        WHERE p_fix
+        AND ca.account_id = d.account_id
+        AND ABS(ca.balance - (ca.expiring_credits + ca.non_expiring_credits)) > 0.01
+        RETURNING ca.account_id, ca.balance AS new_balance
+    ),
+    adjustments AS (
+        INSERT INTO credit_ledger (account_id, amount, balance_after, type, description, metadata)
+        SELECT
+            d.account_id,
+            r.new_balance - d.balance,
+            r.new_balance,
+            'adjustment',
+            'Automatic balance reconciliation',
+            jsonb_build_object(
+                'old_balance', d.balance,
+                'old_expiring', d.expiring_credits,
+                'old_non_expiring', d.non_expiring_credits,
+                'reconciled_at', NOW(),
+                'reconciliation_run_id', p_run_id
+            )
+        FROM discrepancies d
+        JOIN repaired r ON r.account_id = d.account_id
+        RETURNING 1
+    ),
+    recorded AS (
+        INSERT INTO public.billing_reconciliation_findings (run_id, check_type, account_id, details, fixed)
+        SELECT
+            p_run_id,
+            'balance_consistency',
+            d.account_id,
+            jsonb_build_object(
+                'expected', d.expected,
+                'actual', d.balance,
+                'difference', d.expected - d.balance
+            ),
+            r.account_id IS NOT NULL
+        FROM discrepancies d
+        LEFT JOIN repaired r ON r.account_id = d.account_id
+        RETURNING fixed, (details->>'difference')::DECIMAL AS difference
+    )
+    SELECT
+        (SELECT COUNT(*) FROM checked),
+        (SELECT COUNT(*) FROM recorded),
+        (SELECT COUNT(*) FROM recorded WHERE fixed),
+        (SELECT COALESCE(SUM(ABS(difference)), 0) FROM recorded)
+    INTO v_checked, v_findings, v_fixed, v_amount;
+
+    PERFORM record_billing_reconciliation_partition(
+        p_run_id, p_partition, v_started_at, v_checked, v_checked, v_findings, v_fixed, v_amount
+    );
+
+    accounts_checked := v_checked;
+    rows_scanned := v_checked;
+    findings := v_findings;
+    fixed := v_fixed;
+    amount := v_amount;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Ledger entries of the same account, amount and description created less
+-- than p_window_seconds apart. Incremental runs only report pairs whose
+-- later entry is new since p_since, so a pair is reported once.
+CREATE OR REPLACE FUNCTION detect_double_charges_partition(
+    p_run_id UUID,
+    p_partition INTEGER,
+    p_partitions INTEGER,
+    p_since TIMESTAMPTZ DEFAULT NULL,
+    p_fix BOOLEAN DEFAULT FALSE,
+    p_window_seconds INTEGER DEFAULT 60,
+    p_lookback INTERVAL DEFAULT INTERVAL '7 days'
+) RETURNS TABLE(
+    accounts_checked BIGINT,
+    rows_scanned BIGINT,
+    findings BIGINT,
+    fixed BIGINT,
+    amount DECIMAL
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_started_at TIMESTAMPTZ := clock_timestamp();
+    v_checked BIGINT;
+    v_scanned BIGINT;
+    v_findings BIGINT;
+    v_amount DECIMAL;
+BEGIN
+    WITH entries AS (
+        SELECT
+            cl.id,
+            cl.account_id,
+            cl.amount,
+            cl.description,
+            cl.created_at,
+            LAG(cl.id) OVER w AS previous_id,
+            LAG(cl.created_at) OVER w AS previous_created_at
+        FROM credit_ledger cl
+        WHERE cl.created_at >= NOW() - p_lookback
+        AND billing_account_partition(cl.account_id, p_partitions) = p_partition
+        AND (
+            p_since IS NULL
+            OR cl.account_id IN (
+                SELECT c.account_id FROM billing_reconciliation_candidates(p_partition, p_partitions, p_since) c
+            )
+        )
+        WINDOW w AS (PARTITION BY cl.account_id, cl.amount, cl.description ORDER BY cl.created_at, cl.id)
+    ),
+    duplicates AS (
+        SELECT * FROM entries
+        WHERE previous_id IS NOT NULL
+        AND created_at - previous_created_at < make_interval(secs => p_window_seconds)
+        AND (p_since IS NULL OR created_at >= p_since)
+    ),
+    recorded AS (
+        INSERT INTO public.billing_reconciliation_findings (run_id, check_type, account_id, details)
+        SELECT
+            p_run_id,
+            'double_charges',
+            d.account_id,
+            jsonb_build_object(
+                'amount', d.amount,
+                'description', d.description,
+                'entries', jsonb_build_array(d.id, d.previous_id),
+                'time_difference_seconds', EXTRACT(EPOCH FROM d.created_at - d.previous_created_at)
+            )
+        FROM duplicates d
+        RETURNING (details->>'amount')::DECIMAL AS duplicated_amount
+    )
+    SELECT
+        (SELECT COUNT(DISTINCT account_id) FROM entries),
+        (SELECT COUNT(*) FROM entries),
+        (SELECT COUNT(*) FROM recorded),
+        (SELECT COALESCE(SUM(ABS(duplicated_amount)), 0) FROM recorded)
+    INTO v_checked, v_scanned, v_findings, v_amount;
+
+    PERFORM record_billing_reconciliation_partition(
+        p_run_id, p_partition, v_started_at, v_checked, v_scanned, v_findings, 0, v_amount
+    );
+
+    accounts_checked := v_checked;
+    rows_scanned := v_scanned;
+    findings := v_findings;
+    fixed := 0;
+    amount := v_amount;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Set-based, partitioned version of cleanup_expired_credits(). Expiry
+-- depends on time rather than on ledger changes, so p_since is ignored and
+-- every account of the partition with expiring credits is considered.
+CREATE OR REPLACE FUNCTION cleanup_expired_credits_partition(
+    p_run_id UUID,
+    p_partition INTEGER,
+    p_partitions INTEGER,
+    p_since TIMESTAMPTZ DEFAULT NULL,
+    p_fix BOOLEAN DEFAULT TRUE
+) RETURNS TABLE(
+    accounts_checked BIGINT,
+    rows_scanned BIGINT,
+    findings BIGINT,
+    fixed BIGINT,
+    amount DECIMAL
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_started_at TIMESTAMPTZ := clock_timestamp();
+    v_scanned BIGINT;
+    v_findings BIGINT;
+    v_fixed BIGINT;
+    v_amount DECIMAL;
+BEGIN
+    WITH considered AS (
+        SELECT ca.account_id
+        FROM credit_accounts ca
+        WHERE ca.expiring_credits > 0
+        AND billing_account_partition(ca.account_id, p_partitions) = p_partition
+    ),
+    expired AS (
+        SELECT ca.account_id, ca.expiring_credits, ca.non_expiring_credits,
+               ca.tier, ca.stripe_subscription_id, ca.next_credit_grant
+        FROM credit_accounts ca
+        JOIN considered c ON c.account_id = ca.account_id
+        WHERE (
+            (ca.tier IS NULL OR ca.tier = 'none')
+            OR (ca.stripe_subscription_id IS NULL AND ca.next_credit_grant < NOW() - INTERVAL '30 days')
+        )
+        AND (ca.trial_status IS NULL OR ca.trial_status NOT IN ('active'))
+        FOR UPDATE OF ca
+    ),
+    cleaned AS (
+        UPDATE credit_accounts ca
+        SET
+            expiring_credits = 0,
+            balance = ca.non_expiring_credits,
+            updated_at = NOW()
+        FROM expired e
+        WHERE p_fix
+        AND ca.account_id = e.account_id
+        RETURNING ca.account_id, e.expiring_credits AS credits_removed, ca.balance AS new_balance
+    ),
+    expiry_entries AS (
+        INSERT INTO credit_ledger (account_id, amount, balance_after, type, description, is_expiring, metadata)
+        SELECT
+            c.account_id,
+            -c.credits_removed,
+            c.new_balance,
+            'expired',
+            'Cleanup of expired credits after subscription cancellation',
+            true,
+            jsonb_build_object('reconciliation_run_id', p_run_id)
+        FROM cleaned c
+        RETURNING 1
+    ),
+    recorded AS (
+        INSERT INTO public.billing_reconciliation_findings (run_id, check_type, account_id, details, fixed)
+        SELECT
+            p_run_id,
+            'expired_credits',
+            e.account_id,
+            jsonb_build_object(
+                'credits_removed', e.expiring_credits,
+                'new_balance', e.non_expiring_credits,
+                'tier', e.tier,
+                'subscription_id', e.stripe_subscription_id,
+                'next_grant', e.next_credit_grant
+            ),
+            c.account_id IS NOT NULL
+        FROM expired e
+        LEFT JOIN cleaned c ON c.account_id = e.account_id
+        RETURNING fixed, (details->>'credits_removed')::DECIMAL AS credits_removed
+    )
+    SELECT
+        (SELECT COUNT(*) FROM considered),
+        (SELECT COUNT(*) FROM recorded),
+        (SELECT COUNT(*) FROM recorded WHERE fixed),
+        (SELECT COALESCE(SUM(credits_removed), 0) FROM recorded WHERE fixed)
+    INTO v_scanned, v_findings, v_fixed, v_amount;
+
+    PERFORM record_billing_reconciliation_partition(
+        p_run_id, p_partition, v_started_at, v_scanned, v_scanned, v_findings, v_fixed, v_amount
+    );
+
+    accounts_checked := v_scanned;
+    rows_scanned := v_scanned;
+    findings := v_findings;
+    fixed := v_fixed;
+    amount := v_amount;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION begin_billing_reconciliation_run(TEXT, INTEGER, BOOLEAN) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION record_billing_reconciliation_partition(UUID, INTEGER, TIMESTAMPTZ, BIGINT, BIGINT, BIGINT, BIGINT, DECIMAL) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION reconcile_balance_partition(UUID, INTEGER, INTEGER, TIMESTAMPTZ, BOOLEAN) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION detect_double_charges_partition(UUID, INTEGER, INTEGER, TIMESTAMPTZ, BOOLEAN, INTEGER, INTERVAL) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION cleanup_expired_credits_partition(UUID, INTEGER, INTEGER, TIMESTAMPTZ, BOOLEAN) FROM PUBLIC, anon, authenticated;
+
+GRANT EXECUTE ON FUNCTION begin_billing_reconciliation_run(TEXT, INTEGER, BOOLEAN) TO service_role;
+GRANT EXECUTE ON FUNCTION reconcile_balance_partition(UUID, INTEGER, INTEGER, TIMESTAMPTZ, BOOLEAN) TO service_role;
+GRANT EXECUTE ON FUNCTION detect_double_charges_partition(UUID, INTEGER, INTEGER, TIMESTAMPTZ, BOOLEAN, INTEGER, INTERVAL) TO service_role;
+GRANT EXECUTE ON FUNCTION cleanup_expired_credits_partition(UUID, INTEGER, INTEGER, TIMESTAMPTZ, BOOLEAN) TO service_role;
+
+COMMENT ON TABLE public.billing_reconciliation_runs IS 'Billing reconciliation runs with per-partition runtime and row counts';
+COMMENT ON TABLE public.billing_reconciliation_findings IS 'Accounts flagged (and possibly fixed) by billing reconciliation runs';
+
+COMMIT;
@@ -0,0 +1,185 @@
+BEGIN;
+
+-- Check the caller's fencing token in the same transaction as the grant
+-- instead of a separate advance_lock_fence call beforehand.
+DROP FUNCTION IF EXISTS atomic_add_credits(UUID, NUMERIC, BOOLEAN, TEXT, TIMESTAMP WITH TIME ZONE, TEXT, TEXT, TEXT);
+
+CREATE OR REPLACE FUNCTION atomic_add_credits(
+    p_account_id UUID,
+    p_amount NUMERIC(10, 2),
+    p_is_expiring BOOLEAN DEFAULT TRUE,
+    p_description TEXT DEFAULT 'Credit added',
+    p_expires_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_type TEXT DEFAULT NULL,
+    p_stripe_event_id TEXT DEFAULT NULL,
+    p_idempotency_key TEXT DEFAULT NULL,
+    p_lock_key TEXT DEFAULT NULL,
+    p_fencing_token BIGINT DEFAULT NULL
+) RETURNS JSONB AS $$
+DECLARE
+    v_current_expiring NUMERIC(10, 2);
+    v_current_non_expiring NUMERIC(10, 2);
+    v_current_balance NUMERIC(10, 2);
+    v_new_expiring NUMERIC(10, 2);
+    v_new_non_expiring NUMERIC(10, 2);
+    v_new_total NUMERIC(10, 2);
+    v_tier TEXT;
+    v_ledger_id UUID;
+BEGIN
+    -- The fence row stays locked until the grant commits, so a holder whose
+    -- lease expired cannot slip a write in between the check and the grant
+    IF p_lock_key IS NOT NULL AND p_fencing_token IS NOT NULL THEN
+        IF NOT advance_lock_fence(p_lock_key, p_fencing_token) THEN
+            RETURN jsonb_build_object(
+                'success', false,
+                'message', 'Fencing token is stale',
+                'lock_lost', true
+            );
+        END IF;
+    END IF;
+    
+    IF p_stripe_event_id IS NOT NULL THEN
+        IF EXISTS (
+            SELECT 1 FROM public.credit_ledger 
+            WHERE stripe_event_id = p_stripe_event_id
+        ) THEN
+            RETURN jsonb_build_object(
+                'success', true,
+                'message', 'Credit already added (duplicate prevented)',
+                'duplicate_prevented', true
+            );
+        END IF;
+    END IF;
+    
+    IF p_idempotency_key IS NOT NULL THEN
+        IF EXISTS (
+            SELECT 1 FROM public.credit_ledger 
+            WHERE idempotency_key = p_idempotency_key
+            AND created_at > NOW() - INTERVAL '1 hour'
+        ) THEN
+            RETURN jsonb_build_object(
+                'success', true,
+                'message', 'Credit already added (idempotent)',
+                'duplicate_prevented', true
+            );
+        END IF;
+    END IF;
+    
+    SELECT 
+        expiring_credits, 
+        non_expiring_credits, 
+        balance, 
+        tier
+    INTO 
+        v_current_expiring,
+        v_current_non_expiring,
+        v_current_balance,
+        v_tier
+    FROM public.credit_accounts
+    WHERE account_id = p_account_id
+    FOR UPDATE;
+    
+    IF NOT FOUND THEN
+        v_current_expiring := 0;
+        v_current_non_expiring := 0;
+        v_current_balance := 0;
+        v_tier := 'none';
+        
+        INSERT INTO public.credit_accounts (
+            account_id, 
+            expiring_credits, 
+            non_expiring_credits, 
+            balance, 
+            tier
+        ) VALUES (
+            p_account_id,
+            0,
+            0,
+            0,
+            v_tier
+        );
+    END IF;
+    
+    IF p_is_expiring THEN
+        v_new_expiring := v_current_expiring + p_amount;
+        v_new_non_expiring := v_current_non_expiring;
+    ELSE
+        v_new_expiring := v_current_expiring;
+        v_new_non_expiring := v_current_non_expiring + p_amount;
+    END IF;
+    
+    v_new_total := v_new_expiring + v_new_non_expiring;
+    
+    UPDATE public.credit_accounts
+    SET 
+        expiring_credits = v_new_expiring,
+        non_expiring_credits = v_new_non_expiring,
+        balance = v_new_total,
+        updated_at = NOW()
+    WHERE account_id = p_account_id;
+    
+    INSERT INTO public.credit_ledger (
+        account_id,
+        amount,
+        balance_after,
+        type,
+        description,
+        is_expiring,
+        expires_at,
+        stripe_event_id,
+        idempotency_key,
+        processing_source
+    ) VALUES (
+        p_account_id,
+        p_amount,
+        v_new_total,
+        COALESCE(p_type, CASE WHEN p_is_expiring THEN 'tier_grant' ELSE 'purchase' END),
+        p_description,
+        p_is_expiring,
+        p_expires_at,
+        p_stripe_event_id,
+        p_idempotency_key,
+        'atomic_function'
+    ) RETURNING id INTO v_ledger_id;
+    
+    RETURN jsonb_build_object(
+        'success', true,
+        'expiring_credits', v_new_expiring,
+        'non_expiring_credits', v_new_non_expiring,
+        'total_balance', v_new_total,
+        'ledger_id', v_ledger_id
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION atomic_add_credits TO service_role;
+
+-- Fence rows are only needed while a lock can still have a holder with an
+-- older token; drop the ones that have not been written for a week.
+CREATE INDEX IF NOT EXISTS idx_lock_fences_updated_at ON public.lock_fences(updated_at);
+
+CREATE OR REPLACE FUNCTION cleanup_lock_fences(
+    p_older_than INTERVAL DEFAULT INTERVAL '7 days'
+) RETURNS INTEGER AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    DELETE FROM public.lock_fences
+    WHERE updated_at < NOW() - p_older_than;
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION cleanup_lock_fences(INTERVAL) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION cleanup_lock_fences(INTERVAL) TO service_role;
+
+DO $$
+BEGIN
+    PERFORM cron.schedule('cleanup-lock-fences', '17 3 * * *', 'SELECT cleanup_lock_fences()');
+EXCEPTION WHEN OTHERS THEN
+    RAISE WARNING 'Failed to schedule lock fence cleanup: %', SQLERRM;
+END;
+$$;
+
+COMMIT;
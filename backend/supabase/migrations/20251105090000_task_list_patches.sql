@@ -0,0 +1,72 @@
+BEGIN;
+
+-- Apply task list changes to the stored task_list message in place, so a
+-- task update sends the changed tasks instead of the whole document.
+--
+-- p_sections replaces the section list when given (NULL keeps it).
+-- p_tasks holds new or changed tasks; changed tasks keep their position and
+-- new ones are appended in the given order. p_task_order, when given, lists
+-- every remaining task ID in the order to store. Returns false if the
+-- message no longer exists.
+CREATE OR REPLACE FUNCTION patch_task_list(
+    p_message_id UUID,
+    p_sections JSONB DEFAULT NULL,
+    p_tasks JSONB DEFAULT '[]'::jsonb,
+    p_deleted_task_ids TEXT[] DEFAULT '{}',
+    p_task_order TEXT[] DEFAULT NULL
+) RETURNS BOOLEAN AS $$
+DECLARE
+    v_content JSONB;
+    v_tasks JSONB;
+BEGIN
+    SELECT CASE WHEN jsonb_typeof(content) = 'string' THEN (content #>> '{}')::jsonb ELSE content END
+    INTO v_content
+    FROM public.messages
+    WHERE message_id = p_message_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    WITH current_tasks AS (
+        SELECT value AS task, ordinality AS pos
+        FROM jsonb_array_elements(COALESCE(v_content->'tasks', '[]'::jsonb)) WITH ORDINALITY
+    ),
+    changed AS (
+        SELECT value AS task, ordinality AS pos
+        FROM jsonb_array_elements(COALESCE(p_tasks, '[]'::jsonb)) WITH ORDINALITY
+    ),
+    merged AS (
+        SELECT COALESCE(c.task, t.task) AS task, t.pos AS pos
+        FROM current_tasks t
+        LEFT JOIN changed c ON c.task->>'id' = t.task->>'id'
+        WHERE NOT (t.task->>'id' = ANY(COALESCE(p_deleted_task_ids, '{}')))
+        UNION ALL
+        SELECT c.task, (SELECT COUNT(*) FROM current_tasks) + c.pos
+        FROM changed c
+        WHERE NOT EXISTS (SELECT 1 FROM current_tasks t WHERE t.task->>'id' = c.task->>'id')
+    )
+    SELECT COALESCE(
+        jsonb_agg(task ORDER BY COALESCE(array_position(p_task_order, task->>'id'), pos), pos),
+        '[]'::jsonb
+    )
+    INTO v_tasks
+    FROM merged;
+
+    UPDATE public.messages
+    SET content = jsonb_build_object(
+            'sections', COALESCE(p_sections, v_content->'sections', '[]'::jsonb),
+            'tasks', v_tasks
+        ),
+        updated_at = NOW()
+    WHERE message_id = p_message_id;
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION patch_task_list(UUID, JSONB, JSONB, TEXT[], TEXT[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION patch_task_list(UUID, JSONB, JSONB, TEXT[], TEXT[]) TO service_role;
+
+COMMIT;
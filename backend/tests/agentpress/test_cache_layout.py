@@ -0,0 +1,121 @@
+"""
+Unit tests for the stable prompt-cache layout.
+
+Tests that chunk boundaries are reused verbatim as the thread grows,
+that stale boundaries are dropped from the first changed chunk onwards,
+that predicted cache reads are compared with reported usage, and that
+reused chunks never exceed the available cache breakpoints.
+"""
+import uuid
+
+import pytest
+from core.agentpress.cache_layout import CacheLayoutEngine
+
+MODEL = "anthropic/claude-sonnet-4-20250514"
+SYSTEM_PROMPT = {"role": "system", "content": "You are a helpful agent. " * 400}
+
+
+def make_messages(count: int, words: int = 300):
+    messages = []
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append({
+            "role": role,
+            "content": f"turn {i} " + "tokens " * words,
+            "message_id": str(uuid.uuid4()),
+        })
+    return messages
+
+
+def cached_texts(prepared):
+    return [
+        msg["content"][0]["text"]
+        for msg in prepared[1:]
+        if isinstance(msg.get("content"), list) and "cache_control" in msg["content"][0]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_boundaries_are_append_only():
+    """Appending messages keeps earlier cached chunks byte-identical"""
+    engine = CacheLayoutEngine(persist_layout=False)
+    thread = make_messages(12)
+
+    first = await engine.apply(SYSTEM_PROMPT, thread, MODEL, thread_id="t1", context_window_tokens=200_000)
+    first_chunks = cached_texts(first)
+    assert first_chunks
+
+    thread = thread + make_messages(6)
+    second = await engine.apply(SYSTEM_PROMPT, thread, MODEL, thread_id="t1", context_window_tokens=200_000)
+    second_chunks = cached_texts(second)
+
+    assert second_chunks[:len(first_chunks)] == first_chunks
+    assert len(second_chunks) <= 3
+    assert second[-1] is thread[-1]
+
+
+@pytest.mark.asyncio
+async def test_changed_chunk_drops_it_and_later_boundaries():
+    """Compressing a message inside a chunk only rebuilds from that chunk on"""
+    engine = CacheLayoutEngine(persist_layout=False)
+    thread = make_messages(20)
+
+    first = await engine.apply(SYSTEM_PROMPT, thread, MODEL, thread_id="t2", context_window_tokens=200_000)
+    first_chunks = cached_texts(first)
+    assert len(first_chunks) >= 2
+
+    layout = await engine.load_layout("t2")
+    second_chunk_start = layout.boundaries[0].message_count
+    thread[second_chunk_start + 1] = {**thread[second_chunk_start + 1], "content": "compressed"}
+
+    second = await engine.apply(SYSTEM_PROMPT, thread, MODEL, thread_id="t2", context_window_tokens=200_000)
+    second_chunks = cached_texts(second)
+    assert second_chunks[0] == first_chunks[0]
+    assert second_chunks[1] != first_chunks[1]
+    assert (await engine.load_layout("t2")).prediction["reused_blocks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_prediction_is_compared_with_reported_usage():
+    engine = CacheLayoutEngine(persist_layout=False)
+    thread = make_messages(12)
+
+    await engine.apply(SYSTEM_PROMPT, thread, MODEL, thread_id="t3", context_window_tokens=200_000)
+    layout = await engine.load_layout("t3")
+    # Nothing is warm on the first turn
+    assert layout.prediction["predicted_read_tokens"] == 0
+    await engine.record_usage("t3", {"prompt_tokens": 9000, "cache_creation_input_tokens": 8000})
+
+    await engine.apply(SYSTEM_PROMPT, thread + make_messages(2), MODEL, thread_id="t3", context_window_tokens=200_000)
+    predicted = (await engine.load_layout("t3")).prediction["predicted_read_tokens"]
+    assert predicted > 0
+
+    record = await engine.record_usage("t3", {"prompt_tokens": 10000, "cache_read_input_tokens": predicted})
+    assert record["predicted_read_tokens"] == record["actual_read_tokens"] == predicted
+
+    layout = await engine.load_layout("t3")
+    assert layout.prediction is None
+    assert layout.stats["turns"] == 2
+    assert layout.hit_ratio == pytest.approx(predicted / 19000)
+    assert await engine.record_usage("t3", {"prompt_tokens": 1}) is None
+
+
+@pytest.mark.asyncio
+async def test_reused_chunks_fit_when_system_prompt_becomes_cacheable():
+    """A layout stored with 4 chunks merges its tail once the system prompt takes a breakpoint"""
+    engine = CacheLayoutEngine(persist_layout=False)
+    thread = make_messages(200)
+    short_prompt = {"role": "system", "content": "You are a helpful agent."}
+
+    await engine.apply(short_prompt, thread[:60], MODEL, thread_id="t4", context_window_tokens=200_000)
+    first = await engine.apply(short_prompt, thread, MODEL, thread_id="t4", context_window_tokens=200_000)
+    first_chunks = cached_texts(first)
+    assert len(first_chunks) == 4
+
+    second = await engine.apply(SYSTEM_PROMPT, thread + make_messages(2), MODEL, thread_id="t4", context_window_tokens=200_000)
+    breakpoints = [
+        msg for msg in second
+        if isinstance(msg.get("content"), list) and "cache_control" in msg["content"][-1]
+    ]
+    assert len(breakpoints) <= 4
+    assert cached_texts(second)[:2] == first_chunks[:2]
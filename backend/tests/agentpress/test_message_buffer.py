@@ -0,0 +1,78 @@
+"""
+Unit tests for the write-behind status message buffer.
+
+Tests that non-LLM status rows are returned immediately with
+client-generated IDs and persisted in batches.
+"""
+import pytest
+from core.agentpress.message_buffer import MessageWriteBuffer
+
+
+class RecordingInserter:
+    """Collects batches passed to the bulk insert callback."""
+
+    def __init__(self, fail_times: int = 0):
+        self.batches = []
+        self.fail_times = fail_times
+
+    async def __call__(self, rows):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError("db unavailable")
+        self.batches.append(list(rows))
+
+
+def test_should_buffer_only_non_llm_status_types():
+    """LLM-visible messages and llm_response_end must stay synchronous"""
+    assert MessageWriteBuffer.should_buffer("status", False)
+    assert MessageWriteBuffer.should_buffer("llm_response_start", False)
+    assert MessageWriteBuffer.should_buffer("assistant_response_end", False)
+    assert not MessageWriteBuffer.should_buffer("llm_response_end", False)
+    assert not MessageWriteBuffer.should_buffer("assistant", True)
+    assert not MessageWriteBuffer.should_buffer("status", True)
+
+
+@pytest.mark.asyncio
+async def test_add_returns_row_without_writing():
+    """Rows are returned immediately and only written on flush"""
+    inserter = RecordingInserter()
+    buffer = MessageWriteBuffer(inserter, batch_size=10)
+
+    row = buffer.add("thread-1", "status", {"status_type": "tool_started"}, {"thread_run_id": "run-1"})
+
+    assert row["message_id"]
+    assert row["is_llm_message"] is False
+    assert row["created_at"]
+    assert inserter.batches == []
+
+    written = await buffer.flush()
+    assert written == 1
+    assert inserter.batches == [[row]]
+    assert buffer.pending_count == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_size_triggers_background_flush():
+    """Reaching batch_size schedules a flush; close() drains everything in order"""
+    inserter = RecordingInserter()
+    buffer = MessageWriteBuffer(inserter, batch_size=3)
+
+    rows = [buffer.add("thread-1", "status", {"i": i}) for i in range(5)]
+    await buffer.close()
+
+    flushed = [row for batch in inserter.batches for row in batch]
+    assert flushed == rows
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_requeues_rows():
+    """A failed bulk insert keeps rows for the next flush"""
+    inserter = RecordingInserter(fail_times=1)
+    buffer = MessageWriteBuffer(inserter, batch_size=10)
+
+    row = buffer.add("thread-1", "status", {"status_type": "finish"})
+    assert await buffer.flush() == 0
+    assert buffer.pending_count == 1
+
+    assert await buffer.flush() == 1
+    assert inserter.batches == [[row]]
@@ -0,0 +1,151 @@
+"""
+Unit tests for the per-run thread state.
+
+Tests that thread facts are loaded in a single batch (and retried when
+loading fails), kept current from saved messages and from messages added
+by other processes, and that the cache rebuild flag is only written back
+when it changed.
+"""
+import json
+
+import pytest
+from core.agentpress.thread_state import ThreadRunState
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = {}
+        self.update_data = None
+
+    def select(self, fields):
+        return self
+
+    def eq(self, field, value):
+        self.filters[field] = value
+        return self
+
+    def in_(self, field, values):
+        self.filters[field] = tuple(values)
+        return self
+
+    def order(self, field, desc=False):
+        return self
+
+    def limit(self, count):
+        return self
+
+    def update(self, data):
+        self.update_data = data
+        return self
+
+    async def execute(self):
+        self.client.requests += 1
+        if self.client.fail:
+            raise ConnectionError("database unavailable")
+        if self.update_data is not None:
+            self.client.updates.append(self.update_data)
+            return type("Result", (), {"data": [self.update_data]})()
+        if self.table == "threads":
+            data = [{"metadata": self.client.metadata}]
+        else:
+            data = self.client.rows.get(self.filters.get("type"), [])
+        return type("Result", (), {"data": data})()
+
+
+class FakeClient:
+    def __init__(self, rows=None, metadata=None, fail=False):
+        self.rows = rows or {}
+        self.metadata = metadata or {}
+        self.fail = fail
+        self.requests = 0
+        self.updates = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+@pytest.mark.asyncio
+async def test_load_fetches_thread_facts_once():
+    client = FakeClient(
+        rows={
+            "llm_response_end": [{"content": json.dumps({"usage": {"total_tokens": 1200}, "model": "gpt-4o"})}],
+            ("assistant", "tool", "user"): [{"type": "tool"}],
+            "user": [{"content": json.dumps({"role": "user", "content": "hello"})}],
+        },
+        metadata={"cache_needs_rebuild": True},
+    )
+    state = ThreadRunState(thread_id="t1")
+
+    await state.load(client)
+    await state.load(client)
+
+    assert client.requests == 4
+    assert state.last_usage == {"total_tokens": 1200}
+    assert state.last_usage_model == "gpt-4o"
+    assert state.latest_message_type == "tool"
+    assert state.latest_user_message_content == "hello"
+    assert state.cache_needs_rebuild is True
+
+
+@pytest.mark.asyncio
+async def test_failed_load_is_retried():
+    client = FakeClient(rows={"user": [{"content": "hi"}]}, fail=True)
+    state = ThreadRunState(thread_id="t1")
+
+    await state.load(client)
+    assert state.loaded is False
+
+    client.fail = False
+    await state.load(client)
+    assert state.loaded is True
+    assert state.latest_user_message_content == "hi"
+
+
+@pytest.mark.asyncio
+async def test_latest_message_type_sees_messages_from_other_processes():
+    client = FakeClient(rows={("assistant", "tool", "user"): [{"type": "assistant"}]})
+    state = ThreadRunState(thread_id="t1", loaded=True)
+    state.record_message("tool", {"role": "tool", "content": "ok"})
+
+    # A user message was added through the API after the assistant reply was saved
+    client.rows[("assistant", "tool", "user")] = [{"type": "user"}]
+    assert await state.refresh_latest_message_type(client) == "user"
+
+    client.fail = True
+    assert await state.refresh_latest_message_type(client) == "user"
+
+
+def test_record_message_tracks_latest_type_and_usage():
+    state = ThreadRunState(thread_id="t1", loaded=True)
+
+    state.record_message("assistant", {"role": "assistant", "content": "done"})
+    state.record_message("status", {"status_type": "finish"})
+    state.record_message("llm_response_end", {"usage": {"total_tokens": 50}, "model": "claude"})
+
+    assert state.latest_message_type == "assistant"
+    assert state.last_usage == {"total_tokens": 50}
+    assert state.last_usage_model == "claude"
+
+
+@pytest.mark.asyncio
+async def test_rebuild_flag_is_persisted_only_when_changed():
+    client = FakeClient(metadata={"cache_needs_rebuild": False, "other": 1})
+    state = ThreadRunState(thread_id="t1", loaded=True)
+
+    await state.persist(client)
+    assert client.requests == 0
+
+    state.request_cache_rebuild()
+    await state.persist(client)
+    assert client.updates == [{"metadata": {"cache_needs_rebuild": True, "other": 1}}]
+
+    # Requested and consumed within the run: nothing to write
+    client = FakeClient(metadata={"cache_needs_rebuild": False})
+    state = ThreadRunState(thread_id="t2", loaded=True)
+    state.request_cache_rebuild()
+    assert state.consume_cache_rebuild() is True
+    assert state.consume_cache_rebuild() is False
+    await state.persist(client)
+    assert client.updates == []
@@ -0,0 +1,111 @@
+"""
+Unit tests for the class-level tool spec and the cached ToolRegistry lookups.
+
+Tests that schemas are collected once per tool class, and that the
+name -> callable, XML tag and schema caches follow changes to the tool table.
+"""
+import inspect
+
+from core.agentpress.tool import Tool, ToolResult, openapi_schema, method_metadata, tool_metadata, get_tool_class_spec
+from core.agentpress.tool_registry import ToolRegistry
+
+
+def _schema(name: str):
+    return {"type": "function", "function": {"name": name, "description": name, "parameters": {"type": "object", "properties": {}}}}
+
+
+@tool_metadata(display_name="Sample", description="Sample tool")
+class SampleTool(Tool):
+    def __init__(self, label: str = "sample"):
+        super().__init__()
+        self.label = label
+
+    @method_metadata(display_name="Create File", description="Create a file")
+    @openapi_schema(_schema("create_file"))
+    async def create_file(self) -> ToolResult:
+        return self.success_response(self.label)
+
+    @openapi_schema(_schema("delete_file"))
+    async def delete_file(self) -> ToolResult:
+        return self.success_response("deleted")
+
+    def helper(self):
+        return None
+
+
+def test_class_spec_is_built_once_and_shared(monkeypatch):
+    spec = get_tool_class_spec(SampleTool)
+    assert set(spec.schemas) == {"create_file", "delete_file"}
+    assert set(spec.method_metadata) == {"create_file"}
+    assert spec.metadata.display_name == "Sample"
+
+    calls = []
+    original = inspect.getmembers
+    monkeypatch.setattr(inspect, "getmembers", lambda *a, **k: calls.append(a) or original(*a, **k))
+
+    first, second = SampleTool(), SampleTool()
+    assert calls == []
+    assert get_tool_class_spec(SampleTool) is spec
+    assert first.get_schemas() == second.get_schemas()
+    assert first.get_schemas() is not second.get_schemas()
+    assert first.get_method_metadata()["create_file"].display_name == "Create File"
+
+
+def test_registry_filters_functions_and_caches_lookups():
+    registry = ToolRegistry()
+    registry.register_tool(SampleTool, function_names=["create_file"], label="x")
+
+    functions = registry.get_available_functions()
+    assert list(functions) == ["create_file"]
+    assert registry.get_available_functions() is functions
+    assert registry.get_function("create_file").__self__.label == "x"
+    assert registry.get_function("delete_file") is None
+    assert registry.get_xml_tag_map() == {"create-file": "create_file"}
+    assert [s["function"]["name"] for s in registry.get_openapi_schemas()] == ["create_file"]
+
+
+def test_direct_table_writes_invalidate_caches():
+    registry = ToolRegistry()
+    registry.register_tool(SampleTool, function_names=["create_file"])
+    assert registry.get_function("delete_file") is None
+
+    instance = registry.tools["create_file"]["instance"]
+    registry.tools["delete_file"] = {"instance": instance, "schema": get_tool_class_spec(SampleTool).schemas["delete_file"][0]}
+
+    assert registry.get_function("delete_file") is not None
+    assert "delete-file" in registry.get_xml_tag_map()
+    assert len(registry.get_openapi_schemas()) == 2
+
+    registry.tools.pop("create_file")
+    assert registry.get_function("create_file") is None
+
+
+class CountingTool(SampleTool):
+    constructed = 0
+
+    def __init__(self, label: str = "counting"):
+        super().__init__(label)
+        CountingTool.constructed += 1
+
+
+def test_lazy_registration_defers_construction_until_first_lookup():
+    CountingTool.constructed = 0
+    registry = ToolRegistry()
+    registry.register_tool(CountingTool, lazy=True, label="lazy")
+
+    assert len(registry.get_openapi_schemas()) == 2
+    assert registry.get_xml_tag_map() == {"create-file": "create_file", "delete-file": "delete_file"}
+    assert registry.get_function_names() == ["create_file", "delete_file"]
+    assert CountingTool.constructed == 0
+    assert registry.get_construction_stats()["deferred"] == ["CountingTool"]
+
+    create_file = registry.get_function("create_file")
+    delete_file = registry.get_function("delete_file")
+    assert CountingTool.constructed == 1
+    assert create_file.__self__ is delete_file.__self__
+    assert create_file.__self__.label == "lazy"
+
+    stats = registry.get_construction_stats()
+    assert stats["constructed"] == ["CountingTool"]
+    assert stats["deferred"] == []
+    assert "CountingTool" in stats["construction_ms"]
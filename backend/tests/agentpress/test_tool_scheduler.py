@@ -0,0 +1,196 @@
+"""
+Unit tests for the tool execution scheduler.
+
+Tests that timeouts, concurrency limits and idempotency declared in tool and
+method metadata are merged into per-function policies, that slow calls time
+out, that concurrent calls respect the limits, that identical idempotent
+calls execute once per run, and that a stop signal cancels running calls.
+"""
+import asyncio
+
+import pytest
+
+from core.agentpress.response_processor import ResponseProcessor
+from core.agentpress.tool import Tool, ToolResult, get_execution_policy, method_metadata, openapi_schema, tool_metadata
+from core.agentpress.tool_registry import ToolRegistry
+from core.agentpress.tool_scheduler import ToolExecutionScheduler
+
+
+def _schema(name: str):
+    return {"type": "function", "function": {"name": name, "description": name, "parameters": {"type": "object", "properties": {}}}}
+
+
+class NullTrace:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+
+@tool_metadata(display_name="Search", description="Search tool", timeout=5, max_concurrency=2, idempotent=True)
+class SearchTool(Tool):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def _track(self, name, delay=0.02):
+        self.calls.append(name)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.running -= 1
+
+    @openapi_schema(_schema("search"))
+    async def search(self, query: str, limit: int = 10) -> ToolResult:
+        await self._track("search")
+        if query == "fail":
+            return self.fail_response("search failed")
+        return self.success_response({"query": query, "limit": limit})
+
+    @method_metadata(display_name="Fetch", description="Fetch a page", timeout=0.05, idempotent=False)
+    @openapi_schema(_schema("fetch"))
+    async def fetch(self, url: str, delay: float = 0.0) -> ToolResult:
+        await self._track("fetch", delay)
+        return self.success_response(url)
+
+
+@tool_metadata(display_name="Plain", description="Tool without execution settings")
+class PlainTool(Tool):
+    @method_metadata(display_name="Run", description="Run", max_concurrency=1)
+    @openapi_schema(_schema("run"))
+    async def run(self) -> ToolResult:
+        return self.success_response("ok")
+
+    @openapi_schema(_schema("other"))
+    async def other(self) -> ToolResult:
+        return self.success_response("ok")
+
+
+def make_scheduler(stop_event=None, default_timeout=1.0):
+    registry = ToolRegistry()
+    registry.register_tool(SearchTool)
+    tool = registry.get_function("search").__self__
+
+    async def invoke(tool_call):
+        return await registry.get_function(tool_call["function_name"])(**tool_call["arguments"])
+
+    scheduler = ToolExecutionScheduler(registry, invoke, stop_event=stop_event, default_timeout=default_timeout)
+    return scheduler, tool
+
+
+def call(function_name, **arguments):
+    return {"function_name": function_name, "arguments": arguments}
+
+
+def test_policies_merge_tool_and_method_metadata():
+    search = get_execution_policy(SearchTool, "search")
+    fetch = get_execution_policy(SearchTool, "fetch")
+    assert (search.timeout, search.max_concurrency, search.concurrency_key, search.idempotent) == (5, 2, "SearchTool", True)
+    # Method settings override the tool's; the tool-wide concurrency slot is shared
+    assert (fetch.timeout, fetch.concurrency_key, fetch.idempotent) == (0.05, "SearchTool", False)
+
+    run, other = get_execution_policy(PlainTool, "run"), get_execution_policy(PlainTool, "other")
+    assert (run.max_concurrency, run.concurrency_key, run.timeout) == (1, "PlainTool.run", None)
+    assert other.max_concurrency is None and not other.idempotent
+
+    registry = ToolRegistry()
+    registry.register_tool(PlainTool, lazy=True)
+    assert registry.get_execution_policy("run") == run
+    assert registry.get_execution_policy("missing").timeout is None
+    assert registry.get_tool("run")["binding"].is_constructed is False
+
+
+@pytest.mark.asyncio
+async def test_identical_idempotent_calls_execute_once():
+    scheduler, tool = make_scheduler()
+
+    results = await asyncio.gather(
+        scheduler.execute(call("search", query="rust", limit=5)),
+        scheduler.execute(call("search", limit=5, query="rust")),
+        scheduler.execute({"function_name": "search", "arguments": '{"limit": 5, "query": "rust"}'}),
+        scheduler.execute(call("search", query="go", limit=5)),
+    )
+    again = await scheduler.execute(call("search", query="rust", limit=5))
+
+    assert tool.calls == ["search", "search"]
+    assert all(result.success for result in results)
+    assert again is results[0]
+    assert scheduler.stats["memo_hits"] == 3
+
+    # Failures and non-idempotent methods are executed every time
+    await scheduler.execute(call("search", query="fail"))
+    await scheduler.execute(call("search", query="fail"))
+    await scheduler.execute(call("fetch", url="a"))
+    await scheduler.execute(call("fetch", url="a"))
+    assert tool.calls.count("search") == 4 and tool.calls.count("fetch") == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_is_shared_by_the_tool():
+    scheduler, tool = make_scheduler()
+
+    results = await asyncio.gather(
+        *[scheduler.execute(call("search", query=f"q{i}")) for i in range(6)],
+        *[scheduler.execute(call("fetch", url=f"u{i}")) for i in range(3)],
+    )
+
+    assert all(result.success for result in results)
+    assert tool.max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_call_times_out_and_is_cancelled():
+    scheduler, tool = make_scheduler()
+
+    result = await scheduler.execute(call("fetch", url="slow", delay=1.0))
+
+    assert not result.success
+    assert "timed out after 0.05 seconds" in result.output
+    assert scheduler.stats["timeouts"] == 1
+    await asyncio.sleep(0)
+    assert tool.running == 0
+
+
+@pytest.mark.asyncio
+async def test_stop_event_cancels_running_calls_and_refuses_new_ones():
+    stop_event = asyncio.Event()
+    scheduler, tool = make_scheduler(stop_event=stop_event, default_timeout=10)
+    scheduler.tool_registry.get_execution_policy("search")  # warm cache
+
+    async def slow_invoke(tool_call):
+        await asyncio.sleep(10)
+
+    scheduler.invoke = slow_invoke
+    running = [asyncio.create_task(scheduler.execute(call("search", query=f"q{i}"))) for i in range(3)]
+    await asyncio.sleep(0.01)
+    stop_event.set()
+    results = await asyncio.wait_for(asyncio.gather(*running), timeout=1)
+
+    assert [result.success for result in results] == [False, False, False]
+    assert all("cancelled because the run was stopped" in result.output for result in results)
+    refused = await scheduler.execute(call("search", query="late"))
+    assert not refused.success and scheduler.stats["executed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cancel_all_through_response_processor():
+    registry = ToolRegistry()
+    registry.register_tool(SearchTool)
+
+    async def add_message(**kwargs):
+        return None
+
+    processor = ResponseProcessor(registry, add_message, trace=NullTrace())
+    tool = registry.get_function("search").__self__
+
+    results = await processor._execute_tools_in_parallel([call("search", query="x"), call("search", query="x"), call("fetch", url="u")])
+    assert [result.success for _, result in results] == [True, True, True]
+    assert tool.calls == ["search", "fetch"]
+
+    pending = asyncio.create_task(processor._execute_tool(call("fetch", url="slow", delay=0.04)))
+    await asyncio.sleep(0.01)
+    assert processor.tool_scheduler.cancel_all() == 1
+    result = await pending
+    assert not result.success and "cancelled" in result.output
@@ -0,0 +1,178 @@
+"""
+Unit tests for the billing reconciliation service.
+
+Tests that a check is fanned out over every account-id hash partition with
+bounded concurrency and the incremental watermark, that findings keep the
+result shape of the reconcile endpoint, and that a failed partition marks
+the run failed.
+"""
+import asyncio
+import importlib
+
+import pytest
+
+from core.billing.reconciliation_service import ReconciliationService
+
+# core.billing re-exports the service instance under the module's name
+reconciliation_module = importlib.import_module('core.billing.reconciliation_service')
+
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.values = None
+        self.filters = {}
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def limit(self, count):
+        return self
+
+    async def execute(self):
+        if self.values is not None:
+            self.client.updates.append((self.table, self.values, self.filters))
+            return FakeResult([])
+        return FakeResult(self.client.findings)
+
+
+class FakeRpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    async def execute(self):
+        client = self.client
+        client.calls.append((self.name, self.params))
+        if self.name == 'begin_billing_reconciliation_run':
+            return FakeResult([{'run_id': 'run-1', 'since': client.since}])
+
+        client.in_flight += 1
+        client.max_in_flight = max(client.max_in_flight, client.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.params['p_partition'] in client.failing_partitions:
+                raise RuntimeError("statement timeout")
+            return FakeResult([{
+                'accounts_checked': 10, 'rows_scanned': 25, 'findings': 1, 'fixed': 1, 'amount': '2.5'
+            }])
+        finally:
+            client.in_flight -= 1
+
+
+class FakeClient:
+    def __init__(self, since=None, findings=None, failing_partitions=()):
+        self.since = since
+        self.findings = findings or []
+        self.failing_partitions = set(failing_partitions)
+        self.calls = []
+        self.updates = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def rpc(self, name, params):
+        return FakeRpc(self, name, params)
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def from_(self, name):
+        return FakeQuery(self, name)
+
+
+class FakeDB:
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    async def client(self):
+        return self._client
+
+
+def make_service(client):
+    service = ReconciliationService()
+    service.db = FakeDB(client)
+    return service
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_check_runs_every_partition_with_bounded_concurrency(monkeypatch):
+    monkeypatch.setattr(reconciliation_module, 'PARTITION_CONCURRENCY', 3)
+    client = FakeClient(since='2025-11-01T00:00:00+00:00')
+    service = make_service(client)
+
+    run = await service.run_check('balance_consistency', partitions=8)
+
+    begin_name, begin_params = client.calls[0]
+    assert begin_name == 'begin_billing_reconciliation_run'
+    assert begin_params['p_incremental'] is True
+    partition_calls = [params for name, params in client.calls if name == 'reconcile_balance_partition']
+    assert sorted(p['p_partition'] for p in partition_calls) == list(range(8))
+    assert all(p['p_since'] == client.since and p['p_run_id'] == 'run-1' for p in partition_calls)
+    assert client.max_in_flight == 3
+
+    assert run['mode'] == 'incremental'
+    assert run['accounts_checked'] == 80
+    assert run['rows_scanned'] == 200
+    assert run['findings'] == 8
+    assert run['amount'] == 20.0
+    assert len(run['partition_ms']) == 8
+    assert client.updates == []
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_findings_keep_endpoint_result_shape():
+    client = FakeClient(findings=[{
+        'account_id': 'acct-1',
+        'details': {'expected': 10, 'actual': 12.5, 'difference': -2.5},
+        'fixed': True
+    }])
+    service = make_service(client)
+
+    results = await service.verify_balance_consistency()
+
+    assert results['checked'] == 80
+    assert results['fixed'] == 8
+    assert results['discrepancies_found'][0] == {
+        'account_id': 'acct-1', 'expected': 10.0, 'actual': 12.5, 'difference': -2.5
+    }
+    assert results['run']['mode'] == 'full'
+
+    cleanup = await service.cleanup_expired_credits()
+    assert cleanup['accounts_cleaned'] == 8
+    assert cleanup['credits_removed'] == 20.0
+    expired_begin = [params for name, params in client.calls if name == 'begin_billing_reconciliation_run'][-1]
+    assert expired_begin['p_incremental'] is False
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_failed_partition_marks_run_failed():
+    client = FakeClient(failing_partitions={2})
+    service = make_service(client)
+
+    run = await service.run_check('double_charges', fix=False, partitions=4)
+
+    assert len(run['errors']) == 1
+    assert run['accounts_checked'] == 30
+    table, values, filters = client.updates[0]
+    assert table == 'billing_reconciliation_runs'
+    assert values['status'] == 'failed'
+    assert filters == {'id': 'run-1'}
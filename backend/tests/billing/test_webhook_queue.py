@@ -0,0 +1,234 @@
+"""
+Unit tests for the Stripe webhook queue.
+
+Tests that a customer's pending events are processed in order with one
+subscription retrieval shared across the batch, that duplicate paid-invoice
+notifications run the handler once, that events are processed inline
+when they cannot be enqueued, and that events left pending or stuck in
+processing are enqueued again.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.billing import webhook_queue as queue_module
+from core.billing.webhook_queue import WebhookQueue, customer_key_for
+from core.billing.webhook_service import StripeAPIWrapper, webhook_service
+
+
+def make_payload(event_id, event_type, obj):
+    return {"id": event_id, "object": "event", "type": event_type, "data": {"object": obj}}
+
+
+class FakeLock:
+    held = set()
+
+    def __init__(self, lock_key, timeout_seconds=300):
+        self.lock_key = lock_key
+
+    async def acquire(self, wait=False, wait_timeout=30):
+        if self.lock_key in FakeLock.held:
+            return False
+        FakeLock.held.add(self.lock_key)
+        return True
+
+    async def release(self):
+        FakeLock.held.discard(self.lock_key)
+        return True
+
+
+class FakeWebhookEvents:
+    def __init__(self, rows):
+        self.rows = {row["event_id"]: dict(row, status="pending") for row in rows}
+
+    async def record_webhook_received(self, event_id, event_type, payload=None, customer_id=None, event_created_at=None,
+                                      stale_after_seconds=300):
+        if event_id in self.rows:
+            return False, self.rows[event_id]["status"]
+        self.rows[event_id] = {
+            "event_id": event_id, "event_type": event_type, "payload": payload, "customer_id": customer_id, "status": "pending"
+        }
+        return True, None
+
+    async def claim_pending_webhook(self, event_id):
+        if self.rows[event_id]["status"] != "pending":
+            return False
+        self.rows[event_id]["status"] = "processing"
+        return True
+
+    async def mark_webhook_completed(self, event_id):
+        self.rows[event_id]["status"] = "completed"
+
+    async def mark_webhook_failed(self, event_id, error_message):
+        self.rows[event_id]["status"] = "failed"
+
+    async def pending_events(self, customer_key, limit):
+        return [row for row in self.rows.values() if row["status"] == "pending" and row["customer_id"] == customer_key][:limit]
+
+
+@pytest.fixture
+def webhook_events(monkeypatch):
+    events = FakeWebhookEvents([
+        {"event_id": "evt_1", "customer_id": "cus_1", "payload": make_payload("evt_1", "customer.subscription.updated", {"id": "sub_1", "customer": "cus_1"})},
+        {"event_id": "evt_2", "customer_id": "cus_1", "payload": make_payload("evt_2", "invoice.paid", {"id": "in_1", "customer": "cus_1", "subscription": "sub_1"})},
+        {"event_id": "evt_3", "customer_id": "cus_1", "payload": make_payload("evt_3", "invoice.payment_succeeded", {"id": "in_1", "customer": "cus_1", "subscription": "sub_1"})},
+    ])
+    for name in ("record_webhook_received", "claim_pending_webhook", "mark_webhook_completed", "mark_webhook_failed"):
+        monkeypatch.setattr(queue_module.WebhookLock, name, getattr(events, name))
+    monkeypatch.setattr(queue_module, "DistributedLock", FakeLock)
+    monkeypatch.setattr(queue_module.stripe, "api_key", "sk_test")
+    return events
+
+
+def make_queue(webhook_events, enqueue=None):
+    queue = WebhookQueue(enqueue=enqueue or (lambda customer_key: None))
+
+    async def pending_events(customer_key, limit):
+        return await webhook_events.pending_events(customer_key, limit)
+
+    queue._pending_events = pending_events
+    return queue
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_customer_batch_is_processed_in_order_with_shared_fetches(webhook_events, monkeypatch):
+    handled = []
+    retrievals = []
+
+    async def retrieve_subscription(subscription_id):
+        retrievals.append(subscription_id)
+        return {"id": subscription_id, "status": "active"}
+
+    async def handle_event(event, client):
+        handled.append(event.id)
+        await webhook_service._retrieve_subscription("sub_1")
+
+    monkeypatch.setattr(StripeAPIWrapper, "retrieve_subscription", retrieve_subscription)
+    monkeypatch.setattr(webhook_service, "handle_event", handle_event)
+
+    queue = make_queue(webhook_events)
+    assert await queue.process_customer("cus_1") == 3
+
+    assert handled == ["evt_1", "evt_2"]
+    assert retrievals == ["sub_1"]
+    assert {row["status"] for row in webhook_events.rows.values()} == {"completed"}
+
+    # Outside a queue batch every retrieval goes to Stripe
+    await webhook_service._retrieve_subscription("sub_1")
+    assert retrievals == ["sub_1", "sub_1"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_busy_customer_is_left_to_the_lock_holder(webhook_events):
+    FakeLock.held.add("stripe_webhooks:cus_1")
+    try:
+        assert await make_queue(webhook_events).process_customer("cus_1") == 0
+    finally:
+        FakeLock.held.clear()
+    assert {row["status"] for row in webhook_events.rows.values()} == {"pending"}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_event_is_processed_inline_when_enqueue_fails(webhook_events, monkeypatch):
+    import stripe
+
+    handled = []
+
+    async def handle_event(event, client):
+        handled.append(event.id)
+
+    def enqueue(customer_key):
+        raise ConnectionError("broker unavailable")
+
+    monkeypatch.setattr(webhook_service, "handle_event", handle_event)
+    payload = make_payload("evt_4", "invoice.paid", {"id": "in_2", "customer": "cus_2"})
+    event = stripe.Event.construct_from(payload, "sk_test")
+    assert customer_key_for(event) == "cus_2"
+
+    result = await make_queue(webhook_events, enqueue=enqueue).accept(event, payload)
+    assert result == {"status": "success"}
+    assert handled == ["evt_4"]
+    # The row was claimed like a queued one, so the stale sweep finds nothing to redo
+    assert webhook_events.rows["evt_4"]["status"] == "completed"
+    assert {webhook_events.rows[e]["status"] for e in ("evt_1", "evt_2", "evt_3")} == {"pending"}
+
+    # A redelivered event is not processed again
+    result = await make_queue(webhook_events, enqueue=enqueue).accept(event, payload)
+    assert "already" in result["message"]
+
+
+class FakeEventsQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.values = None
+
+    def select(self, fields):
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def limit(self, count):
+        return self
+
+    async def execute(self):
+        matched = [row for row in self.rows if all(check(row) for check in self.filters)]
+        if self.values is not None:
+            for row in matched:
+                row.update(self.values)
+        return type("Result", (), {"data": [dict(row) for row in matched]})()
+
+
+class FakeEventsDB:
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    async def client(self):
+        return type("Client", (), {"from_": lambda _, table: FakeEventsQuery(self.rows)})()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_stale_pending_and_processing_events_are_enqueued_again(monkeypatch):
+    from core.utils import distributed_lock
+
+    old = (datetime.now(timezone.utc) - timedelta(minutes=10)).isoformat()
+    recent = datetime.now(timezone.utc).isoformat()
+    rows = [
+        {"id": 1, "event_id": "evt_1", "customer_id": "cus_1", "status": "pending", "created_at": old},
+        {"id": 2, "event_id": "evt_2", "customer_id": "cus_2", "status": "processing",
+         "created_at": old, "processing_started_at": old, "retry_count": 0},
+        {"id": 3, "event_id": "evt_3", "customer_id": "cus_3", "status": "processing",
+         "created_at": old, "processing_started_at": recent, "retry_count": 0},
+        {"id": 4, "event_id": "evt_4", "customer_id": "cus_4", "status": "pending", "created_at": recent},
+    ]
+    monkeypatch.setattr(distributed_lock, "DBConnection", lambda: FakeEventsDB(rows))
+    WebhookLock = distributed_lock.WebhookLock
+
+    # A redelivery of an abandoned event is accepted again; live events are not
+    assert await WebhookLock.record_webhook_received("evt_1", "invoice.paid") == (True, None)
+    assert await WebhookLock.record_webhook_received("evt_3", "invoice.paid") == (False, "processing")
+    assert await WebhookLock.record_webhook_received("evt_4", "invoice.paid") == (False, "pending")
+
+    enqueued = []
+    queue = WebhookQueue(enqueue=enqueued.append)
+    assert await queue.requeue_stale() == 2
+
+    assert enqueued == ["cus_2", "cus_1"]
+    assert rows[1]["status"] == "pending"
+    assert rows[1]["retry_count"] == 1
+    assert rows[2]["status"] == "processing"
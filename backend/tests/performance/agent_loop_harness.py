@@ -0,0 +1,592 @@
+"""
+Offline benchmark harness for the agent loop.
+
+Drives ThreadManager.run_thread the way AgentRunner does (streaming, XML tool
+calling, parallel execution on stream, auto-continue) against:
+
+- ScriptedLLM: a deterministic streaming model with a configurable token
+  rate, response size and number of tool calls per turn
+- FakeSupabase / FakeRedis: in-memory stand-ins that count round trips
+- FakeSandboxTool: a sandbox command tool with configurable latency and
+  output size
+
+and reports per-phase CPU time, DB round trips, Redis operations,
+allocations and time-to-first-chunk as JSON, so runs can be compared from
+commit to commit:
+
+    python -m tests.performance.agent_loop_harness --output agent_loop.json
+
+CPU time is main-thread time (time.thread_time) attributed to the phase that
+is active when it is spent: prepare (history fetch, compaction, caching),
+stream_processing (chunk handling), tool_execution (steps of _execute_tool)
+and post (finalisation after the last chunk). Time spent inside the
+stand-ins is reported separately as stand_in and excluded from the total.
+Work that the event loop interleaves with a tool step is attributed to the
+tool, so the split is approximate when tools overlap with streaming.
+Allocations come from a second pass under tracemalloc.
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+from litellm.types.utils import Delta, ModelResponseStream, StreamingChoices, Usage
+
+from core.agentpress import thread_manager as thread_manager_module
+from core.agentpress.response_processor import ProcessorConfig
+from core.agentpress.thread_manager import ThreadManager
+from core.agentpress.tool import Tool, ToolResult, openapi_schema
+from core.services import redis as redis_module
+from core.services.supabase import DBConnection
+
+PREPARE = "prepare"
+STREAM_PROCESSING = "stream_processing"
+TOOL_EXECUTION = "tool_execution"
+POST = "post"
+STAND_IN = "stand_in"
+PHASES = (PREPARE, STREAM_PROCESSING, TOOL_EXECUTION, POST)
+
+
+@dataclass
+class Scenario:
+    """Shape of one benchmark run.
+
+    Each of the first tool_turns LLM calls streams response_tokens of text
+    followed by tool_calls_per_turn XML tool calls; the last call streams a
+    plain answer. As in AgentRunner only the first XML tool call of a turn is
+    executed, the rest of the stream is drained.
+    """
+    name: str = "tool_loop"
+    tool_turns: int = 3
+    tool_calls_per_turn: int = 1
+    response_tokens: int = 200
+    token_chars: int = 4
+    tokens_per_second: float = 0.0  # 0 streams as fast as the loop consumes
+    tool_latency_s: float = 0.0
+    tool_output_chars: int = 2_000
+    history_messages: int = 20
+    model: str = "gpt-4o"
+    max_iterations: int = 10
+
+
+DEFAULT_SCENARIOS = [
+    Scenario(name="plain_answer", tool_turns=0, response_tokens=400),
+    Scenario(name="tool_loop"),
+    Scenario(name="multi_tool_turns", tool_turns=2, tool_calls_per_turn=3, tool_output_chars=8_000),
+    Scenario(name="long_history", history_messages=400, tool_turns=2),
+]
+
+
+class PhaseClock:
+    """Attributes main-thread CPU time to the currently active phase."""
+
+    def __init__(self):
+        self.cpu: Dict[str, float] = defaultdict(float)
+        self.phase: Optional[str] = None
+        self._mark = time.thread_time()
+
+    def switch(self, phase: Optional[str]) -> Optional[str]:
+        """Charge the time since the last switch to the current phase and enter a new one."""
+        now = time.thread_time()
+        if self.phase is not None:
+            self.cpu[self.phase] += now - self._mark
+        self._mark = now
+        previous, self.phase = self.phase, phase
+        return previous
+
+    @contextmanager
+    def within(self, phase: str):
+        previous = self.switch(phase)
+        try:
+            yield
+        finally:
+            self.switch(previous)
+
+
+class _PhasedAwaitable:
+    """Runs each step of a coroutine inside a phase, restoring the caller's phase in between."""
+
+    def __init__(self, coro, clock: PhaseClock, phase: str):
+        self.coro = coro
+        self.clock = clock
+        self.phase = phase
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            previous = self.clock.switch(self.phase)
+            try:
+                yielded = self.coro.throw(error) if error is not None else self.coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.clock.switch(previous)
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+
+class Counters:
+    """Shared operation counters for the stand-ins."""
+
+    def __init__(self):
+        self.db = Counter()
+        self.redis = Counter()
+
+
+class FakeQuery:
+    """Chainable subset of the Supabase query builder used on the run path."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table_name = table
+        self.op = "select"
+        self.columns: Optional[List[str]] = None
+        self.payload: Any = None
+        self.filters = []
+        self.order_by: Optional[tuple] = None
+        self.start = 0
+        self.stop: Optional[int] = None
+
+    def select(self, columns: str = "*", **kwargs):
+        self.op = "select"
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, **kwargs):
+        self.op, self.payload = "upsert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, count):
+        self.stop = self.start + count
+        return self
+
+    def range(self, start, end):
+        self.start, self.stop = start, end + 1
+        return self
+
+    async def execute(self):
+        with self.db.clock.within(STAND_IN):
+            self.db.counters.db[f"{self.table_name}.{self.op}"] += 1
+            return SimpleNamespace(data=self.db.run(self))
+
+
+class FakeSupabase:
+    """In-memory tables returning copies of rows, like a real round trip would."""
+
+    def __init__(self, clock: PhaseClock, counters: Counters):
+        self.clock = clock
+        self.counters = counters
+        self.tables: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._created = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def add_row(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = copy.deepcopy(row)
+        self._created += timedelta(milliseconds=1)
+        row.setdefault("created_at", self._created.isoformat())
+        if table == "messages":
+            row.setdefault("message_id", str(uuid.uuid4()))
+        self.tables[table].append(row)
+        return row
+
+    def run(self, query: FakeQuery) -> List[Dict[str, Any]]:
+        rows = self.tables[query.table_name]
+        if query.op in ("insert", "upsert"):
+            payload = query.payload if isinstance(query.payload, list) else [query.payload]
+            return [copy.deepcopy(self.add_row(query.table_name, row)) for row in payload]
+
+        matched = [row for row in rows if all(match(row) for match in query.filters)]
+        if query.op == "update":
+            for row in matched:
+                row.update(copy.deepcopy(query.payload))
+        elif query.op == "delete":
+            self.tables[query.table_name] = [row for row in rows if row not in matched]
+        else:
+            if query.order_by:
+                column, desc = query.order_by
+                matched.sort(key=lambda row: row.get(column) or "", reverse=desc)
+            matched = matched[query.start:query.stop]
+        if query.columns:
+            matched = [{column: row.get(column) for column in query.columns} for row in matched]
+        return copy.deepcopy(matched)
+
+
+class FakeRedis:
+    """Counts Redis operations; stores plain values without expiry."""
+
+    def __init__(self, clock: PhaseClock, counters: Counters):
+        self.clock = clock
+        self.counters = counters
+        self.store: Dict[str, Any] = {}
+
+    async def get(self, key):
+        with self.clock.within(STAND_IN):
+            self.counters.redis["get"] += 1
+            return self.store.get(key)
+
+    async def set(self, key, value, ex=None, nx=False, **kwargs):
+        with self.clock.within(STAND_IN):
+            self.counters.redis["set"] += 1
+            if nx and key in self.store:
+                return None
+            self.store[key] = value
+            return True
+
+    async def delete(self, *keys):
+        with self.clock.within(STAND_IN):
+            self.counters.redis["delete"] += 1
+            return sum(self.store.pop(key, None) is not None for key in keys)
+
+    def __getattr__(self, name):
+        async def operation(*args, **kwargs):
+            self.counters.redis[name] += 1
+            return None
+        return operation
+
+
+class NullTrace:
+    """Langfuse trace stand-in: every call is a no-op returning the trace."""
+
+    def __getattr__(self, name):
+        return self._noop
+
+    def _noop(self, *args, **kwargs):
+        return self
+
+
+class FakeSandboxTool(Tool):
+    """Sandbox command tool with scripted latency and output size."""
+
+    def __init__(self, scenario: Scenario, clock: PhaseClock):
+        super().__init__()
+        self.scenario = scenario
+        self.clock = clock
+        self.commands: List[str] = []
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "execute_command",
+            "description": "Execute a shell command in the sandbox.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "command": {"type": "string", "description": "The command to execute."}
+                },
+                "required": ["command"]
+            }
+        }
+    })
+    async def execute_command(self, command: str) -> ToolResult:
+        if self.scenario.tool_latency_s:
+            await asyncio.sleep(self.scenario.tool_latency_s)
+        with self.clock.within(STAND_IN):
+            self.commands.append(command)
+            output = ("line of sandbox output\n" * (self.scenario.tool_output_chars // 23 + 1))[:self.scenario.tool_output_chars]
+        return self.success_response({"output": output, "exit_code": 0})
+
+
+def _tool_call_xml(index: int) -> str:
+    return (
+        '<function_calls>\n<invoke name="execute_command">\n'
+        f'<parameter name="command">ls -la /workspace/step_{index}</parameter>\n'
+        '</invoke>\n</function_calls>'
+    )
+
+
+class ScriptedLLM:
+    """Deterministic stand-in for make_llm_api_call that streams scripted turns."""
+
+    def __init__(self, scenario: Scenario, clock: PhaseClock):
+        self.scenario = scenario
+        self.clock = clock
+        self.calls = 0
+
+    def script(self, turn: int) -> List[str]:
+        """Content pieces streamed for a turn, one chunk each."""
+        word = "w" * (self.scenario.token_chars - 1) + " "
+        pieces = [word] * self.scenario.response_tokens
+        if turn < self.scenario.tool_turns:
+            for index in range(self.scenario.tool_calls_per_turn):
+                xml = _tool_call_xml(turn * self.scenario.tool_calls_per_turn + index)
+                step = self.scenario.token_chars
+                pieces.extend(xml[i:i + step] for i in range(0, len(xml), step))
+        return pieces
+
+    async def __call__(self, messages, model_name, **kwargs):
+        with self.clock.within(STAND_IN):
+            turn = self.calls
+            self.calls += 1
+            prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+        self.clock.switch(STREAM_PROCESSING)
+        return self._stream(turn, model_name, prompt_chars)
+
+    async def _stream(self, turn: int, model_name: str, prompt_chars: int):
+        delay = 1 / self.scenario.tokens_per_second if self.scenario.tokens_per_second else 0
+        pieces = self.script(turn)
+        for index, piece in enumerate(pieces):
+            if index:
+                await asyncio.sleep(delay)
+            with self.clock.within(STAND_IN):
+                chunk = ModelResponseStream(
+                    choices=[StreamingChoices(delta=Delta(content=piece), finish_reason=None, index=0)],
+                    model=model_name,
+                )
+            yield chunk
+
+        with self.clock.within(STAND_IN):
+            completion_tokens = len(pieces)
+            prompt_tokens = prompt_chars // 4
+            last = ModelResponseStream(
+                choices=[StreamingChoices(delta=Delta(content=None), finish_reason="stop", index=0)],
+                model=model_name,
+                usage=Usage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                            total_tokens=prompt_tokens + completion_tokens),
+            )
+        # The processor may stop reading once it has usage, so finalisation starts here
+        self.clock.switch(POST)
+        yield last
+
+
+def seed_thread(db: FakeSupabase, scenario: Scenario) -> str:
+    """Create a thread whose history ends with the user's request."""
+    thread_id = str(uuid.uuid4())
+    db.add_row("threads", {"thread_id": thread_id, "account_id": None, "project_id": None, "metadata": {}})
+    for index in range(scenario.history_messages):
+        role = "user" if index % 2 == 0 else "assistant"
+        db.add_row("messages", {
+            "thread_id": thread_id, "type": role, "is_llm_message": True, "metadata": {},
+            "content": {"role": role, "content": f"Earlier message {index}: " + "context " * 60},
+        })
+    db.add_row("messages", {
+        "thread_id": thread_id, "type": "user", "is_llm_message": True, "metadata": {},
+        "content": {"role": "user", "content": "List the workspace and summarise what you find."},
+    })
+    return thread_id
+
+
+async def _async_value(value):
+    return value
+
+
+async def run_agent_loop(manager: ThreadManager, thread_id: str, scenario: Scenario, on_chunk) -> int:
+    """The AgentRunner.run iteration loop without setup, billing checks and prompt assembly."""
+    thread_state = await manager.get_thread_state(thread_id)
+    latest_user_message_content = thread_state.latest_user_message_content
+    system_prompt = {"role": "system", "content": "You are a benchmark agent. " * 200}
+    iterations = 0
+
+    while iterations < scenario.max_iterations:
+        iterations += 1
+        thread_state = await manager.get_thread_state(thread_id)
+        if thread_state.latest_message_type == 'assistant':
+            break
+
+        response = await manager.run_thread(
+            thread_id=thread_id,
+            system_prompt=system_prompt,
+            stream=True,
+            llm_model=scenario.model,
+            llm_temperature=0,
+            llm_max_tokens=None,
+            tool_choice="auto",
+            max_xml_tool_calls=1,
+            latest_user_message_content=latest_user_message_content,
+            processor_config=ProcessorConfig(
+                xml_tool_calling=True,
+                native_tool_calling=False,
+                execute_tools=True,
+                execute_on_stream=True,
+                tool_execution_strategy="parallel",
+                xml_adding_strategy="user_message"
+            ),
+            native_max_auto_continues=25,
+        )
+        async for chunk in response:
+            on_chunk(chunk)
+
+    await manager.message_buffer.close()
+    await manager.persist_thread_states()
+    return iterations
+
+
+async def run_scenario(scenario: Scenario, trace_allocations: bool = False) -> Dict[str, Any]:
+    """Run one scenario against fresh stand-ins and return its metrics."""
+    clock = PhaseClock()
+    counters = Counters()
+    db = FakeSupabase(clock, counters)
+    fake_redis = FakeRedis(clock, counters)
+    llm = ScriptedLLM(scenario, clock)
+    thread_id = seed_thread(db, scenario)
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(thread_manager_module, "make_llm_api_call", llm))
+        stack.enter_context(patch.object(DBConnection, "client", property(lambda self: _async_value(db))))
+        stack.enter_context(patch.object(redis_module, "client", fake_redis))
+        stack.enter_context(patch.object(redis_module, "_initialized", True))
+
+        manager = ThreadManager(trace=NullTrace())
+        manager.add_tool(FakeSandboxTool, scenario=scenario, clock=clock)
+        sandbox = manager.tool_registry.get_function("execute_command").__self__
+
+        execute_run = manager._execute_run
+        execute_tool = manager.response_processor._execute_tool
+
+        async def timed_execute_run(*args, **kwargs):
+            clock.switch(PREPARE)
+            return await execute_run(*args, **kwargs)
+
+        async def timed_execute_tool(tool_call):
+            return await _PhasedAwaitable(execute_tool(tool_call), clock, TOOL_EXECUTION)
+
+        manager._execute_run = timed_execute_run
+        manager.response_processor._execute_tool = timed_execute_tool
+
+        chunks = Counter()
+        first_chunk_at: List[float] = []
+
+        def on_chunk(chunk):
+            chunks[chunk.get("type", "unknown")] += 1
+            if not first_chunk_at and chunk.get("type") == "assistant" and '"chunk"' in str(chunk.get("metadata")):
+                first_chunk_at.append(time.perf_counter())
+
+        if trace_allocations:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        clock.switch(PREPARE)
+        iterations = await run_agent_loop(manager, thread_id, scenario, on_chunk)
+        clock.switch(None)
+        wall = time.perf_counter() - started
+        if trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    cpu = {phase: round(clock.cpu.get(phase, 0.0) * 1000, 3) for phase in PHASES}
+    result = {
+        "scenario": asdict(scenario),
+        "wall_ms": round(wall * 1000, 3),
+        "time_to_first_chunk_ms": round((first_chunk_at[0] - started) * 1000, 3) if first_chunk_at else None,
+        "cpu_ms": {**cpu, "total": round(sum(cpu.values()), 3)},
+        "stand_in_cpu_ms": round(clock.cpu.get(STAND_IN, 0.0) * 1000, 3),
+        "db_round_trips": {"total": sum(counters.db.values()), "by_operation": dict(sorted(counters.db.items()))},
+        "redis_ops": {"total": sum(counters.redis.values()), "by_operation": dict(sorted(counters.redis.items()))},
+        "llm_calls": llm.calls,
+        "iterations": iterations,
+        "tool_calls": len(sandbox.commands),
+        "chunks": dict(sorted(chunks.items())),
+        "messages_saved": sum(1 for row in db.tables["messages"] if row["thread_id"] == thread_id) - scenario.history_messages - 1,
+    }
+    if trace_allocations:
+        result["allocations"] = {"peak_kib": round((peak - before) / 1024, 1), "retained_kib": round((current - before) / 1024, 1)}
+    return result
+
+
+async def run_benchmark(scenarios: Optional[List[Scenario]] = None, repeat: int = 3, warmup: bool = True) -> Dict[str, Any]:
+    """Run each scenario repeat times and report medians of the timing metrics.
+
+    Counts (round trips, operations, calls) are deterministic and taken from the
+    first run; allocations come from one extra run under tracemalloc.
+    """
+    scenarios = scenarios or DEFAULT_SCENARIOS
+    if warmup:
+        # Lazy imports and tokenizer loading would otherwise land in the first scenario
+        await run_scenario(Scenario(name="warmup", tool_turns=1, response_tokens=20, history_messages=2))
+
+    results = []
+    for scenario in scenarios:
+        runs = [await run_scenario(scenario) for _ in range(max(1, repeat))]
+        result = runs[0]
+        result["wall_ms"] = round(statistics.median(run["wall_ms"] for run in runs), 3)
+        if result["time_to_first_chunk_ms"] is not None:
+            result["time_to_first_chunk_ms"] = round(statistics.median(run["time_to_first_chunk_ms"] for run in runs), 3)
+        for phase in result["cpu_ms"]:
+            result["cpu_ms"][phase] = round(statistics.median(run["cpu_ms"][phase] for run in runs), 3)
+        result["stand_in_cpu_ms"] = round(statistics.median(run["stand_in_cpu_ms"] for run in runs), 3)
+        result["allocations"] = (await run_scenario(scenario, trace_allocations=True))["allocations"]
+        result["repeat"] = len(runs)
+        results.append(result)
+
+    return {
+        "benchmark": "agent_loop",
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline agent loop benchmark")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--scenario", action="append", choices=[s.name for s in DEFAULT_SCENARIOS],
+                        help="Run only the named scenario (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; timings are medians")
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in DEFAULT_SCENARIOS if not args.scenario or s.name in args.scenario]
+    report = json.dumps(asyncio.run(run_benchmark(scenarios, repeat=args.repeat)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
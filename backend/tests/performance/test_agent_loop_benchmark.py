@@ -0,0 +1,99 @@
+"""
+Benchmark for the agent loop, run offline through agent_loop_harness.
+
+Drives ThreadManager.run_thread with a scripted streaming LLM, in-memory
+Supabase/Redis stand-ins and a fake sandbox tool, and checks that the
+report carries per-phase CPU time, round trip and operation counts,
+allocations and time-to-first-chunk. Set AGENT_LOOP_BENCHMARK_OUTPUT to keep
+the JSON report for comparison with other commits.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from tests.performance.agent_loop_harness import (
+    PHASES,
+    PhaseClock,
+    Scenario,
+    _PhasedAwaitable,
+    run_benchmark,
+    run_scenario,
+)
+
+SCENARIOS = [
+    Scenario(name="plain_answer", tool_turns=0, response_tokens=100, history_messages=10),
+    Scenario(name="tool_loop", tool_turns=2, response_tokens=100, history_messages=10),
+]
+
+
+@pytest.mark.performance
+@pytest.mark.asyncio
+async def test_agent_loop_report_has_per_phase_metrics():
+    report = await run_benchmark(SCENARIOS, repeat=1)
+
+    output = os.environ.get("AGENT_LOOP_BENCHMARK_OUTPUT")
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    plain, tool_loop = report["results"]
+    for result in report["results"]:
+        print(f"\n  {result['scenario']['name']}: ttfc {result['time_to_first_chunk_ms']:.1f}ms, "
+              f"cpu {result['cpu_ms']}, db {result['db_round_trips']['total']}, "
+              f"redis {result['redis_ops']['total']}, peak {result['allocations']['peak_kib']}KiB")
+        assert set(PHASES) < set(result["cpu_ms"])
+        assert result["time_to_first_chunk_ms"] > 0
+        assert result["cpu_ms"]["stream_processing"] > 0
+        assert result["allocations"]["peak_kib"] > 0
+
+    assert (plain["llm_calls"], plain["tool_calls"]) == (1, 0)
+    assert (tool_loop["llm_calls"], tool_loop["tool_calls"]) == (3, 2)
+    assert tool_loop["cpu_ms"]["tool_execution"] > 0
+    assert tool_loop["db_round_trips"]["total"] > plain["db_round_trips"]["total"]
+    assert json.loads(json.dumps(report)) == report
+
+
+@pytest.mark.performance
+@pytest.mark.asyncio
+async def test_scripted_runs_are_deterministic():
+    scenario = Scenario(name="repeatable", tool_turns=2, tool_calls_per_turn=2, response_tokens=50, history_messages=6)
+    first, second = await run_scenario(scenario), await run_scenario(scenario)
+
+    for key in ("db_round_trips", "redis_ops", "llm_calls", "tool_calls", "chunks", "messages_saved"):
+        assert first[key] == second[key], key
+    # Only the first XML tool call of a turn is executed, as in AgentRunner
+    assert first["tool_calls"] == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_phased_steps_are_charged_to_their_phase():
+    clock = PhaseClock()
+
+    def spin(seconds):
+        end = time.thread_time() + seconds
+        while time.thread_time() < end:
+            pass
+
+    async def tool():
+        spin(0.02)
+        await asyncio.sleep(0)
+        spin(0.02)
+
+    clock.switch("caller")
+    task = asyncio.create_task(_run_phased(tool(), clock))
+    await asyncio.sleep(0)
+    spin(0.01)
+    await task
+    clock.switch(None)
+
+    assert clock.cpu["tool"] >= 0.04
+    assert 0.01 <= clock.cpu["caller"] < 0.02
+
+
+async def _run_phased(coro, clock):
+    return await _PhasedAwaitable(coro, clock, "tool")
@@ -0,0 +1,87 @@
+"""
+Benchmark for incremental context compaction.
+
+Builds long synthetic threads and compares a full token recount (what
+compress_messages pays on every turn) with an incremental compaction turn
+that only processes newly appended messages.
+"""
+
+import time
+import uuid
+
+import pytest
+from litellm.utils import token_counter
+
+from core.agentpress.context_compaction import IncrementalContextCompactor
+
+MODEL = "gpt-4o"
+
+
+def make_thread(num_messages: int, chars_per_message: int = 1200):
+    messages = []
+    for i in range(num_messages):
+        role = "user" if i % 2 == 0 else "assistant"
+        body = f"message {i} " + ("lorem ipsum dolor sit amet " * (chars_per_message // 27))
+        messages.append({"role": role, "content": body, "message_id": str(uuid.uuid4())})
+    return messages
+
+
+@pytest.mark.asyncio
+@pytest.mark.performance
+async def test_incremental_turn_vs_full_recount():
+    """A follow-up turn only tokenizes new messages"""
+    print("\n  messages | full recount ms | first compaction ms | next turn ms")
+    for size in (200, 500, 1000):
+        thread = make_thread(size)
+        compactor = IncrementalContextCompactor(persist_state=False)
+
+        start = time.perf_counter()
+        token_counter(model=MODEL, messages=thread)
+        full_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        first = await compactor.compact(thread, MODEL, max_tokens=10_000_000, thread_id="bench")
+        first_ms = (time.perf_counter() - start) * 1000
+        assert first.newly_counted == size
+
+        thread = thread + make_thread(2)
+        start = time.perf_counter()
+        second = await compactor.compact(thread, MODEL, max_tokens=10_000_000, thread_id="bench")
+        next_ms = (time.perf_counter() - start) * 1000
+
+        print(f"  {size:>8} | {full_ms:>15.1f} | {first_ms:>19.1f} | {next_ms:>12.1f}")
+
+        assert second.newly_counted == 2
+        assert next_ms < first_ms
+
+
+@pytest.mark.asyncio
+async def test_compaction_folds_prefix_once_and_keeps_it_stable():
+    """Folded segments are reused verbatim on later turns"""
+    compactor = IncrementalContextCompactor(keep_recent_messages=10, persist_state=False)
+    thread = make_thread(300)
+
+    first = await compactor.compact(thread, MODEL, max_tokens=20_000, thread_id="t1")
+    assert first.folded > 0
+    assert first.within_limit
+    prefix = first.messages[0]["content"]
+    assert "earlier messages compacted" in prefix
+
+    thread = thread + make_thread(2, chars_per_message=100)
+    second = await compactor.compact(thread, MODEL, max_tokens=20_000, thread_id="t1")
+    assert second.folded == 0
+    assert second.newly_counted == 2
+    assert second.messages[0]["content"] == prefix
+    assert second.messages[-1] is thread[-1]
+
+
+@pytest.mark.asyncio
+async def test_compaction_does_not_orphan_tool_results():
+    compactor = IncrementalContextCompactor(keep_recent_messages=2, persist_state=False)
+    thread = make_thread(40)
+    thread[21]["role"] = "tool"
+    thread[22]["role"] = "tool"
+
+    result = await compactor.compact(thread, MODEL, max_tokens=6_000, thread_id="t2")
+    live = [m for m in result.messages if m.get("message_id")]
+    assert live and live[0]["role"] != "tool"
@@ -0,0 +1,187 @@
+"""
+Benchmark for logging overhead on the streaming hot path.
+
+Simulates the per-token work of ResponseProcessor (a debug event per chunk
+carrying the accumulated content) and measures the added cost per streamed
+token with no logging, with debug filtered out (production INFO level) and
+with debug enabled through the background queue with sampling. Also checks
+per-module levels, rate-limited sampling, eager formatting of mutable
+arguments, the report of events dropped by a full queue and the writer
+thread of forked processes.
+"""
+
+import io
+import json
+import logging
+import os
+import time
+
+import pytest
+import structlog
+
+from core.utils.logger import QueuedLogWriter, RateLimitSampler, build_logger, parse_module_levels
+
+TOKENS = 5000
+TOOL_PAYLOAD = {"function_name": "create_file", "arguments": {"file_path": "notes.txt", "file_contents": "x" * 4000}}
+JSON = [structlog.processors.JSONRenderer()]
+
+
+def stream(log=None):
+    """Per-token loop of the streaming processor; returns seconds per token."""
+    accumulated = ""
+    start = time.perf_counter()
+    for chunk_count in range(1, TOKENS + 1):
+        accumulated += "tok "
+        if log is not None:
+            log.debug("Processing chunk #%s, type=%s", chunk_count, "ModelResponseStream", sample_key="stream_chunk")
+            log.debug("📋 Tool calls data: %s", TOOL_PAYLOAD, sample_key="tool_payload")
+    return (time.perf_counter() - start) / TOKENS
+
+
+def lines(buffer):
+    return [json.loads(line) for line in buffer.getvalue().splitlines()]
+
+
+@pytest.mark.performance
+def test_log_overhead_per_streamed_token():
+    baseline = stream()
+
+    filtered_out = io.StringIO()
+    filtered, filtered_writer = build_logger(level=logging.INFO, stream=filtered_out, renderers=JSON)
+    filtered_cost = stream(filtered) - baseline
+    filtered_writer.flush()
+
+    sampled_out = io.StringIO()
+    sampled, sampled_writer = build_logger(level=logging.DEBUG, sample_rate=5, stream=sampled_out, renderers=JSON)
+    sampled_cost = stream(sampled) - baseline
+    sampled_writer.flush()
+
+    eager_out = io.StringIO()
+    eager, _ = build_logger(level=logging.DEBUG, sample_rate=TOKENS * 2, use_queue=False, stream=eager_out, renderers=JSON)
+    eager_cost = stream(eager) - baseline
+
+    print(
+        f"\n  log overhead per streamed token: filtered {filtered_cost * 1e6:.2f}µs, "
+        f"queued+sampled {sampled_cost * 1e6:.2f}µs, unsampled synchronous {eager_cost * 1e6:.2f}µs"
+    )
+    assert filtered_out.getvalue() == ""
+    assert len(lines(sampled_out)) < TOKENS * 2 / 100
+    assert len(lines(eager_out)) == TOKENS * 2
+    assert filtered_cost < sampled_cost < eager_cost
+
+
+@pytest.mark.performance
+def test_payloads_are_only_formatted_when_emitted():
+    class Payload:
+        renders = 0
+
+        def __str__(self):
+            Payload.renders += 1
+            return "payload"
+
+    out = io.StringIO()
+    log, writer = build_logger(level=logging.INFO, stream=out, renderers=JSON)
+    log.debug("Result: %s", Payload())
+    for _ in range(100):
+        log.info("Result: %s", Payload(), sample_key="result")
+    writer.flush()
+
+    assert [entry["event"] for entry in lines(out)] == ["Result: payload"] * 5
+    assert Payload.renders == 5
+
+
+@pytest.mark.unit
+def test_sampler_reports_dropped_events(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    sampler = RateLimitSampler(per_second=2)
+
+    def emit(key="chunk"):
+        try:
+            return sampler(None, "debug", {"event": "e", "sample_key": key})
+        except structlog.DropEvent:
+            return None
+
+    assert [emit() is not None for _ in range(5)] == [True, True, False, False, False]
+    assert emit("other") == {"event": "e"}
+    now[0] += 1.0
+    assert emit() == {"event": "e", "sampled_out": 3}
+    assert sampler(None, "info", {"event": "unsampled"}) == {"event": "unsampled"}
+
+
+@pytest.mark.unit
+def test_module_levels_override_the_default_level():
+    assert parse_module_levels("core.agentpress=INFO, tests=debug,bad,x=NOPE") == {
+        "core.agentpress": logging.INFO,
+        "tests": logging.DEBUG,
+    }
+
+    out = io.StringIO()
+    log, writer = build_logger(
+        level=logging.WARNING,
+        module_levels={"tests.performance": logging.DEBUG, "tests.performance.other": logging.ERROR},
+        use_queue=False,
+        stream=out,
+        renderers=JSON,
+    )
+    log.debug("kept for this module")
+    assert writer is None
+    assert [entry["event"] for entry in lines(out)] == ["kept for this module"]
+
+    quiet, _ = build_logger(level=logging.INFO, module_levels={"tests": logging.ERROR}, use_queue=False,
+                            stream=out, renderers=JSON)
+    quiet.warning("dropped")
+    quiet.error("kept")
+    assert [entry["event"] for entry in lines(out)][-1] == "kept"
+    assert len(lines(out)) == 2
+
+
+@pytest.mark.unit
+def test_mutable_arguments_are_formatted_when_logged():
+    out = io.StringIO()
+    log, writer = build_logger(level=logging.INFO, stream=out, renderers=JSON)
+    payload = {"status": "running"}
+    log.info("State: %s (%s)", payload, "id-1")
+    payload["status"] = "done"
+    writer.flush()
+
+    assert [entry["event"] for entry in lines(out)] == ["State: {'status': 'running'} (id-1)"]
+
+
+@pytest.mark.unit
+def test_dropped_events_are_reported_as_their_own_event():
+    out = io.StringIO()
+    writer = QueuedLogWriter(JSON, stream=out, maxsize=1)
+    writer.dropped = 3
+    writer.submit("info", {"event": "next", "level": "info"})
+    writer.flush()
+
+    entries = lines(out)
+    assert entries[0]["event"] == "Log queue full, events dropped"
+    assert entries[0]["dropped_events"] == 3
+    assert entries[0]["level"] == "warning"
+    assert "timestamp" in entries[0]
+    assert entries[1] == {"event": "next", "level": "info"}
+
+
+@pytest.mark.unit
+def test_forked_child_starts_its_own_writer(tmp_path):
+    path = tmp_path / "log.jsonl"
+    with open(path, "w") as stream:
+        log, writer = build_logger(level=logging.INFO, stream=stream, renderers=JSON)
+        log.info("parent")
+        writer.flush()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                log.info("child")
+                writer.flush()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        log.info("parent again")
+        writer.flush()
+
+    events = [json.loads(line)["event"] for line in path.read_text().splitlines()]
+    assert sorted(events) == ["child", "parent", "parent again"]
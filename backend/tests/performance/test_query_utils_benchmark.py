@@ -0,0 +1,119 @@
+"""
+Benchmark for batched IN queries.
+
+Measures batch_query_in latency against list size for sequential
+(max_concurrency=1) and concurrent batching using a fake PostgREST
+client with a fixed per-request latency.
+"""
+
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from core.utils.query_utils import batch_query_in, iter_batch_query_in, _split_batches
+
+REQUEST_LATENCY_S = 0.01
+
+
+class FakeQuery:
+    def __init__(self, client):
+        self.client = client
+        self.values = []
+
+    def select(self, fields):
+        return self
+
+    def in_(self, field, values):
+        self.values = list(values)
+        return self
+
+    def eq(self, field, value):
+        return self
+
+    def gte(self, field, value):
+        return self
+
+    async def execute(self):
+        self.client.in_flight += 1
+        self.client.peak_in_flight = max(self.client.peak_in_flight, self.client.in_flight)
+        self.client.requests += 1
+        try:
+            await asyncio.sleep(REQUEST_LATENCY_S)
+        finally:
+            self.client.in_flight -= 1
+        return type("Result", (), {"data": [{"id": v} for v in self.values]})()
+
+
+class FakeClient:
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def table(self, name):
+        return FakeQuery(self)
+
+    def schema(self, name):
+        return self
+
+    def from_(self, name):
+        return FakeQuery(self)
+
+
+@pytest.mark.asyncio
+@pytest.mark.performance
+async def test_batch_query_in_latency_vs_list_size():
+    """Concurrent batching keeps latency flat-ish as the IN list grows"""
+    print("\n  size | batches | sequential ms | concurrent ms")
+    for size in (100, 500, 1000, 2000):
+        values = [str(uuid.uuid4()) for _ in range(size)]
+
+        sequential_client = FakeClient()
+        start = time.perf_counter()
+        sequential = await batch_query_in(sequential_client, "t", "*", "id", values, max_concurrency=1)
+        sequential_ms = (time.perf_counter() - start) * 1000
+
+        concurrent_client = FakeClient()
+        start = time.perf_counter()
+        concurrent = await batch_query_in(concurrent_client, "t", "*", "id", values, max_concurrency=5)
+        concurrent_ms = (time.perf_counter() - start) * 1000
+
+        print(f"  {size:>4} | {concurrent_client.requests:>7} | {sequential_ms:>13.1f} | {concurrent_ms:>13.1f}")
+
+        assert sequential == concurrent
+        assert len(concurrent) == size
+        assert concurrent_client.peak_in_flight <= 5
+        if concurrent_client.requests > 1:
+            assert concurrent_client.peak_in_flight > 1
+        # Wall-clock comparison only where the gap is well above scheduling noise
+        if concurrent_client.requests >= 4:
+            assert concurrent_ms < sequential_ms
+
+
+@pytest.mark.asyncio
+async def test_batch_query_in_dedupes_values():
+    client = FakeClient()
+    results = await batch_query_in(client, "t", "*", "id", ["a", "b", "a", "c", "b"])
+    assert [r["id"] for r in results] == ["a", "b", "c"]
+    assert client.requests == 1
+
+
+def test_split_batches_respects_uri_budget():
+    long_values = ["x" * 200 for _ in range(100)]
+    batches = _split_batches(long_values, batch_size=100, max_uri_length=2000)
+    assert len(batches) > 1
+    assert sum(len(b) for b in batches) == 100
+    assert all(len(b) <= 10 for b in batches)
+
+
+@pytest.mark.asyncio
+async def test_iter_batch_query_in_streams_all_batches():
+    client = FakeClient()
+    values = list(range(250))
+    seen = []
+    async for batch in iter_batch_query_in(client, "t", "*", "id", values, batch_size=100):
+        seen.extend(r["id"] for r in batch)
+    assert sorted(seen) == values
+    assert client.requests == 3
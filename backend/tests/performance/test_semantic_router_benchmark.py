@@ -0,0 +1,148 @@
+"""
+Benchmark for SemanticPromptRouter startup and per-query latency.
+
+Uses a deterministic hashing encoder with a fixed load time and per-call
+cost in place of the SentenceTransformer model, and measures router
+construction with and without the precomputed embeddings artifact, cold
+vs cached query latency, and batch vs one-by-one routing.
+"""
+
+import hashlib
+import time
+
+import numpy as np
+import pytest
+
+from core.prompts.router import PromptModule
+from core.prompts.semantic_router import (
+    SemanticPromptRouter,
+    embeddings_path,
+    precompute_module_embeddings,
+)
+
+MODEL_LOAD_S = 0.2
+ENCODE_CALL_S = 0.01
+DIMENSIONS = 256
+
+QUERIES = [
+    "Create a file called notes.txt",
+    "Analyze this CSV and compute the averages",
+    "Write a blog post about remote work",
+    "Set up a deployment pipeline for the project",
+    "Take a screenshot of the homepage",
+    "Parse the JSON export and clean the data",
+    "Draft the release notes for version 2",
+    "Organize my tasks for the sprint",
+]
+
+
+class HashingEncoder:
+    """Bag-of-words hashing encoder with a fixed cost per encode call."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32):
+        self.calls += 1
+        time.sleep(ENCODE_CALL_S)
+        vectors = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().replace(",", " ").replace(":", " ").split():
+                word = word.rstrip("s")
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % DIMENSIONS] += 1.0
+        return vectors
+
+
+class Loader:
+    def __init__(self):
+        self.loads = 0
+        self.encoder = HashingEncoder()
+
+    def __call__(self, model_name):
+        self.loads += 1
+        time.sleep(MODEL_LOAD_S)
+        return self.encoder
+
+
+@pytest.mark.performance
+def test_startup_does_not_load_the_model(tmp_path):
+    loader = Loader()
+    precompute_module_embeddings(embeddings_dir=tmp_path, model_loader=Loader())
+
+    start = time.perf_counter()
+    router = SemanticPromptRouter(embeddings_dir=tmp_path, model_loader=loader)
+    startup_ms = (time.perf_counter() - start) * 1000
+    print(f"\n  startup with precomputed embeddings: {startup_ms:.1f}ms (model load would be {MODEL_LOAD_S * 1000:.0f}ms)")
+
+    assert loader.loads == 0
+    assert startup_ms < MODEL_LOAD_S * 1000
+    assert set(router.module_embeddings) == set(router.modules)
+    # Module embeddings came from the artifact, not from the encoder
+    assert loader.loads == 0
+
+    modules = router.route("Analyze this CSV and compute the averages")
+    assert PromptModule.TOOL_DATA_PROCESSING in modules
+    assert loader.loads == 1
+    assert loader.encoder.calls == 1
+
+
+@pytest.mark.performance
+def test_query_latency_cold_vs_cached(tmp_path):
+    precompute_module_embeddings(embeddings_dir=tmp_path, model_loader=Loader())
+    router = SemanticPromptRouter(embeddings_dir=tmp_path, model_loader=Loader())
+    router.route("warm up the model")
+
+    start = time.perf_counter()
+    for query in QUERIES:
+        router.route(query)
+    cold_ms = (time.perf_counter() - start) * 1000 / len(QUERIES)
+
+    start = time.perf_counter()
+    for query in QUERIES:
+        router.route(query)
+    cached_ms = (time.perf_counter() - start) * 1000 / len(QUERIES)
+
+    print(f"\n  per-query latency: cold {cold_ms:.2f}ms, cached {cached_ms:.2f}ms")
+    assert router.stats["query_cache_hits"] == len(QUERIES)
+    assert cached_ms < cold_ms
+
+
+@pytest.mark.performance
+def test_route_batch_uses_one_encoder_call(tmp_path):
+    precompute_module_embeddings(embeddings_dir=tmp_path, model_loader=Loader())
+    one_by_one = SemanticPromptRouter(embeddings_dir=tmp_path, model_loader=Loader())
+    batched_loader = Loader()
+    batched = SemanticPromptRouter(embeddings_dir=tmp_path, model_loader=batched_loader)
+    one_by_one.route("warm up the model")
+    batched.route("warm up the model")
+
+    start = time.perf_counter()
+    expected = [one_by_one.route(query) for query in QUERIES]
+    sequential_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    results = batched.route_batch(QUERIES)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\n  {len(QUERIES)} queries: one by one {sequential_ms:.1f}ms, batched {batch_ms:.1f}ms")
+    assert [sorted(m.value for m in r) for r in results] == [sorted(m.value for m in r) for r in expected]
+    assert batched_loader.encoder.calls == 2  # warm-up + one batch
+    assert batch_ms < sequential_ms
+
+
+def test_artifact_is_versioned_by_model_and_descriptions(tmp_path, monkeypatch):
+    path = precompute_module_embeddings(embeddings_dir=tmp_path, model_loader=Loader())
+    assert path == embeddings_path(embeddings_dir=tmp_path)
+    assert embeddings_path("other-model", tmp_path) != path
+
+    from core.prompts import semantic_router
+    descriptions = dict(semantic_router.MODULE_DESCRIPTIONS)
+    descriptions[PromptModule.TOOL_WORKFLOW] += ", release planning"
+    monkeypatch.setattr(semantic_router, "MODULE_DESCRIPTIONS", descriptions)
+    assert embeddings_path(embeddings_dir=tmp_path) != path
+
+    # Stale artifact is not picked up: embeddings are computed with the model on first use
+    loader = Loader()
+    router = SemanticPromptRouter(embeddings_dir=tmp_path, model_loader=loader)
+    router.route("plan the release")
+    assert loader.encoder.calls == 2
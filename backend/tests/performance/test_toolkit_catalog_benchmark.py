@@ -0,0 +1,194 @@
+"""
+Benchmark for the Composio toolkit catalog.
+
+Uses a fake SDK source whose calls block like the synchronous Composio
+client, and measures SDK calls and event loop stalls for a burst of
+catalog page, search and icon requests. Also checks pagination, stale
+snapshot refresh, per-toolkit tool caching, toolkits that only category
+fetches return and per-API-key catalogs.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from core.composio_integration import toolkit_catalog
+from core.composio_integration.toolkit_catalog import (
+    CATALOG_CACHE_KEY, CatalogSnapshot, ToolkitCatalog, get_toolkit_catalog, paginate
+)
+from core.composio_integration.toolkit_service import ToolInfo, ToolkitInfo
+
+SDK_CALL_S = 0.05
+TOOLKITS = 300
+
+
+class FakeSource:
+    """Blocking stand-in for the SDK side of ToolkitService."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _block(self, name, *args):
+        self.calls.append((name, *args))
+        time.sleep(SDK_CALL_S)
+
+    def fetch_toolkits(self, category=None):
+        self._block("fetch_toolkits", category)
+        toolkits = [
+            ToolkitInfo(
+                slug=f"app{i}",
+                name="Gmail" if i == 7 else f"App {i}",
+                description="Send mail" if i % 50 == 0 else f"Toolkit number {i}",
+                logo=f"https://logos/app{i}.png",
+                tags=["Productivity"] if i % 3 == 0 else ["CRM"],
+                categories=["productivity"] if i % 3 == 0 else ["crm"],
+            )
+            for i in range(TOOLKITS)
+        ]
+        if category:
+            toolkits = [toolkit for toolkit in toolkits if category in toolkit.categories]
+        return toolkits, {toolkit.slug: toolkit.logo for toolkit in toolkits}
+
+    def fetch_toolkit_icon(self, toolkit_slug):
+        self._block("fetch_toolkit_icon", toolkit_slug)
+        return f"https://logos/{toolkit_slug}.svg"
+
+    def fetch_toolkit_tools(self, toolkit_slug):
+        self._block("fetch_toolkit_tools", toolkit_slug)
+        return [ToolInfo(slug=f"{toolkit_slug}_tool_{i}", name=f"Tool {i}", description="", version="1") for i in range(120)]
+
+
+async def max_loop_stall(work):
+    """Run work while a ticker measures the longest gap between event loop turns."""
+    stalls = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    result = await work()
+    done.set()
+    await tick
+    return result, max(stalls, default=0.0)
+
+
+@pytest.mark.performance
+@pytest.mark.asyncio
+async def test_catalog_burst_uses_one_sdk_call_and_does_not_block_the_loop():
+    source = FakeSource()
+    catalog = ToolkitCatalog(source_factory=lambda: source, use_redis=False)
+
+    async def burst():
+        return await asyncio.gather(
+            *[catalog.list_toolkits(limit=50, cursor=str(page * 50)) for page in range(6)],
+            *[catalog.search_toolkits("mail") for _ in range(10)],
+            *[catalog.get_icon(f"app{i}") for i in range(50)],
+        )
+
+    start = time.perf_counter()
+    results, stall = await max_loop_stall(burst)
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(100):
+        await catalog.search_toolkits("app 1", limit=20)
+    warm_ms = (time.perf_counter() - start) * 1000 / 100
+
+    print(f"\n  66 cold requests: {cold_ms:.1f}ms, {len(source.calls)} SDK call(s), max loop stall {stall * 1000:.1f}ms;"
+          f" warm search {warm_ms:.3f}ms")
+    assert source.calls == [("fetch_toolkits", None)]
+    assert stall < SDK_CALL_S
+    assert [toolkit.slug for toolkit in results[6]["items"]][0] == "app7"  # name matches first
+    assert results[6]["total_items"] == 1 + TOOLKITS // 50
+    assert results[-1] == "https://logos/app49.png"
+
+
+@pytest.mark.asyncio
+async def test_pagination_and_category_filter():
+    source = FakeSource()
+    catalog = ToolkitCatalog(source_factory=lambda: source, use_redis=False)
+
+    first = await catalog.list_toolkits(limit=100)
+    last = await catalog.list_toolkits(limit=100, cursor="200")
+    assert (first["total_items"], first["total_pages"], first["next_cursor"]) == (TOOLKITS, 3, "100")
+    assert (last["current_page"], last["next_cursor"], len(last["items"])) == (3, None, 100)
+
+    productivity = await catalog.list_toolkits(limit=500, category="productivity")
+    again = await catalog.search_toolkits("app", category="productivity", limit=500)
+    assert productivity["total_items"] == again["total_items"] == TOOLKITS // 3
+    assert source.calls == [("fetch_toolkits", None), ("fetch_toolkits", "productivity")]
+
+    assert paginate([], 10) == {"items": [], "total_items": 0, "total_pages": 1, "current_page": 1, "next_cursor": None}
+
+
+@pytest.mark.asyncio
+async def test_stale_snapshot_is_served_while_refreshing():
+    source = FakeSource()
+    catalog = ToolkitCatalog(source_factory=lambda: source, refresh_interval=3600, use_redis=False)
+    snapshot = await catalog.snapshot()
+    snapshot.refreshed_at -= 7200
+
+    start = time.perf_counter()
+    assert await catalog.get_toolkit("app1") is not None
+    assert (time.perf_counter() - start) < SDK_CALL_S
+
+    await catalog._refresh_task
+    assert catalog.stats["refreshes"] == 2
+    assert (await catalog.snapshot()).age < 1
+
+
+@pytest.mark.asyncio
+async def test_toolkit_tools_and_unknown_icons_are_fetched_once():
+    source = FakeSource()
+    catalog = ToolkitCatalog(source_factory=lambda: source, use_redis=False)
+
+    pages = [await catalog.get_toolkit_tools("app1", limit=50, cursor=cursor) for cursor in (None, "50", "100")]
+    assert [len(page.items) for page in pages] == [50, 50, 20]
+    assert pages[-1].next_cursor is None
+
+    assert await catalog.get_icon("not_listed") == "https://logos/not_listed.svg"
+    assert await catalog.get_icon("not_listed") == "https://logos/not_listed.svg"
+    assert [call[0] for call in source.calls] == ["fetch_toolkit_tools", "fetch_toolkits", "fetch_toolkit_icon"]
+
+
+@pytest.mark.asyncio
+async def test_category_only_toolkits_survive_cache_and_refresh():
+    class CategorySource(FakeSource):
+        def fetch_toolkits(self, category=None):
+            toolkits, icons = super().fetch_toolkits(category)
+            if category:
+                toolkits.append(ToolkitInfo(slug="hidden", name="Hidden", tags=[], categories=[category]))
+            return toolkits, icons
+
+    source = CategorySource()
+    catalog = ToolkitCatalog(source_factory=lambda: source, use_redis=False)
+    await catalog.list_toolkits(category="productivity")
+    snapshot = await catalog.snapshot()
+
+    restored = CatalogSnapshot.from_cache(snapshot.to_cache())
+    assert restored.by_slug["hidden"].name == "Hidden"
+    assert "hidden" in restored.categories["productivity"]
+    assert len(restored.toolkits) == TOOLKITS
+
+    await catalog.refresh()
+    assert await catalog.get_toolkit("hidden") is not None
+    assert (await catalog.search_toolkits("hidden", category="productivity"))["total_items"] == 1
+
+
+def test_catalogs_are_keyed_by_api_key(monkeypatch):
+    monkeypatch.setenv("COMPOSIO_API_KEY", "default-key")
+    monkeypatch.setattr(toolkit_catalog, "_toolkit_catalog_instances", {})
+
+    default = get_toolkit_catalog()
+    assert get_toolkit_catalog("default-key") is default
+    other = get_toolkit_catalog("other-key")
+    assert other is not default and other is get_toolkit_catalog("other-key")
+    assert other.api_key == "other-key"
+    assert other._catalog_key != default._catalog_key == CATALOG_CACHE_KEY
@@ -0,0 +1,76 @@
+"""
+Unit tests for memoized modular prompt assembly.
+
+Tests that module order is fixed so the core prefix is identical across
+module sets, that assembled prompts are memoized per module set, and that
+the modular prompt is only used for agents that opted in.
+"""
+import pytest
+from core.prompts.module_manager import ModularPromptBuilder, PromptModule
+from core.prompts.prompt import get_system_prompt
+from core.run import AgentConfig, AgentRunner, PromptManager
+
+
+@pytest.fixture
+def builder():
+    """Create a ModularPromptBuilder instance for testing"""
+    return ModularPromptBuilder()
+
+
+def test_module_order_is_fixed_and_core_prefix_is_shared(builder):
+    forward = builder.assemble([PromptModule.TOOL_TOOLKIT, PromptModule.TOOL_WORKFLOW])
+    backward = builder.assemble([PromptModule.TOOL_WORKFLOW, PromptModule.TOOL_TOOLKIT])
+    other = builder.assemble([PromptModule.TOOL_DATA_PROCESSING])
+
+    assert forward.content == backward.content
+    assert forward.modules[:4] == other.modules[:4] == (
+        "core/identity", "core/workspace", "core/critical_rules", "response/format"
+    )
+    core_prefix = "\n\n".join(builder.modules[PromptModule(name)].content for name in forward.modules[:4])
+    assert forward.content.startswith(core_prefix)
+    assert other.content.startswith(core_prefix)
+
+
+def test_assembled_prompts_are_memoized_per_module_set(builder):
+    first = builder.assemble([PromptModule.TOOL_TOOLKIT], strip_xml_examples=True)
+    second = builder.assemble([PromptModule.TOOL_TOOLKIT], strip_xml_examples=True)
+    with_xml = builder.assemble([PromptModule.TOOL_TOOLKIT])
+
+    assert not first.cache_hit
+    assert second.cache_hit
+    assert second.content is first.content
+    assert second.tokens == first.tokens > 0
+    assert not with_xml.cache_hit
+    assert builder.stats == {"assembled": 2, "cache_hits": 1}
+
+    # build_prompt goes through the same cache
+    assert builder.build_prompt([PromptModule.TOOL_TOOLKIT], {'native_tool_calling': True}) is first.content
+    assert builder.stats["cache_hits"] == 2
+
+
+def test_routed_prompt_is_smaller_than_the_monolithic_prompt():
+    assembly = PromptManager.assemble_modular_prompt("Create a file called notes.txt")
+
+    assert "tools/toolkit" in assembly.modules
+    assert "tools/content_creation" not in assembly.modules
+    assert assembly.tokens < ModularPromptBuilder().count_tokens(get_system_prompt())
+
+
+@pytest.mark.parametrize("agent_config, expected", [
+    (None, False),
+    ({"system_prompt": "", "metadata": {}}, False),
+    ({"system_prompt": "", "metadata": {"modular_prompt": True}}, True),
+    ({"system_prompt": "Custom", "is_chainlens_default": True, "metadata": {"modular_prompt": True}}, True),
+    ({"system_prompt": "You are a pirate.", "metadata": {"modular_prompt": True}}, False),
+])
+def test_modular_prompt_is_toggled_per_agent(agent_config, expected):
+    runner = AgentRunner(AgentConfig(thread_id="t1", project_id="p1", agent_config=agent_config))
+    assert runner._use_modular_prompt() is expected
+
+
+@pytest.mark.asyncio
+async def test_system_prompt_uses_assembled_base_prompt():
+    system_message = await PromptManager.build_system_prompt(
+        "gpt-4o", {"system_prompt": "ignored"}, "t1", None, base_prompt="MODULAR PROMPT"
+    )
+    assert system_message["content"].startswith("MODULAR PROMPT")
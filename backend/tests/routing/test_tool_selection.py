@@ -0,0 +1,180 @@
+"""
+Tool schema routing tests.
+
+Measures how many schema tokens query-aware tool selection saves against
+how often the tool a query needs is left out (tool-miss rate), using the
+real tool classes registered lazily, and checks the always-on, fallback
+and recovery behaviour.
+"""
+import json
+
+import pytest
+from litellm import token_counter
+
+from core.agentpress.tool_registry import ToolRegistry, _uses_class_schemas
+from core.prompts.tool_router import ToolSchemaRouter, ALWAYS_ON_FUNCTIONS
+from core.utils.tool_discovery import discover_tools
+
+# (query, function the agent needs to answer it)
+LABELED_QUERIES = [
+    ("Search the web for the latest news about electric vehicles", "web_search"),
+    ("Scrape https://example.com/pricing and summarize it", "scrape_webpage"),
+    ("Create a 5-slide presentation about our Q3 results", "create_slide"),
+    ("Export the presentation to PowerPoint", "export_to_pptx"),
+    ("Write a Python script that parses the CSV and run it", "execute_command"),
+    ("Fix the typo in src/app.py", "str_replace"),
+    ("Find images of golden retrievers for the report", "image_search"),
+    ("Generate an image of a sunset over mountains", "image_edit_or_generate"),
+    ("Open the login page in the browser and click sign in", "browser_act"),
+    ("Take a screenshot of the dashboard website", "browser_screenshot"),
+    ("Find research papers on transformer attention", "paper_search"),
+    ("Look up people who work as data scientists at Stripe", "people_search"),
+    ("Find companies in the fintech space in Berlin", "company_search"),
+    ("Call the customer at +1 555 0100 and confirm the appointment", "make_phone_call"),
+    ("Write a Word document with the meeting notes", "create_document"),
+    ("Convert the document to PDF", "convert_to_pdf"),
+    ("Parse this uploaded PDF invoice and extract the totals", "parse_document"),
+    ("Look at the image I uploaded and describe it", "load_image"),
+    ("Expose port 3000 so I can preview the site", "expose_port"),
+    ("Search my knowledge base for the onboarding guide", "search_files"),
+    ("Create a new agent that posts daily summaries to Slack", "create_new_agent"),
+    ("Schedule a trigger to run every morning at 9am", "create_agent_scheduled_trigger"),
+    ("Get LinkedIn profile data for this person using a data provider", "execute_data_provider_call"),
+    ("Design a poster for the conference", "designer_create_or_edit"),
+    ("Upload the report file so I can share it", "upload_file"),
+    ("Find an MCP server for Gmail integration", "search_mcp_servers"),
+]
+
+
+@pytest.fixture(scope="module")
+def registry():
+    """Registry with every discovered tool, registered lazily (nothing is constructed)"""
+    registry = ToolRegistry()
+    for tool_class in discover_tools().values():
+        if _uses_class_schemas(tool_class):
+            registry.register_tool(tool_class, lazy=True)
+    return registry
+
+
+def schema_tokens(registry, function_names=None):
+    return token_counter(model="gpt-4o", text=json.dumps(registry.get_openapi_schemas(function_names), indent=2))
+
+
+@pytest.mark.routing
+@pytest.mark.performance
+def test_tokens_saved_vs_tool_miss_rate(registry):
+    router = ToolSchemaRouter()
+    full_tokens = schema_tokens(registry)
+
+    selected_tokens, misses = [], []
+    for query, expected in LABELED_QUERIES:
+        selection = router.select(registry, query)
+        assert selection.routed
+        selected_tokens.append(schema_tokens(registry, selection.selected))
+        if not selection.is_selected(expected):
+            misses.append((query, expected))
+
+    average_tokens = sum(selected_tokens) / len(selected_tokens)
+    savings = 1 - average_tokens / full_tokens
+    miss_rate = len(misses) / len(LABELED_QUERIES)
+
+    print(f"\nTool schema tokens: full={full_tokens}, selected avg={average_tokens:.0f}")
+    print(f"Tokens saved per call: {savings:.1%}, tool-miss rate: {miss_rate:.1%} {misses}")
+
+    assert savings >= 0.5
+    assert miss_rate <= 0.1
+
+
+@pytest.mark.unit
+@pytest.mark.routing
+def test_always_on_and_recent_functions_are_selected(registry):
+    router = ToolSchemaRouter()
+    selection = router.select(registry, "Search the web for flights", recent_functions=["create_slide"])
+
+    assert ALWAYS_ON_FUNCTIONS <= set(selection.selected)
+    assert {"web_search", "create_slide"} <= set(selection.selected)
+    assert not set(selection.selected) & set(selection.omitted)
+    assert set(selection.selected) | set(selection.omitted) == set(registry.get_function_names())
+
+    # A follow-up that names no tool still gets the tools the thread was using
+    follow_up = router.select(registry, "ok, continue", recent_functions=["create_slide", "web_search"])
+    assert follow_up.routed
+    assert {"web_search", "create_slide"} <= set(follow_up.selected)
+
+
+@pytest.mark.unit
+@pytest.mark.routing
+def test_unmatched_query_falls_back_to_all_schemas(registry):
+    selection = ToolSchemaRouter().select(registry, "hi!")
+
+    assert not selection.routed
+    assert selection.omitted == []
+    assert selection.selected == registry.get_function_names()
+
+
+@pytest.mark.unit
+@pytest.mark.routing
+def test_calling_an_unlisted_function_expands_the_selection(registry):
+    router = ToolSchemaRouter()
+    selection = router.select(registry, "Search the web for the latest news about electric vehicles")
+    assert "make_phone_call" in selection.omitted
+    chars_before = selection.selected_schema_chars
+
+    assert router.expand(selection, registry, ["web_search", "make_phone_call"]) == ["make_phone_call"]
+    assert selection.is_selected("make_phone_call")
+    assert "make_phone_call" not in selection.omitted
+    assert selection.expanded == ["make_phone_call"]
+    assert selection.selected_schema_chars > chars_before
+    assert router.expand(selection, registry, ["make_phone_call"]) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.routing
+async def test_expansion_is_added_as_its_own_cached_system_block(registry):
+    from core.agentpress.prompt_caching import add_system_cache_control, system_cache_breakpoints
+    from core.run import PromptManager
+
+    router = ToolSchemaRouter()
+    selection = router.select(registry, "Take a screenshot of the dashboard website")
+    system_message = await PromptManager.build_system_prompt(
+        "gpt-4o", None, "thread-1", None, tool_registry=registry, tool_selection=selection
+    )
+    content = system_message["content"]
+    assert '"name": "browser_screenshot"' in content
+    assert '"name": "make_phone_call"' not in content
+    assert "make_phone_call" in content.split("schemas are not listed above:")[1]
+    assert PromptManager.add_tool_expansion(system_message, registry, selection) is system_message
+
+    router.expand(selection, registry, ["make_phone_call"])
+    expanded = PromptManager.add_tool_expansion(system_message, registry, selection)
+
+    # The system prompt is unchanged in front of the expansion block
+    base, expansion = expanded["content"]
+    assert base["text"] == content
+    assert '"name": "make_phone_call"' in expansion["text"]
+    rebuilt = await PromptManager.build_system_prompt(
+        "gpt-4o", None, "thread-1", None, tool_registry=registry, tool_selection=selection
+    )
+    assert rebuilt["content"] == content
+
+    cached = add_system_cache_control(expanded)
+    assert system_cache_breakpoints(expanded) == 2
+    assert all(block["cache_control"] == {"type": "ephemeral"} for block in cached["content"])
+
+
+@pytest.mark.asyncio
+@pytest.mark.routing
+async def test_unrouted_system_prompt_embeds_every_schema(registry):
+    from types import SimpleNamespace
+    from core.run import AgentConfig, AgentRunner, PromptManager
+
+    runner = AgentRunner(AgentConfig(thread_id="thread-1", project_id="project-1", model_name="gpt-4o"))
+    runner.thread_manager = SimpleNamespace(tool_registry=registry)
+    runner.client = None
+
+    selection = ToolSchemaRouter().select(registry, "hi!")
+    system_message = await runner._build_system_message(None, selection)
+
+    assert '"name": "browser_screenshot"' in system_message["content"]
+    assert '"name": "make_phone_call"' in system_message["content"]
+    assert "schemas are not listed above" not in system_message["content"]
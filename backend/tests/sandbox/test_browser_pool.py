@@ -0,0 +1,164 @@
+"""
+Unit tests for the sandbox browser pool.
+
+Tests that pages are leased from one browser up to the page limit, that the
+browser is recycled after max_uses leases and replaced after a crash, and
+that a retired browser is only closed once its last lease ends.
+"""
+import asyncio
+
+import pytest
+
+from core.sandbox.docker.browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def new_page(self):
+        return type("FakePage", (), {})()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, number):
+        self.number = number
+        self.connected = True
+        self.closed = False
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+        self.connected = False
+
+
+class FakeChromium:
+    def __init__(self):
+        self.browsers = []
+
+    async def launch(self, headless=True, args=None):
+        browser = FakeBrowser(len(self.browsers))
+        self.browsers.append(browser)
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+        self.stopped = False
+
+    async def stop(self):
+        self.stopped = True
+
+
+def make_pool(**kwargs):
+    playwright = FakePlaywright()
+
+    async def factory():
+        return playwright
+
+    return BrowserPool(playwright_factory=factory, **kwargs), playwright.chromium
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_browser_is_recycled_after_max_uses():
+    pool, chromium = make_pool(max_uses=2)
+
+    for _ in range(5):
+        async with pool.page() as page:
+            assert page.lease_timings["wait_ms"] >= 0
+    # Idle retired browsers are closed in a background task
+    await asyncio.sleep(0)
+
+    assert len(chromium.browsers) == 3
+    assert [browser.closed for browser in chromium.browsers] == [True, True, False]
+    assert all(context.closed for browser in chromium.browsers for context in browser.contexts)
+    stats = pool.stats()
+    assert (stats["launches"], stats["recycles"], stats["leases"], stats["open_pages"]) == (3, 2, 5, 0)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_crashed_browser_is_replaced_on_next_lease():
+    pool, chromium = make_pool()
+    async with pool.page():
+        pass
+
+    chromium.browsers[0].connected = False
+    async with pool.page():
+        pass
+
+    assert len(chromium.browsers) == 2
+    assert pool.stats()["crashes"] == 1
+    assert pool.stats()["browser_connected"] is True
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_leases_wait_for_a_free_page():
+    pool, _ = make_pool(max_pages=2)
+    in_use = 0
+    max_in_use = 0
+
+    async def export():
+        nonlocal in_use, max_in_use
+        async with pool.page():
+            in_use += 1
+            max_in_use = max(max_in_use, in_use)
+            await asyncio.sleep(0.01)
+            in_use -= 1
+
+    await asyncio.gather(*(export() for _ in range(6)))
+
+    assert max_in_use == 2
+    assert pool.stats()["leases"] == 6
+
+    blocked, _ = make_pool(max_pages=1, lease_timeout=0.01)
+    async with blocked.page():
+        with pytest.raises(RuntimeError, match="No browser page became free"):
+            async with blocked.page():
+                pass
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_retired_browser_closes_after_its_last_lease():
+    pool, chromium = make_pool(max_uses=1)
+    release = asyncio.Event()
+    leased = asyncio.Event()
+
+    async def long_export():
+        async with pool.page():
+            leased.set()
+            await release.wait()
+
+    task = asyncio.create_task(long_export())
+    await leased.wait()
+
+    # The first browser is used up: the next lease gets a new one while the old one stays open
+    async with pool.page():
+        pass
+    first = chromium.browsers[0]
+    assert len(chromium.browsers) == 2
+    assert first.closed is False
+
+    release.set()
+    await task
+    assert first.closed is True
+    assert chromium.browsers[1].closed is False
+
+    await pool.stop()
+    assert chromium.browsers[1].closed is True
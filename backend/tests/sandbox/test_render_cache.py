@@ -0,0 +1,109 @@
+"""
+Unit tests for the slide render cache.
+
+Tests that the cache lives outside the presentation, that a slide's key
+changes with the local assets it references, that a PPTX slide analysis
+round-trips with its screenshots, and that pruning keeps the live keys and
+entries used by a concurrent export.
+"""
+import os
+import time
+from dataclasses import dataclass
+
+import pytest
+
+from core.sandbox.docker.render_cache import SlideRenderCache
+
+
+@dataclass
+class TextElement:
+    text: str
+    x: float
+    y: float
+
+
+def write_slide(presentation_dir, name="slide_01.html", image="logo.png"):
+    html = presentation_dir / name
+    html.write_text(f'<html><body><img src="{image}"><div style="background: url(\'https://cdn/bg.png\')">Hi</div></body></html>')
+    return html
+
+
+@pytest.mark.unit
+def test_cache_is_outside_the_presentation(tmp_path):
+    presentation = tmp_path / "workspace" / "presentations" / "deck"
+    presentation.mkdir(parents=True)
+    cache = SlideRenderCache(presentation, "pdf", cache_root=tmp_path / "render-cache")
+    other = SlideRenderCache(tmp_path / "workspace" / "presentations" / "other", "pdf", cache_root=tmp_path / "render-cache")
+
+    assert (tmp_path / "render-cache") in cache.root.parents
+    assert presentation not in cache.root.parents
+    assert cache.root != other.root
+    assert SlideRenderCache(presentation / ".." / "deck", "pdf", cache_root=tmp_path / "render-cache").root == cache.root
+
+
+@pytest.mark.unit
+def test_asset_change_invalidates_the_key(tmp_path):
+    (tmp_path / "logo.png").write_bytes(b"v1")
+    html = write_slide(tmp_path)
+    cache = SlideRenderCache(tmp_path, "pdf", cache_root=tmp_path / "cache")
+
+    key = cache.key(html)
+    assert cache.key(html) == key
+
+    (tmp_path / "logo.png").write_bytes(b"v2")
+    assert cache.key(html) != key
+
+    # Remote references are keyed by URL only; missing files do not break hashing
+    write_slide(tmp_path, image="missing.png")
+    assert cache.key(html) is not None
+
+
+@pytest.mark.unit
+def test_pptx_analysis_round_trips(tmp_path):
+    shots = tmp_path / "shots"
+    shots.mkdir()
+    (shots / "chart.png").write_bytes(b"chart")
+    (shots / "background.png").write_bytes(b"background")
+    analysis = {
+        "visual_elements": [{"image_path": str(shots / "chart.png"), "x": 10, "y": 20}],
+        "background_path": str(shots / "background.png"),
+        "text_elements": [TextElement("Title", 1.0, 2.0)],
+    }
+    cache = SlideRenderCache(tmp_path, "pptx", cache_root=tmp_path / "cache")
+
+    assert cache.get_analysis("key-1") is None
+    cache.put_analysis("key-1", analysis)
+    # The export's own screenshots are temporary
+    for shot in shots.iterdir():
+        shot.unlink()
+
+    restored = cache.get_analysis("key-1", text_element_type=TextElement)
+    assert restored["text_elements"] == [TextElement("Title", 1.0, 2.0)]
+    assert restored["visual_elements"][0]["x"] == 10
+    assert restored["visual_elements"][0]["image_path"].read_bytes() == b"chart"
+    assert restored["background_path"].read_bytes() == b"background"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.put_analysis("key-2", {**analysis, "error": "render failed"})
+    assert cache.get_analysis("key-2") is None
+
+
+@pytest.mark.unit
+def test_prune_keeps_live_keys_and_newer_entries(tmp_path):
+    pdf = tmp_path / "slide.pdf"
+    pdf.write_bytes(b"%PDF")
+    earlier = SlideRenderCache(tmp_path, "pdf", cache_root=tmp_path / "cache")
+    for key in ("live", "stale", "concurrent"):
+        earlier.put_pdf(key, pdf)
+    past = time.time() - 60
+    for key in ("live", "stale", "concurrent"):
+        os.utime(earlier.root / f"{key}.pdf", (past, past))
+
+    export = SlideRenderCache(tmp_path, "pdf", cache_root=tmp_path / "cache")
+    export.started_at = time.time() - 30
+    # A concurrent export of another deck version reuses "concurrent" after this export started
+    assert SlideRenderCache(tmp_path, "pdf", cache_root=tmp_path / "cache").get_pdf("concurrent") is not None
+
+    export.prune(["live", None])
+
+    assert sorted(path.name for path in export.root.iterdir()) == ["concurrent.pdf", "live.pdf"]
@@ -0,0 +1,197 @@
+"""
+Unit tests for the marketplace listing read model.
+
+Tests that listings are read from the projection with a single tag filter,
+that one-word and multi-word searches match word prefixes in the full-text
+index alike, that unsearched first pages
+are served from the page cache until the listing version changes, that
+downloads are queued in Redis and applied in one batched update, and that
+counts left behind by an interrupted flush are recovered.
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.services import redis
+from core.templates.services import marketplace_index
+from core.templates.services.marketplace_index import LISTINGS_TABLE, PENDING_DOWNLOADS_KEY, MarketplaceIndex
+from core.utils import cache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        self.values[key] = value
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+        self.hashes.pop(key, None)
+
+    async def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1)
+
+    async def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, 0)) + amount)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def scan_iter(self, match):
+        prefix = match.rstrip("*")
+        for key in list(self.hashes):
+            if key.startswith(prefix):
+                yield key
+
+    async def rename(self, src, dst):
+        if src not in self.hashes:
+            raise Exception("ERR no such key")
+        self.hashes[dst] = self.hashes.pop(src)
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.calls = [("table", table)]
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return record
+
+    async def execute(self):
+        self.db.queries.append(self.calls)
+        return SimpleNamespace(data=list(self.db.rows), count=len(self.db.rows))
+
+
+class FakeClient:
+    def __init__(self, db):
+        self.db = db
+
+    def table(self, name):
+        return FakeQuery(self.db, name)
+
+    def rpc(self, name, params):
+        self.db.rpcs.append((name, params))
+        return SimpleNamespace(execute=self._execute)
+
+    async def _execute(self):
+        return SimpleNamespace(data=None)
+
+
+class FakeDB:
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.queries = []
+        self.rpcs = []
+
+    @property
+    async def client(self):
+        return FakeClient(self)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = FakeRedis()
+
+    async def get_client():
+        return fake
+
+    async def get(key, default=None):
+        value = await fake.get(key)
+        return value if value is not None else default
+
+    monkeypatch.setattr(redis, "get_client", get_client)
+    monkeypatch.setattr(redis, "get", get)
+    monkeypatch.setattr(cache, "get_client", get_client)
+    return fake
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_listing_reads_projection_and_caches_first_pages(fake_redis):
+    db = FakeDB(rows=[{"template_id": "t1", "name": "Research"}])
+    index = MarketplaceIndex(db)
+
+    rows = await index.list_templates(limit=20, tags=["ai", "research"])
+    assert rows == [{"template_id": "t1", "name": "Research"}]
+    query = db.queries[0]
+    assert query[0] == ("table", LISTINGS_TABLE)
+    assert [call for call in query if call[0] == "contains"] == [("contains", ("tags", ["ai", "research"]), {})]
+
+    # Same page again, tags in another order: served from the cache
+    await index.list_templates(limit=20, tags=["research", "ai"])
+    assert len(db.queries) == 1
+    assert index.stats["page_hits"] == 1
+
+    # Searches and deep pages always go to the database
+    await index.list_templates(limit=20, search="res")
+    await index.list_templates(limit=20, offset=20 * marketplace_index.CACHED_PAGES)
+    assert len(db.queries) == 3
+
+    # Publishing a template moves every page to a new cache key
+    await index.invalidate()
+    await index.list_templates(limit=20, tags=["ai", "research"])
+    assert len(db.queries) == 4
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_downloads_are_applied_in_one_batch(fake_redis):
+    db = FakeDB()
+    index = MarketplaceIndex(db)
+
+    for template_id in ["t1", "t2", "t1", "t1"]:
+        await index.record_download(template_id)
+    assert db.rpcs == []
+
+    assert await index.flush_downloads() == 4
+    assert db.rpcs == [("apply_template_download_counts", {"p_counts": {"t1": 3, "t2": 1}})]
+    assert fake_redis.hashes == {}
+
+    # Nothing pending: no database round trip
+    assert await index.flush_downloads() == 0
+    assert len(db.rpcs) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_searches_match_word_prefixes_in_the_full_text_index(fake_redis):
+    db = FakeDB()
+    index = MarketplaceIndex(db)
+
+    await index.list_templates(limit=20, search="resea")
+    await index.count_templates(search="slack  daily-sum")
+    await index.count_templates(search=" & ! ")
+
+    assert ("filter", ("search_vector", "fts(simple)", "resea:*"), {}) in db.queries[0]
+    assert ("filter", ("search_vector", "fts(simple)", "slack:* & daily:* & sum:*"), {}) in db.queries[1]
+    # Nothing searchable left: no filter rather than an invalid tsquery
+    assert not [call for call in db.queries[2] if call[0] in ("filter", "ilike")]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_interrupted_flushes_are_merged_back(fake_redis):
+    db = FakeDB()
+    index = MarketplaceIndex(db)
+    stale_key = f"{PENDING_DOWNLOADS_KEY}:{int(time.time()) - 3600}:dead"
+    live_key = f"{PENDING_DOWNLOADS_KEY}:{int(time.time())}:running"
+    fake_redis.hashes[stale_key] = {"t1": "2", "t2": "1"}
+    fake_redis.hashes[live_key] = {"t3": "5"}
+    await index.record_download("t1")
+
+    assert await index.recover_orphaned_downloads() == 3
+    # A flush still running in another process keeps its counts
+    assert fake_redis.hashes[live_key] == {"t3": "5"}
+
+    assert await index.flush_downloads() == 4
+    assert db.rpcs == [("apply_template_download_counts", {"p_counts": {"t1": 3, "t2": 1}})]
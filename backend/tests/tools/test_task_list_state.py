@@ -0,0 +1,211 @@
+"""
+Unit tests for the task list state kept by TaskListTool during a run.
+
+Tests that the task list is read once per run, that each change is written
+right away (an insert first, then patches carrying only the changed tasks)
+so a stopped run loses nothing, that calls without changes do not write,
+that write errors reach the tool result without changing the in-memory
+list, and that a failed read is retried instead of starting a new list.
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from core.tools.task_list_tool import TaskListTool
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = None
+        self.payload = None
+        self.filters = {}
+
+    def select(self, *args):
+        self.op = "select"
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    async def execute(self):
+        self.db.calls.append(self.op)
+        if self.op == "select" and self.db.fail_reads:
+            raise ConnectionError("database unavailable")
+        if self.op != "select" and self.db.fail_writes:
+            raise ConnectionError("database unavailable")
+        if self.op == "select":
+            rows = [r for r in self.db.rows if all(r.get(k) == v for k, v in self.filters.items())]
+            return SimpleNamespace(data=rows[-1:])
+        if self.op == "insert":
+            row = {"message_id": f"m{len(self.db.rows) + 1}", **self.payload}
+            self.db.rows.append(row)
+            return SimpleNamespace(data=[row])
+        for row in self.db.rows:
+            if row["message_id"] == self.filters["message_id"]:
+                row.update(self.payload)
+        return SimpleNamespace(data=[])
+
+
+class FakePatch:
+    """patch_task_list, applied the way the SQL function merges tasks."""
+
+    def __init__(self, db, params):
+        self.db = db
+        self.params = params
+
+    async def execute(self):
+        self.db.calls.append("rpc")
+        self.db.patches.append(self.params)
+        if self.db.fail_writes:
+            raise ConnectionError("database unavailable")
+        row = next((r for r in self.db.rows if r["message_id"] == self.params["p_message_id"]), None)
+        if row is None:
+            return SimpleNamespace(data=False)
+        content = row["content"] if isinstance(row["content"], dict) else json.loads(row["content"])
+        changed = {t["id"]: t for t in self.params["p_tasks"]}
+        known = {t["id"] for t in content["tasks"]}
+        tasks = [changed.get(t["id"], t) for t in content["tasks"] if t["id"] not in self.params["p_deleted_task_ids"]]
+        tasks += [t for t in self.params["p_tasks"] if t["id"] not in known]
+        if self.params["p_task_order"] is not None:
+            tasks.sort(key=lambda t: self.params["p_task_order"].index(t["id"]))
+        row["content"] = {"sections": self.params["p_sections"] or content["sections"], "tasks": tasks}
+        return SimpleNamespace(data=True)
+
+
+class FakeDB:
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.calls = []
+        self.patches = []
+        self.fail_writes = False
+        self.fail_reads = False
+
+    @property
+    def client(self):
+        async def get():
+            return SimpleNamespace(
+                table=lambda name: FakeQuery(self, name),
+                rpc=lambda name, params: FakePatch(self, params),
+            )
+        return get()
+
+
+def make_tool(db):
+    thread_manager = SimpleNamespace(db=db)
+    return TaskListTool("project", thread_manager, "thread-1")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_each_change_is_written_without_rereading():
+    db = FakeDB()
+    tool = make_tool(db)
+
+    created = await tool.create_tasks(sections=[{"title": "Research", "tasks": ["a", "b", "c"]}])
+    task_ids = [t["id"] for t in json.loads(created.output)["sections"][0]["tasks"]]
+    assert db.calls == ["select", "insert"]
+
+    await tool.update_tasks(task_ids[0], status="completed")
+    await tool.delete_tasks(task_ids[2])
+    assert db.calls == ["select", "insert", "rpc", "rpc"]
+    stored = db.rows[0]["content"]
+    assert [t["status"] for t in stored["tasks"]] == ["completed", "pending"]
+
+    # Only the changed task travels; sections and order are left out
+    update, delete = db.patches
+    assert [t["id"] for t in update["p_tasks"]] == [task_ids[0]]
+    assert update["p_sections"] is None and update["p_task_order"] is None
+    assert delete["p_tasks"] == [] and delete["p_deleted_task_ids"] == [task_ids[2]]
+
+    # Nothing changed: no write
+    view = await tool.view_tasks()
+    assert json.loads(view.output)["total_tasks"] == 2
+    assert db.calls == ["select", "insert", "rpc", "rpc"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_stored_list_is_loaded_once():
+    stored = {"sections": [{"id": "s1", "title": "Plan"}], "tasks": [{"id": "t1", "content": "x", "status": "completed", "section_id": "s1"}]}
+    db = FakeDB([{"message_id": "m1", "thread_id": "thread-1", "type": "task_list", "content": json.dumps(stored)}])
+    tool = make_tool(db)
+
+    view = json.loads((await tool.view_tasks()).output)
+    assert view["sections"][0]["title"] == "Plan"
+    assert view["sections"][0]["tasks"][0]["id"] == "t1"
+
+    await tool.update_tasks("t1", status="pending")
+    await tool.update_tasks("t1", content="y")
+    assert db.calls == ["select", "rpc", "rpc"]
+    assert db.rows[0]["content"]["tasks"][0] == {"id": "t1", "content": "y", "status": "pending", "section_id": "s1"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_write_errors_reach_the_tool_result():
+    stored = {"sections": [{"id": "s1", "title": "Plan"}], "tasks": [{"id": "t1", "content": "x", "status": "pending", "section_id": "s1"}]}
+    db = FakeDB([{"message_id": "m1", "thread_id": "thread-1", "type": "task_list", "content": json.dumps(stored)}])
+    db.fail_writes = True
+    tool = make_tool(db)
+
+    result = await tool.update_tasks("t1", status="completed")
+    assert result.success is False
+    assert "database unavailable" in result.output
+    assert tool.state.tasks[0].status == "pending"
+    assert tool.state.dirty is False
+
+    db.fail_writes = False
+    assert (await tool.update_tasks("t1", status="completed")).success
+    assert db.rows[0]["content"]["tasks"][0]["status"] == "completed"
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_failed_read_is_retried_instead_of_starting_a_new_list():
+    stored = {"sections": [{"id": "s1", "title": "Plan"}], "tasks": [{"id": "t1", "content": "x", "status": "pending", "section_id": "s1"}]}
+    db = FakeDB([{"message_id": "m1", "thread_id": "thread-1", "type": "task_list", "content": stored}])
+    db.fail_reads = True
+    tool = make_tool(db)
+
+    result = await tool.create_tasks(section_title="Plan", task_contents=["y"])
+    assert result.success is False
+    assert tool.state.loaded is False
+    assert "insert" not in db.calls
+
+    db.fail_reads = False
+    assert (await tool.create_tasks(section_title="Plan", task_contents=["y"])).success
+    assert len(db.rows) == 1
+    assert [t["content"] for t in db.rows[0]["content"]["tasks"]] == ["x", "y"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_list_not_in_the_current_format_is_rewritten_in_full():
+    # Tasks stored without IDs get new ones on load, so a patch could not match them
+    stored = {"sections": [{"id": "s1", "title": "Plan"}], "tasks": [{"content": "x", "status": "pending", "section_id": "s1"}]}
+    db = FakeDB([{"message_id": "m1", "thread_id": "thread-1", "type": "task_list", "content": stored}])
+    tool = make_tool(db)
+
+    view = json.loads((await tool.view_tasks()).output)
+    task_id = view["sections"][0]["tasks"][0]["id"]
+    assert (await tool.update_tasks(task_id, status="completed")).success
+    assert db.calls == ["select", "update"]
+    assert db.rows[0]["content"]["tasks"][0]["status"] == "completed"
@@ -0,0 +1,131 @@
+"""
+Unit tests for copying presentation templates into a sandbox.
+
+Tests that template archives are deterministic, that a template is uploaded
+as one archive and extracted in the sandbox, that a template version the
+sandbox has already cached is extracted without any upload, and that a
+failing extraction falls back to copying files one by one.
+"""
+import io
+import shlex
+import tarfile
+from types import SimpleNamespace
+
+import pytest
+
+from core.tools.sb_presentation_tool import SandboxPresentationTool
+from core.utils import template_archives
+from core.utils.template_archives import build_all_archives, build_template_archive, get_template_archive
+
+
+class FakeFS:
+    def __init__(self):
+        self.uploads = {}
+        self.folders = []
+
+    async def upload_file(self, content, path):
+        self.uploads[path] = content
+
+    async def create_folder(self, path, mode):
+        self.folders.append(path)
+
+    async def download_file(self, path):
+        if path not in self.uploads:
+            raise FileNotFoundError(path)
+        return self.uploads[path]
+
+
+class FakeProcess:
+    """Understands the test/mv/tar commands used to extract cached archives."""
+
+    def __init__(self, fs, tar_works=True):
+        self.fs = fs
+        self.tar_works = tar_works
+        self.cached = {}
+        self.extracted = []
+        self.commands = []
+
+    async def exec(self, command, timeout=None):
+        self.commands.append(command)
+        parts = [shlex.split(part) for part in command.split(" && ")]
+        for args in parts:
+            if args[0] == "test" and args[2] not in self.cached:
+                return SimpleNamespace(exit_code=1, result="")
+            if args[0] == "mv":
+                self.cached[args[2]] = self.fs.uploads.pop(args[1])
+            if args[0] == "tar":
+                if not self.tar_works:
+                    return SimpleNamespace(exit_code=2, result="tar: not found")
+                self.extracted.append((args[2], args[4]))
+        return SimpleNamespace(exit_code=0, result="")
+
+
+@pytest.fixture
+def templates_dir(tmp_path, monkeypatch):
+    template = tmp_path / "clean"
+    (template / "assets").mkdir(parents=True)
+    (template / "metadata.json").write_text('{"title": "Clean", "slides": {"1": {"filename": "slide_01.html"}}}')
+    (template / "slide_01.html").write_text("<html><body>Slide</body></html>")
+    (template / "assets" / "logo.png").write_bytes(b"\x89PNG")
+    monkeypatch.setattr(template_archives, "_archives", {})
+    return tmp_path
+
+
+def make_tool(templates_dir, tar_works=True):
+    tool = SandboxPresentationTool("project", thread_manager=None)
+    tool.templates_dir = str(templates_dir)
+    fs = FakeFS()
+    tool._sandbox = SimpleNamespace(fs=fs, process=FakeProcess(fs, tar_works))
+    return tool
+
+
+@pytest.mark.unit
+def test_archives_are_deterministic_and_prebuilt(templates_dir):
+    first = build_template_archive(str(templates_dir / "clean"))
+    second = build_template_archive(str(templates_dir / "clean"))
+    assert first.sha256 == second.sha256 and first.file_count == 3
+
+    with tarfile.open(fileobj=io.BytesIO(first.data)) as tar:
+        assert sorted(tar.getnames()) == ["assets/logo.png", "metadata.json", "slide_01.html"]
+
+    manifest = build_all_archives(str(templates_dir))
+    assert manifest["clean"]["sha256"] == first.sha256
+    assert get_template_archive("clean", str(templates_dir)).data == first.data
+
+    (templates_dir / "clean" / "slide_01.html").write_text("<html><body>Edited</body></html>")
+    template_archives._archives.clear()
+    assert get_template_archive("clean", str(templates_dir)).sha256 != first.sha256
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_template_is_uploaded_once_per_version(templates_dir):
+    tool = make_tool(templates_dir)
+    fs, process = tool.sandbox.fs, tool.sandbox.process
+
+    path = await tool._copy_template_to_workspace("clean", "Deck One")
+    archive_uploads = [p for p in fs.uploads if p.endswith(".tar.gz")]
+    assert archive_uploads == [] and len(process.cached) == 1
+    assert process.extracted[-1][1] == path == "/workspace/presentations/deckone"
+    assert [p for p in fs.uploads if not p.endswith("metadata.json")] == []
+
+    process.commands.clear()
+    await tool._copy_template_to_workspace("clean", "Deck Two")
+    # Cached version: a single exec and no archive upload
+    assert len(process.commands) == 1
+    assert process.extracted[-1][1] == "/workspace/presentations/decktwo"
+    metadata = fs.uploads["/workspace/presentations/decktwo/metadata.json"]
+    assert b'"presentations/decktwo/slide_01.html"' in metadata
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_failed_extraction_falls_back_to_file_copy(templates_dir):
+    tool = make_tool(templates_dir, tar_works=False)
+
+    await tool._copy_template_to_workspace("clean", "Deck")
+
+    uploads = tool.sandbox.fs.uploads
+    assert uploads["/workspace/presentations/deck/assets/logo.png"] == b"\x89PNG"
+    assert "/workspace/presentations/deck/slide_01.html" in uploads
+    assert "/workspace/presentations/deck/assets" in tool.sandbox.fs.folders
@@ -0,0 +1,209 @@
+"""
+Unit tests for the worker-side trigger scheduler.
+
+Tests that a herd of schedules due on the same minute is popped from the
+heap, claimed once across scheduler replicas in batched Redis round trips,
+and dispatched with jitter; that reloads only reschedule changed triggers;
+that cron expressions are evaluated in the trigger's timezone; that a
+redelivered fire is not executed twice; and that a running scheduler
+advertises itself through a Redis heartbeat.
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from core.triggers import scheduler as scheduler_module
+from core.services import redis as redis_service
+from core.triggers import trigger_service as trigger_service_module
+from core.triggers.scheduler import (
+    HEARTBEAT_KEY,
+    TriggerScheduler,
+    execute_scheduled_trigger,
+    next_fire_time,
+    scheduler_running,
+)
+
+# 2026-01-05 08:59:30 UTC (a Monday)
+NOW = datetime(2026, 1, 5, 8, 59, 30, tzinfo=timezone.utc).timestamp()
+
+
+class FakePipeline:
+    def __init__(self, store, redis):
+        self.store = store
+        self.redis = redis
+        self.commands = []
+
+    def set(self, key, value, nx=False, ex=None):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        results = []
+        for key, value in self.commands:
+            won = key not in self.store
+            if won:
+                self.store[key] = value
+            results.append(won)
+        return results
+
+
+class FakeRedis:
+    def __init__(self, store):
+        self.store = store
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.store, self)
+
+    async def set(self, key, value, nx=False, ex=None):
+        self.store[key] = value
+        return True
+
+
+def schedule_rows(count, cron="0 9 * * *", tz="UTC", updated_at="v1"):
+    return [
+        {
+            "trigger_id": f"trigger-{i:05d}",
+            "agent_id": f"agent-{i % 7}",
+            "config": {"cron_expression": cron, "timezone": tz, "agent_prompt": "Daily report", "scheduler": "worker"},
+            "updated_at": updated_at,
+        }
+        for i in range(count)
+    ]
+
+
+def make_scheduler(store, enqueued):
+    redis = FakeRedis(store)
+
+    async def redis_factory():
+        return redis
+
+    scheduler = TriggerScheduler(
+        db=object(),
+        redis_client_factory=redis_factory,
+        enqueue=lambda trigger_id, scheduled_time, delay_ms: enqueued.append((trigger_id, scheduled_time, delay_ms)),
+        clock=lambda: NOW,
+    )
+    return scheduler, redis
+
+
+@pytest.mark.asyncio
+async def test_same_minute_herd_is_claimed_once_and_jittered():
+    store, first_enqueued, second_enqueued = {}, [], []
+    first, first_redis = make_scheduler(store, first_enqueued)
+    second, _ = make_scheduler(store, second_enqueued)
+    rows = schedule_rows(3000)
+    first.sync(rows, now=NOW)
+    second.sync(rows, now=NOW)
+
+    assert first.pop_due(NOW) == []
+    fire_at = NOW + 30
+    due = first.pop_due(fire_at)
+    assert len(due) == 3000
+
+    delays = first.dispatch(await first.claim(due))
+    # Another replica popping the same fires wins nothing
+    assert await second.claim(second.pop_due(fire_at)) == []
+
+    assert len(first_enqueued) == 3000 and second_enqueued == []
+    assert first_redis.round_trips == 3000 // scheduler_module.CLAIM_BATCH_SIZE
+    assert max(delays) <= scheduler_module.MAX_JITTER_S * 1000
+    assert max(delays) - min(delays) > scheduler_module.MAX_JITTER_S * 1000 / 2
+    assert {scheduled for _, scheduled, _ in first_enqueued} == {"2026-01-05T09:00:00+00:00"}
+
+    # Next fires are a day later; nothing is due again in the meantime
+    assert first.pop_due(fire_at + 3600) == []
+    assert len(first.pop_due(fire_at + 24 * 3600)) == 3000
+
+
+def test_reload_reschedules_only_changed_and_drops_removed_triggers():
+    scheduler, _ = make_scheduler({}, [])
+    scheduler.sync(schedule_rows(3), now=NOW)
+
+    rows = schedule_rows(2)
+    rows[1] = schedule_rows(2, cron="*/5 * * * *", updated_at="v2")[1]
+    scheduler.sync(rows, now=NOW)
+
+    assert len(scheduler) == 2
+    due = scheduler.pop_due(NOW + 30)
+    assert [fire.trigger.trigger_id for fire in due] == ["trigger-00000", "trigger-00001"]
+
+    # Five minutes later only the */5 trigger is due, each fire exactly once
+    due = scheduler.pop_due(NOW + 330)
+    assert [fire.trigger.trigger_id for fire in due] == ["trigger-00001"]
+
+
+def test_missed_fires_are_coalesced():
+    scheduler, _ = make_scheduler({}, [])
+    scheduler.sync(schedule_rows(1, cron="* * * * *"), now=NOW)
+
+    due = scheduler.pop_due(NOW + 3600)
+    assert len(due) == 1
+    assert scheduler.pop_due(NOW + 3600) == []
+
+
+def test_cron_is_evaluated_in_the_trigger_timezone():
+    # 09:00 in New York is 14:00 UTC in January (EST) and 13:00 UTC in July (EDT)
+    winter = next_fire_time("0 9 * * *", "America/New_York", NOW)
+    summer = next_fire_time("0 9 * * *", "America/New_York", datetime(2026, 7, 6, 8, tzinfo=timezone.utc).timestamp())
+    assert datetime.fromtimestamp(winter, timezone.utc).hour == 14
+    assert datetime.fromtimestamp(summer, timezone.utc).hour == 13
+
+
+def test_invalid_trigger_config_is_skipped():
+    scheduler, _ = make_scheduler({}, [])
+    rows = schedule_rows(2)
+    rows[0]["config"]["cron_expression"] = "not a cron"
+    scheduler.sync(rows, now=NOW)
+    assert len(scheduler) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_redelivered_fire_is_executed_once(monkeypatch):
+    store = {}
+    lookups = []
+
+    async def fake_set(key, value, ex=None, nx=False):
+        if nx and key in store:
+            return None
+        store[key] = value
+        return True
+
+    class FakeTriggerService:
+        async def get_trigger(self, trigger_id):
+            lookups.append(trigger_id)
+            return None
+
+    monkeypatch.setattr(redis_service, "set", fake_set)
+    monkeypatch.setattr(trigger_service_module, "get_trigger_service", lambda db: FakeTriggerService())
+
+    first = await execute_scheduled_trigger(object(), "trigger-1", "2026-01-05T09:00:00+00:00")
+    again = await execute_scheduled_trigger(object(), "trigger-1", "2026-01-05T09:00:00+00:00")
+    next_slot = await execute_scheduled_trigger(object(), "trigger-1", "2026-01-06T09:00:00+00:00")
+
+    assert first["error"] == next_slot["error"] == "Trigger not found or inactive"
+    assert again == {"success": False, "error": "Already executed"}
+    assert lookups == ["trigger-1", "trigger-1"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_reload_refreshes_the_scheduler_heartbeat(monkeypatch):
+    store = {}
+    scheduler, _ = make_scheduler(store, [])
+
+    async def load_rows():
+        return schedule_rows(1)
+
+    async def fake_get(key):
+        return store.get(key)
+
+    scheduler.load_rows = load_rows
+    monkeypatch.setattr(redis_service, "get", fake_get)
+
+    assert not await scheduler_running()
+    await scheduler.reload()
+
+    assert store[HEARTBEAT_KEY] == scheduler.instance_id
+    assert await scheduler_running()
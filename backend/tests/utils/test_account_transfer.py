@@ -0,0 +1,157 @@
+"""
+Unit tests for the bulk account export and import.
+
+Tests that an export pages through every table in batches and matches the
+database counts, that an interrupted export resumes from its checkpoint
+without duplicating rows, and that an import into another account copies
+the rows under new IDs with their references remapped.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from core.utils.account_transfer import AccountTransfer, _TableFiles
+
+KEYS = {"projects": "project_id", "threads": "thread_id", "messages": "message_id", "agent_runs": "id"}
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = []
+        self.limit_n = None
+        self.upserted = None
+        self.count = False
+
+    def select(self, *columns, count=None, head=None):
+        self.count = count is not None
+        return self
+
+    def eq(self, column, value):
+        if column == "threads.account_id":
+            threads = {t["thread_id"] for t in self.db.tables["threads"] if t["account_id"] == value}
+            self.filters.append(lambda row: row["thread_id"] in threads)
+        else:
+            self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row[column] in set(values))
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def upsert(self, rows, on_conflict):
+        self.upserted = (rows, on_conflict)
+        return self
+
+    async def execute(self):
+        if self.upserted:
+            rows, key = self.upserted
+            existing = {row[key]: row for row in self.db.tables[self.table]}
+            existing.update({row[key]: row for row in rows})
+            self.db.tables[self.table] = list(existing.values())
+            return SimpleNamespace(data=rows, count=None)
+
+        self.db.queries += 1
+        if self.db.fail_after is not None and self.db.queries > self.db.fail_after:
+            raise ConnectionError("connection lost")
+        rows = sorted(
+            (row for row in self.db.tables[self.table] if all(f(row) for f in self.filters)),
+            key=lambda row: row[KEYS[self.table]]
+        )
+        if self.count:
+            return SimpleNamespace(data=[], count=len(rows))
+        return SimpleNamespace(data=rows[:self.limit_n], count=None)
+
+
+class FakeDB:
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = 0
+        self.fail_after = None
+
+    @property
+    async def client(self):
+        return SimpleNamespace(table=lambda name: FakeQuery(self, name))
+
+
+def make_account(account_id, threads=3, messages_per_thread=5):
+    tables = {"projects": [{"project_id": f"p-{account_id}", "account_id": account_id, "sandbox": {"id": "sb"}}],
+              "threads": [], "messages": [], "agent_runs": []}
+    for t in range(threads):
+        thread_id = f"t-{account_id}-{t}"
+        tables["threads"].append({"thread_id": thread_id, "account_id": account_id, "project_id": f"p-{account_id}"})
+        tables["agent_runs"].append({"id": f"r-{thread_id}", "thread_id": thread_id, "status": "completed"})
+        for m in range(messages_per_thread):
+            tables["messages"].append({"message_id": f"m-{thread_id}-{m:02d}", "thread_id": thread_id,
+                                       "content": {"role": "user", "content": f"hello {m}"}})
+    return tables
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_export_resumes_and_imports_into_target_account(tmp_path):
+    source = FakeDB(make_account("acct"))
+    transfer = AccountTransfer(source, batch_size=4, thread_chunk_size=2)
+
+    # Lose the connection halfway through the messages
+    source.fail_after = 6
+    results = await transfer.export_accounts(["acct"], str(tmp_path))
+    assert results["acct"]["valid"] is False
+
+    source.fail_after = None
+    results = await transfer.export_accounts(["acct"], str(tmp_path))
+    manifest = results["acct"]
+    assert manifest["valid"] is True
+    assert manifest["tables"]["messages"] == {"rows": 15, "database": 15}
+
+    exported = [row["message_id"] for row in _TableFiles(tmp_path / "acct", "messages", "ndjson").iter_rows()]
+    assert sorted(exported) == sorted(row["message_id"] for row in source.tables["messages"])
+    assert len(exported) == len(set(exported))
+
+    target = FakeDB({"projects": [], "threads": [], "messages": [], "agent_runs": []})
+    results = await AccountTransfer(target, batch_size=4).import_accounts(["acct"], str(tmp_path), target_account_id="other")
+    assert results["acct"]["valid"] is True
+    assert {row["account_id"] for row in target.tables["threads"]} == {"other"}
+    assert target.tables["messages"][0]["content"] == {"role": "user", "content": "hello 0"}
+    assert len(target.tables["agent_runs"]) == 3
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_import_into_another_account_copies_rows_under_new_ids(tmp_path):
+    db = FakeDB(make_account("acct", threads=2, messages_per_thread=2))
+    original = {name: [dict(row) for row in rows] for name, rows in db.tables.items()}
+    transfer = AccountTransfer(db, batch_size=3)
+    await transfer.export_accounts(["acct"], str(tmp_path))
+
+    # Copy within the same database: the source account keeps its rows
+    results = await transfer.import_accounts(["acct"], str(tmp_path), target_account_id="other")
+    assert results["acct"]["valid"] is True
+    for name, rows in original.items():
+        assert all(row in db.tables[name] for row in rows)
+        assert len(db.tables[name]) == 2 * len(rows)
+
+    copied_projects = {row["project_id"] for row in db.tables["projects"] if row["account_id"] == "other"}
+    copied_threads = [row for row in db.tables["threads"] if row["account_id"] == "other"]
+    copied_thread_ids = {row["thread_id"] for row in copied_threads}
+    assert {row["project_id"] for row in copied_threads} == copied_projects
+    assert not copied_thread_ids & {row["thread_id"] for row in original["threads"]}
+    new_messages = [row for row in db.tables["messages"] if row not in original["messages"]]
+    assert {row["thread_id"] for row in new_messages} == copied_thread_ids
+
+    # Importing again writes the same IDs
+    (tmp_path / "acct" / "import_checkpoint.json").unlink()
+    await transfer.import_accounts(["acct"], str(tmp_path), target_account_id="other")
+    assert len(db.tables["messages"]) == 2 * len(original["messages"])
@@ -0,0 +1,227 @@
+"""
+Unit tests for the Redis distributed lock.
+
+Tests that holders get increasing fencing tokens, that a waiter is woken by
+the release instead of waiting out the lease, that a holder which lost its
+lease cannot pass the fence check or grant credits, that fence counters
+expire, and that the lock is not acquired at all (rather than taken in
+Postgres) while Redis is unavailable.
+"""
+import asyncio
+import time
+
+import pytest
+
+from core.utils import distributed_lock
+from core.utils.distributed_lock import (
+    DistributedLock,
+    LockLostError,
+    PostgresDistributedLock,
+    RedisDistributedLock,
+)
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.setdefault(channel, []).append(self.queue)
+
+    async def unsubscribe(self, channel):
+        self.redis.subscribers[channel].remove(self.queue)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+        self.subscribers = {}
+        self.clock = 1_000_000
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def pttl(self, key):
+        return int((self.expires[key] - time.monotonic()) * 1000) if key in self.values else -2
+
+    async def eval(self, script, numkeys, *args):
+        keys, argv = args[:numkeys], args[numkeys:]
+        holder = self.values.get(keys[0])
+        if script == distributed_lock._ACQUIRE_SCRIPT:
+            if holder is not None:
+                return None
+            self.values[keys[0]] = argv[0]
+            self.expires[keys[0]] = time.monotonic() + int(argv[1]) / 1000
+            token = max(self.clock, int(self.values.get(keys[1], 0)) + 1)
+            self.values[keys[1]] = str(token)
+            self.expires[keys[1]] = time.monotonic() + int(argv[2]) / 1000
+            return token
+        if script == distributed_lock._RELEASE_SCRIPT:
+            if holder != argv[0]:
+                return 0
+            del self.values[keys[0]]
+            for queue in self.subscribers.get(keys[1], []):
+                queue.put_nowait({"type": "message", "data": argv[0]})
+            return 1
+        if script == distributed_lock._EXTEND_SCRIPT:
+            return 1 if holder == argv[0] else 0
+        raise AssertionError("unexpected script")
+
+
+class FakeFenceDB:
+    def __init__(self):
+        self.fences = {}
+        self.grants = []
+
+    def _advance(self, lock_key, token):
+        accepted = token >= self.fences.get(lock_key, 0)
+        if accepted:
+            self.fences[lock_key] = token
+        return accepted
+
+    def rpc(self, name, params):
+        if name == "advance_lock_fence":
+            data = self._advance(params["p_lock_key"], params["p_token"])
+        else:
+            assert name == "atomic_add_credits"
+            if "p_lock_key" in params and not self._advance(params["p_lock_key"], params["p_fencing_token"]):
+                data = {"success": False, "lock_lost": True}
+            else:
+                self.grants.append(params["p_amount"])
+                data = {"success": True, "total_balance": sum(self.grants)}
+
+        async def execute():
+            return type("Result", (), {"data": data})()
+        return type("Query", (), {"execute": staticmethod(execute)})()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = FakeRedis()
+
+    async def factory():
+        return fake
+
+    original_init = RedisDistributedLock.__init__
+
+    def init(self, *args, **kwargs):
+        kwargs.setdefault("redis_client_factory", factory)
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(RedisDistributedLock, "__init__", init)
+    monkeypatch.setattr(distributed_lock, "LOCK_BACKEND", "redis")
+    return fake
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_waiter_is_woken_by_release_and_gets_newer_token(fake_redis):
+    first = DistributedLock("renewal:acct", timeout_seconds=60)
+    assert await first.acquire()
+    assert first.backend == "redis"
+    assert not await DistributedLock("renewal:acct").acquire(wait=False)
+
+    second = DistributedLock("renewal:acct", timeout_seconds=60)
+    waiter = asyncio.create_task(second.acquire(wait=True, wait_timeout=10))
+    await asyncio.sleep(0.05)
+    started = time.monotonic()
+    assert await first.release()
+    assert await waiter
+    # Woken by the release message, not by the 60s lease running out
+    assert time.monotonic() - started < 1
+    assert second.fencing_token > first.fencing_token
+    # The fence counter expires instead of living forever
+    assert fake_redis.expires["lock_fence:renewal:acct"] - time.monotonic() > 6 * 24 * 3600
+    await second.release()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_stale_holder_fails_fence_check(fake_redis):
+    db = FakeFenceDB()
+    stale = DistributedLock("credit_grant:acct", timeout_seconds=60)
+    assert await stale.acquire()
+
+    # The lease runs out and another holder takes over and writes
+    fake_redis.values.pop("lock:credit_grant:acct")
+    fake_redis.clock += 1
+    current = DistributedLock("credit_grant:acct", timeout_seconds=60)
+    assert await current.acquire()
+    await current.check_fence(db)
+
+    with pytest.raises(LockLostError):
+        await stale.check_fence(db)
+    assert not await stale.release()
+    assert await current.release()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_stale_holder_cannot_grant_credits(fake_redis, monkeypatch):
+    from core.billing.credit_manager import CreditManager
+    from core.utils.cache import Cache
+
+    async def invalidate(key):
+        pass
+
+    db = FakeFenceDB()
+    manager = CreditManager()
+    manager.db = type("DB", (), {"client": property(lambda self: _resolved(db))})()
+    monkeypatch.setattr(Cache, "invalidate", invalidate)
+
+    stale = DistributedLock("credit_grant:acct", timeout_seconds=60)
+    assert await stale.acquire()
+    fake_redis.values.pop("lock:credit_grant:acct")
+    fake_redis.clock += 1
+    current = DistributedLock("credit_grant:acct", timeout_seconds=60)
+    assert await current.acquire()
+
+    # The fence is checked by the grant itself, not by a separate call
+    result = await manager.add_credits("acct", 10, description="Renewal", lock=current)
+    assert result["success"] is True
+    with pytest.raises(LockLostError):
+        await manager.add_credits("acct", 10, description="Renewal", lock=stale)
+    assert db.grants == [10.0]
+    assert manager.use_atomic_functions is True
+    assert not await stale.release()
+    assert await current.release()
+
+
+async def _resolved(value):
+    return value
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_not_acquired_while_redis_is_down(monkeypatch):
+    async def unavailable():
+        raise ConnectionError("redis down")
+
+    async def pg_acquire(self, wait=False, wait_timeout=30):
+        raise AssertionError("must not fall back to the Postgres lock")
+
+    original_init = RedisDistributedLock.__init__
+    monkeypatch.setattr(
+        RedisDistributedLock, "__init__",
+        lambda self, *args, **kwargs: original_init(self, *args, redis_client_factory=unavailable, **kwargs)
+    )
+    monkeypatch.setattr(PostgresDistributedLock, "acquire", pg_acquire)
+    monkeypatch.setattr(distributed_lock, "LOCK_BACKEND", "redis")
+
+    lock = DistributedLock("stripe_webhooks:cus_1")
+    assert not await lock.acquire(wait=False)
+    assert not await lock.acquire(wait=True, wait_timeout=0)
+    assert lock.backend == "redis"
+    assert lock.fencing_token is None
+    assert await lock.release()
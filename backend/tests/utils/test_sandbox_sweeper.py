@@ -0,0 +1,147 @@
+"""
+Unit tests for the sandbox sweeper.
+
+Tests that sandboxes are processed concurrently with outcomes counted per
+policy decision, that dry runs never act, that a resumed sweep skips
+finished sandboxes and retries the ones that failed (including failed
+lookups while deciding), and that a finished sweep starts over.
+"""
+import threading
+import time
+
+import pytest
+
+from core.utils.sandbox_sweeper import SandboxSweeper, SweepPolicy, SweepTarget
+
+
+class FakeSandbox:
+    def __init__(self, sandbox_id, state='STOPPED'):
+        self.id = sandbox_id
+        self.state = state
+
+
+class FakeDaytona:
+    def __init__(self, sandboxes):
+        self.sandboxes = sandboxes
+
+    def list(self):
+        return list(self.sandboxes)
+
+
+class RecordingPolicy(SweepPolicy):
+    name = "archive"
+
+    def __init__(self, skip=(), fail=(), delay=0.0, lookup_fail=()):
+        self.skip = set(skip)
+        self.fail = set(fail)
+        self.lookup_fail = set(lookup_fail)
+        self.delay = delay
+        self.acted = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def targets(self, daytona):
+        return [SweepTarget(sb.id, sb.state.lower(), sb) for sb in daytona.list()]
+
+    async def decide(self, target):
+        if target.sandbox_id in self.lookup_fail:
+            raise ConnectionError("subscription lookup failed")
+        if target.sandbox_id in self.skip:
+            return False, "skipped_paid_user"
+        return True, "selected"
+
+    def act(self, daytona, target):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if target.sandbox_id in self.fail:
+                raise RuntimeError("archive failed")
+            self.acted.append(target.sandbox_id)
+            return "archived"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _daytona(count):
+    return FakeDaytona([FakeSandbox(f"sb-{i:02d}") for i in range(count)])
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_sweep_runs_concurrently_and_counts_outcomes():
+    policy = RecordingPolicy(skip={"sb-03"}, fail={"sb-05"}, delay=0.05)
+    sweeper = SandboxSweeper(policy, daytona=_daytona(10), concurrency=4, rate_per_second=0)
+
+    stats = await sweeper.run()
+
+    assert stats["total"] == 10
+    assert stats["processed"] == 10
+    assert stats["outcomes"] == {"archived": 8, "skipped_paid_user": 1, "error": 1}
+    assert stats["errors"] == 1
+    assert policy.max_in_flight > 1
+    assert policy.max_in_flight <= 4
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_dry_run_decides_without_acting(tmp_path):
+    checkpoint = tmp_path / "sweep.json"
+    policy = RecordingPolicy(skip={"sb-01"})
+    sweeper = SandboxSweeper(
+        policy, daytona=_daytona(3), rate_per_second=0, checkpoint_path=str(checkpoint), dry_run=True
+    )
+
+    stats = await sweeper.run()
+
+    assert policy.acted == []
+    assert stats["outcomes"] == {"would_archive": 2, "skipped_paid_user": 1}
+    assert not checkpoint.exists()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_resume_skips_finished_and_retries_failed(tmp_path):
+    checkpoint = str(tmp_path / "sweep.json")
+    daytona = _daytona(6)
+
+    first = RecordingPolicy(fail={"sb-02"}, lookup_fail={"sb-03"})
+    stats = await SandboxSweeper(
+        first, daytona=daytona, concurrency=2, rate_per_second=0, checkpoint_path=checkpoint, limit=4
+    ).run()
+    assert stats["processed"] == 4
+    assert stats["outcomes"] == {"archived": 2, "error": 2}
+    assert sorted(first.acted) == ["sb-00", "sb-01"]
+
+    second = RecordingPolicy()
+    stats = await SandboxSweeper(
+        second, daytona=daytona, concurrency=2, rate_per_second=0, checkpoint_path=checkpoint
+    ).run()
+
+    assert stats["skipped_done"] == 2
+    assert sorted(second.acted) == ["sb-02", "sb-03", "sb-04", "sb-05"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_finished_sweep_starts_over(tmp_path):
+    checkpoint = tmp_path / "sweep.json"
+    first = RecordingPolicy()
+    await SandboxSweeper(
+        first, daytona=FakeDaytona([FakeSandbox("b"), FakeSandbox("d")]),
+        rate_per_second=0, checkpoint_path=str(checkpoint)
+    ).run()
+    assert sorted(first.acted) == ["b", "d"]
+    assert not checkpoint.exists()
+
+    # Sandboxes created since sort before the last cursor
+    second = RecordingPolicy()
+    stats = await SandboxSweeper(
+        second, daytona=FakeDaytona([FakeSandbox(i) for i in "abcd"]),
+        rate_per_second=0, checkpoint_path=str(checkpoint)
+    ).run()
+    assert stats["skipped_done"] == 0
+    assert sorted(second.acted) == ["a", "b", "c", "d"]